@@ -0,0 +1,175 @@
+/* dh.cpp */
+
+#include "dh.h"
+
+#include <math.h>
+#include <Eigen/Dense>
+
+/*
+ * Link transform of link j for joint coordinate q
+ */
+static void _dh_A(DH *dh, int j, double q, Matrix4dc &A)
+{
+    double st, ct, d, sa, ca, a;
+
+    q = dh->flip[j] * q + dh->offset[j];
+
+    if (dh->sigma[j] == 0)
+    {
+        st = sin(q);
+        ct = cos(q);
+        d = dh->d[j];
+    }
+    else
+    {
+        st = sin(dh->theta[j]);
+        ct = cos(dh->theta[j]);
+        d = q;
+    }
+
+    sa = sin(dh->alpha[j]);
+    ca = cos(dh->alpha[j]);
+    a = dh->a[j];
+
+    if (dh->mdh == 0)
+    {
+        A << ct, -st * ca, st * sa, a * ct,
+            st, ct * ca, -ct * sa, a * st,
+            0, sa, ca, d,
+            0, 0, 0, 1;
+    }
+    else
+    {
+        A << ct, -st, 0, a,
+            st * ca, ct * ca, -sa, -sa * d,
+            st * sa, ct * sa, ca, ca * d,
+            0, 0, 0, 1;
+    }
+}
+
+void _dh_fkine(DH *dh, double *q, double *base, double *tool, double *T)
+{
+    Matrix4dc A, U;
+    MapMatrix4dr Tout(T);
+
+    if (base != NULL)
+        U = MapMatrix4dr(base);
+    else
+        U.setIdentity();
+
+    for (int j = 0; j < dh->n; j++)
+    {
+        _dh_A(dh, j, q[j], A);
+        U = U * A;
+    }
+
+    if (tool != NULL)
+        Tout = U * MapMatrix4dr(tool);
+    else
+        Tout = U;
+}
+
+void _dh_fkine_all(DH *dh, double *q, double *base, double *T)
+{
+    // The base frame followed by the frame of every link
+    Matrix4dc A, U;
+
+    if (base != NULL)
+        U = MapMatrix4dr(base);
+    else
+        U.setIdentity();
+
+    MapMatrix4dr T0(T);
+    T0 = U;
+
+    for (int j = 0; j < dh->n; j++)
+    {
+        _dh_A(dh, j, q[j], A);
+        U = U * A;
+        MapMatrix4dr(T + 16 * (j + 1)) = U;
+    }
+}
+
+/*
+ * Jacobian in the end-effector frame, returns the pose of the end-effector
+ * with respect to the base frame of the chain in U
+ */
+static void _dh_jacobe_U(DH *dh, double *q, double *tool, double *J, Matrix4dc &U)
+{
+    Matrix4dc A;
+    int n = dh->n;
+
+    if (tool != NULL)
+        U = MapMatrix4dr(tool);
+    else
+        U.setIdentity();
+
+    // J is 6 x n row major, column j is J[k * n + j]
+    for (int j = n - 1; j >= 0; j--)
+    {
+        _dh_A(dh, j, q[j], A);
+
+        if (dh->mdh == 0)
+            U = A * U;
+
+        if (dh->sigma[j] == 0)
+        {
+            // revolute axis
+            for (int k = 0; k < 3; k++)
+            {
+                J[k * n + j] = dh->flip[j] * (-U(0, k) * U(1, 3) + U(1, k) * U(0, 3));
+                J[(k + 3) * n + j] = dh->flip[j] * U(2, k);
+            }
+        }
+        else
+        {
+            // prismatic axis
+            for (int k = 0; k < 3; k++)
+            {
+                J[k * n + j] = dh->flip[j] * U(2, k);
+                J[(k + 3) * n + j] = 0.0;
+            }
+        }
+
+        if (dh->mdh != 0)
+            U = A * U;
+    }
+}
+
+void _dh_jacobe(DH *dh, double *q, double *tool, double *J)
+{
+    Matrix4dc U;
+
+    _dh_jacobe_U(dh, q, tool, J, U);
+}
+
+void _dh_jacob0(DH *dh, double *q, double *base, double *tool, double *J)
+{
+    // Rotate the end-effector frame Jacobian into the world frame, the
+    // recursion has already computed the end-effector pose
+    Matrix4dc U;
+    Eigen::Matrix3d R;
+    int n = dh->n;
+
+    _dh_jacobe_U(dh, q, tool, J, U);
+
+    if (base != NULL)
+        R = MapMatrix4dr(base).topLeftCorner<3, 3>() * U.topLeftCorner<3, 3>();
+    else
+        R = U.topLeftCorner<3, 3>();
+
+    for (int j = 0; j < n; j++)
+    {
+        Vector3 v(J[j], J[n + j], J[2 * n + j]);
+        Vector3 w(J[3 * n + j], J[4 * n + j], J[5 * n + j]);
+
+        v = R * v;
+        w = R * w;
+
+        for (int k = 0; k < 3; k++)
+        {
+            J[k * n + j] = v(k);
+            J[(k + 3) * n + j] = w(k);
+        }
+    }
+}
@@ -0,0 +1,45 @@
+/**
+ * \file dh.h
+ * \brief Denavit-Hartenberg kinematics
+ *
+ */
+/* dh.h */
+
+#ifndef _DH_H_
+#define _DH_H_
+
+#include "linalg.h"
+#include <Eigen/Dense>
+
+/*
+ * A serial chain described by standard or modified Denavit-Hartenberg
+ * parameters. The joint coordinate of link j is
+ *
+ *      flip[j] * q[j] + offset[j]
+ *
+ * which replaces theta[j] for a revolute joint or d[j] for a prismatic
+ * joint.
+ */
+typedef struct DH
+{
+    int n;          /* number of links */
+    int mdh;        /* 0 for standard DH, 1 for modified DH */
+    int *sigma;     /* 0 for a revolute joint, 1 for a prismatic joint */
+    double *theta;  /* joint angle */
+    double *d;      /* link offset */
+    double *a;      /* link length */
+    double *alpha;  /* link twist */
+    double *offset; /* joint coordinate offset */
+    double *flip;   /* joint direction, 1 or -1 */
+} DH;
+
+/*
+ * The base and tool transforms are row major, as they come from Python,
+ * and may be NULL if they are the identity. All results are row major.
+ */
+void _dh_fkine(DH *dh, double *q, double *base, double *tool, double *T);
+void _dh_fkine_all(DH *dh, double *q, double *base, double *T);
+void _dh_jacobe(DH *dh, double *q, double *tool, double *J);
+void _dh_jacob0(DH *dh, double *q, double *base, double *tool, double *J);
+
+#endif
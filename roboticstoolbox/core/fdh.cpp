@@ -0,0 +1,408 @@
+/**
+ * \file fdh.cpp
+ * \brief Python bindings for the Denavit-Hartenberg kinematics
+ *
+ *  CHAIN = DH_init(SIGMA, THETA, D, A, ALPHA, OFFSET, FLIP, MDH)
+ *  T = DH_fkine(CHAIN, Q, BASE, TOOL)
+ *  T = DH_fkine_all(CHAIN, Q, BASE)
+ *  J = DH_jacobe(CHAIN, Q, TOOL)
+ *  J = DH_jacob0(CHAIN, Q, BASE, TOOL)
+ *
+ *  where Q is an (M x n) array, one joint configuration per row, and BASE
+ *  and TOOL are 4 x 4 homogeneous transforms or None for the identity. The
+ *  results are (M x 4 x 4) for DH_fkine, (M x n+1 x 4 x 4) for DH_fkine_all
+ *  which includes the base frame, and (M x 6 x n) for the Jacobians.
+ */
+
+#define NPY_NO_DEPRECATED_API NPY_1_7_API_VERSION
+
+#include "fdh.h"
+#include "dh.h"
+#include "linalg.h"
+
+#include <Python.h>
+#include <numpy/arrayobject.h>
+#include <math.h>
+#include <Eigen/Dense>
+
+static PyMethodDef fdhMethods[] = {
+    {"DH_init",
+     (PyCFunction)DH_init,
+     METH_VARARGS,
+     "Create a Denavit-Hartenberg chain"},
+    {"DH_fkine",
+     (PyCFunction)DH_fkine,
+     METH_VARARGS,
+     "Forward kinematics"},
+    {"DH_fkine_all",
+     (PyCFunction)DH_fkine_all,
+     METH_VARARGS,
+     "Forward kinematics of every link frame"},
+    {"DH_jacobe",
+     (PyCFunction)DH_jacobe,
+     METH_VARARGS,
+     "Jacobian in the end-effector frame"},
+    {"DH_jacob0",
+     (PyCFunction)DH_jacob0,
+     METH_VARARGS,
+     "Jacobian in the world frame"},
+    {NULL, NULL, 0, NULL} /* Sentinel */
+};
+
+static struct PyModuleDef fdhmodule =
+    {
+        PyModuleDef_HEAD_INIT,
+        "fdh",
+        "Fast Denavit-Hartenberg Kinematics",
+        -1,
+        fdhMethods};
+
+PyMODINIT_FUNC PyInit_fdh(void)
+{
+    import_array();
+    return PyModule_Create(&fdhmodule);
+}
+
+extern "C"
+{
+
+    static PyObject *DH_init(PyObject *self, PyObject *args)
+    {
+        DH *dh;
+        PyObject *py_param[7];
+        PyArrayObject *np_param[7] = {NULL, NULL, NULL, NULL, NULL, NULL, NULL};
+        double *param[6];
+        int n, mdh;
+
+        if (!PyArg_ParseTuple(
+                args, "OOOOOOOp",
+                &py_param[0],
+                &py_param[1],
+                &py_param[2],
+                &py_param[3],
+                &py_param[4],
+                &py_param[5],
+                &py_param[6],
+                &mdh))
+            return NULL;
+
+        dh = NULL;
+
+        np_param[0] = (PyArrayObject *)PyArray_FROMANY(py_param[0], NPY_INT, 1, 1, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_FORCECAST);
+        if (!np_param[0])
+            goto cleanup;
+
+        n = PyArray_DIM(np_param[0], 0);
+
+        for (int i = 1; i < 7; i++)
+        {
+            np_param[i] = (PyArrayObject *)PyArray_FROMANY(py_param[i], NPY_DOUBLE, 1, 1, NPY_ARRAY_IN_ARRAY);
+            if (!np_param[i])
+                goto cleanup;
+
+            if (PyArray_DIM(np_param[i], 0) != n)
+            {
+                PyErr_SetString(PyExc_ValueError, "inconsistent Denavit-Hartenberg parameters");
+                goto cleanup;
+            }
+        }
+
+        dh = (DH *)PyMem_RawMalloc(sizeof(DH));
+        dh->n = n;
+        dh->mdh = mdh;
+        dh->sigma = (int *)PyMem_RawMalloc(n * sizeof(int));
+        dh->theta = (double *)PyMem_RawMalloc(n * sizeof(double));
+        dh->d = (double *)PyMem_RawMalloc(n * sizeof(double));
+        dh->a = (double *)PyMem_RawMalloc(n * sizeof(double));
+        dh->alpha = (double *)PyMem_RawMalloc(n * sizeof(double));
+        dh->offset = (double *)PyMem_RawMalloc(n * sizeof(double));
+        dh->flip = (double *)PyMem_RawMalloc(n * sizeof(double));
+
+        for (int i = 0; i < 6; i++)
+            param[i] = (double *)PyArray_DATA(np_param[i + 1]);
+
+        for (int j = 0; j < n; j++)
+        {
+            dh->sigma[j] = ((int *)PyArray_DATA(np_param[0]))[j];
+            dh->theta[j] = param[0][j];
+            dh->d[j] = param[1][j];
+            dh->a[j] = param[2][j];
+            dh->alpha[j] = param[3][j];
+            dh->offset[j] = param[4][j];
+            dh->flip[j] = param[5][j];
+        }
+
+    cleanup:
+        for (int i = 0; i < 7; i++)
+            Py_XDECREF(np_param[i]);
+
+        if (dh == NULL)
+            return NULL;
+
+        return PyCapsule_New(dh, "DH", _DH_delete);
+    }
+
+    static PyObject *DH_fkine(PyObject *self, PyObject *args)
+    {
+        DH *dh;
+        PyObject *py_dh, *py_q, *py_base, *py_tool, *py_T;
+        PyArrayObject *np_q, *np_base = NULL, *np_tool = NULL;
+        double *q, *base, *tool, *T;
+        npy_intp dims[3];
+        int trajn, n;
+
+        if (!PyArg_ParseTuple(args, "OOOO", &py_dh, &py_q, &py_base, &py_tool))
+            return NULL;
+
+        if (!(dh = (DH *)PyCapsule_GetPointer(py_dh, "DH")))
+            return NULL;
+
+        n = dh->n;
+
+        if (!_DH_transform(py_base, &np_base, &base) ||
+            !_DH_transform(py_tool, &np_tool, &tool))
+        {
+            Py_XDECREF(np_base);
+            return NULL;
+        }
+
+        if (!(np_q = _DH_traj(py_q, n)))
+        {
+            Py_XDECREF(np_base);
+            Py_XDECREF(np_tool);
+            return NULL;
+        }
+
+        trajn = PyArray_DIM(np_q, 0);
+        dims[0] = trajn;
+        dims[1] = 4;
+        dims[2] = 4;
+        py_T = PyArray_EMPTY(3, dims, NPY_DOUBLE, 0);
+
+        q = (double *)PyArray_DATA(np_q);
+        T = (double *)PyArray_DATA((PyArrayObject *)py_T);
+
+        Py_BEGIN_ALLOW_THREADS;
+        for (int k = 0; k < trajn; k++)
+        {
+            _dh_fkine(dh, q + n * k, base, tool, T + 16 * k);
+        }
+        Py_END_ALLOW_THREADS;
+
+        Py_DECREF(np_q);
+        Py_XDECREF(np_base);
+        Py_XDECREF(np_tool);
+
+        return py_T;
+    }
+
+    static PyObject *DH_fkine_all(PyObject *self, PyObject *args)
+    {
+        DH *dh;
+        PyObject *py_dh, *py_q, *py_base, *py_T;
+        PyArrayObject *np_q, *np_base = NULL;
+        double *q, *base, *T;
+        npy_intp dims[4];
+        int trajn, n;
+
+        if (!PyArg_ParseTuple(args, "OOO", &py_dh, &py_q, &py_base))
+            return NULL;
+
+        if (!(dh = (DH *)PyCapsule_GetPointer(py_dh, "DH")))
+            return NULL;
+
+        n = dh->n;
+
+        if (!_DH_transform(py_base, &np_base, &base))
+            return NULL;
+
+        if (!(np_q = _DH_traj(py_q, n)))
+        {
+            Py_XDECREF(np_base);
+            return NULL;
+        }
+
+        trajn = PyArray_DIM(np_q, 0);
+        dims[0] = trajn;
+        dims[1] = n + 1;
+        dims[2] = 4;
+        dims[3] = 4;
+        py_T = PyArray_EMPTY(4, dims, NPY_DOUBLE, 0);
+
+        q = (double *)PyArray_DATA(np_q);
+        T = (double *)PyArray_DATA((PyArrayObject *)py_T);
+
+        Py_BEGIN_ALLOW_THREADS;
+        for (int k = 0; k < trajn; k++)
+        {
+            _dh_fkine_all(dh, q + n * k, base, T + 16 * (n + 1) * k);
+        }
+        Py_END_ALLOW_THREADS;
+
+        Py_DECREF(np_q);
+        Py_XDECREF(np_base);
+
+        return py_T;
+    }
+
+    static PyObject *DH_jacobe(PyObject *self, PyObject *args)
+    {
+        DH *dh;
+        PyObject *py_dh, *py_q, *py_tool, *py_J;
+        PyArrayObject *np_q, *np_tool = NULL;
+        double *q, *tool, *J;
+        npy_intp dims[3];
+        int trajn, n;
+
+        if (!PyArg_ParseTuple(args, "OOO", &py_dh, &py_q, &py_tool))
+            return NULL;
+
+        if (!(dh = (DH *)PyCapsule_GetPointer(py_dh, "DH")))
+            return NULL;
+
+        n = dh->n;
+
+        if (!_DH_transform(py_tool, &np_tool, &tool))
+            return NULL;
+
+        if (!(np_q = _DH_traj(py_q, n)))
+        {
+            Py_XDECREF(np_tool);
+            return NULL;
+        }
+
+        trajn = PyArray_DIM(np_q, 0);
+        dims[0] = trajn;
+        dims[1] = 6;
+        dims[2] = n;
+        py_J = PyArray_EMPTY(3, dims, NPY_DOUBLE, 0);
+
+        q = (double *)PyArray_DATA(np_q);
+        J = (double *)PyArray_DATA((PyArrayObject *)py_J);
+
+        Py_BEGIN_ALLOW_THREADS;
+        for (int k = 0; k < trajn; k++)
+        {
+            _dh_jacobe(dh, q + n * k, tool, J + 6 * n * k);
+        }
+        Py_END_ALLOW_THREADS;
+
+        Py_DECREF(np_q);
+        Py_XDECREF(np_tool);
+
+        return py_J;
+    }
+
+    static PyObject *DH_jacob0(PyObject *self, PyObject *args)
+    {
+        DH *dh;
+        PyObject *py_dh, *py_q, *py_base, *py_tool, *py_J;
+        PyArrayObject *np_q, *np_base = NULL, *np_tool = NULL;
+        double *q, *base, *tool, *J;
+        npy_intp dims[3];
+        int trajn, n;
+
+        if (!PyArg_ParseTuple(args, "OOOO", &py_dh, &py_q, &py_base, &py_tool))
+            return NULL;
+
+        if (!(dh = (DH *)PyCapsule_GetPointer(py_dh, "DH")))
+            return NULL;
+
+        n = dh->n;
+
+        if (!_DH_transform(py_base, &np_base, &base) ||
+            !_DH_transform(py_tool, &np_tool, &tool))
+        {
+            Py_XDECREF(np_base);
+            return NULL;
+        }
+
+        if (!(np_q = _DH_traj(py_q, n)))
+        {
+            Py_XDECREF(np_base);
+            Py_XDECREF(np_tool);
+            return NULL;
+        }
+
+        trajn = PyArray_DIM(np_q, 0);
+        dims[0] = trajn;
+        dims[1] = 6;
+        dims[2] = n;
+        py_J = PyArray_EMPTY(3, dims, NPY_DOUBLE, 0);
+
+        q = (double *)PyArray_DATA(np_q);
+        J = (double *)PyArray_DATA((PyArrayObject *)py_J);
+
+        Py_BEGIN_ALLOW_THREADS;
+        for (int k = 0; k < trajn; k++)
+        {
+            _dh_jacob0(dh, q + n * k, base, tool, J + 6 * n * k);
+        }
+        Py_END_ALLOW_THREADS;
+
+        Py_DECREF(np_q);
+        Py_XDECREF(np_base);
+        Py_XDECREF(np_tool);
+
+        return py_J;
+    }
+
+    PyArrayObject *_DH_traj(PyObject *py_q, int n)
+    {
+        PyArrayObject *np_q;
+
+        // A joint space trajectory is (trajn x n)
+        np_q = (PyArrayObject *)PyArray_FROMANY(py_q, NPY_DOUBLE, 2, 2, NPY_ARRAY_IN_ARRAY);
+        if (np_q == NULL)
+            return NULL;
+
+        if (PyArray_DIM(np_q, 1) != n)
+        {
+            Py_DECREF(np_q);
+            PyErr_SetString(PyExc_ValueError, "joint coordinates have the wrong shape");
+            return NULL;
+        }
+
+        return np_q;
+    }
+
+    int _DH_transform(PyObject *py_T, PyArrayObject **np_T, double **T)
+    {
+        // None is the identity transform and gives a NULL pointer
+        *np_T = NULL;
+        *T = NULL;
+
+        if (py_T == Py_None)
+            return 1;
+
+        *np_T = (PyArrayObject *)PyArray_FROMANY(py_T, NPY_DOUBLE, 2, 2, NPY_ARRAY_IN_ARRAY);
+        if (*np_T == NULL)
+            return 0;
+
+        if (PyArray_DIM(*np_T, 0) != 4 || PyArray_DIM(*np_T, 1) != 4)
+        {
+            Py_DECREF(*np_T);
+            *np_T = NULL;
+            PyErr_SetString(PyExc_ValueError, "transform must be 4x4");
+            return 0;
+        }
+
+        *T = (double *)PyArray_DATA(*np_T);
+        return 1;
+    }
+
+    void _DH_delete(PyObject *capsule)
+    {
+        DH *dh = (DH *)PyCapsule_GetPointer(capsule, "DH");
+
+        PyMem_RawFree(dh->sigma);
+        PyMem_RawFree(dh->theta);
+        PyMem_RawFree(dh->d);
+        PyMem_RawFree(dh->a);
+        PyMem_RawFree(dh->alpha);
+        PyMem_RawFree(dh->offset);
+        PyMem_RawFree(dh->flip);
+        PyMem_RawFree(dh);
+    }
+
+} /* extern "C" */
@@ -0,0 +1,33 @@
+/**
+ * \file fdh.h
+ *
+ */
+
+#ifndef _FDH_H_
+#define _FDH_H_
+
+#include <Python.h>
+#include <numpy/arrayobject.h>
+#include "dh.h"
+
+#ifdef __cplusplus
+extern "C"
+{
+#endif /* __cplusplus */
+
+    // forward defines
+    static PyObject *DH_init(PyObject *self, PyObject *args);
+    static PyObject *DH_fkine(PyObject *self, PyObject *args);
+    static PyObject *DH_fkine_all(PyObject *self, PyObject *args);
+    static PyObject *DH_jacobe(PyObject *self, PyObject *args);
+    static PyObject *DH_jacob0(PyObject *self, PyObject *args);
+
+    PyArrayObject *_DH_traj(PyObject *py_q, int n);
+    int _DH_transform(PyObject *py_T, PyArrayObject **np_T, double **T);
+    void _DH_delete(PyObject *capsule);
+
+#ifdef __cplusplus
+} /* extern "C" */
+#endif /* __cplusplus */
+
+#endif
@@ -18,6 +18,7 @@
 #include <math.h>
 #include <Eigen/Dense>
 #include <iostream>
+#include <vector>
 
 static PyMethodDef fknmMethods[] = {
     {"IK_GN",
@@ -40,10 +41,22 @@ static PyMethodDef fknmMethods[] = {
      (PyCFunction)IK_LM_Sugihara,
      METH_VARARGS,
      "Link"},
+    {"IK_batch",
+     (PyCFunction)IK_batch,
+     METH_VARARGS,
+     "Link"},
+    {"IK_traj",
+     (PyCFunction)IK_traj,
+     METH_VARARGS,
+     "Link"},
     {"Robot_link_T",
      (PyCFunction)Robot_link_T,
      METH_VARARGS,
      "Link"},
+    {"Robot_link_frames",
+     (PyCFunction)Robot_link_frames,
+     METH_VARARGS,
+     "Link"},
     {"ETS_hessian0",
      (PyCFunction)ETS_hessian0,
      METH_VARARGS,
@@ -115,10 +128,11 @@ extern "C"
         int ilimit, slimit, q0_used = 0, we_used = 0, reject_jl, use_pinv;
         double tol, E, pinv_damping;
 
-        int it = 0, search = 1, solution = 0;
+        int it = 0, search = 1, solution = 0, halton;
+        unsigned long long seed;
 
         if (!PyArg_ParseTuple(
-                args, "OOOiidiOid",
+                args, "OOOiidiOidKi",
                 &py_ets,
                 &py_Tep,
                 &py_q0,
@@ -128,7 +142,9 @@ extern "C"
                 &reject_jl,
                 &py_we,
                 &use_pinv,
-                &pinv_damping))
+                &pinv_damping,
+                &seed,
+                &halton))
             return NULL;
 
         if (!_check_array_type(py_Tep))
@@ -187,7 +203,9 @@ extern "C"
         np_ret = (npy_float64 *)PyArray_DATA((PyArrayObject *)py_ret);
         MapVectorX ret(np_ret, ets->n);
 
-        _IK_GN(ets, Tep, q0, ilimit, slimit, tol, reject_jl, ret, &it, &search, &solution, &E, we, use_pinv, pinv_damping);
+        IKRand rng(seed, halton, ets->n);
+
+        _IK_GN(ets, Tep, q0, ilimit, slimit, tol, reject_jl, ret, &it, &search, &solution, &E, we, use_pinv, pinv_damping, &rng);
 
         // Free the memory
         Py_DECREF(py_np_Tep);
@@ -230,10 +248,11 @@ extern "C"
         int ilimit, slimit, q0_used = 0, we_used = 0, reject_jl, use_pinv;
         double tol, E, pinv_damping;
 
-        int it = 0, search = 1, solution = 0;
+        int it = 0, search = 1, solution = 0, halton;
+        unsigned long long seed;
 
         if (!PyArg_ParseTuple(
-                args, "OOOiidiOid",
+                args, "OOOiidiOidKi",
                 &py_ets,
                 &py_Tep,
                 &py_q0,
@@ -243,7 +262,9 @@ extern "C"
                 &reject_jl,
                 &py_we,
                 &use_pinv,
-                &pinv_damping))
+                &pinv_damping,
+                &seed,
+                &halton))
             return NULL;
 
         if (!_check_array_type(py_Tep))
@@ -302,7 +323,9 @@ extern "C"
         np_ret = (npy_float64 *)PyArray_DATA((PyArrayObject *)py_ret);
         MapVectorX ret(np_ret, ets->n);
 
-        _IK_NR(ets, Tep, q0, ilimit, slimit, tol, reject_jl, ret, &it, &search, &solution, &E, we, use_pinv, pinv_damping);
+        IKRand rng(seed, halton, ets->n);
+
+        _IK_NR(ets, Tep, q0, ilimit, slimit, tol, reject_jl, ret, &it, &search, &solution, &E, we, use_pinv, pinv_damping, &rng);
 
         // Free the memory
         Py_DECREF(py_np_Tep);
@@ -345,10 +368,11 @@ extern "C"
         int ilimit, slimit, q0_used = 0, we_used = 0, reject_jl;
         double tol, E, lambda;
 
-        int it = 0, search = 1, solution = 0;
+        int it = 0, search = 1, solution = 0, halton;
+        unsigned long long seed;
 
         if (!PyArg_ParseTuple(
-                args, "OOOiidiOd",
+                args, "OOOiidiOdKi",
                 &py_ets,
                 &py_Tep,
                 &py_q0,
@@ -357,7 +381,9 @@ extern "C"
                 &tol,
                 &reject_jl,
                 &py_we,
-                &lambda))
+                &lambda,
+                &seed,
+                &halton))
             return NULL;
 
         if (!_check_array_type(py_Tep))
@@ -419,7 +445,9 @@ extern "C"
         // std::cout << Tep << std::endl;
         // std::cout << ret << std::endl;
 
-        _IK_LM_Chan(ets, Tep, q0, ilimit, slimit, tol, reject_jl, ret, &it, &search, &solution, &E, lambda, we);
+        IKRand rng(seed, halton, ets->n);
+
+        _IK_LM_Chan(ets, Tep, q0, ilimit, slimit, tol, reject_jl, ret, &it, &search, &solution, &E, lambda, we, &rng);
 
         // Free the memory
         Py_DECREF(py_np_Tep);
@@ -462,10 +490,11 @@ extern "C"
         int ilimit, slimit, q0_used = 0, we_used = 0, reject_jl;
         double tol, E, lambda;
 
-        int it = 0, search = 1, solution = 0;
+        int it = 0, search = 1, solution = 0, halton;
+        unsigned long long seed;
 
         if (!PyArg_ParseTuple(
-                args, "OOOiidiOd",
+                args, "OOOiidiOdKi",
                 &py_ets,
                 &py_Tep,
                 &py_q0,
@@ -474,7 +503,9 @@ extern "C"
                 &tol,
                 &reject_jl,
                 &py_we,
-                &lambda))
+                &lambda,
+                &seed,
+                &halton))
             return NULL;
 
         if (!_check_array_type(py_Tep))
@@ -536,7 +567,9 @@ extern "C"
         // std::cout << Tep << std::endl;
         // std::cout << ret << std::endl;
 
-        _IK_LM_Wampler(ets, Tep, q0, ilimit, slimit, tol, reject_jl, ret, &it, &search, &solution, &E, lambda, we);
+        IKRand rng(seed, halton, ets->n);
+
+        _IK_LM_Wampler(ets, Tep, q0, ilimit, slimit, tol, reject_jl, ret, &it, &search, &solution, &E, lambda, we, &rng);
 
         // Free the memory
         Py_DECREF(py_np_Tep);
@@ -579,10 +612,11 @@ extern "C"
         int ilimit, slimit, q0_used = 0, we_used = 0, reject_jl;
         double tol, E, lambda;
 
-        int it = 0, search = 1, solution = 0;
+        int it = 0, search = 1, solution = 0, halton;
+        unsigned long long seed;
 
         if (!PyArg_ParseTuple(
-                args, "OOOiidiOd",
+                args, "OOOiidiOdKi",
                 &py_ets,
                 &py_Tep,
                 &py_q0,
@@ -591,7 +625,9 @@ extern "C"
                 &tol,
                 &reject_jl,
                 &py_we,
-                &lambda))
+                &lambda,
+                &seed,
+                &halton))
             return NULL;
 
         if (!_check_array_type(py_Tep))
@@ -653,7 +689,9 @@ extern "C"
         // std::cout << Tep << std::endl;
         // std::cout << ret << std::endl;
 
-        _IK_LM_Sugihara(ets, Tep, q0, ilimit, slimit, tol, reject_jl, ret, &it, &search, &solution, &E, lambda, we);
+        IKRand rng(seed, halton, ets->n);
+
+        _IK_LM_Sugihara(ets, Tep, q0, ilimit, slimit, tol, reject_jl, ret, &it, &search, &solution, &E, lambda, we, &rng);
 
         // Free the memory
         Py_DECREF(py_np_Tep);
@@ -685,6 +723,221 @@ extern "C"
         return py_tup;
     }
 
+    static PyObject *IK_batch(PyObject *self, PyObject *args)
+    {
+        ETS *ets;
+        PyArrayObject *py_np_Tep, *py_np_q0 = NULL, *py_np_we = NULL;
+        PyObject *py_ets, *py_Tep, *py_q0, *py_we;
+        PyObject *py_q, *py_solution, *py_it, *py_search, *py_E;
+        npy_intp dim[2];
+        int method, ilimit, slimit, reject_jl, use_pinv, nthreads, trajn, halton;
+        unsigned long long seed;
+        double tol, lambda, pinv_damping;
+        double *q0 = NULL, *we = NULL;
+
+        if (!PyArg_ParseTuple(
+                args, "OiOOiidiOdidiKi",
+                &py_ets,
+                &method,
+                &py_Tep,
+                &py_q0,
+                &ilimit,
+                &slimit,
+                &tol,
+                &reject_jl,
+                &py_we,
+                &lambda,
+                &use_pinv,
+                &pinv_damping,
+                &nthreads,
+                &seed,
+                &halton))
+            return NULL;
+
+        // Extract the ETS object from the python object
+        if (!(ets = (ETS *)PyCapsule_GetPointer(py_ets, "ETS")))
+            return NULL;
+
+        // Targets are (trajn x 4 x 4), each in row major
+        py_np_Tep = (PyArrayObject *)PyArray_FROMANY(py_Tep, NPY_DOUBLE, 3, 3, NPY_ARRAY_IN_ARRAY);
+        if (py_np_Tep == NULL)
+            return NULL;
+
+        trajn = PyArray_DIM(py_np_Tep, 0);
+        if (PyArray_DIM(py_np_Tep, 1) != 4 || PyArray_DIM(py_np_Tep, 2) != 4)
+        {
+            PyErr_SetString(PyExc_ValueError, "Tep must be (M, 4, 4)");
+            Py_DECREF(py_np_Tep);
+            return NULL;
+        }
+
+        // Seeds are (trajn x n)
+        if (py_q0 != Py_None)
+        {
+            py_np_q0 = (PyArrayObject *)PyArray_FROMANY(py_q0, NPY_DOUBLE, 2, 2, NPY_ARRAY_IN_ARRAY);
+            if (py_np_q0 == NULL ||
+                PyArray_DIM(py_np_q0, 0) != trajn || PyArray_DIM(py_np_q0, 1) != ets->n)
+            {
+                if (py_np_q0 != NULL)
+                    PyErr_SetString(PyExc_ValueError, "q0 must be (M, n)");
+                Py_XDECREF(py_np_q0);
+                Py_DECREF(py_np_Tep);
+                return NULL;
+            }
+            q0 = (double *)PyArray_DATA(py_np_q0);
+        }
+
+        if (py_we != Py_None)
+        {
+            py_np_we = (PyArrayObject *)PyArray_FROMANY(py_we, NPY_DOUBLE, 1, 1, NPY_ARRAY_IN_ARRAY);
+            if (py_np_we == NULL || PyArray_DIM(py_np_we, 0) != 6)
+            {
+                if (py_np_we != NULL)
+                    PyErr_SetString(PyExc_ValueError, "we must be a 6-vector");
+                Py_XDECREF(py_np_we);
+                Py_XDECREF(py_np_q0);
+                Py_DECREF(py_np_Tep);
+                return NULL;
+            }
+            we = (double *)PyArray_DATA(py_np_we);
+        }
+
+        dim[0] = trajn;
+        dim[1] = ets->n;
+        py_q = PyArray_EMPTY(2, dim, NPY_DOUBLE, 0);
+        py_solution = PyArray_EMPTY(1, dim, NPY_INT, 0);
+        py_it = PyArray_EMPTY(1, dim, NPY_INT, 0);
+        py_search = PyArray_EMPTY(1, dim, NPY_INT, 0);
+        py_E = PyArray_EMPTY(1, dim, NPY_DOUBLE, 0);
+
+        if (nthreads < 1)
+            nthreads = 1;
+
+        Py_BEGIN_ALLOW_THREADS;
+        _IK_batch(
+            ets, method, trajn, (double *)PyArray_DATA(py_np_Tep), q0,
+            ilimit, slimit, tol, reject_jl, we, lambda, use_pinv, pinv_damping, nthreads,
+            seed, halton,
+            (double *)PyArray_DATA((PyArrayObject *)py_q),
+            (int *)PyArray_DATA((PyArrayObject *)py_solution),
+            (int *)PyArray_DATA((PyArrayObject *)py_it),
+            (int *)PyArray_DATA((PyArrayObject *)py_search),
+            (double *)PyArray_DATA((PyArrayObject *)py_E));
+        Py_END_ALLOW_THREADS;
+
+        Py_DECREF(py_np_Tep);
+        Py_XDECREF(py_np_q0);
+        Py_XDECREF(py_np_we);
+
+        return Py_BuildValue("NNNNN", py_q, py_solution, py_it, py_search, py_E);
+    }
+
+    static PyObject *IK_traj(PyObject *self, PyObject *args)
+    {
+        ETS *ets;
+        PyArrayObject *py_np_Tep, *py_np_q0 = NULL, *py_np_we = NULL;
+        PyObject *py_ets, *py_Tep, *py_q0, *py_we;
+        PyObject *py_q, *py_solution, *py_it, *py_search, *py_E, *py_dq;
+        npy_intp dim[2];
+        int method, ilimit, slimit, reject_jl, use_pinv, trajn, halton;
+        unsigned long long seed;
+        double tol, lambda, pinv_damping;
+        double *q0 = NULL, *we = NULL;
+
+        if (!PyArg_ParseTuple(
+                args, "OiOOiidiOdidKi",
+                &py_ets,
+                &method,
+                &py_Tep,
+                &py_q0,
+                &ilimit,
+                &slimit,
+                &tol,
+                &reject_jl,
+                &py_we,
+                &lambda,
+                &use_pinv,
+                &pinv_damping,
+                &seed,
+                &halton))
+            return NULL;
+
+        // Extract the ETS object from the python object
+        if (!(ets = (ETS *)PyCapsule_GetPointer(py_ets, "ETS")))
+            return NULL;
+
+        // Targets are (trajn x 4 x 4), each in row major
+        py_np_Tep = (PyArrayObject *)PyArray_FROMANY(py_Tep, NPY_DOUBLE, 3, 3, NPY_ARRAY_IN_ARRAY);
+        if (py_np_Tep == NULL)
+            return NULL;
+
+        trajn = PyArray_DIM(py_np_Tep, 0);
+        if (PyArray_DIM(py_np_Tep, 1) != 4 || PyArray_DIM(py_np_Tep, 2) != 4)
+        {
+            PyErr_SetString(PyExc_ValueError, "Tep must be (M, 4, 4)");
+            Py_DECREF(py_np_Tep);
+            return NULL;
+        }
+
+        // A single seed for the first point
+        if (py_q0 != Py_None)
+        {
+            py_np_q0 = (PyArrayObject *)PyArray_FROMANY(py_q0, NPY_DOUBLE, 1, 1, NPY_ARRAY_IN_ARRAY);
+            if (py_np_q0 == NULL || PyArray_DIM(py_np_q0, 0) != ets->n)
+            {
+                if (py_np_q0 != NULL)
+                    PyErr_SetString(PyExc_ValueError, "q0 must be an n-vector");
+                Py_XDECREF(py_np_q0);
+                Py_DECREF(py_np_Tep);
+                return NULL;
+            }
+            q0 = (double *)PyArray_DATA(py_np_q0);
+        }
+
+        if (py_we != Py_None)
+        {
+            py_np_we = (PyArrayObject *)PyArray_FROMANY(py_we, NPY_DOUBLE, 1, 1, NPY_ARRAY_IN_ARRAY);
+            if (py_np_we == NULL || PyArray_DIM(py_np_we, 0) != 6)
+            {
+                if (py_np_we != NULL)
+                    PyErr_SetString(PyExc_ValueError, "we must be a 6-vector");
+                Py_XDECREF(py_np_we);
+                Py_XDECREF(py_np_q0);
+                Py_DECREF(py_np_Tep);
+                return NULL;
+            }
+            we = (double *)PyArray_DATA(py_np_we);
+        }
+
+        dim[0] = trajn;
+        dim[1] = ets->n;
+        py_q = PyArray_EMPTY(2, dim, NPY_DOUBLE, 0);
+        py_solution = PyArray_EMPTY(1, dim, NPY_INT, 0);
+        py_it = PyArray_EMPTY(1, dim, NPY_INT, 0);
+        py_search = PyArray_EMPTY(1, dim, NPY_INT, 0);
+        py_E = PyArray_EMPTY(1, dim, NPY_DOUBLE, 0);
+        py_dq = PyArray_EMPTY(1, dim, NPY_DOUBLE, 0);
+
+        Py_BEGIN_ALLOW_THREADS;
+        _IK_traj(
+            ets, method, trajn, (double *)PyArray_DATA(py_np_Tep), q0,
+            ilimit, slimit, tol, reject_jl, we, lambda, use_pinv, pinv_damping,
+            seed, halton,
+            (double *)PyArray_DATA((PyArrayObject *)py_q),
+            (int *)PyArray_DATA((PyArrayObject *)py_solution),
+            (int *)PyArray_DATA((PyArrayObject *)py_it),
+            (int *)PyArray_DATA((PyArrayObject *)py_search),
+            (double *)PyArray_DATA((PyArrayObject *)py_E),
+            (double *)PyArray_DATA((PyArrayObject *)py_dq));
+        Py_END_ALLOW_THREADS;
+
+        Py_DECREF(py_np_Tep);
+        Py_XDECREF(py_np_q0);
+        Py_XDECREF(py_np_we);
+
+        return Py_BuildValue("NNNNNN", py_q, py_solution, py_it, py_search, py_E, py_dq);
+    }
+
     static PyObject *Robot_link_T(PyObject *self, PyObject *args)
     {
         ETS *ets;
@@ -741,128 +994,176 @@ extern "C"
         Py_RETURN_NONE;
     }
 
-    static PyObject *ETS_hessian0(PyObject *self, PyObject *args)
+    static PyObject *Robot_link_frames(PyObject *self, PyObject *args)
     {
         ETS *ets;
-        npy_float64 *H, *J, *q, *tool = NULL;
-        PyObject *py_q, *py_J, *py_tool, *py_np_q, *py_np_tool, *py_np_J;
-        PyObject *py_ets;
-        int tool_used = 0, J_used = 0, q_used = 0;
+        npy_float64 *q, *base, *out;
+        PyObject *ets_list, *T_list, *parents;
+        PyObject *py_q, *py_base, *py_out;
+        PyObject *py_np_q = NULL, *py_np_base = NULL;
+        Py_ssize_t n_links, i, j, k;
+        npy_intp dims[3] = {0, 4, 4};
+        std::vector<long> parent;
+        std::vector<char> done;
+        std::vector<Py_ssize_t> stack;
+        Matrix4dc eT;
 
         if (!PyArg_ParseTuple(
-                args, "OOOO",
-                &py_ets,
+                args, "O!OO!OOO",
+                &PyList_Type, &ets_list,
+                &T_list,
+                &PyList_Type, &parents,
                 &py_q,
-                &py_J,
-                &py_tool))
+                &py_base,
+                &py_out))
             return NULL;
 
-        // Extract the ETS object from the python object
-        if (!(ets = (ETS *)PyCapsule_GetPointer(py_ets, "ETS")))
+        n_links = PyList_GET_SIZE(ets_list);
+        dims[0] = n_links;
+
+        if (PyList_GET_SIZE(parents) != n_links ||
+            (T_list != Py_None &&
+             (!PyList_Check(T_list) || PyList_GET_SIZE(T_list) != n_links)))
+        {
+            PyErr_SetString(PyExc_ValueError, "link lists must have the same length");
             return NULL;
+        }
 
-        MapMatrixJc eJ(NULL, 6, ets->n);
+        if (!_check_out(py_out, 3, dims))
+            return NULL;
+        out = (npy_float64 *)PyArray_DATA((PyArrayObject *)py_out);
 
-        // Check if J is None
-        // Make sure J is number array
-        // Cast to numpy array
-        // Get data out
-        if (py_J != Py_None)
+        // The index of the parent of each link, -1 if it is attached to
+        // the base
+        parent.resize(n_links);
+        for (i = 0; i < n_links; i++)
         {
-            if (!_check_array_type(py_J))
+            parent[i] = PyLong_AsLong(PyList_GET_ITEM(parents, i));
+            if (parent[i] == -1 && PyErr_Occurred())
                 return NULL;
-            J_used = 1;
-            py_np_J = (PyObject *)PyArray_FROMANY(py_J, NPY_DOUBLE, 1, 2, NPY_ARRAY_F_CONTIGUOUS);
-            J = (npy_float64 *)PyArray_DATA((PyArrayObject *)py_np_J);
-            // MapMatrixJc eJ(J, 6, ets->n);
-            new (&eJ) MapMatrixJc(J, 6, ets->n);
-        }
-        else
-        {
-            // Now we must use q instead
-            // Make sure q is number array
-            // Cast to numpy array
-            // Get data out
-            if (!_check_array_type(py_q))
+            if (parent[i] < -1 || parent[i] >= n_links || parent[i] == i)
+            {
+                PyErr_SetString(PyExc_ValueError, "invalid parent index");
                 return NULL;
-            q_used = 1;
-            py_np_q = (PyObject *)PyArray_FROMANY(py_q, NPY_DOUBLE, 1, 2, NPY_ARRAY_F_CONTIGUOUS);
-            q = (npy_float64 *)PyArray_DATA((PyArrayObject *)py_np_q);
+            }
+        }
 
-            // Make our empty Jacobian
-            npy_intp dimsJ[2] = {6, ets->n};
-            PyObject *py_J = PyArray_EMPTY(2, dimsJ, NPY_DOUBLE, 1);
-            J = (npy_float64 *)PyArray_DATA((PyArrayObject *)py_J);
-            // MapMatrixJc eJ(J, 6, ets->n);
-            new (&eJ) MapMatrixJc(J, 6, ets->n);
+        if (!(py_np_q = PyArray_FROMANY(py_q, NPY_DOUBLE, 1, 1, NPY_ARRAY_DEFAULT)))
+            goto fail;
+        q = (npy_float64 *)PyArray_DATA((PyArrayObject *)py_np_q);
 
-            // Check if tool is None
-            // Make sure tool is number array
-            // Cast to numpy array
-            // Get data out
-            if (py_tool != Py_None)
+        if (!(py_np_base = PyArray_FROMANY(py_base, NPY_DOUBLE, 2, 2, NPY_ARRAY_DEFAULT)))
+            goto fail;
+        base = (npy_float64 *)PyArray_DATA((PyArrayObject *)py_np_base);
+
+        done.assign(n_links, 0);
+        for (i = 0; i < n_links; i++)
+        {
+            // Links need not be ordered, so stack up this link and any of
+            // its ancestors which have not been computed yet
+            stack.clear();
+            for (j = i; j >= 0 && !done[j]; j = parent[j])
             {
-                if (!_check_array_type(py_tool))
-                    return NULL;
-                tool_used = 1;
-                py_np_tool = (PyObject *)PyArray_FROMANY(py_tool, NPY_DOUBLE, 1, 2, NPY_ARRAY_F_CONTIGUOUS);
-                tool = (npy_float64 *)PyArray_DATA((PyArrayObject *)py_np_tool);
+                if (stack.size() > (size_t)n_links)
+                {
+                    PyErr_SetString(PyExc_ValueError, "the links contain a cycle");
+                    goto fail;
+                }
+                stack.push_back(j);
             }
 
-            // Calculate the Jacobian
-            _ETS_jacob0(ets, q, tool, eJ);
+            while (!stack.empty())
+            {
+                k = stack.back();
+                stack.pop_back();
+
+                // Extract the ETS object from the python object
+                if (!(ets = (ETS *)PyCapsule_GetPointer(PyList_GET_ITEM(ets_list, k), "ETS")))
+                    goto fail;
+
+                // The link transform relative to its parent, written into
+                // the column-major scene node array if one was given
+                if (T_list != Py_None)
+                {
+                    MapMatrix4dc lT((npy_float64 *)PyArray_DATA(
+                        (PyArrayObject *)PyList_GET_ITEM(T_list, k)));
+                    _ETS_fkine(ets, q, NULL, NULL, lT);
+                    eT = lT;
+                }
+                else
+                {
+                    MapMatrix4dc lT(eT.data());
+                    _ETS_fkine(ets, q, NULL, NULL, lT);
+                }
+
+                // The world frame of the link is the frame of its parent,
+                // or the base, followed by the link transform
+                MapMatrix4dr wT(out + 16 * k);
+                if (parent[k] < 0)
+                    wT = MapMatrix4dr(base) * eT;
+                else
+                    wT = MapMatrix4dr(out + 16 * parent[k]) * eT;
+                done[k] = 1;
+            }
         }
 
-        // Make our empty Hessian
-        npy_intp dimsH[3] = {ets->n, 6, ets->n};
-        PyObject *py_H = PyArray_EMPTY(3, dimsH, NPY_DOUBLE, 0);
-        H = (npy_float64 *)PyArray_DATA((PyArrayObject *)py_H);
-        MapMatrixHr eH(H, ets->n * 6, ets->n);
+        Py_DECREF(py_np_q);
+        Py_DECREF(py_np_base);
+        Py_RETURN_NONE;
 
-        // Do the job
-        _ETS_hessian(ets->n, eJ, eH);
+    fail:
+        Py_XDECREF(py_np_q);
+        Py_XDECREF(py_np_base);
+        return NULL;
+    }
 
-        // Free the memory
-        if (q_used)
-        {
-            Py_DECREF(py_np_q);
-        }
+    static PyObject *ETS_hessian0(PyObject *self, PyObject *args)
+    {
+        return ETS_hessian(args, 0);
+    }
 
-        if (J_used)
-        {
-            Py_DECREF(py_np_J);
-        }
+    static PyObject *ETS_hessiane(PyObject *self, PyObject *args)
+    {
+        return ETS_hessian(args, 1);
+    }
 
-        if (tool_used)
-        {
-            Py_DECREF(py_np_tool);
-        }
+    static PyObject *ETS_jacob0(PyObject *self, PyObject *args)
+    {
+        return ETS_jacob(args, 0);
+    }
 
-        return py_H;
-        // return Py_None;
+    static PyObject *ETS_jacobe(PyObject *self, PyObject *args)
+    {
+        return ETS_jacob(args, 1);
     }
 
-    static PyObject *ETS_hessiane(PyObject *self, PyObject *args)
+    static PyObject *ETS_hessian(PyObject *args, int frame)
     {
         ETS *ets;
-        npy_float64 *H, *J, *q, *tool = NULL;
+        npy_intp dim3[3], dim4[4];
+        int trajn = 1, stride = 0, tool_used = 0, q_used = 0, J_used = 0, J_nd;
+        npy_float64 *H, *J = NULL, *q = NULL, *tool = NULL;
         PyObject *py_q, *py_J, *py_tool, *py_np_q, *py_np_tool, *py_np_J;
-        PyObject *py_ets;
-        int tool_used = 0, J_used = 0, q_used = 0;
+        PyObject *py_ets, *py_H, *py_out = Py_None;
 
         if (!PyArg_ParseTuple(
-                args, "OOOO",
+                args, "OOOO|O",
                 &py_ets,
                 &py_q,
                 &py_J,
-                &py_tool))
+                &py_tool,
+                &py_out))
             return NULL;
 
         // Extract the ETS object from the python object
         if (!(ets = (ETS *)PyCapsule_GetPointer(py_ets, "ETS")))
             return NULL;
 
-        MapMatrixJc eJ(NULL, 6, ets->n);
+        // Inputs can be:
+        // J - A (6xn) Jacobian or a (Mx6xn) stack of Jacobians
+        // q - Used when J is None, 1D (n), 2D (1xn or nx1) or a trajectory (Mxn)
+        // tool can be SE3s or 4x4 numpy array
+        // out can be None or a C contiguous (Mxnx6xn) float64 array
 
         // Check if J is None
         // Make sure J is number array
@@ -872,11 +1173,25 @@ extern "C"
         {
             if (!_check_array_type(py_J))
                 return NULL;
+
+            // J is taken in row major so that each Jacobian is contiguous
+            py_np_J = (PyObject *)PyArray_FROMANY(py_J, NPY_DOUBLE, 2, 3, NPY_ARRAY_IN_ARRAY);
+            if (py_np_J == NULL)
+                return NULL;
             J_used = 1;
-            py_np_J = (PyObject *)PyArray_FROMANY(py_J, NPY_DOUBLE, 1, 2, NPY_ARRAY_F_CONTIGUOUS);
             J = (npy_float64 *)PyArray_DATA((PyArrayObject *)py_np_J);
-            // MapMatrixJc eJ(J, 6, ets->n);
-            new (&eJ) MapMatrixJc(J, 6, ets->n);
+
+            J_nd = PyArray_NDIM((PyArrayObject *)py_np_J);
+            if (J_nd == 3)
+                trajn = PyArray_DIM((PyArrayObject *)py_np_J, 0);
+
+            if (PyArray_DIM((PyArrayObject *)py_np_J, J_nd - 2) != 6 ||
+                PyArray_DIM((PyArrayObject *)py_np_J, J_nd - 1) != ets->n)
+            {
+                Py_DECREF(py_np_J);
+                PyErr_SetString(PyExc_ValueError, "J has the wrong shape");
+                return NULL;
+            }
         }
         else
         {
@@ -886,16 +1201,18 @@ extern "C"
             // Get data out
             if (!_check_array_type(py_q))
                 return NULL;
+
+            py_np_q = (PyObject *)PyArray_FROMANY(py_q, NPY_DOUBLE, 1, 2, NPY_ARRAY_IN_ARRAY);
+            if (py_np_q == NULL)
+                return NULL;
             q_used = 1;
-            py_np_q = (PyObject *)PyArray_FROMANY(py_q, NPY_DOUBLE, 1, 2, NPY_ARRAY_F_CONTIGUOUS);
             q = (npy_float64 *)PyArray_DATA((PyArrayObject *)py_np_q);
 
-            // Make our empty Jacobian
-            npy_intp dimsJ[2] = {6, ets->n};
-            PyObject *py_J = PyArray_EMPTY(2, dimsJ, NPY_DOUBLE, 1);
-            J = (npy_float64 *)PyArray_DATA((PyArrayObject *)py_J);
-            // MapMatrixJc eJ(J, 6, ets->n);
-            new (&eJ) MapMatrixJc(J, 6, ets->n);
+            if (!_q_traj((PyArrayObject *)py_np_q, ets->n, &trajn, &stride))
+            {
+                Py_DECREF(py_np_q);
+                return NULL;
+            }
 
             // Check if tool is None
             // Make sure tool is number array
@@ -904,58 +1221,96 @@ extern "C"
             if (py_tool != Py_None)
             {
                 if (!_check_array_type(py_tool))
+                {
+                    Py_DECREF(py_np_q);
                     return NULL;
+                }
                 tool_used = 1;
                 py_np_tool = (PyObject *)PyArray_FROMANY(py_tool, NPY_DOUBLE, 1, 2, NPY_ARRAY_F_CONTIGUOUS);
                 tool = (npy_float64 *)PyArray_DATA((PyArrayObject *)py_np_tool);
             }
+        }
 
-            // Calculate the Jacobian
-            _ETS_jacobe(ets, q, tool, eJ);
+        // Allocate or check the return array
+        if (py_out != Py_None)
+        {
+            dim4[0] = trajn;
+            dim4[1] = ets->n;
+            dim4[2] = 6;
+            dim4[3] = ets->n;
+
+            if (!_check_out(py_out, 4, dim4))
+            {
+                py_H = NULL;
+                goto cleanup;
+            }
+
+            Py_INCREF(py_out);
+            py_H = py_out;
+        }
+        else if (trajn == 1)
+        {
+            dim3[0] = ets->n;
+            dim3[1] = 6;
+            dim3[2] = ets->n;
+            py_H = PyArray_EMPTY(3, dim3, NPY_DOUBLE, 0);
+        }
+        else
+        {
+            dim4[0] = trajn;
+            dim4[1] = ets->n;
+            dim4[2] = 6;
+            dim4[3] = ets->n;
+            py_H = PyArray_EMPTY(4, dim4, NPY_DOUBLE, 0);
         }
 
-        // Make our empty Hessian
-        npy_intp dimsH[3] = {ets->n, 6, ets->n};
-        PyObject *py_H = PyArray_EMPTY(3, dimsH, NPY_DOUBLE, 0);
         H = (npy_float64 *)PyArray_DATA((PyArrayObject *)py_H);
-        MapMatrixHr eH(H, ets->n * 6, ets->n);
 
-        // Do the job
-        _ETS_hessian(ets->n, eJ, eH);
+        // Do the job, none of which touches python objects
+        Py_BEGIN_ALLOW_THREADS;
+        if (J_used)
+        {
+            _ETS_hessian_traj(ets->n, trajn, J, H);
+        }
+        else
+        {
+            // Calculate the Jacobians first
+            J = (double *)PyMem_RawMalloc(trajn * 6 * ets->n * sizeof(double));
+            _ETS_jacob_traj(ets, trajn, stride, q, tool, J, frame);
+            _ETS_hessian_traj(ets->n, trajn, J, H);
+            PyMem_RawFree(J);
+        }
+        Py_END_ALLOW_THREADS;
 
+    cleanup:
         // Free the memory
         if (q_used)
-        {
             Py_DECREF(py_np_q);
-        }
 
         if (J_used)
-        {
             Py_DECREF(py_np_J);
-        }
 
         if (tool_used)
-        {
             Py_DECREF(py_np_tool);
-        }
 
         return py_H;
-        // return Py_None;
     }
 
-    static PyObject *ETS_jacob0(PyObject *self, PyObject *args)
+    static PyObject *ETS_jacob(PyObject *args, int frame)
     {
         ETS *ets;
+        npy_intp dim2[2], dim3[3];
+        int trajn = 1, stride = 0, tool_used = 0;
         npy_float64 *J, *q, *tool = NULL;
         PyObject *py_q, *py_tool, *py_np_q, *py_np_tool;
-        PyObject *py_ets;
-        int tool_used = 0;
+        PyObject *py_ets, *py_J, *py_out = Py_None;
 
         if (!PyArg_ParseTuple(
-                args, "OOO",
+                args, "OOO|O",
                 &py_ets,
                 &py_q,
-                &py_tool))
+                &py_tool,
+                &py_out))
             return NULL;
 
         // Extract the ETS object from the python object
@@ -966,23 +1321,28 @@ extern "C"
         // None - Even q
         // Not arrays - Will raise exception
         // Have symbolic data - Will raise exception
-        // q can be 1D or 2D, assumes dimesnions correct (n, 1xn or nx1)
+        // q can be 1D (n), 2D (1xn or nx1) or a trajectory (Mxn)
         // tool can be SE3s or 4x4 numpy array
-
-        // Make our empty Jacobian
-        npy_intp dims[2] = {6, ets->n};
-        PyObject *py_J = PyArray_EMPTY(2, dims, NPY_DOUBLE, 1);
-        J = (npy_float64 *)PyArray_DATA((PyArrayObject *)py_J);
-        MapMatrixJc eJ(J, 6, ets->n);
+        // out can be None or a C contiguous (Mx6xn) float64 array
 
         // Make sure q is number array
         // Cast to numpy array
         // Get data out
         if (!_check_array_type(py_q))
             return NULL;
-        py_np_q = (PyObject *)PyArray_FROMANY(py_q, NPY_DOUBLE, 1, 2, NPY_ARRAY_F_CONTIGUOUS);
+
+        // q is taken in row major so that each configuration is contiguous
+        py_np_q = (PyObject *)PyArray_FROMANY(py_q, NPY_DOUBLE, 1, 2, NPY_ARRAY_IN_ARRAY);
+        if (py_np_q == NULL)
+            return NULL;
         q = (npy_float64 *)PyArray_DATA((PyArrayObject *)py_np_q);
 
+        if (!_q_traj((PyArrayObject *)py_np_q, ets->n, &trajn, &stride))
+        {
+            Py_DECREF(py_np_q);
+            return NULL;
+        }
+
         // Check if tool is None
         // Make sure tool is number array
         // Cast to numpy array
@@ -990,93 +1350,71 @@ extern "C"
         if (py_tool != Py_None)
         {
             if (!_check_array_type(py_tool))
+            {
+                Py_DECREF(py_np_q);
                 return NULL;
+            }
             tool_used = 1;
             py_np_tool = (PyObject *)PyArray_FROMANY(py_tool, NPY_DOUBLE, 1, 2, NPY_ARRAY_F_CONTIGUOUS);
             tool = (npy_float64 *)PyArray_DATA((PyArrayObject *)py_np_tool);
         }
 
-        // Do the job
-        _ETS_jacob0(ets, q, tool, eJ);
+        // Allocate or check the return array
+        dim3[0] = trajn;
+        dim3[1] = 6;
+        dim3[2] = ets->n;
 
-        // Free the memory
-        Py_DECREF(py_np_q);
+        if (py_out != Py_None)
+        {
+            if (!_check_out(py_out, 3, dim3))
+            {
+                py_J = NULL;
+                goto cleanup;
+            }
 
-        if (tool_used)
+            Py_INCREF(py_out);
+            py_J = py_out;
+        }
+        else if (trajn == 1)
         {
-            Py_DECREF(py_np_tool);
+            // Single Jacobian, returned in fortran order
+            dim2[0] = 6;
+            dim2[1] = ets->n;
+            py_J = PyArray_EMPTY(2, dim2, NPY_DOUBLE, 1);
+        }
+        else
+        {
+            // Trajectories are returned in C order so that each Jacobian
+            // is a contiguous block
+            py_J = PyArray_EMPTY(3, dim3, NPY_DOUBLE, 0);
         }
 
-        return py_J;
-    }
-
-    static PyObject *ETS_jacobe(PyObject *self, PyObject *args)
-    {
-        ETS *ets;
-        npy_float64 *J, *q, *tool = NULL;
-        PyObject *py_q, *py_tool, *py_np_q, *py_np_tool;
-        PyObject *py_ets;
-        int tool_used = 0;
-
-        if (!PyArg_ParseTuple(
-                args, "OOO",
-                &py_ets,
-                &py_q,
-                &py_tool))
-            return NULL;
-
-        // Extract the ETS object from the python object
-        if (!(ets = (ETS *)PyCapsule_GetPointer(py_ets, "ETS")))
-            return NULL;
-
-        // Inputs can be:
-        // None - Even q
-        // Not arrays - Will raise exception
-        // Have symbolic data - Will raise exception
-        // q can be 1D or 2D, assumes dimesnions correct (n, 1xn or nx1)
-        // tool can be SE3s or 4x4 numpy array
-
-        // Make our empty Jacobian
-        npy_intp dims[2] = {6, ets->n};
-        PyObject *py_J = PyArray_EMPTY(2, dims, NPY_DOUBLE, 1);
         J = (npy_float64 *)PyArray_DATA((PyArrayObject *)py_J);
-        MapMatrixJc eJ(J, 6, ets->n);
 
-        // Make sure q is number array
-        // Cast to numpy array
-        // Get data out
-        if (!_check_array_type(py_q))
-            return NULL;
-        py_np_q = (PyObject *)PyArray_FROMANY(py_q, NPY_DOUBLE, 1, 2, NPY_ARRAY_F_CONTIGUOUS);
-        q = (npy_float64 *)PyArray_DATA((PyArrayObject *)py_np_q);
+        // Do the job
+        if (trajn == 1 && py_out == Py_None)
+        {
+            MapMatrixJc eJ(J, 6, ets->n);
 
-        // Check if tool is None
-        // Make sure tool is number array
-        // Cast to numpy array
-        // Get data out
-        if (py_tool != Py_None)
+            if (frame)
+                _ETS_jacobe(ets, q, tool, eJ);
+            else
+                _ETS_jacob0(ets, q, tool, eJ);
+        }
+        else
         {
-            if (!_check_array_type(py_tool))
-                return NULL;
-            tool_used = 1;
-            py_np_tool = (PyObject *)PyArray_FROMANY(py_tool, NPY_DOUBLE, 1, 2, NPY_ARRAY_F_CONTIGUOUS);
-            tool = (npy_float64 *)PyArray_DATA((PyArrayObject *)py_np_tool);
+            // The trajectory loop does not touch any python objects
+            Py_BEGIN_ALLOW_THREADS;
+            _ETS_jacob_traj(ets, trajn, stride, q, tool, J, frame);
+            Py_END_ALLOW_THREADS;
         }
 
-        // Do the job
-        // for (int i = 0; i < 1000000; i++)
-        // {
-        //     _ETS_jacobe(ets, q, tool, eJ);
-        // }
-        _ETS_jacobe(ets, q, tool, eJ);
-
+    cleanup:
         // Free the memory
         Py_DECREF(py_np_q);
 
         if (tool_used)
-        {
             Py_DECREF(py_np_tool);
-        }
 
         return py_J;
     }
@@ -1085,19 +1423,19 @@ extern "C"
     {
         ETS *ets;
         npy_intp dim2[2] = {4, 4}, dim3[3] = {1, 4, 4};
-        int include_base, n = 0, q_nd, trajn = 1, tool_used = 0, base_used = 0;
-        npy_float64 *ret, *retp, *q, *qp, *base = NULL, *tool = NULL;
+        int include_base, n = 0, trajn = 1, tool_used = 0, base_used = 0;
+        npy_float64 *ret, *q, *base = NULL, *tool = NULL;
         PyObject *py_q, *py_base, *py_tool, *py_np_q, *py_np_tool, *py_np_base;
-        PyObject *py_ret, *py_ets;
-        npy_intp *q_shape;
+        PyObject *py_ret, *py_ets, *py_out = Py_None;
 
         if (!PyArg_ParseTuple(
-                args, "OOOOi",
+                args, "OOOOi|O",
                 &py_ets,
                 &py_q,
                 &py_base,
                 &py_tool,
-                &include_base))
+                &include_base,
+                &py_out))
             return NULL;
 
         // Extract the ETS object from the python object
@@ -1108,53 +1446,52 @@ extern "C"
         // None - Even q
         // Not arrays - Will raise exception
         // Have symbolic data - Will raise exception
-        // q can be 2D or 1D, but assumes dimesnions correct (n, 1xn or nx1)
+        // q can be 1D (n), 2D (1xn or nx1) or a trajectory (Mxn)
         // base and tool can be SE3s or 4x4 numpy array
+        // out can be None or a C contiguous (Mx4x4) float64 array
 
         // Make sure q is number array
         // Cast to numpy array
         // Get data out
         if (!_check_array_type(py_q))
             return NULL;
-        py_np_q = (PyObject *)PyArray_FROMANY(py_q, NPY_DOUBLE, 1, 2, NPY_ARRAY_F_CONTIGUOUS);
+
+        // q is taken in row major so that each configuration is contiguous
+        py_np_q = (PyObject *)PyArray_FROMANY(py_q, NPY_DOUBLE, 1, 2, NPY_ARRAY_IN_ARRAY);
+        if (py_np_q == NULL)
+            return NULL;
         q = (npy_float64 *)PyArray_DATA((PyArrayObject *)py_np_q);
 
-        // Check the dimesnions of q
-        q_nd = PyArray_NDIM((PyArrayObject *)py_np_q);
-        q_shape = PyArray_SHAPE((PyArrayObject *)py_np_q);
+        if (!_q_traj((PyArrayObject *)py_np_q, ets->n, &trajn, &n))
+        {
+            Py_DECREF(py_np_q);
+            return NULL;
+        }
 
-        // Work out how long the trajectory is
-        if (q_nd > 1)
+        // Allocate or check the return array
+        if (py_out != Py_None)
         {
-            if (q_shape[0] == 1)
-            {
-                // We have a single q vector
-                trajn = 1;
-                n = q_shape[1];
-            }
-            else if (q_shape[1] == 1)
-            {
-                // We have a single q vector
-                trajn = 1;
-                n = q_shape[0];
-            }
-            else
+            dim3[0] = trajn;
+
+            if (!_check_out(py_out, 3, dim3))
             {
-                // We have a trajectory of q
-                trajn = q_shape[0];
-                n = q_shape[1];
+                Py_DECREF(py_np_q);
+                return NULL;
             }
-        }
 
-        // Allocate return array
-        if (trajn == 1)
+            Py_INCREF(py_out);
+            py_ret = py_out;
+        }
+        else if (trajn == 1)
         {
             py_ret = PyArray_EMPTY(2, dim2, NPY_DOUBLE, 1);
         }
         else
         {
+            // Trajectories are returned in C order so that each pose is a
+            // contiguous block of 16 values
             dim3[0] = trajn;
-            py_ret = PyArray_EMPTY(3, dim3, NPY_DOUBLE, 1);
+            py_ret = PyArray_EMPTY(3, dim3, NPY_DOUBLE, 0);
         }
 
         // Get numpy reference to return array
@@ -1167,7 +1504,11 @@ extern "C"
         if (py_base != Py_None)
         {
             if (!_check_array_type(py_base))
+            {
+                Py_DECREF(py_np_q);
+                Py_DECREF(py_ret);
                 return NULL;
+            }
 
             if (include_base)
             {
@@ -1180,20 +1521,31 @@ extern "C"
         if (py_tool != Py_None)
         {
             if (!_check_array_type(py_tool))
+            {
+                Py_DECREF(py_np_q);
+                Py_DECREF(py_ret);
+                if (base_used)
+                    Py_DECREF(py_np_base);
                 return NULL;
+            }
             tool_used = 1;
             py_np_tool = (PyObject *)PyArray_FROMANY(py_tool, NPY_DOUBLE, 1, 2, NPY_ARRAY_F_CONTIGUOUS);
             tool = (npy_float64 *)PyArray_DATA((PyArrayObject *)py_np_tool);
         }
 
         // Do the actual job
-        for (int i = 0; i < trajn; i++)
+        if (trajn == 1 && py_out == Py_None)
         {
-            // Get pointers to the new section of return array and q array
-            retp = ret + (4 * 4 * i);
-            MapMatrix4dc e_retp(retp);
-            qp = q + (n * i);
-            _ETS_fkine(ets, qp, base, tool, e_retp);
+            // Single pose, returned in fortran order
+            MapMatrix4dc e_ret(ret);
+            _ETS_fkine(ets, q, base, tool, e_ret);
+        }
+        else
+        {
+            // The trajectory loop does not touch any python objects
+            Py_BEGIN_ALLOW_THREADS;
+            _ETS_fkine_traj(ets, trajn, n, q, base, tool, ret);
+            Py_END_ALLOW_THREADS;
         }
 
         // Free memory
@@ -1438,6 +1790,73 @@ extern "C"
         Py_RETURN_NONE;
     }
 
+    int _q_traj(PyArrayObject *py_np_q, int n, int *trajn, int *stride)
+    {
+        int q_nd;
+        npy_intp *q_shape;
+
+        // q can be 1D (n), 2D (1xn or nx1) or a trajectory (Mxn). The row
+        // stride may be larger than n when the ETS is part of a larger robot
+        q_nd = PyArray_NDIM(py_np_q);
+        q_shape = PyArray_SHAPE(py_np_q);
+
+        *trajn = 1;
+        *stride = q_shape[q_nd - 1];
+
+        if (q_nd > 1)
+        {
+            if (q_shape[0] == 1)
+            {
+                // We have a single q row vector
+                *stride = q_shape[1];
+            }
+            else if (q_shape[1] == 1 && n != 1)
+            {
+                // We have a single q column vector
+                *stride = q_shape[0];
+            }
+            else if (q_shape[1] >= n)
+            {
+                // We have a trajectory of q
+                *trajn = q_shape[0];
+                *stride = q_shape[1];
+            }
+            else
+            {
+                PyErr_SetString(PyExc_ValueError, "q has the wrong shape");
+                return 0;
+            }
+        }
+
+        return 1;
+    }
+
+    int _check_out(PyObject *out, int nd, npy_intp *dims)
+    {
+        PyArrayObject *np_out = (PyArrayObject *)out;
+
+        if (!PyArray_Check(out) ||
+            PyArray_TYPE(np_out) != NPY_DOUBLE ||
+            !PyArray_IS_C_CONTIGUOUS(np_out) ||
+            !PyArray_ISWRITEABLE(np_out) ||
+            PyArray_NDIM(np_out) != nd)
+        {
+            PyErr_SetString(PyExc_ValueError, "out must be a writeable C contiguous float64 array");
+            return 0;
+        }
+
+        for (int i = 0; i < nd; i++)
+        {
+            if (PyArray_DIM(np_out, i) != dims[i])
+            {
+                PyErr_SetString(PyExc_ValueError, "out has the wrong shape");
+                return 0;
+            }
+        }
+
+        return 1;
+    }
+
     int _check_array_type(PyObject *toCheck)
     {
         PyArray_Descr *desc;
@@ -21,14 +21,19 @@ extern "C"
     static PyObject *IK_LM_Chan(PyObject *self, PyObject *args);
     static PyObject *IK_LM_Wampler(PyObject *self, PyObject *args);
     static PyObject *IK_LM_Sugihara(PyObject *self, PyObject *args);
+    static PyObject *IK_batch(PyObject *self, PyObject *args);
+    static PyObject *IK_traj(PyObject *self, PyObject *args);
 
     static PyObject *Robot_link_T(PyObject *self, PyObject *args);
+    static PyObject *Robot_link_frames(PyObject *self, PyObject *args);
 
     static PyObject *ETS_hessian0(PyObject *self, PyObject *args);
     static PyObject *ETS_hessiane(PyObject *self, PyObject *args);
     static PyObject *ETS_jacob0(PyObject *self, PyObject *args);
     static PyObject *ETS_jacobe(PyObject *self, PyObject *args);
     static PyObject *ETS_fkine(PyObject *self, PyObject *args);
+    static PyObject *ETS_hessian(PyObject *args, int frame);
+    static PyObject *ETS_jacob(PyObject *args, int frame);
     static PyObject *ETS_init(PyObject *self, PyObject *args);
 
     static PyObject *ET_init(PyObject *self, PyObject *args);
@@ -37,6 +42,8 @@ extern "C"
 
     static PyObject *r2q(PyObject *self, PyObject *args);
     int _check_array_type(PyObject *toCheck);
+    int _q_traj(PyArrayObject *py_np_q, int n, int *trajn, int *stride);
+    int _check_out(PyObject *out, int nd, npy_intp *dims);
 
     void rx(npy_float64 *data, double eta);
     void ry(npy_float64 *data, double eta);
@@ -0,0 +1,423 @@
+/**
+ * \file frbd.cpp
+ * \brief Python bindings for the rigid-body tree dynamics
+ *
+ *  TREE = RBD_init(PARENT, JINDEX, AXIS, FLIP, OFFSET, TPRE, TPOST, L)
+ *  C = RBD_coriolis(TREE, Q, QD)
+ *  M = RBD_inertia(TREE, Q)
+ *  TAU = RBD_rne(TREE, Q, QD, QDD, GRAV)
+ *  QDD = RBD_accel(TREE, Q, QD, TAU, GRAV)
+ *
+ *  where Q, QD, QDD and TAU are (M x n) arrays, one joint state per row, and
+ *  the matrix results are (M x n x n). GRAV is the gravitational
+ *  acceleration in the base frame.
+ *
+ *  L is an (n x 18) array with one row per body holding
+ *  m, r (3), I (9, row major), Jm, G, B, Tc (2)
+ */
+
+#define NPY_NO_DEPRECATED_API NPY_1_7_API_VERSION
+
+#include "frbd.h"
+#include "rbd.h"
+#include "linalg.h"
+
+#include <Python.h>
+#include <numpy/arrayobject.h>
+#include <math.h>
+#include <Eigen/Dense>
+
+static PyMethodDef frbdMethods[] = {
+    {"RBD_init",
+     (PyCFunction)RBD_init,
+     METH_VARARGS,
+     "Create a rigid-body tree"},
+    {"RBD_coriolis",
+     (PyCFunction)RBD_coriolis,
+     METH_VARARGS,
+     "Coriolis matrix"},
+    {"RBD_inertia",
+     (PyCFunction)RBD_inertia,
+     METH_VARARGS,
+     "Joint space inertia matrix"},
+    {"RBD_rne",
+     (PyCFunction)RBD_rne,
+     METH_VARARGS,
+     "Inverse dynamics"},
+    {"RBD_accel",
+     (PyCFunction)RBD_accel,
+     METH_VARARGS,
+     "Forward dynamics"},
+    {NULL, NULL, 0, NULL} /* Sentinel */
+};
+
+static struct PyModuleDef frbdmodule =
+    {
+        PyModuleDef_HEAD_INIT,
+        "frbd",
+        "Fast Rigid-Body Dynamics",
+        -1,
+        frbdMethods};
+
+PyMODINIT_FUNC PyInit_frbd(void)
+{
+    import_array();
+    return PyModule_Create(&frbdmodule);
+}
+
+extern "C"
+{
+
+    static PyObject *RBD_init(PyObject *self, PyObject *args)
+    {
+        Tree *tree;
+        PyObject *py_parent, *py_jindex, *py_axis, *py_flip, *py_offset;
+        PyObject *py_Tpre, *py_Tpost, *py_L;
+        PyArrayObject *np_parent, *np_jindex, *np_axis, *np_flip, *np_offset;
+        PyArrayObject *np_Tpre, *np_Tpost, *np_L;
+        double *Tpre, *Tpost, *L;
+        int n;
+
+        if (!PyArg_ParseTuple(
+                args, "OOOOOOOO",
+                &py_parent,
+                &py_jindex,
+                &py_axis,
+                &py_flip,
+                &py_offset,
+                &py_Tpre,
+                &py_Tpost,
+                &py_L))
+            return NULL;
+
+        np_parent = (PyArrayObject *)PyArray_FROMANY(py_parent, NPY_INT, 1, 1, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_FORCECAST);
+        np_jindex = (PyArrayObject *)PyArray_FROMANY(py_jindex, NPY_INT, 1, 1, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_FORCECAST);
+        np_axis = (PyArrayObject *)PyArray_FROMANY(py_axis, NPY_INT, 1, 1, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_FORCECAST);
+        np_flip = (PyArrayObject *)PyArray_FROMANY(py_flip, NPY_DOUBLE, 1, 1, NPY_ARRAY_IN_ARRAY);
+        np_offset = (PyArrayObject *)PyArray_FROMANY(py_offset, NPY_DOUBLE, 1, 1, NPY_ARRAY_IN_ARRAY);
+        np_Tpre = (PyArrayObject *)PyArray_FROMANY(py_Tpre, NPY_DOUBLE, 3, 3, NPY_ARRAY_IN_ARRAY);
+        np_Tpost = (PyArrayObject *)PyArray_FROMANY(py_Tpost, NPY_DOUBLE, 3, 3, NPY_ARRAY_IN_ARRAY);
+        np_L = (PyArrayObject *)PyArray_FROMANY(py_L, NPY_DOUBLE, 2, 2, NPY_ARRAY_IN_ARRAY);
+
+        if (!np_parent || !np_jindex || !np_axis || !np_flip || !np_offset ||
+            !np_Tpre || !np_Tpost || !np_L)
+        {
+            tree = NULL;
+            goto cleanup;
+        }
+
+        n = PyArray_DIM(np_parent, 0);
+
+        if (PyArray_DIM(np_jindex, 0) != n || PyArray_DIM(np_axis, 0) != n ||
+            PyArray_DIM(np_flip, 0) != n || PyArray_DIM(np_offset, 0) != n ||
+            PyArray_DIM(np_Tpre, 0) != n || PyArray_DIM(np_Tpost, 0) != n ||
+            PyArray_DIM(np_L, 0) != n || PyArray_DIM(np_L, 1) != 18)
+        {
+            PyErr_SetString(PyExc_ValueError, "inconsistent rigid-body tree description");
+            tree = NULL;
+            goto cleanup;
+        }
+
+        // the indices are used without checks by the dynamics, a parent
+        // must precede its children
+        for (int i = 0; i < n; i++)
+        {
+            int parent = ((int *)PyArray_DATA(np_parent))[i];
+            int jindex = ((int *)PyArray_DATA(np_jindex))[i];
+            int axis = ((int *)PyArray_DATA(np_axis))[i];
+
+            if (parent < -1 || parent >= i)
+            {
+                PyErr_SetString(PyExc_ValueError, "invalid parent index");
+                tree = NULL;
+                goto cleanup;
+            }
+            if (jindex < 0 || jindex >= n)
+            {
+                PyErr_SetString(PyExc_ValueError, "invalid joint index");
+                tree = NULL;
+                goto cleanup;
+            }
+            if (axis < 0 || axis > 5)
+            {
+                PyErr_SetString(PyExc_ValueError, "invalid joint axis");
+                tree = NULL;
+                goto cleanup;
+            }
+        }
+
+        tree = (Tree *)PyMem_RawMalloc(sizeof(Tree));
+        tree->n = n;
+        tree->parent = (int *)PyMem_RawMalloc(n * sizeof(int));
+        tree->jindex = (int *)PyMem_RawMalloc(n * sizeof(int));
+        tree->axis = (int *)PyMem_RawMalloc(n * sizeof(int));
+        tree->flip = (double *)PyMem_RawMalloc(n * sizeof(double));
+        tree->offset = (double *)PyMem_RawMalloc(n * sizeof(double));
+        tree->Tpre = (double *)PyMem_RawMalloc(16 * n * sizeof(double));
+        tree->Tpost = (double *)PyMem_RawMalloc(16 * n * sizeof(double));
+        tree->m = (double *)PyMem_RawMalloc(n * sizeof(double));
+        tree->r = (double *)PyMem_RawMalloc(3 * n * sizeof(double));
+        tree->I = (double *)PyMem_RawMalloc(9 * n * sizeof(double));
+        tree->Jm = (double *)PyMem_RawMalloc(n * sizeof(double));
+        tree->G = (double *)PyMem_RawMalloc(n * sizeof(double));
+        tree->B = (double *)PyMem_RawMalloc(n * sizeof(double));
+        tree->Tc = (double *)PyMem_RawMalloc(2 * n * sizeof(double));
+
+        Tpre = (double *)PyArray_DATA(np_Tpre);
+        Tpost = (double *)PyArray_DATA(np_Tpost);
+        L = (double *)PyArray_DATA(np_L);
+
+        for (int i = 0; i < n; i++)
+        {
+            tree->parent[i] = ((int *)PyArray_DATA(np_parent))[i];
+            tree->jindex[i] = ((int *)PyArray_DATA(np_jindex))[i];
+            tree->axis[i] = ((int *)PyArray_DATA(np_axis))[i];
+            tree->flip[i] = ((double *)PyArray_DATA(np_flip))[i];
+            tree->offset[i] = ((double *)PyArray_DATA(np_offset))[i];
+
+            // Transforms come in row major from Python
+            MapMatrix4dr row_Tpre(Tpre + 16 * i);
+            MapMatrix4dr row_Tpost(Tpost + 16 * i);
+            MapMatrix4dc(tree->Tpre + 16 * i) = row_Tpre;
+            MapMatrix4dc(tree->Tpost + 16 * i) = row_Tpost;
+
+            double *Li = L + 18 * i;
+            tree->m[i] = Li[0];
+            for (int j = 0; j < 3; j++)
+                tree->r[3 * i + j] = Li[1 + j];
+            for (int j = 0; j < 9; j++)
+                tree->I[9 * i + j] = Li[4 + j];
+            tree->Jm[i] = Li[13];
+            tree->G[i] = Li[14];
+            tree->B[i] = Li[15];
+            tree->Tc[2 * i] = Li[16];
+            tree->Tc[2 * i + 1] = Li[17];
+        }
+
+    cleanup:
+        Py_XDECREF(np_parent);
+        Py_XDECREF(np_jindex);
+        Py_XDECREF(np_axis);
+        Py_XDECREF(np_flip);
+        Py_XDECREF(np_offset);
+        Py_XDECREF(np_Tpre);
+        Py_XDECREF(np_Tpost);
+        Py_XDECREF(np_L);
+
+        if (tree == NULL)
+            return NULL;
+
+        return PyCapsule_New(tree, "Tree", _RBD_delete);
+    }
+
+    static PyObject *RBD_coriolis(PyObject *self, PyObject *args)
+    {
+        Tree *tree;
+        PyObject *py_tree, *py_q, *py_qd, *py_C;
+        PyArrayObject *np_q, *np_qd;
+        double *q, *qd, *C;
+        npy_intp dims[3];
+        int trajn = -1, n;
+
+        if (!PyArg_ParseTuple(args, "OOO", &py_tree, &py_q, &py_qd))
+            return NULL;
+
+        if (!(tree = (Tree *)PyCapsule_GetPointer(py_tree, "Tree")))
+            return NULL;
+
+        n = tree->n;
+
+        if (!(np_q = _RBD_traj(py_q, n, &trajn)))
+            return NULL;
+
+        if (!(np_qd = _RBD_traj(py_qd, n, &trajn)))
+        {
+            Py_DECREF(np_q);
+            return NULL;
+        }
+
+        // Entries between bodies on different branches are zero
+        dims[0] = trajn;
+        dims[1] = n;
+        dims[2] = n;
+        py_C = PyArray_ZEROS(3, dims, NPY_DOUBLE, 0);
+
+        q = (double *)PyArray_DATA(np_q);
+        qd = (double *)PyArray_DATA(np_qd);
+        C = (double *)PyArray_DATA((PyArrayObject *)py_C);
+
+        Py_BEGIN_ALLOW_THREADS;
+        Work w(n);
+        for (int k = 0; k < trajn; k++)
+        {
+            _rbd_coriolis(tree, q + n * k, qd + n * k, C + n * n * k, w);
+        }
+        Py_END_ALLOW_THREADS;
+
+        Py_DECREF(np_q);
+        Py_DECREF(np_qd);
+
+        return py_C;
+    }
+
+    static PyObject *RBD_inertia(PyObject *self, PyObject *args)
+    {
+        Tree *tree;
+        PyObject *py_tree, *py_q, *py_M;
+        PyArrayObject *np_q;
+        double *q, *M;
+        npy_intp dims[3];
+        int trajn = -1, n;
+
+        if (!PyArg_ParseTuple(args, "OO", &py_tree, &py_q))
+            return NULL;
+
+        if (!(tree = (Tree *)PyCapsule_GetPointer(py_tree, "Tree")))
+            return NULL;
+
+        n = tree->n;
+
+        if (!(np_q = _RBD_traj(py_q, n, &trajn)))
+            return NULL;
+
+        // Entries between bodies on different branches are zero
+        dims[0] = trajn;
+        dims[1] = n;
+        dims[2] = n;
+        py_M = PyArray_ZEROS(3, dims, NPY_DOUBLE, 0);
+
+        q = (double *)PyArray_DATA(np_q);
+        M = (double *)PyArray_DATA((PyArrayObject *)py_M);
+
+        Py_BEGIN_ALLOW_THREADS;
+        Work w(n);
+        for (int k = 0; k < trajn; k++)
+        {
+            _rbd_inertia(tree, q + n * k, M + n * n * k, w);
+        }
+        Py_END_ALLOW_THREADS;
+
+        Py_DECREF(np_q);
+
+        return py_M;
+    }
+
+    static PyObject *RBD_rne(PyObject *self, PyObject *args)
+    {
+        return _RBD_dyn(args, _rbd_rne);
+    }
+
+    static PyObject *RBD_accel(PyObject *self, PyObject *args)
+    {
+        return _RBD_dyn(args, _rbd_accel);
+    }
+
+    PyObject *_RBD_dyn(PyObject *args, void (*method)(Tree *, double *, double *, double *, double *, double *, Work &))
+    {
+        // Common to the inverse and forward dynamics, three (M x n) joint
+        // space arguments and gravity give an (M x n) result
+        Tree *tree;
+        PyObject *py_tree, *py_x1, *py_x2, *py_x3, *py_grav, *py_y;
+        PyArrayObject *np_x1 = NULL, *np_x2 = NULL, *np_x3 = NULL, *np_grav = NULL;
+        double *x1, *x2, *x3, *grav, *y;
+        npy_intp dims[2];
+        int trajn = -1, n;
+
+        if (!PyArg_ParseTuple(args, "OOOOO", &py_tree, &py_x1, &py_x2, &py_x3, &py_grav))
+            return NULL;
+
+        if (!(tree = (Tree *)PyCapsule_GetPointer(py_tree, "Tree")))
+            return NULL;
+
+        n = tree->n;
+
+        if (!(np_x1 = _RBD_traj(py_x1, n, &trajn)) ||
+            !(np_x2 = _RBD_traj(py_x2, n, &trajn)) ||
+            !(np_x3 = _RBD_traj(py_x3, n, &trajn)))
+        {
+            Py_XDECREF(np_x1);
+            Py_XDECREF(np_x2);
+            return NULL;
+        }
+
+        np_grav = (PyArrayObject *)PyArray_FROMANY(py_grav, NPY_DOUBLE, 1, 1, NPY_ARRAY_IN_ARRAY);
+        if (np_grav == NULL || PyArray_DIM(np_grav, 0) != 3)
+        {
+            if (np_grav != NULL)
+                PyErr_SetString(PyExc_ValueError, "gravity must be a 3-vector");
+            Py_XDECREF(np_grav);
+            Py_DECREF(np_x1);
+            Py_DECREF(np_x2);
+            Py_DECREF(np_x3);
+            return NULL;
+        }
+
+        dims[0] = trajn;
+        dims[1] = n;
+        py_y = PyArray_EMPTY(2, dims, NPY_DOUBLE, 0);
+
+        x1 = (double *)PyArray_DATA(np_x1);
+        x2 = (double *)PyArray_DATA(np_x2);
+        x3 = (double *)PyArray_DATA(np_x3);
+        grav = (double *)PyArray_DATA(np_grav);
+        y = (double *)PyArray_DATA((PyArrayObject *)py_y);
+
+        Py_BEGIN_ALLOW_THREADS;
+        Work w(n);
+        for (int k = 0; k < trajn; k++)
+        {
+            method(tree, x1 + n * k, x2 + n * k, x3 + n * k, grav, y + n * k, w);
+        }
+        Py_END_ALLOW_THREADS;
+
+        Py_DECREF(np_x1);
+        Py_DECREF(np_x2);
+        Py_DECREF(np_x3);
+        Py_DECREF(np_grav);
+
+        return py_y;
+    }
+
+    PyArrayObject *_RBD_traj(PyObject *py_x, int n, int *trajn)
+    {
+        PyArrayObject *np_x;
+
+        // A joint space trajectory is (trajn x n), all arguments of one call
+        // must have the same number of rows
+        np_x = (PyArrayObject *)PyArray_FROMANY(py_x, NPY_DOUBLE, 2, 2, NPY_ARRAY_IN_ARRAY);
+        if (np_x == NULL)
+            return NULL;
+
+        if (PyArray_DIM(np_x, 1) != n || (*trajn >= 0 && PyArray_DIM(np_x, 0) != *trajn))
+        {
+            Py_DECREF(np_x);
+            PyErr_SetString(PyExc_ValueError, "joint state has the wrong shape");
+            return NULL;
+        }
+
+        *trajn = PyArray_DIM(np_x, 0);
+        return np_x;
+    }
+
+    void _RBD_delete(PyObject *capsule)
+    {
+        Tree *tree = (Tree *)PyCapsule_GetPointer(capsule, "Tree");
+
+        PyMem_RawFree(tree->parent);
+        PyMem_RawFree(tree->jindex);
+        PyMem_RawFree(tree->axis);
+        PyMem_RawFree(tree->flip);
+        PyMem_RawFree(tree->offset);
+        PyMem_RawFree(tree->Tpre);
+        PyMem_RawFree(tree->Tpost);
+        PyMem_RawFree(tree->m);
+        PyMem_RawFree(tree->r);
+        PyMem_RawFree(tree->I);
+        PyMem_RawFree(tree->Jm);
+        PyMem_RawFree(tree->G);
+        PyMem_RawFree(tree->B);
+        PyMem_RawFree(tree->Tc);
+        PyMem_RawFree(tree);
+    }
+
+} /* extern "C" */
@@ -0,0 +1,33 @@
+/**
+ * \file frbd.h
+ *
+ */
+
+#ifndef _FRBD_H_
+#define _FRBD_H_
+
+#include <Python.h>
+#include <numpy/arrayobject.h>
+#include "rbd.h"
+
+#ifdef __cplusplus
+extern "C"
+{
+#endif /* __cplusplus */
+
+    // forward defines
+    static PyObject *RBD_init(PyObject *self, PyObject *args);
+    static PyObject *RBD_coriolis(PyObject *self, PyObject *args);
+    static PyObject *RBD_inertia(PyObject *self, PyObject *args);
+    static PyObject *RBD_rne(PyObject *self, PyObject *args);
+    static PyObject *RBD_accel(PyObject *self, PyObject *args);
+
+    PyObject *_RBD_dyn(PyObject *args, void (*method)(Tree *, double *, double *, double *, double *, double *, Work &));
+    PyArrayObject *_RBD_traj(PyObject *py_x, int n, int *trajn);
+    void _RBD_delete(PyObject *capsule);
+
+#ifdef __cplusplus
+} /* extern "C" */
+#endif /* __cplusplus */
+
+#endif
@@ -8,12 +8,57 @@
 #include <Python.h>
 #include <math.h>
 #include <iostream>
+#include <atomic>
+#include <thread>
+#include <vector>
 #include <Eigen/Dense>
 // #include <Eigen/QR>
 // #include <Eigen/Core>
 // #include <Eigen/LU>
 // #include <Eigen/SVD>
 
+IKRand::IKRand(unsigned long long seed, int halton, int n)
+    : gen(seed), halton(halton), index(0)
+{
+    std::uniform_real_distribution<double> uniform(0.0, 1.0);
+
+    if (!halton)
+        return;
+
+    // The first n primes and a random shift for each dimension
+    for (int p = 2; (int)base.size() < n; p++)
+    {
+        bool prime = true;
+
+        for (int b : base)
+        {
+            if (p % b == 0)
+            {
+                prime = false;
+                break;
+            }
+        }
+
+        if (prime)
+        {
+            base.push_back(p);
+            shift.push_back(uniform(gen));
+        }
+    }
+}
+
+/*
+ * Scramble an integer, used to derive well separated generator seeds from
+ * consecutive integers
+ */
+static unsigned long long _splitmix64(unsigned long long x)
+{
+    x += 0x9e3779b97f4a7c15ULL;
+    x = (x ^ (x >> 30)) * 0xbf58476d1ce4e5b9ULL;
+    x = (x ^ (x >> 27)) * 0x94d049bb133111ebULL;
+    return x ^ (x >> 31);
+}
+
 extern "C"
 {
 
@@ -21,7 +66,7 @@ extern "C"
         ETS *ets, Matrix4dc Tep,
         MapVectorX q0, int ilimit, int slimit, double tol, int reject_jl,
         MapVectorX q, int *it, int *search, int *solution, double *E,
-        MapVectorX we, int use_pinv, double pinv_damping)
+        MapVectorX we, int use_pinv, double pinv_damping, IKRand *rng)
     {
         int iter = 1;
 
@@ -69,7 +114,7 @@ extern "C"
         }
         else
         {
-            _rand_q(ets, q);
+            _rand_q(ets, q, rng);
         }
 
         // Global search up to slimit
@@ -91,11 +136,8 @@ extern "C"
                 {
                     // We have arrived
 
-                    // wrap q to +- pi
-                    for (int i = 0; i < ets->n; i++)
-                    {
-                        q(i) = std::fmod(q(i), PI);
-                    }
+                    // wrap revolute joints to +- pi
+                    _wrap_q(ets, q);
 
                     // Check for joint limit violation
                     if (reject_jl)
@@ -138,7 +180,7 @@ extern "C"
             *it += iter;
             iter = 0;
             *search += 1;
-            _rand_q(ets, q);
+            _rand_q(ets, q, rng);
         }
 
         free(np_e);
@@ -155,7 +197,7 @@ extern "C"
         ETS *ets, Matrix4dc Tep,
         MapVectorX q0, int ilimit, int slimit, double tol, int reject_jl,
         MapVectorX q, int *it, int *search, int *solution, double *E,
-        MapVectorX we, int use_pinv, double pinv_damping)
+        MapVectorX we, int use_pinv, double pinv_damping, IKRand *rng)
     {
         int iter = 1;
 
@@ -203,7 +245,7 @@ extern "C"
         }
         else
         {
-            _rand_q(ets, q);
+            _rand_q(ets, q, rng);
         }
 
         // Global search up to slimit
@@ -225,11 +267,8 @@ extern "C"
                 {
                     // We have arrived
 
-                    // wrap q to +- pi
-                    for (int i = 0; i < ets->n; i++)
-                    {
-                        q(i) = std::fmod(q(i), PI);
-                    }
+                    // wrap revolute joints to +- pi
+                    _wrap_q(ets, q);
 
                     // Check for joint limit violation
                     if (reject_jl)
@@ -272,7 +311,7 @@ extern "C"
             *it += iter;
             iter = 0;
             *search += 1;
-            _rand_q(ets, q);
+            _rand_q(ets, q, rng);
         }
 
         free(np_e);
@@ -289,7 +328,7 @@ extern "C"
         ETS *ets, Matrix4dc Tep,
         MapVectorX q0, int ilimit, int slimit, double tol, int reject_jl,
         MapVectorX q, int *it, int *search, int *solution, double *E,
-        double lambda, MapVectorX we)
+        double lambda, MapVectorX we, IKRand *rng)
     {
         int iter = 1;
 
@@ -326,7 +365,7 @@ extern "C"
         }
         else
         {
-            _rand_q(ets, q);
+            _rand_q(ets, q, rng);
         }
 
         // Global search up to slimit
@@ -348,11 +387,8 @@ extern "C"
                 {
                     // We have arrived
 
-                    // wrap q to +- pi
-                    for (int i = 0; i < ets->n; i++)
-                    {
-                        q(i) = std::fmod(q(i), PI);
-                    }
+                    // wrap revolute joints to +- pi
+                    _wrap_q(ets, q);
 
                     // Check for joint limit violation
                     if (reject_jl)
@@ -392,7 +428,7 @@ extern "C"
             *it += iter;
             iter = 0;
             *search += 1;
-            _rand_q(ets, q);
+            _rand_q(ets, q, rng);
         }
 
         free(np_e);
@@ -404,7 +440,7 @@ extern "C"
         ETS *ets, Matrix4dc Tep,
         MapVectorX q0, int ilimit, int slimit, double tol, int reject_jl,
         MapVectorX q, int *it, int *search, int *solution, double *E,
-        double lambda, MapVectorX we)
+        double lambda, MapVectorX we, IKRand *rng)
     {
         int iter = 1;
 
@@ -440,7 +476,7 @@ extern "C"
         }
         else
         {
-            _rand_q(ets, q);
+            _rand_q(ets, q, rng);
         }
 
         // Global search up to slimit
@@ -462,11 +498,8 @@ extern "C"
                 {
                     // We have arrived
 
-                    // wrap q to +- pi
-                    for (int i = 0; i < ets->n; i++)
-                    {
-                        q(i) = std::fmod(q(i), PI);
-                    }
+                    // wrap revolute joints to +- pi
+                    _wrap_q(ets, q);
 
                     // Check for joint limit violation
                     if (reject_jl)
@@ -503,7 +536,7 @@ extern "C"
             *it += iter;
             iter = 0;
             *search += 1;
-            _rand_q(ets, q);
+            _rand_q(ets, q, rng);
         }
 
         free(np_e);
@@ -515,7 +548,7 @@ extern "C"
         ETS *ets, Matrix4dc Tep,
         MapVectorX q0, int ilimit, int slimit, double tol, int reject_jl,
         MapVectorX q, int *it, int *search, int *solution, double *E,
-        double lambda, MapVectorX we)
+        double lambda, MapVectorX we, IKRand *rng)
     {
         int iter = 1;
 
@@ -552,7 +585,7 @@ extern "C"
         }
         else
         {
-            _rand_q(ets, q);
+            _rand_q(ets, q, rng);
         }
 
         // Global search up to slimit
@@ -574,11 +607,8 @@ extern "C"
                 {
                     // We have arrived
 
-                    // wrap q to +- pi
-                    for (int i = 0; i < ets->n; i++)
-                    {
-                        q(i) = std::fmod(q(i), PI);
-                    }
+                    // wrap revolute joints to +- pi
+                    _wrap_q(ets, q);
 
                     // Check for joint limit violation
                     if (reject_jl)
@@ -618,7 +648,7 @@ extern "C"
             *it += iter;
             iter = 0;
             *search += 1;
-            _rand_q(ets, q);
+            _rand_q(ets, q, rng);
         }
 
         free(np_e);
@@ -626,6 +656,143 @@ extern "C"
         free(np_J);
     }
 
+    /*
+     * Run the solver given by method, 0-4 for NR, GN, LM Chan, LM Wampler
+     * and LM Sugihara, on a single problem
+     */
+    static void _IK_solve(
+        ETS *ets, int method, Matrix4dc Tep, MapVectorX q0,
+        int ilimit, int slimit, double tol, int reject_jl, MapVectorX we,
+        double lambda, int use_pinv, double pinv_damping, IKRand *rng,
+        MapVectorX q, int *solution, int *it, int *search, double *E)
+    {
+        *it = 0;
+        *search = 1;
+        *solution = 0;
+
+        switch (method)
+        {
+        case 0:
+            _IK_NR(ets, Tep, q0, ilimit, slimit, tol, reject_jl, q, it, search, solution, E, we, use_pinv, pinv_damping, rng);
+            break;
+        case 1:
+            _IK_GN(ets, Tep, q0, ilimit, slimit, tol, reject_jl, q, it, search, solution, E, we, use_pinv, pinv_damping, rng);
+            break;
+        case 2:
+            _IK_LM_Chan(ets, Tep, q0, ilimit, slimit, tol, reject_jl, q, it, search, solution, E, lambda, we, rng);
+            break;
+        case 3:
+            _IK_LM_Wampler(ets, Tep, q0, ilimit, slimit, tol, reject_jl, q, it, search, solution, E, lambda, we, rng);
+            break;
+        default:
+            _IK_LM_Sugihara(ets, Tep, q0, ilimit, slimit, tol, reject_jl, q, it, search, solution, E, lambda, we, rng);
+        }
+    }
+
+    /*
+     * Solve trajn independent IK problems, the i'th target is the row major
+     * 4x4 matrix Tep + 16i and the seed, if q0 is not NULL, is q0 + n*i.
+     * Results are written to row i of q and element i of the other outputs.
+     *
+     * Problems are handed out one at a time to nthreads worker threads. The
+     * caller must have released the GIL.
+     */
+    void _IK_batch(
+        ETS *ets, int method, int trajn, double *Tep, double *q0,
+        int ilimit, int slimit, double tol, int reject_jl, double *we,
+        double lambda, int use_pinv, double pinv_damping, int nthreads,
+        unsigned long long seed, int halton,
+        double *q, int *solution, int *it, int *search, double *E)
+    {
+        std::atomic<int> next(0);
+        std::vector<std::thread> workers;
+
+        auto worker = [&]()
+        {
+            int i;
+
+            while ((i = next++) < trajn)
+            {
+                MapMatrix4dr row_Tep(Tep + 16 * i);
+                Matrix4dc Tepi = row_Tep;
+                MapVectorX q0i(q0 == NULL ? NULL : q0 + ets->n * i, q0 == NULL ? 0 : ets->n);
+                MapVectorX wei(we, we == NULL ? 0 : 6);
+                MapVectorX qi(q + ets->n * i, ets->n);
+
+                // Each problem has its own generator so the results do not
+                // depend on how problems are shared between threads
+                IKRand rng(_splitmix64(seed + i), halton, ets->n);
+
+                _IK_solve(
+                    ets, method, Tepi, q0i, ilimit, slimit, tol, reject_jl, wei,
+                    lambda, use_pinv, pinv_damping, &rng, qi, &solution[i], &it[i], &search[i], &E[i]);
+            }
+        };
+
+        if (nthreads > trajn)
+            nthreads = trajn;
+
+        for (int t = 1; t < nthreads; t++)
+            workers.emplace_back(worker);
+
+        // The calling thread does its share too
+        worker();
+
+        for (auto &w : workers)
+            w.join();
+    }
+
+    /*
+     * Solve IK along a trajectory of trajn row major 4x4 poses in Tep. The
+     * first point is seeded with q0, or a random configuration if q0 is
+     * NULL, and every later point with the most recent successful solution.
+     * The solvers only fall back to random restarts when the seeded search
+     * fails.
+     *
+     * Revolute joints are shifted by multiples of 2pi towards the seed so the
+     * joint trajectory does not jump at +- pi. dq[i] is the largest joint
+     * step from the previous point, the continuity error, and is zero for the
+     * first point when no q0 is given.
+     *
+     * The caller must have released the GIL.
+     */
+    void _IK_traj(
+        ETS *ets, int method, int trajn, double *Tep, double *q0,
+        int ilimit, int slimit, double tol, int reject_jl, double *we,
+        double lambda, int use_pinv, double pinv_damping,
+        unsigned long long seed, int halton,
+        double *q, int *solution, int *it, int *search, double *E, double *dq)
+    {
+        double *qseed = q0;
+        MapVectorX wei(we, we == NULL ? 0 : 6);
+        IKRand rng(seed, halton, ets->n);
+
+        for (int i = 0; i < trajn; i++)
+        {
+            MapMatrix4dr row_Tep(Tep + 16 * i);
+            Matrix4dc Tepi = row_Tep;
+            MapVectorX q0i(qseed, qseed == NULL ? 0 : ets->n);
+            MapVectorX qi(q + ets->n * i, ets->n);
+
+            _IK_solve(
+                ets, method, Tepi, q0i, ilimit, slimit, tol, reject_jl, wei,
+                lambda, use_pinv, pinv_damping, &rng, qi, &solution[i], &it[i], &search[i], &E[i]);
+
+            if (qseed != NULL && solution[i])
+                _unwrap_q(ets, qi, q0i, reject_jl);
+
+            if (i > 0)
+                dq[i] = (qi - MapVectorX(q + ets->n * (i - 1), ets->n)).cwiseAbs().maxCoeff();
+            else if (qseed != NULL)
+                dq[i] = (qi - q0i).cwiseAbs().maxCoeff();
+            else
+                dq[i] = 0.0;
+
+            if (solution[i])
+                qseed = q + ets->n * i;
+        }
+    }
+
     void _pseudo_inverse(Eigen::Map<Eigen::MatrixXd> J, Eigen::Map<Eigen::MatrixXd> J_pinv, double damping)
     {
         Eigen::JacobiSVD<Eigen::MatrixXd>
@@ -703,17 +870,70 @@ extern "C"
         }
     }
 
-    void _rand_q(ETS *ets, MapVectorX q)
+    void _wrap_q(ETS *ets, MapVectorX q)
+    {
+        ET *et;
+
+        for (int i = 0; i < ets->m; i++)
+        {
+            et = ets->ets[i];
+
+            if (et->isjoint && et->axis < 3)
+                q(et->jindex) = std::remainder(q(et->jindex), PI_x2);
+        }
+    }
+
+    void _unwrap_q(ETS *ets, MapVectorX q, MapVectorX qref, int reject_jl)
+    {
+        ET *et;
+        double qj;
+        int j;
+
+        for (int i = 0; i < ets->m; i++)
+        {
+            et = ets->ets[i];
+
+            if (!et->isjoint || et->axis >= 3)
+                continue;
+
+            j = et->jindex;
+            qj = qref(j) + std::remainder(q(j) - qref(j), PI_x2);
+
+            if (!reject_jl || (qj >= ets->qlim_l[j] && qj <= ets->qlim_h[j]))
+                q(j) = qj;
+        }
+    }
+
+    void _rand_q(ETS *ets, MapVectorX q, IKRand *rng)
     {
-        Eigen::Map<Eigen::ArrayXd> qlim_l(ets->qlim_l, ets->n);
-        Eigen::Map<Eigen::ArrayXd> q_range2(ets->q_range2, ets->n);
+        std::uniform_real_distribution<double> uniform(0.0, 1.0);
+        unsigned long k;
+        double u, f;
 
-        q = VectorX::Random(ets->n);
+        rng->index += 1;
 
-        q = (q.array() + 1) * q_range2;
-        q = q.array() + qlim_l;
+        for (int i = 0; i < ets->n; i++)
+        {
+            if (rng->halton)
+            {
+                // Radical inverse of the index in the i'th prime base
+                u = 0.0;
+                f = 1.0 / rng->base[i];
+                for (k = rng->index; k > 0; k /= rng->base[i])
+                {
+                    u += f * (k % rng->base[i]);
+                    f /= rng->base[i];
+                }
+                u += rng->shift[i];
+                u -= std::floor(u);
+            }
+            else
+            {
+                u = uniform(rng->gen);
+            }
 
-        // return q;
+            q(i) = ets->qlim_l[i] + 2.0 * ets->q_range2[i] * u;
+        }
     }
 
 } /* extern "C" */
\ No newline at end of file
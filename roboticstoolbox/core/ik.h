@@ -11,6 +11,25 @@
 #include <Python.h>
 #include "structs.h"
 #include "linalg.h"
+#include <random>
+#include <vector>
+
+/*
+ * The source of random restart configurations for one IK problem. Restarts
+ * are drawn uniformly over the joint limits from a generator seeded by the
+ * caller or, if halton is set, from a Halton sequence given a random
+ * (Cranley-Patterson) shift so different seeds give different sequences.
+ */
+typedef struct IKRand
+{
+    std::mt19937_64 gen;
+    int halton;
+    unsigned long index;
+    std::vector<int> base;
+    std::vector<double> shift;
+
+    IKRand(unsigned long long seed, int halton, int n);
+} IKRand;
 
 #ifdef __cplusplus
 extern "C"
@@ -21,35 +40,51 @@ extern "C"
         ETS *ets, Matrix4dc Tep,
         MapVectorX q0, int ilimit, int slimit, double tol, int reject_jl,
         MapVectorX q, int *it, int *search, int *solution, double *E,
-        MapVectorX we, int use_pinv, double pinv_damping);
+        MapVectorX we, int use_pinv, double pinv_damping, IKRand *rng);
 
     void _IK_NR(
         ETS *ets, Matrix4dc Tep,
         MapVectorX q0, int ilimit, int slimit, double tol, int reject_jl,
         MapVectorX q, int *it, int *search, int *solution, double *E,
-        MapVectorX we, int use_pinv, double pinv_damping);
+        MapVectorX we, int use_pinv, double pinv_damping, IKRand *rng);
 
     void _IK_LM_Chan(
         ETS *ets, Matrix4dc Tep,
         MapVectorX q0, int ilimit, int slimit, double tol, int reject_jl,
         MapVectorX q, int *it, int *search, int *solution, double *E,
-        double lambda, MapVectorX we);
+        double lambda, MapVectorX we, IKRand *rng);
 
     void _IK_LM_Wampler(
         ETS *ets, Matrix4dc Tep,
         MapVectorX q0, int ilimit, int slimit, double tol, int reject_jl,
         MapVectorX q, int *it, int *search, int *solution, double *E,
-        double lambda, MapVectorX we);
+        double lambda, MapVectorX we, IKRand *rng);
 
     void _IK_LM_Sugihara(
         ETS *ets, Matrix4dc Tep,
         MapVectorX q0, int ilimit, int slimit, double tol, int reject_jl,
         MapVectorX q, int *it, int *search, int *solution, double *E,
-        double lambda, MapVectorX we);
+        double lambda, MapVectorX we, IKRand *rng);
+
+    void _IK_batch(
+        ETS *ets, int method, int trajn, double *Tep, double *q0,
+        int ilimit, int slimit, double tol, int reject_jl, double *we,
+        double lambda, int use_pinv, double pinv_damping, int nthreads,
+        unsigned long long seed, int halton,
+        double *q, int *solution, int *it, int *search, double *E);
+
+    void _IK_traj(
+        ETS *ets, int method, int trajn, double *Tep, double *q0,
+        int ilimit, int slimit, double tol, int reject_jl, double *we,
+        double lambda, int use_pinv, double pinv_damping,
+        unsigned long long seed, int halton,
+        double *q, int *solution, int *it, int *search, double *E, double *dq);
 
     void _pseudo_inverse(Eigen::Map<Eigen::MatrixXd> J, Eigen::Map<Eigen::MatrixXd> J_pinv, double damping);
-    void _rand_q(ETS *ets, MapVectorX q);
+    void _rand_q(ETS *ets, MapVectorX q, IKRand *rng);
     int _check_lim(ETS *ets, MapVectorX q);
+    void _wrap_q(ETS *ets, MapVectorX q);
+    void _unwrap_q(ETS *ets, MapVectorX q, MapVectorX qref, int reject_jl);
     void _angle_axis(MapMatrix4dc Te, Matrix4dc Tep, MapVectorX e);
 
 #ifdef __cplusplus
@@ -289,6 +289,51 @@ extern "C"
         }
     }
 
+    void _ETS_jacob_traj(ETS *ets, int trajn, int n, double *q, double *tool, double *ret, int frame)
+    {
+        // q is row major (trajn x n) and ret is row major (trajn x 6 x ets->n)
+        MatrixJc tJ(6, ets->n);
+        MapMatrixJc eJ(tJ.data(), 6, ets->n);
+
+        for (int i = 0; i < trajn; i++)
+        {
+            if (frame)
+                _ETS_jacobe(ets, q + (n * i), tool, eJ);
+            else
+                _ETS_jacob0(ets, q + (n * i), tool, eJ);
+
+            MapMatrixJr e_retp(ret + (6 * ets->n * i), 6, ets->n);
+            e_retp = eJ;
+        }
+    }
+
+    void _ETS_hessian_traj(int n, int trajn, double *J, double *H)
+    {
+        // J is row major (trajn x 6 x n) and H is row major (trajn x n x 6 x n)
+        MatrixJc tJ(6, n);
+        MapMatrixJc eJ(tJ.data(), 6, n);
+
+        for (int i = 0; i < trajn; i++)
+        {
+            eJ = MapMatrixJr(J + (6 * n * i), 6, n);
+            MapMatrixHr eH(H + (6 * n * n * i), n * 6, n);
+            _ETS_hessian(n, eJ, eH);
+        }
+    }
+
+    void _ETS_fkine_traj(ETS *ets, int trajn, int n, double *q, double *base, double *tool, double *ret)
+    {
+        // q is row major (trajn x n) and ret is row major (trajn x 4 x 4)
+        for (int i = 0; i < trajn; i++)
+        {
+            MapMatrix4dc e_retp(ret + (16 * i));
+            _ETS_fkine(ets, q + (n * i), base, tool, e_retp);
+
+            // Each pose has been written in column major
+            e_retp.transposeInPlace();
+        }
+    }
+
     void _ET_T(ET *et, double *ret, double eta)
     {
         // Check if static and return static transform
@@ -23,6 +23,9 @@ extern "C"
     void _ETS_jacob0(ETS *ets, double *q, double *tool, MapMatrixJc &eJ);
     void _ETS_jacobe(ETS *ets, double *q, double *tool, MapMatrixJc &eJ);
     void _ETS_fkine(ETS *ets, double *q, double *base, double *tool, MapMatrix4dc &e_ret);
+    void _ETS_jacob_traj(ETS *ets, int trajn, int n, double *q, double *tool, double *ret, int frame);
+    void _ETS_hessian_traj(int n, int trajn, double *J, double *H);
+    void _ETS_fkine_traj(ETS *ets, int trajn, int n, double *q, double *base, double *tool, double *ret);
     void _ET_T(ET *et, double *ret, double eta);
 
 #ifdef __cplusplus
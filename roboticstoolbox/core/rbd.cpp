@@ -0,0 +1,378 @@
+/* rbd.cpp */
+
+#include "rbd.h"
+
+#include <math.h>
+#include <Eigen/Dense>
+
+static inline Eigen::Matrix3d _skew(const Vector3 &v)
+{
+    Eigen::Matrix3d S;
+
+    S << 0, -v(2), v(1),
+        v(2), 0, -v(0),
+        -v(1), v(0), 0;
+
+    return S;
+}
+
+/*
+ * Motion cross product operator, crm(v) * m = v x m
+ */
+static inline Matrix6 _crm(const Vector6 &v)
+{
+    Matrix6 X = Matrix6::Zero();
+    Eigen::Matrix3d w = _skew(v.head<3>());
+
+    X.block<3, 3>(0, 0) = w;
+    X.block<3, 3>(3, 0) = _skew(v.tail<3>());
+    X.block<3, 3>(3, 3) = w;
+
+    return X;
+}
+
+/*
+ * Force cross product operator, crf(v) * f = v x* f
+ */
+static inline Matrix6 _crf(const Vector6 &v)
+{
+    return -_crm(v).transpose();
+}
+
+/*
+ * The operator icrf(f) such that icrf(f) * v = v x* f
+ */
+static inline Matrix6 _icrf(const Vector6 &f)
+{
+    Matrix6 X = Matrix6::Zero();
+    Eigen::Matrix3d fn = _skew(f.head<3>());
+    Eigen::Matrix3d ff = _skew(f.tail<3>());
+
+    X.block<3, 3>(0, 0) = -fn;
+    X.block<3, 3>(0, 3) = -ff;
+    X.block<3, 3>(3, 0) = -ff;
+
+    return X;
+}
+
+static void _rbd_joint_T(int axis, double eta, Matrix4dc &T)
+{
+    double ct = cos(eta), st = sin(eta);
+
+    T.setIdentity();
+
+    switch (axis)
+    {
+    case 0:
+        T(1, 1) = ct;
+        T(1, 2) = -st;
+        T(2, 1) = st;
+        T(2, 2) = ct;
+        break;
+    case 1:
+        T(0, 0) = ct;
+        T(0, 2) = st;
+        T(2, 0) = -st;
+        T(2, 2) = ct;
+        break;
+    case 2:
+        T(0, 0) = ct;
+        T(0, 1) = -st;
+        T(1, 0) = st;
+        T(1, 1) = ct;
+        break;
+    default:
+        T(axis - 3, 3) = eta;
+    }
+}
+
+/*
+ * Joint friction torque, viscous and Coulomb, referred to the link side of
+ * the gearbox. This is the torque the actuator must supply to overcome it.
+ */
+static inline double _rbd_friction(Tree *tree, int j, double qd)
+{
+    double G = tree->G[j];
+    double tau = G * G * tree->B[j] * qd;
+
+    if (qd > 0)
+        tau += fabs(G) * tree->Tc[2 * j];
+    else if (qd < 0)
+        tau += fabs(G) * tree->Tc[2 * j + 1];
+
+    return tau;
+}
+
+/*
+ * Compute the pose, joint motion subspace and spatial inertia of every body
+ * in the base frame
+ */
+void _rbd_kinematics(Tree *tree, double *q, Work &w)
+{
+    Matrix4dc Tj, Tjoint;
+    Eigen::Matrix3d R, Ic, cx;
+    Vector3 a, p, c;
+    int axis, parent;
+    double m;
+
+    for (int i = 0; i < tree->n; i++)
+    {
+        MapMatrix4dc Tpre(tree->Tpre + 16 * i);
+        MapMatrix4dc Tpost(tree->Tpost + 16 * i);
+
+        axis = tree->axis[i];
+        parent = tree->parent[i];
+
+        // Frame of the joint in the base frame
+        if (parent < 0)
+            Tjoint = Tpre;
+        else
+            Tjoint = w.T[parent] * Tpre;
+
+        _rbd_joint_T(axis, tree->flip[i] * q[tree->jindex[i]] + tree->offset[i], Tj);
+        Tjoint = Tjoint * Tj;
+        w.T[i] = Tjoint * Tpost;
+
+        // Joint motion subspace
+        a = Tjoint.block<3, 1>(0, axis % 3);
+        if (axis < 3)
+        {
+            p = Tjoint.block<3, 1>(0, 3);
+            w.S[i] << a, p.cross(a);
+        }
+        else
+        {
+            w.S[i] << Vector3::Zero(), a;
+        }
+        w.S[i] *= tree->flip[i];
+
+        // Spatial inertia about the base frame origin
+        m = tree->m[i];
+        R = w.T[i].block<3, 3>(0, 0);
+        c = R * Eigen::Map<Vector3>(tree->r + 3 * i) + w.T[i].block<3, 1>(0, 3);
+        Ic = R * Eigen::Map<Eigen::Matrix<double, 3, 3, Eigen::RowMajor>>(tree->I + 9 * i) * R.transpose();
+        cx = _skew(c);
+
+        w.I[i].block<3, 3>(0, 0) = Ic + m * cx * cx.transpose();
+        w.I[i].block<3, 3>(0, 3) = m * cx;
+        w.I[i].block<3, 3>(3, 0) = m * cx.transpose();
+        w.I[i].block<3, 3>(3, 3) = m * Eigen::Matrix3d::Identity();
+    }
+}
+
+/*
+ * Coriolis matrix C(q, qd) with O(n^2) cost for a serial chain, following
+ * Echeandia and Wensing, "Numerical methods to compute the Coriolis matrix
+ * and Christoffel symbols for rigid-body systems", 2021.
+ *
+ * C is written in row major order (n x n) and satisfies C qd = the vector of
+ * Coriolis and centripetal joint forces, with Mdot - 2C skew symmetric.
+ */
+void _rbd_coriolis(Tree *tree, double *q, double *qd, double *C, Work &w)
+{
+    Vector6 f1, f2, f3;
+    int n = tree->n, parent, i, ji, jj;
+
+    _rbd_kinematics(tree, q, w);
+
+    // Forward pass, body velocities and composite quantities
+    for (int j = 0; j < n; j++)
+    {
+        parent = tree->parent[j];
+
+        w.v[j] = w.S[j] * qd[tree->jindex[j]];
+        if (parent >= 0)
+            w.v[j] += w.v[parent];
+
+        w.Sd[j] = _crm(w.v[j]) * w.S[j];
+        w.IC[j] = w.I[j];
+        w.BC[j] = 0.5 * (_crf(w.v[j]) * w.I[j] + _icrf(w.I[j] * w.v[j]) - w.I[j] * _crm(w.v[j]));
+    }
+
+    // Backward pass
+    for (int j = n - 1; j >= 0; j--)
+    {
+        jj = tree->jindex[j];
+
+        f1 = w.IC[j] * w.Sd[j] + w.BC[j] * w.S[j];
+        f2 = w.IC[j] * w.S[j];
+        f3 = w.BC[j].transpose() * w.S[j];
+
+        C[jj * n + jj] = w.S[j].dot(f1);
+
+        i = tree->parent[j];
+        while (i >= 0)
+        {
+            ji = tree->jindex[i];
+            C[ji * n + jj] = w.S[i].dot(f1);
+            C[jj * n + ji] = w.Sd[i].dot(f2) + w.S[i].dot(f3);
+            i = tree->parent[i];
+        }
+
+        parent = tree->parent[j];
+        if (parent >= 0)
+        {
+            w.IC[parent] += w.IC[j];
+            w.BC[parent] += w.BC[j];
+        }
+    }
+}
+
+/*
+ * Joint space inertia matrix M(q) by the composite rigid-body algorithm,
+ * including the motor inertia reflected through the gearbox.
+ *
+ * M is written in row major order (n x n).
+ */
+void _rbd_inertia(Tree *tree, double *q, double *M, Work &w)
+{
+    Vector6 F;
+    int n = tree->n, parent, i, ji, jj;
+
+    _rbd_kinematics(tree, q, w);
+
+    for (int j = 0; j < n; j++)
+        w.IC[j] = w.I[j];
+
+    for (int j = n - 1; j >= 0; j--)
+    {
+        jj = tree->jindex[j];
+
+        F = w.IC[j] * w.S[j];
+        M[jj * n + jj] = w.S[j].dot(F) + tree->G[j] * tree->G[j] * tree->Jm[j];
+
+        i = tree->parent[j];
+        while (i >= 0)
+        {
+            ji = tree->jindex[i];
+            M[ji * n + jj] = M[jj * n + ji] = w.S[i].dot(F);
+            i = tree->parent[i];
+        }
+
+        parent = tree->parent[j];
+        if (parent >= 0)
+            w.IC[parent] += w.IC[j];
+    }
+}
+
+/*
+ * Inverse dynamics by the recursive Newton-Euler algorithm. Gravity is the
+ * acceleration due to gravity in the base frame, it is applied as an upward
+ * acceleration of the base. The result includes the motor inertia and joint
+ * friction.
+ */
+void _rbd_rne(Tree *tree, double *q, double *qd, double *qdd, double *grav, double *tau, Work &w)
+{
+    Vector6 a0;
+    int n = tree->n, parent, jj;
+    double G;
+
+    a0 << 0, 0, 0, -grav[0], -grav[1], -grav[2];
+
+    _rbd_kinematics(tree, q, w);
+
+    // Forward pass, body velocities, accelerations and forces
+    for (int j = 0; j < n; j++)
+    {
+        parent = tree->parent[j];
+        jj = tree->jindex[j];
+
+        w.v[j] = w.S[j] * qd[jj];
+        w.a[j] = w.S[j] * qdd[jj];
+        if (parent >= 0)
+        {
+            w.v[j] += w.v[parent];
+            w.a[j] += w.a[parent];
+        }
+        else
+        {
+            w.a[j] += a0;
+        }
+        w.a[j] += _crm(w.v[j]) * w.S[j] * qd[jj];
+
+        w.f[j] = w.I[j] * w.a[j] + _crf(w.v[j]) * w.I[j] * w.v[j];
+    }
+
+    // Backward pass, joint forces
+    for (int j = n - 1; j >= 0; j--)
+    {
+        parent = tree->parent[j];
+        jj = tree->jindex[j];
+        G = tree->G[j];
+
+        tau[jj] = w.S[j].dot(w.f[j]) + G * G * tree->Jm[j] * qdd[jj] + _rbd_friction(tree, j, qd[jj]);
+
+        if (parent >= 0)
+            w.f[parent] += w.f[j];
+    }
+}
+
+/*
+ * Forward dynamics by the articulated-body algorithm with O(n) cost, see
+ * Featherstone, "Rigid Body Dynamics Algorithms", 2008, Table 7.1. Motor
+ * inertia and joint friction are included, consistent with _rbd_rne.
+ *
+ * Work usage: Sd holds the velocity product acceleration, IC and f hold the
+ * articulated-body inertia and bias force.
+ */
+void _rbd_accel(Tree *tree, double *q, double *qd, double *tau, double *grav, double *qdd, Work &w)
+{
+    Vector6 a0, pa;
+    Matrix6 Ia;
+    int n = tree->n, parent, jj;
+    double G;
+
+    a0 << 0, 0, 0, -grav[0], -grav[1], -grav[2];
+
+    _rbd_kinematics(tree, q, w);
+
+    // Forward pass, velocities and bias terms
+    for (int j = 0; j < n; j++)
+    {
+        parent = tree->parent[j];
+        jj = tree->jindex[j];
+
+        w.v[j] = w.S[j] * qd[jj];
+        if (parent >= 0)
+            w.v[j] += w.v[parent];
+
+        w.Sd[j] = _crm(w.v[j]) * w.S[j] * qd[jj];
+        w.IC[j] = w.I[j];
+        w.f[j] = _crf(w.v[j]) * w.I[j] * w.v[j];
+    }
+
+    // Backward pass, articulated-body inertias
+    for (int j = n - 1; j >= 0; j--)
+    {
+        parent = tree->parent[j];
+        jj = tree->jindex[j];
+        G = tree->G[j];
+
+        w.U[j] = w.IC[j] * w.S[j];
+        w.d[j] = w.S[j].dot(w.U[j]) + G * G * tree->Jm[j];
+        w.u[j] = tau[jj] - _rbd_friction(tree, j, qd[jj]) - w.S[j].dot(w.f[j]);
+
+        if (parent >= 0)
+        {
+            Ia = w.IC[j] - w.U[j] * w.U[j].transpose() / w.d[j];
+            pa = w.f[j] + Ia * w.Sd[j] + w.U[j] * w.u[j] / w.d[j];
+            w.IC[parent] += Ia;
+            w.f[parent] += pa;
+        }
+    }
+
+    // Forward pass, accelerations
+    for (int j = 0; j < n; j++)
+    {
+        parent = tree->parent[j];
+        jj = tree->jindex[j];
+
+        if (parent >= 0)
+            w.a[j] = w.a[parent] + w.Sd[j];
+        else
+            w.a[j] = a0 + w.Sd[j];
+
+        qdd[jj] = (w.u[j] - w.U[j].dot(w.a[j])) / w.d[j];
+        w.a[j] += w.S[j] * qdd[jj];
+    }
+}
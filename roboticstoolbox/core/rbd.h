@@ -0,0 +1,79 @@
+/**
+ * \file rbd.h
+ * \brief Rigid-body tree dynamics
+ *
+ */
+/* rbd.h */
+
+#ifndef _RBD_H_
+#define _RBD_H_
+
+#include "linalg.h"
+#include <vector>
+#include <Eigen/Dense>
+#include <Eigen/StdVector>
+
+#define Vector6 Eigen::Matrix<double, 6, 1>
+#define Matrix6 Eigen::Matrix<double, 6, 6>
+
+/*
+ * A rigid-body tree. Each body has exactly one joint which connects it to
+ * its parent body, static links have already been merged into the body
+ * that carries them. Bodies are ordered so that a parent always comes
+ * before its children.
+ *
+ * The pose of body i with respect to its parent is
+ *
+ *      Tpre[i] * J(flip[i] * q[jindex[i]] + offset[i]) * Tpost[i]
+ *
+ * where J is the elementary transform given by axis[i] and the inertial
+ * parameters of body i are expressed in the body frame.
+ */
+typedef struct Tree
+{
+    int n;          /* number of bodies (and joints) */
+    int *parent;    /* parent body, -1 for the base */
+    int *jindex;    /* index of the joint coordinate of each body */
+    int *axis;      /* joint axis, 0-5 for Rx Ry Rz tx ty tz */
+    double *flip;   /* joint direction, 1 or -1 */
+    double *offset; /* joint coordinate offset */
+    double *Tpre;   /* n column major transforms, parent to joint */
+    double *Tpost;  /* n column major transforms, joint to body */
+    double *m;      /* link mass */
+    double *r;      /* centre of mass wrt body frame (3n) */
+    double *I;      /* inertia tensor about the centre of mass (9n) */
+    double *Jm;     /* actuator inertia */
+    double *G;      /* gear ratio */
+    double *B;      /* actuator viscous friction */
+    double *Tc;     /* actuator Coulomb friction (2n) */
+} Tree;
+
+/*
+ * Per configuration scratch space. All spatial quantities are expressed in
+ * the base frame using Featherstone's [angular; linear] ordering.
+ */
+typedef struct Work
+{
+    std::vector<Matrix4dc, Eigen::aligned_allocator<Matrix4dc>> T;
+    std::vector<Vector6, Eigen::aligned_allocator<Vector6>> S;
+    std::vector<Vector6, Eigen::aligned_allocator<Vector6>> Sd;
+    std::vector<Vector6, Eigen::aligned_allocator<Vector6>> v;
+    std::vector<Vector6, Eigen::aligned_allocator<Vector6>> a;
+    std::vector<Vector6, Eigen::aligned_allocator<Vector6>> f;
+    std::vector<Vector6, Eigen::aligned_allocator<Vector6>> U;
+    std::vector<double> d;
+    std::vector<double> u;
+    std::vector<Matrix6, Eigen::aligned_allocator<Matrix6>> I;
+    std::vector<Matrix6, Eigen::aligned_allocator<Matrix6>> IC;
+    std::vector<Matrix6, Eigen::aligned_allocator<Matrix6>> BC;
+
+    Work(int n) : T(n), S(n), Sd(n), v(n), a(n), f(n), U(n), d(n), u(n), I(n), IC(n), BC(n) {}
+} Work;
+
+void _rbd_kinematics(Tree *tree, double *q, Work &w);
+void _rbd_coriolis(Tree *tree, double *q, double *qd, double *C, Work &w);
+void _rbd_inertia(Tree *tree, double *q, double *M, Work &w);
+void _rbd_rne(Tree *tree, double *q, double *qd, double *qdd, double *grav, double *tau, Work &w);
+void _rbd_accel(Tree *tree, double *q, double *qd, double *tau, double *grav, double *qdd, Work &w);
+
+#endif
@@ -2,13 +2,13 @@
 @Author: Peter Corke, original MATLAB code and Python version
 @Author: Kristian Gibson, initial MATLAB port
 """
+import heapq
+import math
+import numpy as np
 from numpy import disp
 from scipy import integrate
-from spatialmath.base.transforms2d import *
-from spatialmath.base.vectors import *
 from spatialmath.pose2d import SE2
 from spatialmath import base
-from scipy.ndimage import *
 import matplotlib.pyplot as plt
 from matplotlib import cm
 from roboticstoolbox.mobile.PlannerBase import PlannerBase
@@ -53,7 +53,7 @@ class DistanceTransformPlanner(PlannerBase):
         >>> import numpy as np
         >>> simplegrid = np.zeros((6, 6));
         >>> simplegrid[2:5, 3:5] = 1
-        >>> dx = DistanceTransformPlanner(simplegrid, goal=(1, 1), distance="manhattan");
+        >>> dx = DistanceTransformPlanner(simplegrid, goal=(1, 1), metric="manhattan");
         >>> dx.plan()
         >>> path = dx.query(start=(5, 4))
         >>> print(path.T)
@@ -71,6 +71,7 @@ class DistanceTransformPlanner(PlannerBase):
         super().__init__(occgrid=occgrid, ndims=2, **kwargs)
         self._metric = metric
         self._distancemap = None
+        self._descent = None
 
     @property
     def metric(self):
@@ -137,6 +138,134 @@ class DistanceTransformPlanner(PlannerBase):
             metric=self._metric,
             animate=animate
         )
+        self._descent = None
+
+    def update(self, cells, occupied=True):
+        """
+        Update obstacle cells and replan incrementally
+
+        :param cells: grid coordinates of the changed cells, one (x, y) per row
+        :type cells: array_like(N,2)
+        :param occupied: new occupancy of the cells, defaults to True
+        :type occupied: bool, optional
+        :raises RuntimeError: no plan has been computed
+
+        The cells are set in the occupancy grid and the distance map is
+        repaired, giving the same result as calling :meth:`plan` again.  Only
+        the affected part of the wavefront is recomputed: cells whose distance
+        was derived from a new obstacle are invalidated and expanded again
+        from their valid neighbours, and the wavefront spreads from cleared
+        cells only as far as it reduces the distance.
+
+        :seealso: :meth:`plan`
+        """
+        if self._distancemap is None:
+            raise RuntimeError("No distance map computed, you need to plan.")
+
+        tol = 1e-6
+        grid = self.occgrid.grid
+        nrows, ncols = grid.shape
+        distance = self._distancemap.reshape(-1)
+        goal = int(self._goal[1]) * ncols + int(self._goal[0])
+
+        D = _distance_kernel(self._metric)
+        moves = [
+            (dx, dy, D[dy + 1, dx + 1])
+            for dy in (-1, 0, 1)
+            for dx in (-1, 0, 1)
+            if (dx or dy) and np.isfinite(D[dy + 1, dx + 1])
+        ]
+
+        def neighbours(i):
+            y, x = divmod(i, ncols)
+            for dx, dy, w in moves:
+                xn = x + dx
+                yn = y + dy
+                if 0 <= xn < ncols and 0 <= yn < nrows:
+                    yield yn * ncols + xn, w
+
+        # update the grid, new obstacles are nan and cleared cells are inf
+        invalid = {}  # invalidated cell -> previous distance
+        stack = []
+        cleared = []
+        for x, y in np.array(cells, dtype=int).reshape((-1, 2)):
+            if bool(grid[y, x] > 0) == bool(occupied):
+                continue
+            grid[y, x] = occupied
+            i = int(y) * ncols + int(x)
+            if occupied:
+                invalid[i] = distance[i]
+                distance[i] = np.nan
+                if np.isfinite(invalid[i]):
+                    stack.append(i)
+            else:
+                distance[i] = np.inf
+                cleared.append(i)
+
+        # invalidate every cell whose distance was derived from a new obstacle
+        while stack:
+            p = stack.pop()
+            dp = invalid[p]
+            for c, w in neighbours(p):
+                dc = distance[c]
+                if c not in invalid and math.isclose(dc, dp + w, abs_tol=tol):
+                    invalid[c] = dc
+                    distance[c] = np.inf
+                    stack.append(c)
+
+        # seed the invalidated and cleared cells from their valid neighbours
+        frontier = []
+        for i in [*invalid, *cleared]:
+            if np.isnan(distance[i]):
+                continue  # new obstacle
+            if i == goal:
+                d = 0.0
+            else:
+                d = np.inf
+                for n, w in neighbours(i):
+                    if distance[n] + w < d:
+                        d = distance[n] + w
+            if d < np.inf:
+                distance[i] = d
+                frontier.append((d, i))
+        heapq.heapify(frontier)
+
+        # propagate the wavefront while it reduces the distance
+        while frontier:
+            d, i = heapq.heappop(frontier)
+            if d > distance[i]:
+                continue  # stale entry
+            for n, w in neighbours(i):
+                if d + w < distance[n] - tol:
+                    distance[n] = d + w
+                    heapq.heappush(frontier, (d + w, n))
+
+        self._distancemap = distance.reshape((nrows, ncols))
+        self._descent = None
+
+    def _descent_map(self):
+        # For every cell, the flat index of the neighbouring cell with the
+        # smallest distance to the goal, or the cell itself if none is
+        # smaller.  Computed once per plan or update with whole-array
+        # operations.
+        if self._descent is None:
+            distance = np.where(np.isnan(self._distancemap), np.inf, self._distancemap)
+            nrows, ncols = distance.shape
+            H = np.pad(distance, 1, "constant", constant_values=np.inf)
+            D = _distance_kernel(self._metric)
+
+            best = distance
+            index = np.arange(distance.size).reshape(distance.shape)
+            descent = index
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    if (dx or dy) and np.isfinite(D[dy + 1, dx + 1]):
+                        v = H[1 + dy : 1 + dy + nrows, 1 + dx : 1 + dx + ncols]
+                        better = v < best
+                        best = np.where(better, v, best)
+                        descent = np.where(better, index + (dy * ncols + dx), descent)
+            self._descent = descent.reshape(-1)
+        return self._descent
 
     def next(self, position):
         """
@@ -154,48 +283,74 @@ class DistanceTransformPlanner(PlannerBase):
         :seealso: :meth:`plan` :meth:`query`
         """
         if self.distancemap is None:
-            Error("No distance map computed, you need to plan.")
-
-        directions = np.array(
-            [
-                # dy  dx
-                [-1, -1],
-                [0, -1],
-                [1, -1],
-                [-1, 0],
-                [0, 0],
-                [1, 0],
-                [0, 1],
-                [1, 1],
-            ],
-            dtype=int,
-        )
+            raise RuntimeError("No distance map computed, you need to plan.")
 
+        nrows, ncols = self._distancemap.shape
         x = int(position[0])
         y = int(position[1])
+        if not (0 <= x < ncols and 0 <= y < nrows):
+            raise ValueError("position is outside the map")
+
+        i = y * ncols + x
+        if not np.isfinite(self._distancemap[y, x]):
+            raise RuntimeError("no path to the goal from this position")
 
-        min_dist = np.inf
-        for d in directions:
-            try:
-                if self._distancemap[y + d[0], x + d[1]] < min_dist:
-                    min_dir = d
-                    min_dist = self._distancemap[y + d[0], x + d[1]]
-            except:
-                # come here if the neighbouring cell is outside the map bounds
-                # raise RuntimeError(f"Unexpected error finding next min dist at {d}")
-                pass
-
-        if np.isinf(min_dist):
-            raise RuntimeError("no minimum found, shouldn't happen")
-
-        x = x + min_dir[1]
-        y = y + min_dir[0]
-
-        next = np.r_[x, y]
-        if all(next == self._goal):
+        i = int(self._descent_map()[i])
+        if self._distancemap.flat[i] == 0:
             return None
         else:
-            return next
+            y, x = divmod(i, ncols)
+            return np.r_[x, y]
+
+    def query(self, start=None, goal=None, dtype=None, next=True, animate=False, movie=None):
+        r"""
+        Find a path from start to goal
+
+        :param start: start position :math:`(x, y)`, defaults to value specified to constructor
+        :type start: array_like(2), optional
+        :param goal: goal position :math:`(x, y)`, defaults to value specified to constructor
+        :type goal: array_like(2), optional
+        :param animate: show the vehicle path, defaults to False
+        :type animate: bool, optional
+        :raises RuntimeError: no plan has been computed
+        :raises RuntimeError: the goal is not reachable from ``start``
+        :return: path from start to goal, one point :math:`(x, y)` per row
+        :rtype: ndarray(N,2)
+
+        The path follows the steepest descent of the distance map.  Unless
+        ``animate`` is set, the descent direction is found for all cells at
+        once and the whole path is extracted in a single pass, rather than
+        one call to :meth:`next` per step.
+
+        :seealso: :meth:`plan` :meth:`next`
+        """
+        if animate or not next:
+            return super().query(
+                start=start, goal=goal, dtype=dtype, next=next, animate=animate,
+                movie=movie
+            )
+        if self.distancemap is None:
+            raise RuntimeError("No distance map computed, you need to plan.")
+
+        self.start = self.validate_endpoint(start, dtype=dtype)
+        self.goal = self.validate_endpoint(goal, dtype=dtype)
+
+        nrows, ncols = self._distancemap.shape
+        i = int(self._start[1]) * ncols + int(self._start[0])
+        if not np.isfinite(self._distancemap.flat[i]):
+            raise RuntimeError("no path to the goal from this position")
+
+        descent = self._descent_map()
+        path = [i]
+        while True:
+            j = int(descent[i])
+            if j == i:
+                break
+            path.append(j)
+            i = j
+
+        y, x = np.divmod(np.array(path), ncols)
+        return np.column_stack((x, y))
 
     def plot_3d(self, path=None, ls=None):
         """
@@ -235,9 +390,6 @@ class DistanceTransformPlanner(PlannerBase):
         return ax
 
 
-import numpy as np
-
-
 def distancexform(occgrid, goal, metric="cityblock", animate=False, summary=False):
     """
     Distance transform for path planning
@@ -273,31 +425,13 @@ def distancexform(occgrid, goal, metric="cityblock", animate=False, summary=Fals
     # - other cells are inf
     # - goal is zero
 
-    goal = base.getvector(goal, 2, dtype=np.int)
+    goal = base.getvector(goal, 2, dtype=int)
 
-    distance = occgrid.astype(np.float32)
-    distance[occgrid > 0] = np.nan  # assign nan to obstacle cells
-    distance[occgrid == 0] = np.inf  # assign inf to other cells
+    distance = np.where(occgrid > 0, np.nan, np.inf)  # nan for obstacle cells
     distance[goal[1], goal[0]] = 0  # assign zero to goal
 
     # create the appropriate distance matrix D
-    if metric.lower() in ("manhattan", "cityblock"):
-        # fmt: off
-        D = np.array([
-                [ np.inf,   1,   np.inf],
-                [      1,   0,        1],
-                [ np.inf,   1,   np.inf]
-            ])
-        # fmt: on
-    elif metric.lower() == "euclidean":
-        r2 = np.sqrt(2)
-        # fmt: off
-        D = np.array([
-                [ r2,   1,   r2],
-                [  1,   0,    1],
-                [ r2,   1,   r2]
-                ])
-        # fmt: on
+    D = _distance_kernel(metric)
 
     # get ready to iterate
     count = 0
@@ -343,6 +477,31 @@ def distancexform(occgrid, goal, metric="cityblock", animate=False, summary=Fals
     return distance
 
 
+def _distance_kernel(metric):
+    # the distance to each of the 8 neighbouring cells, inf if the move is
+    # not allowed under the metric
+    if metric.lower() in ("manhattan", "cityblock"):
+        # fmt: off
+        D = np.array([
+                [ np.inf,   1,   np.inf],
+                [      1,   0,        1],
+                [ np.inf,   1,   np.inf]
+            ])
+        # fmt: on
+    elif metric.lower() == "euclidean":
+        r2 = np.sqrt(2)
+        # fmt: off
+        D = np.array([
+                [ r2,   1,   r2],
+                [  1,   0,    1],
+                [ r2,   1,   r2]
+                ])
+        # fmt: on
+    else:
+        raise ValueError(f"unknown distance metric {metric}")
+    return D
+
+
 def grassfire_step(G, D):
 
     # pad with inf
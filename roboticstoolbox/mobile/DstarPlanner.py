@@ -35,7 +35,8 @@ show_animation = True
 #
 # 1. replace the classic D* functions min__State(), get_kmin(), insert(), remove()
 #    with heapq.heappush() and heapq.heappop(). The open_list is now a list of 
-#    tuples (k, _State) maintained by heapq, rather than a set
+#    tuples (k, index) maintained by heapq, rather than a set.  Entries are
+#    not removed when a key changes, stale entries are skipped when popped
 #
 # 2. use enums rather than strings for cell state
 #
@@ -43,235 +44,254 @@ show_animation = True
 #    rounding in tests for costs h and k:
 #    - replace equality tests with math.isclose() which is faster than np.isclose()
 #    - add an offset to inequality tests, X > Y becomes X > Y + tol
+#
+# 4. the per-cell state objects are replaced by flat NumPy arrays for h, k,
+#    tag and back pointer, indexed by cell, so memory is a few tens of bytes
+#    per cell
 
 class _Tag(IntEnum):
     NEW = auto()
     OPEN = auto()
     CLOSED = auto()
-class _State:
-
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.parent = None # 'back pointer' to next _State
-        self.t = _Tag.NEW  # open closed new
-        self.h = 0  # cost to goal
-        self.k = 0  # estimate of shortest path cost
-
-    def __str__(self):
-        return f"({self.x}, {self.y})" #[{self.h:.1f}, {self.k:.1f}]"
-
-    def __repr__(self):
-        return self.__str__()
-
-    def __lt__(self, other):
-        return True
-
-class _Map:
-
-    def __init__(self, row, col):
-        self.row = row
-        self.col = col
-        self._Map = self.init__Map()
-
-    def init__Map(self):
-        _Map_list = []  # list of rows
-        for i in range(self.row):
-            # for each row, make a list
-            tmp = []
-            for j in range(self.col):
-                tmp.append(_State(j, i))  # append column to the row
-            _Map_list.append(tmp) # append row to _Map
-        return _Map_list
-
-    _neighbours = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
-
-    def get_neighbors(self, _State):
-        _State_list = []
-
-        for i, j in self._neighbours:
-            try:
-                if _State.x + i >= 0 and _State.y + j >= 0:
-                    _State_list.append(self._Map[_State.y + j][_State.x + i])
-            except IndexError:
-                pass
-        return _State_list
-
-    _root2 = np.sqrt(2)
-
-    def cost(self, _State1, _State2):
-        c = (self.costmap[_State1.y, _State1.x] + self.costmap[_State2.y, _State2.x]) / 2
-
-        dx = _State1.x - _State2.x
-        dy = _State1.y - _State2.y
-        if dx == 0 or dy == 0:
-            # NSEW movement, distance of 1
-            return c
-        else:
-            # diagonal movement, distance of sqrt(2)
-            return c * self._root2
-        # return c * math.sqrt(()**2 +
-        #                  ()**2)
-
-    def show_h(self):
-        h = np.empty((self.col, self.row))
 
-        for x in range(self.col):
-            for y in range(self.row):
-                h[y, x] = self._Map[y][x].h
-        print(h)
+_NEW = int(_Tag.NEW)
+_OPEN = int(_Tag.OPEN)
+_CLOSED = int(_Tag.CLOSED)
 
 
 class _Dstar:
-    def __init__(self, _Map, tol=1e-6):
-        self._Map = _Map
-        # self.open_list = set()
+    """
+    D* search over a 2D costmap
+
+    :param costmap: traversability costmap, C-contiguous
+    :type costmap: ndarray(h,w)
+    :param tol: tolerance for comparing path costs, defaults to 1e-6
+    :type tol: float, optional
+
+    Cell ``(x, y)`` is referred to by its flat index ``y * w + x`` and its
+    cost-to-goal ``h``, key ``k``, tag ``t`` and back pointer ``parent`` are
+    held in flat arrays.  The open list is a binary heap of ``(k, index)``
+    tuples with lazy deletion: an entry is stale, and is discarded when it
+    reaches the top of the heap, if the cell is no longer open or its key
+    has since changed.
+    """
+
+    _root2 = math.sqrt(2)
+
+    # neighbour offsets (dx, dy, distance)
+    _neighbours = [
+        (-1, -1, _root2),
+        (-1, 0, 1.0),
+        (-1, 1, _root2),
+        (0, -1, 1.0),
+        (0, 1, 1.0),
+        (1, -1, _root2),
+        (1, 0, 1.0),
+        (1, 1, _root2),
+    ]
+
+    def __init__(self, costmap, tol=1e-6):
+        self.costmap = costmap
+        self.nrows, self.ncols = costmap.shape
+        self._cost = costmap.reshape(-1)  # flat view, shares memory
+
+        n = costmap.size
+        self.h = np.zeros((n,))  # cost to goal
+        self.k = np.zeros((n,))  # smallest h since the cell was opened
+        self.t = np.full((n,), _NEW, dtype=np.int8)  # new, open or closed
+        self.parent = np.full((n,), -1, dtype=np.intp)  # next cell to goal
+
         self.open_list = []
         self.nexpand = 0
+        self.ninsert = 0
         self.tol = tol
 
-    def process__State(self, verbose=False):
-        if verbose:
-            print('FRONTIER ', ' '.join([f"({x[1].x}, {x[1].y})" for x in self.open_list]))
+    def index(self, x, y):
+        return y * self.ncols + x
+
+    def coord(self, i):
+        y, x = divmod(i, self.ncols)
+        return x, y
 
-        # get _State from frontier
-        if len(self.open_list) == 0:
+    def neighbours(self, i):
+        """
+        Neighbours of a cell
+
+        :param i: cell index
+        :type i: int
+        :return: neighbouring cell index and cost of the move to it
+        :rtype: list of (int, float)
+        """
+        ncols = self.ncols
+        nrows = self.nrows
+        cost = self._cost
+        y, x = divmod(i, ncols)
+        c = cost[i]
+
+        nbrs = []
+        for dx, dy, d in self._neighbours:
+            xn = x + dx
+            yn = y + dy
+            if 0 <= xn < ncols and 0 <= yn < nrows:
+                j = yn * ncols + xn
+                nbrs.append((j, float(c + cost[j]) * 0.5 * d))
+        return nbrs
+
+    def cost(self, i, j):
+        c = float(self._cost[i] + self._cost[j]) * 0.5
+        yi, xi = divmod(i, self.ncols)
+        yj, xj = divmod(j, self.ncols)
+        if xi == xj or yi == yj:
+            # NSEW movement, distance of 1
+            return c
+        else:
+            # diagonal movement, distance of sqrt(2)
+            return c * self._root2
+
+    def get_kmin(self):
+        """
+        Smallest key on the open list
+
+        :return: smallest key, or -1 if the open list is empty
+        :rtype: float
+
+        Stale entries at the top of the heap are discarded.
+        """
+        open_list = self.open_list
+        t = self.t
+        k = self.k
+        while open_list:
+            kmin, i = open_list[0]
+            if t[i] == _OPEN and k[i] == kmin:
+                return kmin
+            heapq.heappop(open_list)
+        return -1
+
+    def process_state(self, verbose=False):
+        if self.get_kmin() == -1:
             if verbose:
-                print('  x is None ')
+                print("  open list is empty")
             return -1
-        k_old, x = heapq.heappop(self.open_list)
-        x.t = _Tag.CLOSED
 
+        h = self.h
+        t = self.t
+        parent = self.parent
+        tol = self.tol
+        isclose = math.isclose
+
+        k_old, x = heapq.heappop(self.open_list)
+        t[x] = _CLOSED
         self.nexpand += 1
 
         if verbose:
-            print(f"EXPAND {x}, {k_old:.1f}")
+            print(f"EXPAND {self.coord(x)}, {k_old:.1f}")
 
-        if x.h > k_old + self.tol:
-            # RAISE _State
-            if verbose:
-                print('  raise')
-            for y in self._Map.get_neighbors(x):
-                if (y.t is not _Tag.NEW and
-                        y.h <= k_old - self.tol and 
-                        x.h > y.h + self._Map.cost(x, y) + self.tol):
-                    if verbose:
-                        print(f"  {x} cost from {x.h:.1f} to {y.h + self._Map.cost(x, y):.1f}; parent from {x.parent} to {y}")
-                    x.parent = y
-                    x.h = y.h + self._Map.cost(x, y)
+        nbrs = self.neighbours(x)
+        hx = float(h[x])
 
-        if math.isclose(x.h, k_old, rel_tol=0, abs_tol=self.tol):
-            # normal _State
+        if hx > k_old + tol:
+            # RAISE state, try to reduce the cost via a closed neighbour
             if verbose:
-                print('  normal')
-            for y in self._Map.get_neighbors(x):
-                if y.t is _Tag.NEW \
-                   or (y.parent == x and not math.isclose(y.h, x.h + self._Map.cost(x, y), rel_tol=0, abs_tol=self.tol)) \
-                   or (y.parent != x and y.h > x.h + self._Map.cost(x, y) + self.tol):
-                    if verbose:
-                        print(f"  reparent {y} from {y.parent} to {x}")
-                    y.parent = x
-                    self.insert(y, x.h + self._Map.cost(x, y))
-        else:
-            # RAISE or LOWER _State
+                print("  raise")
+            for y, c in nbrs:
+                if t[y] != _NEW and h[y] <= k_old - tol and hx > h[y] + c + tol:
+                    parent[x] = y
+                    hx = float(h[y]) + c
+            h[x] = hx
+
+        if isclose(hx, k_old, rel_tol=0, abs_tol=tol):
+            # LOWER state, propagate the cost to the neighbours
             if verbose:
-                print('  raise/lower')
-            for y in self._Map.get_neighbors(x):
-                if y.t is _Tag.NEW or (y.parent == x and not math.isclose(y.h, x.h + self._Map.cost(x, y), rel_tol=0, abs_tol=self.tol)):
-                    if verbose:
-                        print(f"  {y} cost from {y.h:.1f} to {y.h + self._Map.cost(x, y):.1f}; parent from {y.parent} to {x}; add to frontier")
-                    y.parent = x
-                    self.insert(y, x.h + self._Map.cost(x, y))
-                else:
-                    if y.parent != x and y.h > x.h + self._Map.cost(x, y) + self.tol and x.t is _Tag.CLOSED:
-                        self.insert(x, x.h)
-                        if verbose:
-                            print(f"  {x}, {x.h:.1f} add to frontier")
-                    else:
-                        if y.parent != x and x.h > y.h + self._Map.cost(y, x) + self.tol \
-                                and y.t is _Tag.CLOSED and y.h > k_old + self.tol:
-                            self.insert(y, y.h)
-                        if verbose:
-                            print(f"  {y}, {y.h:.1f} add to frontier")
-        if verbose:
-            print()
-
-        if len(self.open_list) == 0:
-            return -1
+                print("  normal")
+            for y, c in nbrs:
+                hy = h[y]
+                py = parent[y]
+                if (
+                    t[y] == _NEW
+                    or (py == x and not isclose(hy, hx + c, rel_tol=0, abs_tol=tol))
+                    or (py != x and hy > hx + c + tol)
+                ):
+                    parent[y] = x
+                    self.insert(y, hx + c)
         else:
-            return self.open_list[0][0]
-
-    ninsert = 0
-    nin = 0
-
-    def insert(self, _State, h_new):
+            # RAISE state that could not be reduced
+            if verbose:
+                print("  raise/lower")
+            for y, c in nbrs:
+                hy = h[y]
+                if t[y] == _NEW or (
+                    parent[y] == x and not isclose(hy, hx + c, rel_tol=0, abs_tol=tol)
+                ):
+                    parent[y] = x
+                    self.insert(y, hx + c)
+                elif parent[y] != x and hy > hx + c + tol and t[x] == _CLOSED:
+                    self.insert(x, hx)
+                elif (
+                    parent[y] != x
+                    and hx > hy + c + tol
+                    and t[y] == _CLOSED
+                    and hy > k_old + tol
+                ):
+                    self.insert(y, float(hy))
+
+        return self.get_kmin()
+
+    def insert(self, i, h_new):
         self.ninsert += 1
 
-        if _State.t is _Tag.NEW:
-            _State.k = h_new
-
-        elif _State.t is _Tag.OPEN:
-            k_new = min(_State.k, h_new)
-            if _State.k == k_new:
-                # k hasn't changed, and vertex already in frontier
-                # just update h and be done
-                _State.h = h_new
+        t = self.t[i]
+        if t == _NEW:
+            k_new = h_new
+        elif t == _OPEN:
+            k_new = min(self.k[i], h_new)
+            if k_new == self.k[i]:
+                # key hasn't changed and the cell is already on the open
+                # list, just update h
+                self.h[i] = h_new
                 return
-            else:
-                # k has changed, we need to remove the vertex from the list
-                # and re-insert it
-                _State.k = k_new
-
-                # scan the list to find vertex, then remove it
-                # this is quite slow
-                for i, item in enumerate(self.open_list):
-                    if item[1] is _State:
-                        del self.open_list[i]
-                        break
-
-            # _State.k = min(_State.k, h_new)
-            # # remove the item from the open list
-            # # print('node already in open list, remove it first')
-            # #TODO use bisect on old _State.k to find the entry
-            # for i, item in enumerate(self.open_list):
-            #     if item[1] is _State:
-            #         del self.open_list[i]
-            #         break  
-
-        elif _State.t is _Tag.CLOSED:
-            _State.k = min(_State.h, h_new)
-
-        _State.h = h_new
-        _State.t = _Tag.OPEN
-
-        # self.open_list.add(_State)
-        heapq.heappush(self.open_list, (_State.k, _State))
-
-    def modify_cost(self, x, newcost):
-        self._Map.costmap[x.y, x.x] = newcost
-        if x.t is _Tag.CLOSED:
-            self.insert(x, x.parent.h + self._Map.cost(x, x.parent))
-        if len(self.open_list) == 0:
-            return -1
+            # otherwise the old heap entry becomes stale
         else:
-            # lowest priority item is always at index 0 according to docs
-            return self.open_list[0][0]
+            k_new = min(self.h[i], h_new)
+
+        k_new = float(k_new)
+        self.k[i] = k_new
+        self.h[i] = h_new
+        self.t[i] = _OPEN
+        heapq.heappush(self.open_list, (k_new, i))
+
+    def modify_cost(self, i, newcost):
+        self._cost[i] = newcost
+        p = self.parent[i]
+        if self.t[i] == _CLOSED and p >= 0:
+            self.insert(i, float(self.h[p]) + self.cost(i, p))
+        return self.get_kmin()
+
+    def hmap(self):
+        """
+        Cost to goal as an image
+
+        :return: cost to goal of every cell
+        :rtype: ndarray(h,w)
+        """
+        return self.h.reshape((self.nrows, self.ncols))
+
+    def show_h(self):
+        print(self.hmap())
 
     def showparents(self):
-        for y in range(self._Map.row-1, -1, -1):
-            if y == self._Map.row-1:
-                print("   ", end='')
-                for x in range(self._Map.col):
-                    print(f"  {x}   ", end='')
+        for y in range(self.nrows - 1, -1, -1):
+            if y == self.nrows - 1:
+                print("   ", end="")
+                for x in range(self.ncols):
+                    print(f"  {x}   ", end="")
                 print()
-            print(f"{y}: ", end='')
-            for x in range(self._Map.col):
-                x = self._Map._Map[y][x]
-                par = x.parent
-                if par is None:
-                    print('  G   ', end='')
+            print(f"{y}: ", end="")
+            for x in range(self.ncols):
+                par = self.parent[self.index(x, y)]
+                if par < 0:
+                    print("  G   ", end="")
                 else:
-                    print(f"({par.x},{par.y}) ", end='')
+                    print("({},{}) ".format(*self.coord(par)), end="")
             print()
         print()
 
@@ -333,9 +353,9 @@ class DstarPlanner(PlannerBase):
             self.costmap = np.where(self.occgrid.grid > 0, np.inf, 1)
         else:
             raise ValueError('unknown type of map')
-        self._Map = _Map(self.costmap.shape[0], self.costmap.shape[1])
-        self._Map.costmap = self.costmap
-        self._Dstar = _Dstar(self._Map) #, tol=0)
+        # D* updates the costmap in place through a flat view
+        self.costmap = np.ascontiguousarray(self.costmap, dtype=float)
+        self._Dstar = _Dstar(self.costmap) #, tol=0)
 
     def plan(self, goal=None, animate=False, progress=True, summary=False):
         r"""
@@ -359,21 +379,18 @@ class DstarPlanner(PlannerBase):
 
         self._goal = self._goal.astype(int)
 
-        goal_State = self._Map._Map[self._goal[1]][self._goal[0]]
-        self.goal_State = goal_State
-
-        # self._Dstar.open_list.add(goal_State)
-        self._Dstar.insert(goal_State, 0)
+        self._goal_index = self._Dstar.index(*self._goal)
+        self._Dstar.insert(self._goal_index, 0.0)
 
         while True:
-            ret = self._Dstar.process__State()
+            ret = self._Dstar.process_state()
             # print('plan', ret, len(self._Dstar.open_list))
 
             if ret == -1:
                 break
         
         if summary:
-            print(self._Dstar.ninsert, self._Dstar.nin)
+            print(self._Dstar.ninsert, self._Dstar.nexpand)
 
     @property
     def nexpand(self):
@@ -421,43 +438,35 @@ class DstarPlanner(PlannerBase):
         :seealso: :meth:`plan`
         """
         self.start = start
-        start_State = self._Map._Map[start[1]][start[0]]
-        s = start_State
-        s = s.parent
-        tmp = start_State
+        dstar = self._Dstar
+        tmp = dstar.index(*start)
 
         if sensor is not None and not callable(sensor):
             raise ValueError('sensor must be callable')
 
-        cost = tmp.h
-        self.goal_State.h = 0
+        cost = dstar.h[tmp]
+        dstar.h[self._goal_index] = 0
 
         path = []
         while True:
-            path.append((tmp.x, tmp.y))
-            if tmp == self.goal_State:
+            path.append(dstar.coord(tmp))
+            if tmp == self._goal_index:
                 break
-            
-            # x, y = tmp.parent.x, tmp.parent.y
 
             if sensor is not None:
-                changes = sensor((tmp.x, tmp.y))
-                if changes is not None:
+                changes = sensor(dstar.coord(tmp))
+                if changes:
                     # make changes to the plan
                     for x, y, newcost in changes:
-                        X = self._Dstar._Map._Map[y][x]
-                        # print(f"change cost at ({x}, {y}) to {newcost}")
-                        val = self._Dstar.modify_cost(X, newcost)
-                    # propagate the changes to plan
-                    print('propagate')
-                    # self._Dstar.showparents()
-                    while val != -1 and val < tmp.h:
-                        val = self._Dstar.process__State(verbose=verbose)
-                        # print('open set', len(self._Dstar.open_list))
-                    # self._Dstar.showparents()
-                    
-            tmp = tmp.parent
-            # print('move to ', tmp)
+                        val = dstar.modify_cost(dstar.index(x, y), newcost)
+                    # propagate the changes to plan, only as far as needed
+                    # to settle the cost of the current cell
+                    if verbose:
+                        print('propagate')
+                    while val != -1 and val < dstar.h[tmp]:
+                        val = dstar.process_state(verbose=verbose)
+
+            tmp = int(dstar.parent[tmp])
 
         status = namedtuple('_DstarStatus', ['cost',])
         
@@ -492,7 +501,7 @@ if __name__ == "__main__":
     goal = (7,6)
 
     ds.plan(goal=goal)
-    ds._Map.show_h()
+    ds._Dstar.show_h()
 
     # path, status = ds.query(start=start)
     # print(path)
@@ -510,9 +519,9 @@ if __name__ == "__main__":
             return changes
 
     path2, status2 = ds.query(start=start, sensor=sensorfunc, verbose=False)
-    print(ds._Map.costmap)
+    print(ds.costmap)
 
-    ds._Map.show_h()
+    ds._Dstar.show_h()
 
     # ds._Dstar.replan()
 
@@ -3,12 +3,13 @@ Python EKF Planner
 @Author: Peter Corke, original MATLAB code and Python version
 @Author: Kristian Gibson, initial MATLAB port
 """
-from collections import namedtuple
 import numpy as np
 from math import pi
 from scipy import integrate, randn
 from scipy.linalg import sqrtm, block_diag
 from scipy.stats.distributions import chi2
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
 import matplotlib.pyplot as plt
 
 from spatialmath.base.animate import Animate
@@ -16,6 +17,265 @@ from spatialmath import base, SE2
 from roboticstoolbox.mobile import VehicleBase
 from roboticstoolbox.mobile.landmarkmap import LandmarkMap
 from roboticstoolbox.mobile.sensors import SensorBase
+from roboticstoolbox.mobile.history import History
+
+
+class _SEIF:
+    # Sparse extended information filter for SLAM, see Thrun et al.,
+    # "Probabilistic Robotics", MIT Press, 2005, chapter 12.
+    #
+    # The state is the vehicle configuration followed by the landmark
+    # positions in the order they were first seen.  The information matrix is
+    # held as blocks: Ovv for the vehicle, Ovm[j] between the vehicle and
+    # active landmark j, and Omm[j][k] between landmarks j and k.  Landmarks
+    # are active if they are linked to the vehicle, and sparsification bounds
+    # their number so that the motion and measurement updates touch a fixed
+    # number of blocks, whatever the size of the map.  The mean is recovered
+    # incrementally by Gauss-Seidel relaxation.
+
+    def __init__(self, x0, P0, sensor, W, nactive):
+        self.sensor = sensor
+        self.W = W
+        self.nactive = nactive
+
+        self.Ovv = np.linalg.inv(P0)
+        self.Ovm = {}  # ordered by most recent observation
+        self.Omm = []
+        self.mu_v = np.array(x0, dtype=float)
+        self.xi_v = self.Ovv @ self.mu_v
+
+        self.n = 0  # number of landmarks
+        self.mu_m = np.zeros((16, 2))
+        self.xi_m = np.zeros((16, 2))
+        self._next = 0  # next passive landmark to relax
+
+    def _block(self, i, k):
+        # block of the information matrix, -1 is the vehicle
+        if i < 0 and k < 0:
+            return self.Ovv
+        elif i < 0:
+            return self.Ovm.get(k)
+        elif k < 0:
+            b = self.Ovm.get(i)
+            return None if b is None else b.T
+        else:
+            return self.Omm[i].get(k)
+
+    def _gather(self, ids):
+        # dense information matrix, information vector and mean over the
+        # variables ids, -1 is the vehicle
+        sl = []
+        n = 0
+        for i in ids:
+            d = 3 if i < 0 else 2
+            sl.append(slice(n, n + d))
+            n += d
+
+        O = np.zeros((n, n))
+        xi = np.zeros((n,))
+        mu = np.zeros((n,))
+        for a, i in enumerate(ids):
+            xi[sl[a]] = self.xi_v if i < 0 else self.xi_m[i]
+            mu[sl[a]] = self.mu_v if i < 0 else self.mu_m[i]
+            for b, k in enumerate(ids):
+                blk = self._block(i, k)
+                if blk is not None:
+                    O[sl[a], sl[b]] = blk
+        return O, xi, mu, sl
+
+    def _scatter(self, ids, O, xi, sl):
+        # inverse of _gather, write back the information matrix and vector
+        for a, i in enumerate(ids):
+            if i < 0:
+                self.xi_v = xi[sl[a]]
+            else:
+                self.xi_m[i] = xi[sl[a]]
+            for b in range(a, len(ids)):
+                k = ids[b]
+                blk = O[sl[a], sl[b]]
+                if i < 0 and k < 0:
+                    self.Ovv = blk
+                elif i < 0:
+                    self.Ovm[k] = blk
+                elif a == b:
+                    self.Omm[i][i] = blk
+                elif k in self.Omm[i] or np.any(blk):
+                    self.Omm[i][k] = blk
+                    self.Omm[k][i] = blk.T
+
+    def predict(self, xv_pred, Fx, Q):
+        # motion update, only the vehicle and active landmarks are affected
+        ids = [-1, *self.Ovm]
+        O, xi, mu, sl = self._gather(ids)
+
+        # information after the linearized motion, without noise
+        Fi = np.linalg.inv(Fx)
+        Phi = O.copy()
+        Phi[:3, :] = Fi.T @ Phi[:3, :]
+        Phi[:, :3] = Phi[:, :3] @ Fi
+
+        # add the process noise, Q may be singular
+        kappa = Phi[:, :3] @ Q @ np.linalg.inv(np.eye(3) + Phi[:3, :3] @ Q) @ Phi[:3, :]
+        O_pred = Phi - kappa
+        O_pred = 0.5 * (O_pred + O_pred.T)
+
+        mu_pred = mu.copy()
+        mu_pred[:3] = xv_pred
+        xi = xi + O_pred @ mu_pred - O @ mu
+
+        self.mu_v = np.array(xv_pred, dtype=float)
+        self._scatter(ids, O_pred, xi, sl)
+
+    def observe(self, obs):
+        # measurement update for a list of (landmark index, observation),
+        # only the vehicle and observed landmarks are affected
+        innov = []
+        for j, z in obs:
+            xv = self.mu_v
+            xf = self.mu_m[j]
+            z_pred = self.sensor.h(xv, xf)
+            nu = np.r_[z[0] - z_pred[0], base.angdiff(z[1], z_pred[1])]
+            innov.append(nu)
+
+            H = np.c_[self.sensor.Hx(xv, xf), self.sensor.Hp(xv, xf)]
+            Hw = self.sensor.Hw(xv, xf)
+            HtRinv = H.T @ np.linalg.inv(Hw @ self.W @ Hw.T)
+            dO = HtRinv @ H
+            dxi = HtRinv @ (nu + H @ np.r_[xv, xf])
+
+            self.Ovv = self.Ovv + dO[:3, :3]
+            # the landmark becomes the most recent active one
+            self.Ovm[j] = self.Ovm.pop(j, 0) + dO[:3, 3:]
+            self.Omm[j][j] = self.Omm[j][j] + dO[3:, 3:]
+            self.xi_v = self.xi_v + dxi[:3]
+            self.xi_m[j] += dxi[3:]
+        return innov
+
+    def add(self, z):
+        # add a new landmark, initialized from the observation
+        j = self.n
+        if j == len(self.mu_m):
+            self.mu_m = np.r_[self.mu_m, np.zeros_like(self.mu_m)]
+            self.xi_m = np.r_[self.xi_m, np.zeros_like(self.xi_m)]
+        self.mu_m[j] = self.sensor.g(self.mu_v, z)
+        self.xi_m[j] = 0
+        self.Omm.append({j: np.zeros((2, 2))})
+        self.n += 1
+
+        self.observe([(j, z)])
+        return j
+
+    def sparsify(self):
+        # deactivate the least recently observed landmarks by removing their
+        # links to the vehicle, Thrun et al. table 12.3
+        nactive = len(self.Ovm)
+        if nactive <= self.nactive:
+            return
+        active = list(self.Ovm)
+        m0 = active[: nactive - self.nactive]
+        mp = active[nactive - self.nactive :]
+
+        ids = [-1, *mp, *m0]
+        O, xi, mu, sl = self._gather(ids)
+
+        def marginalize(O, idx):
+            return O - O[:, idx] @ np.linalg.solve(O[np.ix_(idx, idx)], O[idx, :])
+
+        x = np.arange(3)
+        i0 = np.arange(3 + 2 * len(mp), O.shape[0])
+        O_sparse = marginalize(O, i0) - marginalize(O, np.r_[x, i0]) + marginalize(O, x)
+        O_sparse[np.ix_(x, i0)] = 0
+        O_sparse[np.ix_(i0, x)] = 0
+        O_sparse = 0.5 * (O_sparse + O_sparse.T)
+        xi = xi + (O_sparse - O) @ mu
+
+        self._scatter(ids, O_sparse, xi, sl)
+        for j in m0:
+            del self.Ovm[j]
+
+    def _relax(self, i):
+        # Gauss-Seidel, set the mean of landmark i to its conditional mean
+        # given the current mean of all the others
+        r = self.xi_m[i].copy()
+        blk = self.Ovm.get(i)
+        if blk is not None:
+            r -= blk.T @ self.mu_v
+        for k, blk in self.Omm[i].items():
+            if k != i:
+                r -= blk @ self.mu_m[k]
+        self.mu_m[i] = np.linalg.solve(self.Omm[i][i], r)
+
+    def _relax_block(self, ids):
+        # block Gauss-Seidel, as above for the vehicle and the landmarks ids
+        ids = [-1, *ids]
+        O, xi, mu, sl = self._gather(ids)
+        inside = set(ids)
+        for k, blk in self.Ovm.items():
+            if k not in inside:
+                xi[:3] -= blk @ self.mu_m[k]
+        for a, i in enumerate(ids[1:], 1):
+            for k, blk in self.Omm[i].items():
+                if k not in inside:
+                    xi[sl[a]] -= blk @ self.mu_m[k]
+
+        mu = np.linalg.solve(O, xi)
+        self.mu_v = mu[:3]
+        for a, i in enumerate(ids[1:], 1):
+            self.mu_m[i] = mu[sl[a]]
+
+    def recover(self, ids=(), sweeps=2):
+        # amortized mean recovery, the vehicle, active landmarks and the
+        # given landmarks are solved jointly, then a few passive landmarks
+        # are relaxed in turn
+        npassive = min(self.n, self.nactive)
+        passive = [(self._next + k) % self.n for k in range(npassive)]
+        if self.n > 0:
+            self._next = (self._next + npassive) % self.n
+
+        local = list(dict.fromkeys([*self.Ovm, *ids]))
+        for _ in range(sweeps):
+            self._relax_block(local)
+        for i in passive:
+            if i not in self.Ovm:
+                self._relax(i)
+
+    def mean(self):
+        return np.r_[self.mu_v, self.mu_m[: self.n].ravel()]
+
+    def information(self):
+        # the information matrix as a sparse matrix
+        active = [3 + 2 * j for j in self.Ovm]
+        rows = [0] + [0] * len(active) + active
+        cols = [0] + active + [0] * len(active)
+        blocks = [self.Ovv]
+        blocks += [np.pad(blk, ((0, 0), (0, 1))) for blk in self.Ovm.values()]
+        blocks += [np.pad(blk.T, ((0, 1), (0, 0))) for blk in self.Ovm.values()]
+        for j, row in enumerate(self.Omm):
+            rows += [3 + 2 * j] * len(row)
+            cols += [3 + 2 * k for k in row]
+            blocks += [np.pad(blk, ((0, 1), (0, 1))) for blk in row.values()]
+
+        # blocks are padded to 3x3, the padding is dropped below
+        i, k = np.indices((3, 3))
+        rows = np.array(rows)[:, np.newaxis, np.newaxis] + i
+        cols = np.array(cols)[:, np.newaxis, np.newaxis] + k
+        vals = np.array(blocks)
+        keep = vals != 0
+        keep[0] = True
+
+        n = 3 + 2 * self.n
+        return sp.csc_matrix((vals[keep], (rows[keep], cols[keep])), shape=(n, n))
+
+    def covariance(self, vehicle=False):
+        # the covariance matrix, or just the marginal covariance of the
+        # vehicle which does not need the full inverse
+        O = self.information()
+        if vehicle:
+            E = np.zeros((O.shape[0], 3))
+            E[:3, :] = np.eye(3)
+            return spla.splu(O).solve(E)[:3, :]
+        else:
+            return np.linalg.inv(O.toarray())
 
 
 class EKF:
@@ -23,7 +283,8 @@ class EKF:
     def __init__(self, robot,  sensor=None, map=None, 
             P0=None, x_est=None, joseph=True,
             animate=True, x0=[0, 0, 0],
-            verbose=False, history=True, workspace=None):
+            verbose=False, history=True, workspace=None,
+            batch=False, form="covariance", nactive=10):
         r"""
         Extended Kalman filter
 
@@ -46,9 +307,15 @@ class EKF:
         :param verbose: display extra debug information, defaults to False
         :type verbose: bool, optional
         :param history: retain step-by-step history, defaults to True
-        :type history: bool, optional
+        :type history: bool or :class:`History`, optional
         :param workspace: dimension of workspace, see :func:`~spatialmath.base.graphics.expand_dims`
         :type workspace: scalar, array_like(2), array_like(4)
+        :param batch: update using all visible landmarks at each step, defaults to False
+        :type batch: bool, optional
+        :param form: representation of the Gaussian, "covariance" [default] or "information"
+        :type form: str, optional
+        :param nactive: maximum number of active landmarks for the information form, defaults to 10
+        :type nactive: int, optional
 
         This class solves several classical robotic estimation problems, which are
         selected according to the arguments:
@@ -279,11 +546,34 @@ class EKF:
             # estimating ekf_map
             self._est_ekf_map = True
         self._joseph = joseph          #  flag: use Joseph form to compute p
+        self._batch = batch            #  flag: observe all visible landmarks
+
+        if form == "information":
+            if not (self._est_vehicle and self._est_ekf_map):
+                raise ValueError("information form is only supported for SLAM")
+        elif form != "covariance":
+            raise ValueError(f"unknown form {form}")
+        self._form = form
+        self._nactive = nactive
+        self._seif = None
 
         self._verbose = verbose
 
-        self._keep_history = history     #  keep history
-        self._htuple = namedtuple("EKFlog", "t xest odo P innov S K lm z")
+        if isinstance(history, History):
+            self._history = history
+            self._keep_history = True
+        else:
+            self._history = History()
+            self._keep_history = history     #  keep history
+        fields = ("t", "xest", "odo", "P", "innov", "S", "K", "lm", "z")
+        if form == "information":
+            # the covariance is not maintained, computing it every step would
+            # make the cost of a step grow with the map.  It is recorded only
+            # if it is asked for.
+            default = ("t", "xest", "odo", "innov", "lm", "z")
+            self._history._bind("EKFlog", fields, default=default)
+        else:
+            self._history._bind("EKFlog", fields)
 
         if workspace is not None:
             self._dim = base.expand_dims(dim)
@@ -381,7 +671,12 @@ class EKF:
 
         Returns the value of the estimated covariance matrix at the end of
         simulation. The dimensions depend on the problem being solved.
+
+        .. note:: For the information form the covariance is not maintained by
+            the filter and is computed here by inverting the information matrix.
         """
+        if self._seif is not None:
+            return self._seif.covariance()
         return self._P_est
 
     @property
@@ -468,14 +763,27 @@ class EKF:
         Get EKF simulation history
 
         :return: simulation history
-        :rtype: list of namedtuples
+        :rtype: :class:`History`
+
+        At each simulation timestep a namedtuple of is appended to the history.
+        It contains, for that time step, estimated state and covariance,
+        and sensor observation.  The history can be indexed and iterated
+        over like a list of namedtuples.
 
-        At each simulation timestep a namedtuple of is appended to the history
-        list.  It contains, for that time step, estimated state and covariance,
-        and sensor observation.
+        By default every field at every timestep is kept.  To limit the memory
+        used pass a :class:`History` instance as the ``history`` argument to
+        the constructor, which can select the fields to keep, the maximum
+        number of records, and the recording interval.
+
+        .. note:: For the information form the covariance ``P`` is not kept
+            by default, and ``S`` and ``K`` are always None.  If ``P`` is
+            selected by the :class:`History` it is the 3x3 marginal
+            covariance of the vehicle, not the full covariance as for the
+            covariance form, and computing it makes each step more costly as
+            the map grows.
 
         :seealso: :meth:`get_t` :meth:`get_xyt` :meth:`get_map` :meth:`get_P` 
-            :meth:`get_Pnorm` 
+            :meth:`get_Pnorm` :class:`History`
         """
         return self._history
     
@@ -596,7 +904,7 @@ class EKF:
             self.sensor.init()
 
         #clear the history
-        self._history = []
+        self._history.clear()
         
         if self._V_est is None:
             # perfect vehicle case
@@ -608,6 +916,9 @@ class EKF:
             self._x_est = self._x0
             self._P_est = self._P0
             self._estVehicle = True
+
+        if self._form == "information":
+            self._seif = _SEIF(self._x0, self._P0, self.sensor, self._W_est, self._nactive)
         
         if self.sensor is not None:
             # landmark dictionary maps lm_id to list[index, nseen]
@@ -683,6 +994,10 @@ class EKF:
         # move the robot
         odo = self.robot.step()
 
+        if self._seif is not None:
+            self._step_information(odo)
+            return
+
         # =================================================================
         # P R E D I C T I O N
         # =================================================================
@@ -744,13 +1059,6 @@ class EKF:
         #   x_pred  the full predicted state vector
         #   P_pred  the full predicted covariance matrix
 
-        # initialize the variables that might be computed during
-        # the update phase
-
-        doUpdatePhase = False
-
-        # disp('x_pred:') x_pred'
-
         # =================================================================
         # P R O C E S S    O B S E R V A T I O N S
         # =================================================================
@@ -758,141 +1066,182 @@ class EKF:
         
         if self.sensor is not None:
             #  read the sensor
-            z, lm_id = self.sensor.reading()
+            if self._batch:
+                z, lm_id = self.sensor.readings()
+            else:
+                z, lm_id = self.sensor.reading()
             sensorReading = z is not None
         else:
             lm_id = None  # keep history saving happy
             z = None
             sensorReading = False
 
+        innov = []  # innovation for each observation used in the update
+        H = []  # (Jacobian wrt vehicle, Jacobian wrt landmark, landmark index)
+        R = []  # observation noise covariance
+        new = []  # observations of new landmarks, seen for the first time
+
         if sensorReading:
             #  here for MBL, MM, SLAM
 
-            # compute the innovation
-            z_pred = self.sensor.h(xv_pred, lm_id)
-            innov = np.array([
-                z[0] - z_pred[0],
-                base.angdiff(z[1], z_pred[1])
-            ])
-
-            if self._est_ekf_map:
-                # the ekf_map is estimated MM or SLAM case
-                if self._isseenbefore(lm_id):
-                    # landmark is previously seen
-                    
-                    # get previous estimate of its state
-                    jx = self.landmark_mindex(lm_id)
-                    xf = xm_pred[jx: jx+2]
-
-                    # compute Jacobian for this particular landmark
-                    # xf = self.sensor.g(xv_pred, z) # HACK
-                    Hx_k = self.sensor.Hp(xv_pred, xf)
-
-                    z_pred = self.sensor.h(xv_pred, xf)
-                    innov = np.array([
-                        z[0] - z_pred[0],
-                        base.angdiff(z[1], z_pred[1])
-                    ])
-
-                    #  create the Jacobian for all landmarks
-                    Hx = np.zeros((2, len(xm_pred)))
-                    Hx[:, jx:jx+2] = Hx_k
-
-                    Hw = self.sensor.Hw(xv_pred, xf)
-
-                    if self._est_vehicle:
-                        # concatenate Hx for for vehicle and ekf_map
-                        Hxv = self.sensor.Hx(xv_pred, xf)
-                        Hx = np.block([Hxv, Hx])
-
-                    self._landmark_increment(lm_id)  # update the count
-                    if self._verbose:
-                        print(f"landmark {lm_id} seen {self._landmark_count(lm_id)} times, state_idx={self.landmark_index(lm_id)}")
-                    doUpdatePhase = True
-
+            for zk, idk in zip(np.reshape(z, (-1, 2)), np.atleast_1d(lm_id)):
+                if self._est_ekf_map:
+                    # the ekf_map is estimated MM or SLAM case
+                    if self._isseenbefore(idk):
+                        # landmark is previously seen
+
+                        # get previous estimate of its state
+                        jx = self.landmark_mindex(idk)
+                        xf = xm_pred[jx: jx+2]
+
+                        # compute Jacobian for this particular landmark
+                        Hp = self.sensor.Hp(xv_pred, xf)
+                        Hw = self.sensor.Hw(xv_pred, xf)
+                        if self._est_vehicle:
+                            Hxv = self.sensor.Hx(xv_pred, xf)
+                        else:
+                            Hxv = None
+
+                        z_pred = self.sensor.h(xv_pred, xf)
+
+                        self._landmark_increment(idk)  # update the count
+                        if self._verbose:
+                            print(f"landmark {idk} seen {self._landmark_count(idk)} times, state_idx={self.landmark_index(idk)}")
+                    else:
+                        # new landmark, seen for the first time, add it
+                        # after the update
+                        new.append((zk, idk))
+                        continue
                 else:
-                    # new landmark, seen for the first time
-
-                    # extend the state vector and covariance
-                    x_pred, P_pred = self._extend_map(P_pred, xv_pred, xm_pred, z, lm_id)
-                    # if lm_id == 17:
-                    #     print(P_pred)
-                    #     # print(x_pred[-2:], self._sensor._map.landmark(17), base.norm(x_pred[-2:] - self._sensor._map.landmark(17)))
-
-                    self._landmark_add(lm_id)
-                    if self._verbose:
-                        print(f"landmark {lm_id} seen for first time, state_idx={self.landmark_index(lm_id)}")
-                    doUpdatePhase = False
-
-            else:
                     # LBL
-                    Hx = self.sensor.Hx(xv_pred, lm_id)
-                    Hw = self.sensor.Hw(xv_pred, lm_id)
-                    doUpdatePhase = True
-        else:
-            innov = None
-
-        # doUpdatePhase flag indicates whether or not to do
-        # the update phase of the filter
+                    Hxv = self.sensor.Hx(xv_pred, idk)
+                    Hw = self.sensor.Hw(xv_pred, idk)
+                    Hp = None
+                    jx = None
+
+                    z_pred = self.sensor.h(xv_pred, idk)
+
+                innov.append([
+                    zk[0] - z_pred[0],
+                    base.angdiff(zk[1], z_pred[1])
+                ])
+                H.append((Hxv, Hp, jx))
+                R.append(Hw @ self._W_est @ Hw.T)
+
+        # the update phase of the filter is performed if there is an
+        # innovation
         #
-        #  DR                        always false
+        #  DR                        never
         #  map-based localization    if sensor reading
-        #  map creation              if sensor reading & not first
-        #                              sighting
-        #  SLAM                      if sighting of a previously
+        #  map creation              if sensor reading of a previously
+        #                              seen landmark
+        #  SLAM                      if sensor reading of a previously
         #                              seen landmark
 
-        if doUpdatePhase:
-            # disp('do update\n')
-            # #  we have innovation, update state and covariance
-            #  compute x_est and P_est
-
-            # compute innovation covariance
-            S = Hx @ P_pred @ Hx.T + Hw @ self._W_est @ Hw.T
-
-            # compute the Kalman gain
-            K = P_pred @ Hx.T @ np.linalg.inv(S)
-
-            # update the state vector
-            x_est = x_pred + K @ innov
+        if len(innov) > 0:
+            #  we have innovation, update state and covariance
+            innov = np.array(innov).ravel()
+            x_est, P_est, S, K = self._update(x_pred, P_pred, innov, H, R)
 
             if self._est_vehicle:
                 #  wrap heading state for a vehicle
                 x_est[2] = base.angdiff(x_est[2])
-
-            # update the covariance
-            if self._joseph:
-                #  we use the Joseph form
-                I = np.eye(P_pred.shape[0])
-                P_est = (I - K @ Hx) @ P_pred @ (I - K @ Hx).T \
-                    + K @ self._W_est @ K.T
-            else:
-                P_est = P_pred - K @ S @ K.T
-                # enforce P to be symmetric
-                P_est = 0.5 * (P_est + P_est.T)
         else:
             # no update phase, estimate is same as prediction
+            innov = None
             x_est = x_pred
             P_est = P_pred
             S = None
             K = None
 
+        # extend the state vector and covariance for new landmarks
+        for zk, idk in new:
+            if self._est_vehicle:
+                xv = x_est[:3]
+                xm = x_est[3:]
+            else:
+                xv = xv_pred
+                xm = x_est
+            x_est, P_est = self._extend_map(P_est, xv, xm, zk, idk)
+
+            self._landmark_add(idk)
+            if self._verbose:
+                print(f"landmark {idk} seen for first time, state_idx={self.landmark_index(idk)}")
+
         self._x_est = x_est
         self._P_est = P_est
 
         if self._keep_history:
-            hist = self._htuple(
-                self.robot._t,
-                x_est.copy(),
-                odo.copy(),
-                P_est.copy(),
-                innov.copy() if innov is not None else None,
-                S.copy() if S is not None else None,
-                K.copy() if K is not None else None,
-                lm_id if lm_id is not None else -1,
-                z.copy() if z is not None else None,
+            # the history copies the values
+            self._history.append(
+                self.robot._t, x_est, odo, P_est, innov, S, K, self._lm_log(lm_id), z
+            )
+
+    def _step_information(self, odo):
+        # one timestep of SLAM using the sparse extended information filter
+        seif = self._seif
+
+        # prediction
+        xv_est = seif.mu_v
+        Fx = self.robot.Fx(xv_est, odo)
+        Fv = self.robot.Fv(xv_est, odo)
+        seif.predict(self.robot.f(xv_est, odo), Fx, Fv @ self.V_est @ Fv.T)
+
+        # observations
+        if self._batch:
+            z, lm_id = self.sensor.readings()
+        else:
+            z, lm_id = self.sensor.reading()
+
+        innov = None
+        if z is not None:
+            seen = []
+            new = []
+            for zk, idk in zip(np.reshape(z, (-1, 2)), np.atleast_1d(lm_id)):
+                if self._isseenbefore(idk):
+                    seen.append((self._landmarks[idk][0], zk))
+                    self._landmark_increment(idk)
+                    if self._verbose:
+                        print(f"landmark {idk} seen {self._landmark_count(idk)} times, state_idx={self.landmark_index(idk)}")
+                else:
+                    new.append((zk, idk))
+
+            if len(seen) > 0:
+                # refresh the linearization point before the update
+                seif.recover([j for j, _ in seen])
+                innov = np.array(seif.observe(seen)).ravel()
+
+            for zk, idk in new:
+                seif.add(zk)
+                self._landmark_add(idk)
+                if self._verbose:
+                    print(f"landmark {idk} seen for first time, state_idx={self.landmark_index(idk)}")
+
+            seif.sparsify()
+            seif.recover()
+
+        x_est = seif.mean()
+        x_est[2] = base.angdiff(x_est[2])
+        self._x_est = x_est
+        self._P_est = None
+
+        if self._keep_history:
+            if "P" in self._history.fields:
+                P = seif.covariance(vehicle=True)  # vehicle marginal only
+            else:
+                P = None
+            self._history.append(
+                self.robot._t, x_est, odo, P, innov, None, None, self._lm_log(lm_id), z
             )
-            self._history.append(hist)
+
+    def _lm_log(self, lm_id):
+        # landmark id for the history, -1 if none.  In batch mode this is
+        # always an array so that the history field has a fixed dimension
+        if lm_id is None:
+            lm_id = -1
+        if self._batch:
+            lm_id = np.atleast_1d(lm_id)
+        return lm_id
 
     ## landmark management
 
@@ -917,8 +1266,6 @@ class EKF:
             # estimate position of landmark in the world based on 
             # noisy sensor reading and current vehicle pose
 
-        # M = None
-
         # estimate its position based on observation and vehicle state
         xf = self.sensor.g(xv, z)
         
@@ -931,30 +1278,72 @@ class EKF:
         # get the Jacobian for the new landmark
         Gz = self.sensor.Gz(xv, z)
 
-        # extend the covariance matrix
-        n = len(self._x_est)
+        # extend the covariance matrix, this is Yz @ block_diag(P, W) @ Yz.T
+        # where Yz is the Jacobian of the extended state, computed a block at
+        # a time
+        n = P.shape[0]
+        P_ext = np.zeros((n + 2, n + 2))
+        P_ext[:n, :n] = P
         if self._est_vehicle:
-            # estimating vehicle state
+            # estimating vehicle state, the new landmark is correlated with
+            # the vehicle and hence everything else
             Gx = self.sensor.Gx(xv, z)
-            # fmt: off
-            Yz = np.block([
-                [np.eye(n), np.zeros((n, 2))    ],
-                [Gx,        np.zeros((2, n-3)), Gz]
-            ])
-            # fmt: on
+            Pfx = Gx @ P[:3, :]
+            P_ext[n:, :n] = Pfx
+            P_ext[:n, n:] = Pfx.T
+            P_ext[n:, n:] = Gx @ P[:3, :3] @ Gx.T + Gz @ self._W_est @ Gz.T
         else:
             # estimating landmarks only
-            #P_ext = block_diag(P, Gz @ self._W_est @ Gz.T)
-            # fmt: off
-            Yz = np.block([
-                [np.eye(n),        np.zeros((n, 2))    ],
-                [np.zeros((2, n)), Gz]
-            ])
-            # fmt: on
-        P_ext = Yz @ block_diag(P, self._W_est) @ Yz.T
+            P_ext[n:, n:] = Gz @ self._W_est @ Gz.T
 
         return x_ext, P_ext
 
+    def _update(self, x_pred, P_pred, innov, H, R):
+        # Kalman update for a batch of observations.  Each observation
+        # depends only on the vehicle state and at most one landmark, so the
+        # Jacobian is held as the compact matrix Hc over just those columns
+        # cols of the state, rather than as a dense 2m x n matrix, and
+        # products with P only involve those columns.
+        cols = [0, 1, 2] if self._est_vehicle else []
+        for Hxv, Hp, jx in H:
+            if Hp is not None:
+                jx = jx + 3 if self._est_vehicle else jx
+                cols.extend((jx, jx + 1))
+
+        Hc = np.zeros((2 * len(H), len(cols)))
+        c = 3 if self._est_vehicle else 0
+        for i, (Hxv, Hp, jx) in enumerate(H):
+            if Hxv is not None:
+                Hc[2 * i: 2 * i + 2, :3] = Hxv
+            if Hp is not None:
+                Hc[2 * i: 2 * i + 2, c: c + 2] = Hp
+                c += 2
+
+        PHt = P_pred[:, cols] @ Hc.T
+
+        # compute innovation covariance
+        S = Hc @ PHt[cols, :] + block_diag(*R)
+
+        # compute the Kalman gain
+        K = PHt @ np.linalg.inv(S)
+
+        # update the state vector
+        x_est = x_pred + K @ innov
+
+        # update the covariance
+        if self._joseph:
+            #  we use the Joseph form (I - K H) P (I - K H)' + K W K',
+            #  expanded so that H only appears in the product P H'
+            KHP = K @ PHt.T
+            P_est = P_pred - KHP - KHP.T + K @ S @ K.T
+        else:
+            P_est = P_pred - K @ S @ K.T
+
+        # enforce P to be symmetric, rounding errors otherwise accumulate
+        P_est = 0.5 * (P_est + P_est.T)
+
+        return x_est, P_est, S, K
+
 
     def get_t(self):
         """
@@ -968,7 +1357,7 @@ class EKF:
 
         :seealso: :meth:`run` :meth:`history`
         """
-        return np.array([h.t for h in self._history])
+        return self._history.column("t")
 
     def get_xyt(self):
         r"""
@@ -980,7 +1369,7 @@ class EKF:
         :seealso: :meth:`plot_xy` :meth:`run` :meth:`history`
         """
         if self._est_vehicle:
-            xyt = np.array([h.xest[:3] for h in self._history])
+            xyt = self._history.column("xest")[:, :3]
         else:
             xyt = None
         return xyt
@@ -1063,11 +1452,11 @@ class EKF:
         bounds = [] 
         ppf = chi2.ppf(confidence, df=2)
 
-        x_gt = self.robot.x_hist
-        for k in range(len(self.history)):
-            hk = self.history[k]
+        # ground truth at the timesteps kept in the history
+        x_gt = self.robot.x_hist[self._history.index(), :]
+        for k, hk in enumerate(self._history):
             # error is true - estimated
-            e = x_gt[k, :] - hk.xest
+            e = x_gt[k, :] - hk.xest[:3]
             e[2] = base.angdiff(e[2])
             error.append(e)
 
@@ -1092,7 +1481,7 @@ class EKF:
                     ])
                 polygon = plt.Polygon(edge.T, closed=True, facecolor='r', edgecolor='none', alpha=0.3)
                 ax.add_patch(polygon)
-            ax.plot(error[:, k], **kwargs);
+            ax.plot(t, error[:, k], **kwargs)
             ax.grid(True)
             ax.set_ylabel(labels[k] + " error")
             ax.set_xlim(0, t[-1])
@@ -1135,14 +1524,8 @@ class EKF:
 
         """
         xy = []
-        for lm_id, (jx, n) in self._landmarks.items():
-            #  jx is an index into the *landmark* part of the state
-            #  vector, we need to offset it to account for the vehicle
-            #  state if we are estimating vehicle as well
-            if self._est_vehicle:
-                jx += 3
-            xf = self._x_est[jx: jx+2]
-            xy.append(xf)
+        for lm_id in self._landmarks:
+            xy.append(self.landmark_x(lm_id))
         return np.array(xy)
 
     def plot_map(self, marker=None, ellipse=None, confidence = 0.95):
@@ -1169,7 +1552,7 @@ class EKF:
             }
         
         xm = self._x_est
-        P = self._P_est
+        P = self.P_est
         if self._est_vehicle:
             xm = xm[3:]
             P = P[3:, 3:]
@@ -1181,7 +1564,7 @@ class EKF:
         # add an ellipse
         if ellipse is not None:
             for i in range(xm.shape[0]):
-                Pi = self.P_est[i: i+2, i: i+2]
+                Pi = P[2 * i: 2 * i + 2, 2 * i: 2 * i + 2]
                 # put ellipse in the legend only once
                 if i == 0:
                     base.plot_ellipse(Pi, centre=xm[i, :], confidence=confidence,
@@ -1202,6 +1585,9 @@ class EKF:
         If ``k`` is given return covariance from simulation timestep ``k``, else
         return a list of all covariance matrices.
 
+        .. note:: For the information form this is the vehicle covariance,
+            and it is None unless ``P`` is recorded, see :meth:`history`.
+
         :seealso: :meth:`get_Pnorm` :meth:`run` :meth:`history`
         """
         if k is not None:
@@ -157,6 +157,19 @@ class LatticePlanner(PlannerBase):
         it = int(round(xyt[2]*2/np.pi))
         return f"({ix:d},{iy:d},{it:d})"
 
+    def _ikey(self, xyt):
+        # integer lattice coordinate relative to the root, used to hash the
+        # vertices, heading is in units of pi/2 modulo 4
+        d = np.r_[xyt] - np.r_[self.root]
+        return (int(round(d[0])), int(round(d[1])), int(round(d[2]*2/np.pi)) % 4)
+
+    def _vertex(self, xyt, tol):
+        # the vertex at configuration xyt, or None
+        vertex = self._vertices.get(self._ikey(xyt))
+        if vertex is None or self.graph.metric(vertex.coord - np.r_[xyt]) > tol:
+            return None
+        return vertex
+
     def plan(self, iterations=None, verbose=False, summary=False):
         """
         Create a lattice plan
@@ -181,6 +194,9 @@ class LatticePlanner(PlannerBase):
         self.graph.add_vertex(v0, name='0')
         frontier = [v0]
 
+        # vertices hashed by their integer lattice coordinate
+        self._vertices = {self._ikey(v0.coord): v0}
+
         iteration = 0
         while True:
 
@@ -201,9 +217,9 @@ class LatticePlanner(PlannerBase):
                         if verbose:
                             print('    is occupied')
                         continue
-                    vclose, d = self.graph.closest(xyt)
+                    vclose = self._vertices.get(self._ikey(xyt))
 
-                    if d > 0.01:
+                    if vclose is None:
                         # vertex does not already exists
                         vnew = LatticeVertex(move, newpose, name=vertex.name + move)
 
@@ -212,6 +228,7 @@ class LatticePlanner(PlannerBase):
                         # it = int(round(xyt[2]*2/np.pi))
                         # vnew = LatticeVertex(move, newpose, name=f"{ix:d},{iy:d},{it:d}")
                         self.graph.add_vertex(vnew)
+                        self._vertices[self._ikey(xyt)] = vnew
                         if verbose:
                             print('    add to graph as', vnew.name)
 
@@ -271,11 +288,11 @@ class LatticePlanner(PlannerBase):
         :seealso: :meth:`plan`
         """
 
-        vs, ds = self.graph.closest(start)
-        if ds > 0.001:
+        vs = self._vertex(start, 0.001)
+        if vs is None:
             raise ValueError('start configuration is not in the lattice')
-        vg, dg = self.graph.closest(goal)
-        if dg > 0.001:
+        vg = self._vertex(goal, 0.001)
+        if vg is None:
             raise ValueError('goal configuration is not in the lattice')
 
         try:
@@ -313,8 +330,8 @@ class LatticePlanner(PlannerBase):
             if path is not None:
                 for p, n in zip(path[:-1], path[1:]):
                     # turn coordinaets back into vertices
-                    vp, _ = self.graph.closest(p)
-                    vn, _ = self.graph.closest(n)
+                    vp = self._vertices[self._ikey(p)]
+                    vn = self._vertices[self._ikey(n)]
                     e = vp.edgeto(vn)
 
                     #e.plot(color='b', linewidth=4)
@@ -336,8 +353,8 @@ class LatticePlanner(PlannerBase):
             if path is not None:
                 for p, n in zip(path[:-1], path[1:]):
                     # turn coordinaets back into vertices
-                    vp, _ = self.graph.closest(p)
-                    vn, _ = self.graph.closest(n)
+                    vp = self._vertices[self._ikey(p)]
+                    vn = self._vertices[self._ikey(n)]
                     e = vp.edgeto(vn)
 
                     #e.plot(color='b', linewidth=4)
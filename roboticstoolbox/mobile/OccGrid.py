@@ -258,6 +258,111 @@ class BaseOccupancyGrid(BaseMap):
         """
         return (np.round((p - self._origin) / self._cellsize)).astype(int)
 
+    def isoccupied_many(self, p):
+        """
+        Test if many coordinates are occupied (superclass)
+
+        :param p: world coordinates, one point (x, y) per row
+        :type p: array_like(N,2)
+        :return: occupancy status of the corresponding grid cells
+        :rtype: ndarray(N) of bool
+
+        Each point is converted to a grid coordinate as for :meth:`w2g` and a
+        cell is occupied if its value is non-zero.  Points outside the bounds
+        of the occupancy grid are considered to be occupied.
+
+        :seealso: :meth:`segment_free` :meth:`w2g`
+        """
+        p = np.array(p, dtype=float).reshape((-1, 2))
+        c, r = self.w2g(p).T
+        inside = (c >= 0) & (c < self._grid.shape[1]) & (r >= 0) & (r < self._grid.shape[0])
+
+        occupied = np.ones(len(p), dtype=bool)
+        occupied[inside] = self._grid[r[inside], c[inside]] != 0
+        return occupied
+
+    def segment_free(self, p1, p2):
+        """
+        Test if many line segments are obstacle free (superclass)
+
+        :param p1: start of each segment, one point (x, y) per row
+        :type p1: array_like(N,2) or array_like(2)
+        :param p2: end of each segment, one point (x, y) per row
+        :type p2: array_like(N,2) or array_like(2)
+        :return: whether each segment is obstacle free
+        :rtype: ndarray(N) of bool
+
+        A segment is free if every grid cell it passes through is unoccupied
+        and within the bounds of the grid.  All the cells touched by the
+        segment are tested (a supercover line) rather than the subset found
+        by Bresenham's algorithm.  A single start or end point is used for all
+        the segments.
+
+        :seealso: :meth:`isoccupied_many`
+        """
+        p1, p2 = np.broadcast_arrays(
+            np.array(p1, dtype=float).reshape((-1, 2)),
+            np.array(p2, dtype=float).reshape((-1, 2)),
+        )
+        seg, r, c = self._supercover(
+            (p1 - self._origin) / self._cellsize, (p2 - self._origin) / self._cellsize
+        )
+        inside = (c >= 0) & (c < self._grid.shape[1]) & (r >= 0) & (r < self._grid.shape[0])
+
+        blocked = ~inside
+        blocked[inside] = self._grid[r[inside], c[inside]] != 0
+
+        free = np.ones(len(p1), dtype=bool)
+        free[seg[blocked]] = False
+        return free
+
+    def _supercover(self, g1, g2):
+        # Cells touched by each of the segments g1[i] to g2[i], given in
+        # unrounded grid coordinates.  Returns the segment index, row and
+        # column of every cell, ordered along each segment from g1 to g2.
+        # Coordinates are rounded as for w2g(), so a point on a cell boundary
+        # is in the cell given by np.round.
+        n = len(g1)
+        d = g2 - g1
+        lo = np.round(np.minimum(g1, g2))
+        ncross = (np.round(np.maximum(g1, g2)) - lo).astype(int)
+
+        # the line parameter t at every cell boundary crossing, plus the
+        # start and end of each segment
+        seg = [np.arange(n), np.arange(n)]
+        t = [np.zeros(n), np.ones(n)]
+        for axis in range(2):
+            count = ncross[:, axis]
+            s = np.repeat(np.arange(n), count)
+            k = np.arange(len(s)) - np.repeat(np.cumsum(count) - count, count)
+            seg.append(s)
+            t.append((lo[s, axis] + 0.5 + k - g1[s, axis]) / d[s, axis])
+        seg = np.concatenate(seg)
+        t = np.concatenate(t)
+
+        order = np.lexsort((t, seg))
+        seg = seg[order]
+        t = t[order]
+
+        # the midpoint of each interval between crossings lies in one cell,
+        # empty intervals occur where the segment passes through a corner.
+        # The end points are added, they can be on a boundary and then in a
+        # cell that the segment only touches.
+        keep = (seg[:-1] == seg[1:]) & (t[:-1] < t[1:])
+        mid = (t[:-1][keep] + t[1:][keep]) / 2
+        seg = np.r_[np.arange(n), seg[:-1][keep], np.arange(n)]
+        t = np.r_[np.zeros(n), mid, np.ones(n)]
+        order = np.lexsort((t, seg))
+        seg = seg[order]
+        t = t[order]
+        c, r = np.round(g1[seg] + t[:, np.newaxis] * d[seg]).astype(int).T
+
+        # remove repeated cells
+        first = np.r_[
+            True, (seg[1:] != seg[:-1]) | (r[1:] != r[:-1]) | (c[1:] != c[:-1])
+        ]
+        return seg[first], r[first], c[first]
+
     def plot(self, map=None, ax=None, block=False, **kwargs):
         """
         Plot the occupancy grid (superclass)
@@ -400,9 +505,9 @@ class BinaryOccupancyGrid(BaseOccupancyGrid):
         :seealso: :meth:`w2g`
         """
         c, r = self.w2g(p)
-        try:
+        if 0 <= r < self._grid.shape[0] and 0 <= c < self._grid.shape[1]:
             return self._grid[r, c]
-        except IndexError:
+        else:
             return True
 
     def inflate(self, radius):
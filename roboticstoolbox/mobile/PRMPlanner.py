@@ -12,6 +12,8 @@ from spatialmath.base.vectors import *
 # from spatialmath.pose2d import SE2
 # from spatialmath.base import animate
 from scipy.ndimage import *
+import numpy as np
+from scipy.spatial import cKDTree
 from matplotlib import cm, pyplot as plt
 from roboticstoolbox.mobile.PlannerBase import PlannerBase
 from pgraph import UGraph
@@ -30,6 +32,9 @@ class PRMPlanner(PlannerBase):
         roadmap if it is closer than this distance to an existing vertex,
         defaults to None
     :type dist_thresh: float, optional
+    :param k: maximum number of neighbours each point is connected to,
+        defaults to None (no limit)
+    :type k: int, optional
     :param Planner: probabilistic roadmap path planner
     :param kwargs: common planner options, see :class:`PlannerBase`
 
@@ -61,16 +66,20 @@ class PRMPlanner(PlannerBase):
     :author: Peter Corke
     :seealso: :class:`PlannerBase`
     """
-    def __init__(self, occgrid=None, npoints=100, dist_thresh=None, **kwargs):
+    def __init__(self, occgrid=None, npoints=100, dist_thresh=None, k=None, **kwargs):
         super().__init__(occgrid, ndims=2, **kwargs)
 
         if dist_thresh is None:
-            self._dist_thresh = 0.3 * self.occgrid.maxdim
+            dist_thresh = 0.3 * self.occgrid.maxdim
+        self._dist_thresh = dist_thresh
 
         self._npoints = npoints
+        self._k = k
         # self._npoints0 = npoints
         self._dist_thresh0 = self.dist_thresh
         self._graph = None
+        self._vertices = None
+        self._kdtree = None
         self._v_goal = None
         self._v_start = None
         self._local_goal = None
@@ -126,49 +135,60 @@ class PRMPlanner(PlannerBase):
         return self._graph
 
 
-    def _create_roadmap(self, npoints, dist_thresh, animate=None):
+    def _create_roadmap(self, npoints, dist_thresh, k=None, animate=None):
         # a = Animate(animate, fps=5)
         self.progress_start(npoints)
 
-        x = None
-        y = None
-        for j in range(npoints):
-            # find a random point in freespace
-            while True:
-                # pick a random unoccupied point
-                x = self.random.uniform(self.occgrid.xmin, self.occgrid.xmax)
-                y = self.random.uniform(self.occgrid.ymin, self.occgrid.ymax)
-                if not self.occgrid.isoccupied((x, y)):
-                    break
-
-            # add it as a vertex to the graph
-            vnew = self.graph.add_vertex([x, y])
-
-        # compute distance between vertices
-        for vertex in self.graph:
-            # find distance from vertex to all other vertices
-            distances = []
-            for othervertex in self.graph:
-                # skip self
-                if vertex is othervertex:
-                    continue
-                # add (distance, vertex) tuples to list 
-                distances.append((vertex.distance(othervertex), othervertex))
-            
-            # sort into ascending distance
-            distances.sort(key=lambda x:x[0])
-
-            # create edges to vertex if permissible
-            for distance, othervertex in distances:
-                # test if below distance threshold
-                if dist_thresh is not None and distance > dist_thresh:
-                    break # sorted into ascending order, so we are done
-
-                # test if obstacle free path connecting them
-                if self._test_path(vertex, othervertex):
-                    # add an edge
-                    self.graph.add_edge(vertex, othervertex, cost=distance)
-            self.progress_next()
+        # pick random unoccupied points, a batch at a time
+        occgrid = self.occgrid
+        points = np.zeros((0, 2))
+        while len(points) < npoints:
+            p = self.random.uniform(
+                (occgrid.xmin, occgrid.ymin),
+                (occgrid.xmax, occgrid.ymax),
+                size=(npoints - len(points), 2),
+            )
+            points = np.vstack((points, p[~occgrid.isoccupied_many(p)]))
+
+        # add them as vertices to the graph
+        self._vertices = [self.graph.add_vertex(p) for p in points]
+        self._kdtree = cKDTree(points)
+
+        # candidate edges are the pairs closer than the distance threshold,
+        # or the k nearest neighbours of each point
+        if k is None:
+            if dist_thresh is None:
+                i, j = np.triu_indices(npoints, 1)
+            else:
+                pairs = self._kdtree.query_pairs(dist_thresh, output_type="ndarray")
+                i, j = pairs[:, 0], pairs[:, 1]
+        else:
+            _, nn = self._kdtree.query(
+                points,
+                k=min(k, npoints - 1) + 1,
+                distance_upper_bound=np.inf if dist_thresh is None else dist_thresh,
+            )
+            i = np.repeat(np.arange(npoints), nn.shape[1] - 1)
+            j = nn[:, 1:].ravel()
+            # drop missing neighbours and duplicate pairs
+            i, j = i[j < npoints], j[j < npoints]
+            pairs = np.unique(np.sort(np.c_[i, j], axis=1), axis=0)
+            i, j = pairs[:, 0], pairs[:, 1]
+
+        distances = np.linalg.norm(points[i] - points[j], axis=1)
+
+        # keep the obstacle free pairs
+        free = occgrid.segment_free(points[i], points[j])
+        i, j, distances = i[free], j[free], distances[free]
+
+        # create an edge for each pair, in order of the first vertex
+        order = np.lexsort((distances, i))
+        done = 0
+        for ii, jj, distance in zip(i[order], j[order], distances[order]):
+            self.graph.add_edge(self._vertices[ii], self._vertices[jj], cost=distance)
+            while done < ii:
+                self.progress_next()
+                done += 1
 
         self.progress_end()
             # if animate is not None:
@@ -176,23 +196,11 @@ class PRMPlanner(PlannerBase):
             #     if not np.empty(movie):
             #         a.add()
 
-    def _test_path(self, v1, v2, npoints=None):
-        # vector from v1 to v2
-        dir = v2.coord - v1.coord
+    def _test_path(self, v1, v2):
+        # test if the line from v1 to v2 is obstacle free
+        return self.occgrid.segment_free(v1.coord, v2.coord)[0]
 
-        # figure the number of points, essentially the line length
-        # TODO: should delegate this test to the OccGrid object and do it
-        # world units
-        if npoints is None:
-            npoints = int(round(np.linalg.norm(dir)))
-
-        # test each point along the line from v1 to v2
-        for s in np.linspace(0, 1, npoints):
-            if self.occgrid.isoccupied(v1.coord + s * dir):
-                return False
-        return True
-
-    def plan(self, npoints=None, dist_thresh=None, animate=None):
+    def plan(self, npoints=None, dist_thresh=None, k=None, animate=None):
         """
         Plan PRM path
 
@@ -202,13 +210,18 @@ class PRMPlanner(PlannerBase):
         :param dist_thresh: distance threshold, defaults to ``dist_thresh`` given
             to constructor
         :type dist_thresh: float, optional
+        :param k: maximum number of neighbours, defaults to ``k`` given to
+            constructor
+        :type k: int, optional
         :param animate: animate the planning algorithm iterations, defaults to False
         :type animate: bool, optional
 
         Create a probablistic roadmap.  This is a graph connecting points
         randomly selected from the free space of the occupancy grid. Edges are
         created between points if the distance between them is less than
-        ``dist_thresh``.
+        ``dist_thresh`` and, if ``k`` is given, one is among the ``k`` nearest
+        neighbours of the other.  Neighbours are found using a KD-tree so the
+        roadmap can have many thousands of points.
 
         The roadmap is a pgraph :obj:`~pgraph.PGraph.UGraph`
         :class:`~pgraph.UGraph`
@@ -225,11 +238,14 @@ class PRMPlanner(PlannerBase):
         if dist_thresh is None:
             dist_thresh = self.dist_thresh
 
+        if k is None:
+            k = self._k
+
         self._graph = UGraph()
         self._v_path = np.array([])
 
         self.random_init()  # reset the random number generator
-        self._create_roadmap(npoints, dist_thresh, animate)
+        self._create_roadmap(npoints, dist_thresh, k, animate)
 
     def query(self, start, goal, **kwargs):
         """
@@ -257,8 +273,9 @@ class PRMPlanner(PlannerBase):
         super().query(start=start, goal=goal, next=False, **kwargs)
 
         # find roadmap vertices closest to start and goal
-        vstart, _ = self.graph.closest(self.start)
-        vgoal, _ = self.graph.closest(self.goal)
+        _, (istart, igoal) = self._kdtree.query([self.start, self.goal])
+        vstart = self._vertices[istart]
+        vgoal = self._vertices[igoal]
 
         # find A* path through the roadmap
         out = self.graph.path_Astar(vstart, vgoal)
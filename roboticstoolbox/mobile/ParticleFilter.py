@@ -9,13 +9,12 @@ Based on code by Paul Newman, Oxford University,
 http://www.robots.ox.ac.uk/~pnewman
 """
 
-from collections import namedtuple
-
 import numpy as np
-import scipy as sp
 import matplotlib.pyplot as plt
 from spatialmath import base
 
+from roboticstoolbox.mobile.history import History
+
 """
 Monte-carlo based localisation for estimating vehicle pose based on
 odometry and observations of known landmarks.
@@ -26,8 +25,9 @@ odometry and observations of known landmarks.
 class ParticleFilter:
     
     def __init__(self, robot, sensor, R, L, nparticles=500, seed=0, x0=None,
-    verbose=False, animate=False, history=True, workspace=None):
-        """
+    verbose=False, animate=False, history=True, workspace=None,
+    resample="systematic", neff=1.0, batch=False):
+        r"""
         Particle filter
 
         :param robot: robot motion model
@@ -47,9 +47,15 @@ class ParticleFilter:
         :param verbose: display extra debug information, defaults to False
         :type verbose: bool, optional
         :param history: retain step-by-step history, defaults to True
-        :type history: bool, optional
+        :type history: bool or :class:`History`, optional
         :param workspace: dimension of workspace, see :func:`~spatialmath.base.graphics.expand_dims`
         :type workspace: scalar, array_like(2), array_like(4)
+        :param resample: resampling scheme, one of "systematic" [default], "stratified", "residual" or "multinomial"
+        :type resample: str, optional
+        :param neff: resample when the effective sample size is less than this fraction of ``nparticles``, defaults to 1
+        :type neff: float, optional
+        :param batch: weight particles using all visible landmarks at each step, defaults to False
+        :type batch: bool, optional
 
         This class implements a Monte-Carlo estimator or particle filter for
         vehicle state, based on odometry, a landmark map, and landmark
@@ -57,6 +63,14 @@ class ParticleFilter:
         configuration :math:`(x,y,\theta)`.  Bootstrap particle resampling is 
         used.
 
+        Particle weights are held as logarithms so that the product of
+        likelihoods over several landmarks, or over several steps without
+        resampling, does not underflow.  Particles are resampled when the
+        effective sample size :math:`1 / \sum w_i^2`, for normalized weights,
+        falls below ``neff * nparticles``, so the default of 1 resamples
+        after every observation.  All the resampling schemes are
+        :math:`O(N)` in the number of particles.
+
         The working area is defined by ``workspace`` or inherited from the
         landmark map attached to the ``sensor`` (see
         :func:`~spatialmath.base.graphics.expand_dims`):
@@ -106,18 +120,28 @@ class ParticleFilter:
         self._animate = animate
 
         # self.dim = sensor.map.dim
-        self._history = []
         self.x = ()
         self.weight = ()
         self.w0 = 0.05
         self._x0 = x0
 
+        if resample not in ("systematic", "stratified", "residual", "multinomial"):
+            raise ValueError(f"unknown resampling scheme {resample}")
+        self._resample = resample
+        self._neff = neff
+        self._batch = batch
+
         # create a private random number stream if required
         self._random = np.random.default_rng(seed)
         self._seed = seed
 
-        self._keep_history = history     #  keep history
-        self._htuple = namedtuple("PFlog", "t odo xest std weights")
+        if isinstance(history, History):
+            self._history = history
+            self._keep_history = True
+        else:
+            self._history = History()
+            self._keep_history = history     #  keep history
+        self._history._bind("PFlog", ("t", "odo", "xest", "std", "weights"))
 
         if workspace is not None:
             self._dim = base.expand_dims(workspace)
@@ -195,14 +219,20 @@ class ParticleFilter:
         Get EKF simulation history
 
         :return: simulation history
-        :rtype: list of namedtuples
+        :rtype: :class:`History`
+
+        At each simulation timestep a namedtuple of is appended to the history.
+        It contains, for that time step, estimated state, standard deviation
+        and particle weights.  The history can be indexed and iterated over
+        like a list of namedtuples.
 
-        At each simulation timestep a namedtuple of is appended to the history
-        list.  It contains, for that time step, estimated state and covariance,
-        and sensor observation.
+        The particle weights are the largest part of the history, to limit
+        the memory used pass a :class:`History` instance as the ``history``
+        argument to the constructor, for example
+        ``History(fields=("t", "xest", "std"))``.
 
         :seealso: :meth:`get_t` :meth:`get_xy` :meth:`get_std` 
-            :meth:`get_Pnorm` 
+            :meth:`get_Pnorm` :class:`History`
         """
         return self._history
 
@@ -257,7 +287,7 @@ class ParticleFilter:
         self.sensor.init()
 
         #clear the history
-        self._history = []
+        self._history.clear()
 
         # create a new private random number generator
         if self._seed is not None:
@@ -277,6 +307,7 @@ class ParticleFilter:
             self.x = np.c_[x, y, t] 
 
         self.weight = np.ones((self.nparticles,))
+        self._logweight = np.zeros((self.nparticles,))
 
 
     def run(self, T=10, x0=None):
@@ -332,20 +363,25 @@ class ParticleFilter:
         self._predict(odo)
 
         # get a sensor reading
-        z, lm_id = self.sensor.reading()         
+        if self._batch:
+            z, lm_id = self.sensor.readings()
+        else:
+            z, lm_id = self.sensor.reading()
 
         if z is not None:
             self._observe(z, lm_id)
             #fprintf(' observe beacon #d\n', lm_id)
 
-            self._select()
+            if self.neff() < self._neff * self.nparticles:
+                self._select()
 
-        # our estimate is simply the mean of the particles
-        x_est = self.x.mean(axis=0)
-        std_est = self.x.std(axis=0)
+        # our estimate is simply the weighted mean of the particles, the
+        # weights are equal if they have just been resampled
+        x_est = np.average(self.x, axis=0, weights=self.weight)
+        std_est = np.sqrt(np.average((self.x - x_est) ** 2, axis=0, weights=self.weight))
 
         # std is more complex for angles, need to account for 2pi wrap
-        std_est[2] = np.sqrt(np.sum(base.angdiff(self.x[:,2], x_est[2]) ** 2)) / (self.nparticles-1)
+        std_est[2] = np.sqrt(np.average(base.angdiff(self.x[:,2], x_est[2]) ** 2, weights=self.weight))
 
         # display the updated particles
         # set(self.h, 'Xdata', self.x(:,1), 'Ydata', self.x(:,2), 'Zdata', self.x(:,3))
@@ -358,14 +394,8 @@ class ParticleFilter:
         #     self.anim.add()
 
         if self._keep_history:
-            hist = self._htuple(
-                self.robot._t,
-                odo.copy(),
-                x_est,
-                std_est,
-                self.weight.copy()
-            )
-            self._history.append(hist)
+            # the history copies the values
+            self._history.append(self.robot._t, odo, x_est, std_est, self.weight)
 
     def plot_pdf(self):
         """
@@ -433,16 +463,41 @@ class ParticleFilter:
         #
         # Vectorized code:
 
-        invL = np.linalg.inv(self.L)
-        z_pred = self.sensor.h(self.x, lm_id)
-        z_pred[:, 0] = z[0] - z_pred[:, 0]
-        z_pred[:, 1] = base.angdiff(z[1], z_pred[:, 1])
+        # Vectorized code, the likelihood of the observations of all the
+        # landmarks is the product of the likelihoods for each landmark, ie. 
+        # the sum of their logarithms:
 
+        invL = np.linalg.inv(self.L)
         LL = -0.5 * np.r_[invL[0,0], invL[1,1], 2*invL[0,1]]
-        e = np.c_[z_pred[:, 0]**2, z_pred[:, 1]**2, z_pred[:,0] * z_pred[:, 1]] @ LL
-        self.weight = np.exp(e) + self.w0  
+        logw0 = np.log(self.w0)
 
+        for zk, idk in zip(np.reshape(z, (-1, 2)), np.atleast_1d(lm_id)):
+            z_pred = self.sensor.h(self.x, idk)
+            dr = zk[0] - z_pred[:, 0]
+            db = base.angdiff(zk[1], z_pred[:, 1])
 
+            e = LL[0] * dr**2 + LL[1] * db**2 + LL[2] * dr * db
+            # log(exp(e) + w0)
+            self._logweight += np.logaddexp(e, logw0)
+
+        # keep the largest log weight at zero
+        self._logweight -= self._logweight.max()
+        self.weight = np.exp(self._logweight)
+
+    def neff(self):
+        r"""
+        Effective sample size
+
+        :return: effective number of particles
+        :rtype: float
+
+        The effective sample size :math:`1 / \sum w_i^2` computed from the
+        normalized particle weights.  It is equal to the number of particles
+        when all weights are equal and tends to one as the weight concentrates
+        on a single particle.
+        """
+        w = self.weight / self.weight.sum()
+        return 1.0 / np.dot(w, w)
 
     def _select(self):
         # step 4
@@ -450,19 +505,45 @@ class ParticleFilter:
         #       
         # particles with large weights will occupy a greater percentage of the
         # y axis in a cummulative plot
-        cdf = np.cumsum(self.weight) / self.weight.sum()
-
-        # so randomly (uniform) choosing y values is more likely to correspond to
-        # better particles...
-        iselect  = self.random.uniform(0, 1, size=(self.nparticles,))
-
-        # find the particle that corresponds to each y value (just a look up)
-        interpfun = sp.interpolate.interp1d(cdf, np.arange(self.nparticles), 
-                assume_sorted=True, kind='nearest', fill_value='extrapolate')
-        inextgen = interpfun(iselect).astype(np.int)
-
-        # copy selected particles for next generation..
+        N = self.nparticles
+        w = self.weight / self.weight.sum()
+
+        if self._resample == "residual":
+            # deterministically keep floor(N w) copies of each particle, then
+            # choose the remainder according to the residual weights
+            Nw = N * w
+            counts = np.floor(Nw).astype(int)
+            inextgen = np.repeat(np.arange(N), counts)
+            nresidual = N - len(inextgen)
+            if nresidual > 0:
+                residual = Nw - counts
+                cdf = np.cumsum(residual) / residual.sum()
+                u = (self.random.uniform() + np.arange(nresidual)) / nresidual
+                inextgen = np.r_[inextgen, np.searchsorted(cdf, u, side="right")]
+        else:
+            cdf = np.cumsum(w)
+
+            # so randomly (uniform) choosing y values is more likely to
+            # correspond to better particles...
+            if self._resample == "systematic":
+                # a single random offset, evenly spaced
+                u = (self.random.uniform() + np.arange(N)) / N
+            elif self._resample == "stratified":
+                # one random value in each of N equal strata
+                u = (self.random.uniform(size=(N,)) + np.arange(N)) / N
+            else:
+                u = self.random.uniform(0, 1, size=(N,))
+
+            # find the particle that corresponds to each y value (just a look up)
+            inextgen = np.searchsorted(cdf, u, side="right")
+
+        # cdf[-1] may be slightly less than one due to rounding
+        inextgen = np.minimum(inextgen, N - 1)
+
+        # copy selected particles for next generation, all are equally likely
         self.x = self.x[inextgen, :]
+        self._logweight = np.zeros((N,))
+        self.weight = np.ones((N,))
 
     def get_t(self):
         """
@@ -474,7 +555,7 @@ class ParticleFilter:
         Return simulation time vector, starts at zero.  The timestep is an
         attribute of the ``robot`` object.
         """
-        return np.array([h.t for h in self._history])
+        return self._history.column("t")
 
     def get_xyt(self):
         r"""
@@ -485,7 +566,7 @@ class ParticleFilter:
 
         :seealso: :meth:`plot_xy` :meth:`run` :meth:`history`
         """
-        return np.array([h.xest[:2] for h in self._history])
+        return self._history.column("xest")[:, :2]
 
     def get_std(self):
         r"""
@@ -499,7 +580,7 @@ class ParticleFilter:
 
         :seealso: :meth:`get_xyt`
         """
-        return np.array([h.std for h in self._history])
+        return self._history.column("std")
 
     def plot_xy(self, block=False, **kwargs):
         r"""
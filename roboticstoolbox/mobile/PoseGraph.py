@@ -6,11 +6,24 @@ from spatialmath import base, SE2
 import matplotlib.pyplot as plt
 import numpy as np
 import scipy as sp
+import scipy.sparse.linalg
+from scipy.sparse.csgraph import reverse_cuthill_mckee
 import zipfile
+import os
+import tempfile
 import time
 import math
 from pathlib import Path
 from progress.bar import FillingCirclesBar
+
+try:
+    from sksparse import cholmod
+
+    _cholmod = True
+except ImportError:  # pragma nocover
+    _cholmod = False
+
+
 class PGVertex(pgraph.UVertex):
 
     nvertices = 0
@@ -87,7 +100,34 @@ class PoseGraph:
     #     center
     #     cellsize
 
-    def __init__(self, filename, lidar=False, verbose=False):
+    def __init__(self, filename, lidar=False, verbose=False, cache=False):
+        """
+        Pose graph
+
+        :param filename: name of g2o or TORO format file, optionally zipped
+        :type filename: str
+        :param lidar: load the lidar scans, defaults to False
+        :type lidar: bool, optional
+        :param verbose: display extra debug information, defaults to False
+        :type verbose: bool, optional
+        :param cache: cache the parsed file, defaults to False
+        :type cache: bool, optional
+
+        Loads a pose graph from a file in g2o or TORO format.  The records
+        are parsed in bulk into NumPy arrays of vertex poses, edge means and
+        edge information matrices.  The :class:`pgraph.UGraph` object
+        ``graph`` is only created when it is first used, the optimizer works
+        directly on the arrays.
+
+        Lidar scans, from ROBOTLASER1 records, are decoded when first
+        accessed by :meth:`scan`.
+
+        If ``cache`` is True the parsed file is saved as ``FILENAME.npz`` next
+        to the source file and is loaded from there, which is much faster,
+        unless the source file has changed.
+
+        :seealso: :meth:`optimize` :meth:`scan`
+        """
         # parse the file data
         # we assume g2o format
         #    VERTEX* vertex_id X Y THETA
@@ -95,172 +135,295 @@ class PoseGraph:
         # vertex numbers start at 0
         
         self.lidar = lidar
-        
-        self.graph = pgraph.UGraph(verbose=verbose)
+        self._verbose = verbose
+        self._graph = None
+        self._problem = None
 
         path = Path(rtb.rtb_path_to_datafile(filename))
 
+        data = None
+        if cache:
+            cachefile = path.with_name(path.name + ".npz")
+            data = self._loadcache(path, cachefile, lidar)
+        if data is None:
+            data = self._parse(path, lidar, filename)
+            if cache:
+                self._savecache(path, cachefile, data)
+
+        self._vid = data["vid"]
+        self._x = data["vcoord"]
+        self._vtype = data["vtype"]
+        self._ei = data["ei"]
+        self._ej = data["ej"]
+        self._emean = data["emean"]
+        self._einfo = data["einfo"]
+
+        if data["toro"]:
+            filetype = "TORO/LAGO"
+        else:
+            filetype = "g2o"
+        print(f"loaded {filetype} format file: {len(self._x)} vertices, {len(self._ei)} edges")
+
+        # lidar scans, held as raw records until decoded
+        self._scanvertex = {}
+        if lidar and len(data["svertex"]) > 0:
+            self._scanvertex = {v: k for k, v in enumerate(data["svertex"])}
+            self._scanlines = data.get("slines")
+            self._ranges = data.get("sranges")
+            self._times = data.get("stimes")
+            self._nbeams = int(data["nbeams"])
+
+            angmin, angrange, anginc, maxrange = data["lidarmeta"]
+            self._angmin = angmin
+            self._angmax = angmin + angrange
+            self._anginc = anginc
+            self._maxrange = maxrange
+
+            fov = np.degrees([self._angmin, self._angmax])
+            print(f"  {len(self._scanvertex)} lidar scans: {self._nbeams} beams, fov {fov[0]:.1f}° to {fov[1]:.1f}°, max range {self._maxrange}")
+
+    # indices into the 6 information matrix elements in the file to give the
+    # 3x3 info matrix in row major order
+    # IXX IXY IXT IYY IYT ITT
+    #   0   1   2   3   4   5
+    _g2o =  [0,  1,  2,  1,  3,  4,   2,  4,  5]
+    # IXX IXY IYY ITT IXT IYT
+    #   0   1   2   3   4   5
+    _toro = [0,  1,  4,  1,  2,  5,  4,  5,  3]
+
+    @staticmethod
+    def _parse(path, lidar, filename):
+        # parse the file into arrays, each type of record is converted in
+        # bulk
         if path.suffix == '.zip':
-            zf = zipfile.ZipFile(path, 'r')
-            opener = zf.open
-            path = path.stem
+            with zipfile.ZipFile(path, 'r') as zf:
+                text = zf.read(path.stem).decode()
         else:
-            opener = open
-
-        with opener(path, 'r') as f:
-
-            toroformat = False
-            nlidar = 0
-            
-            # indices into ROBOTLASER1 record for the 3x3 info matrix in column major
-            # order
-            # IXX IXY IXT IYY IYT ITT
-            #   6   7   8   9  10  11
-            #   0   1   2   3   4   5
-            g2o =  [0,  1,  2,  1,  3,  4,   2,  4,  5]
-            # IXX IXY IYY ITT IXT IYT
-            #   6   7   8   9  10  11
-            #   0   1   2   3   4   5
-            toro = [0,  1,  4,  1,  2,  5,  4,  5,  3]
-            
-            # we keep an array self. = vindex(gi) to map g2o vertex index to PGraph vertex index
-            
-            self.vindex = {}
-            firstlidar = True
-            for line in f:
-                # for zip file, we get data as bytes not str
-                if isinstance(line, bytes):
-                    line = line.decode()
-                
-                # is it a comment?
-                if line.startswith('#'):
+            with open(path, 'r') as f:
+                text = f.read()
+
+        # group the lines by record type, keeping their order in the file
+        records = {}
+        vertex = []  # index into each vertex group of each vertex, in order
+        for line in text.splitlines():
+            tokens = line.split(None, 1)
+            # skip blank lines and comments
+            if len(tokens) == 0 or line.startswith('#'):
+                continue
+            tag = tokens[0]
+            if tag in ('VERTEX_SE2', 'VERTEX_XY', 'VERTEX2'):
+                vertex.append((tag, len(records.get(tag, ()))))
+            elif tag == 'ROBOTLASER1':
+                # lidar records are associated with the immediately 
+                # preceding VERTEX record
+                if not lidar:
                     continue
-                
-                tokens = line.split()
-                
-                # g2o format records
-                if tokens[0] == 'VERTEX_SE2':
-                    coord = np.array([float(x) for x in tokens[2:5]])
-                    id = tokens[1]
-
-                    v = PGVertex('vertex', coord=coord, name=id)
-                    self.graph.add_vertex(v)
-
-                elif tokens[0] ==  'VERTEX_XY':
-                    coord = np.array([float(x) for x in tokens[2:4]])
-                    id = tokens[1]
-
-                    v = PGVertex('landmark', coord=coord, name=id)
-                    self.graph.add_vertex(v)
-                        
-                elif tokens[0] ==  'EDGE_SE2':                    
-                    v1 = tokens[1]
-                    v2 = tokens[2]
-
-                    # create the edge data as a structure
-                    #  X  Y  T
-                    #  3  4  5
-                    mean = np.array([float(x) for x in tokens[3:6]])
-                    
-                    # IXX IXY IXT IYY IYT ITT
-                    #   6   7   8   9  10  11
-                    d = np.array([float(x) for x in tokens[6:12]])
-                    info = d[g2o].reshape((3,3))
-
-                    # create the edge
-                    v1 = self.graph[v1]
-                    v2 = self.graph[v2]
-                    e = PGEdge(v1, v2, mean, info)
-                    v1.connect(v2, edge=e)
-
-                ## TORO format records
-                # https://openslam-org.github.io/toro.html
-                elif tokens[0] == 'VERTEX2':
-                    toroformat = True
-
-                    coord = np.array([float(x) for x in tokens[2:5]])
-                    id = tokens[1]
-
-                    v = PGVertex('vertex', coord=coord, name=id)
-                    self.graph.add_vertex(v)
-                        
-                elif tokens[0] == 'EDGE2':
-                    toroformat = True
-                    
-                    v1 = tokens[1]
-                    v2 = tokens[2]
-
-                    # create the edge data as a structure
-                    #  X  Y  T
-                    #  3  4  5
-                    mean = np.array([float(x) for x in tokens[3:6]])
-                    
-                    # IXX IXY IYY ITT IXT IYT
-                    #   6   7   8   9  10  11
-                    d = np.array([float(x) for x in tokens[6:12]])
-                    info = d[toro].reshape((3,3))
-
-                    # create the edge
-                    v1 = self.graph[v1]
-                    v2 = self.graph[v2]
-                    e = PGEdge(v1, v2, mean, info)
-                    v1.connect(v2, edge=e)
-                        
-                elif tokens[0] == 'ROBOTLASER1':
-                    if not lidar:
-                        continue
-                    
-                    # lidar records are associated with the immediately 
-                    # preceding VERTEX record
-                    #
-                    # not quite sure what all the fields are
-                    # 1 ?
-                    # 2 min scan angle
-                    # 3 scan range
-                    # 4 angular increment
-                    # 5 maximum range possible
-                    # ?
-                    # 8 N = number of beams
-                    # 9 to 9+N lidar range data
-                    # ?
-                    # 9+N+12 timestamp (*nix timestamp)
-                    # 9+N+13 lidar type (str)
-
-
-                    if firstlidar:
-                        nbeams = int(tokens[8])
-                        lidarmeta = tokens[2:6]
-                        firstlidar = False
-
-                    # add attributes to the most recent vertex created
-                    v.theta = np.arange(0, nbeams) * float(tokens[4]) + float(tokens[2])
-                    v.range = np.array([float(x) for x in tokens[9:nbeams+9]])
-                    v.time = float(tokens[21+nbeams])
-                    self.vindex[v.index] = v
-                    nlidar+= 1
+                line = (len(vertex) - 1, line)
+            elif tag not in ('EDGE_SE2', 'EDGE2'):
+                raise RuntimeError(f"Unexpected line  {line} in {filename}")
+            records.setdefault(tag, []).append(line)
+
+        def table(tag, ncols):
+            # records of one type as a 2D array of string tokens
+            lines = records.get(tag, [])
+            tokens = np.array(" ".join(lines).split(), dtype=str)
+            try:
+                return tokens.reshape((len(lines), ncols))
+            except ValueError:
+                raise RuntimeError(f"Bad {tag} record in {filename}") from None
+
+        # vertices
+        #    VERTEX_SE2 id X Y THETA
+        #    VERTEX_XY id X Y
+        #    VERTEX2 id X Y THETA  (TORO)
+        se2 = np.concatenate((table('VERTEX_SE2', 5), table('VERTEX2', 5)))
+        xy = table('VERTEX_XY', 4)
+        nse2 = len(records.get('VERTEX_SE2', ()))
+        order = np.array(
+            [
+                k + (nse2 if tag == 'VERTEX2' else 0) if tag != 'VERTEX_XY' else len(se2) + k
+                for tag, k in vertex
+            ],
+            dtype=int,
+        ).reshape((-1,))
+        vid = np.r_[se2[:, 1], xy[:, 1]][order]
+        vcoord = np.r_[
+            se2[:, 2:5].astype(float),
+            np.c_[xy[:, 2:4].astype(float), np.full((len(xy),), np.nan)],
+        ][order]
+        vtype = np.r_[np.zeros((len(se2),), dtype=bool), np.ones((len(xy),), dtype=bool)][order]
+
+        # edges
+        #    EDGE_SE2 v1 v2 X Y THETA IXX IXY IXT IYY IYT ITT
+        #    EDGE2    v1 v2 X Y THETA IXX IXY IYY ITT IXT IYT  (TORO)
+        g2o = table('EDGE_SE2', 12)
+        toro = table('EDGE2', 12)
+        edges = np.r_[g2o, toro]
+        emean = edges[:, 3:6].astype(float)
+        d = edges[:, 6:12].astype(float)
+        einfo = np.r_[
+            d[:len(g2o), PoseGraph._g2o],
+            d[len(g2o):, PoseGraph._toro]
+        ].reshape((-1, 3, 3))
+
+        # map vertex names to vertex index
+        vorder = np.argsort(vid)
+        vsorted = vid[vorder]
+
+        def vindex(names):
+            k = np.searchsorted(vsorted, names)
+            k[k == len(vsorted)] = 0
+            if len(names) > 0 and np.any(vsorted[k] != names):
+                raise RuntimeError(f"Edge to unknown vertex in {filename}")
+            return vorder[k]
+
+        data = dict(
+            toro=len(records.get('VERTEX2', ())) + len(toro) > 0,
+            vid=vid,
+            vcoord=vcoord,
+            vtype=vtype,
+            ei=vindex(edges[:, 1]),
+            ej=vindex(edges[:, 2]),
+            emean=emean,
+            einfo=einfo,
+        )
+
+        # lidar scans, not quite sure what all the fields are
+        # 1 ?
+        # 2 min scan angle
+        # 3 scan range
+        # 4 angular increment
+        # 5 maximum range possible
+        # ?
+        # 8 N = number of beams
+        # 9 to 9+N lidar range data
+        # ?
+        # 9+N+12 timestamp (*nix timestamp)
+        # 9+N+13 lidar type (str)
+        scans = records.get('ROBOTLASER1', [])
+        data["svertex"] = np.array([v for v, _ in scans], dtype=int)
+        if len(scans) > 0:
+            tokens = scans[0][1].split()
+            data["nbeams"] = int(tokens[8])
+            data["lidarmeta"] = np.array([float(x) for x in tokens[2:6]])
+            data["slines"] = [line for _, line in scans]
+        return data
+
+    @staticmethod
+    def _decodelines(lines, nbeams):
+        # decode lidar scan records into arrays of range and time
+        tokens = np.array([line.split()[: nbeams + 22] for line in lines])
+        return tokens[:, 9: nbeams + 9].astype(float), tokens[:, 21 + nbeams].astype(float)
+
+    def _decode(self):
+        # decode all the lidar scan records, when first needed
+        self._ranges, self._times = self._decodelines(self._scanlines, self._nbeams)
+        self._scanlines = None
+
+    @staticmethod
+    def _cachekey(path):
+        st = path.stat()
+        return np.array([st.st_mtime_ns, st.st_size])
+
+    @staticmethod
+    def _loadcache(path, cachefile, lidar):
+        # any failure to read the cache, a missing, truncated or stale file,
+        # is treated as a cache miss
+        try:
+            with np.load(cachefile) as npz:
+                if not np.array_equal(npz["key"], PoseGraph._cachekey(path)):
+                    return None
+                if lidar and not npz["lidar"]:
+                    return None
+
+                data = {
+                    k: npz[k]
+                    for k in ("vid", "vcoord", "vtype", "ei", "ej", "emean", "einfo")
+                }
+                data["toro"] = bool(npz["toro"])
+                data["svertex"] = npz["svertex"] if lidar else np.zeros((0,), dtype=int)
+                if lidar and len(data["svertex"]) > 0:
+                    data["nbeams"] = int(npz["nbeams"])
+                    data["lidarmeta"] = npz["lidarmeta"]
+                    data["sranges"] = npz["sranges"]
+                    data["stimes"] = npz["stimes"]
+        except Exception:
+            return None
+        return data
+
+    @staticmethod
+    def _savecache(path, cachefile, data):
+        data = dict(data)
+        data["key"] = PoseGraph._cachekey(path)
+        data["lidar"] = "slines" in data or len(data["svertex"]) > 0
+        if "slines" in data:
+            # decode the scans before saving
+            data["sranges"], data["stimes"] = PoseGraph._decodelines(
+                data.pop("slines"), data["nbeams"])
+        try:
+            # write to a temporary file first so a concurrent reader never
+            # sees a partial file
+            fd, tmp = tempfile.mkstemp(dir=cachefile.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.savez(f, **data)
+                os.replace(tmp, cachefile)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError:
+            # the cache is optional, the source may be read only
+            pass
+
+    @property
+    def graph(self):
+        """
+        Pose graph
+
+        :return: the pose graph
+        :rtype: :class:`pgraph.UGraph`
+
+        The graph is created from the parsed file when first accessed.  The
+        ``coord`` attribute of each vertex is a view of the pose that is
+        updated by :meth:`optimize`.
+        """
+        if self._graph is None:
+            g = pgraph.UGraph(verbose=self._verbose)
+            vertices = []
+            for k, (id, landmark) in enumerate(zip(self._vid, self._vtype)):
+                if landmark:
+                    v = PGVertex('landmark', name=str(id))
+                    v.coord = self._x[k, :2]
                 else:
-                    raise RuntimeError(f"Unexpected line  {line} in {filename}")
+                    v = PGVertex('vertex', name=str(id))
+                    v.coord = self._x[k]
+                g.add_vertex(v)
+                vertices.append(v)
+            for i, j, mean, info in zip(self._ei, self._ej, self._emean, self._einfo):
+                e = PGEdge(vertices[i], vertices[j], mean, info)
+                vertices[i].connect(vertices[j], edge=e)
+            self._graph = g
+        return self._graph
 
-            if toroformat:
-                filetype = "TORO/LAGO"
-            else:
-                filetype = "g2o"
-            print(f"loaded {filetype} format file: {self.graph.n} vertices, {self.graph.ne} edges")
-            
-            if nlidar > 0:
-                lidarmeta = [float(x) for x in lidarmeta]
-                
-                self._angmin = lidarmeta[0]
-                self._angmax = sum(lidarmeta[0:2])
-                self._maxrange = lidarmeta[3]
-
-                fov = np.degrees([self._angmin, self._angmax])
-                print(f"  {nlidar} lidar scans: {nbeams} beams, fov {fov[0]:.1f}° to {fov[1]:.1f}°, max range {self._maxrange}")
-
-    
     def scan(self, i):
-        v = self.vindex[i]
-        return v.range, v.theta
+        """
+        Lidar scan
+
+        :param i: vertex index
+        :type i: int
+        :return: range and angle of each beam
+        :rtype: ndarray(N), ndarray(N)
+
+        Returns the lidar scan associated with vertex ``i``.
+        """
+        try:
+            k = self._scanvertex[i]
+        except KeyError:
+            raise ValueError(f"no lidar scan for vertex {i}") from None
+        if self._ranges is None:
+            self._decode()
+        theta = np.arange(0, self._nbeams) * self._anginc + self._angmin
+        return self._ranges[k], theta
     
     def scanxy(self, i):
         
@@ -280,10 +443,16 @@ class PoseGraph:
             plt.pause(1)
 
     def pose(self, i):
-        return self.vindex[i].coord
+        return self._x[i]
     
     def time(self, i):
-        return self.vindex[i].time
+        try:
+            k = self._scanvertex[i]
+        except KeyError:
+            raise ValueError(f"no lidar scan for vertex {i}") from None
+        if self._times is None:
+            self._decode()
+        return self._times[k]
     
     def plot(self, **kwargs):
         if not 'vopt' in kwargs:
@@ -304,37 +473,38 @@ class PoseGraph:
     def scanmap(self, occgrid, maxrange=None):
         # note about maxrange timing
 
-        bar = FillingCirclesBar('Converting', max=self.graph.n, 
+        bar = FillingCirclesBar('Converting', max=len(self._x), 
             suffix = '%(percent).1f%% - %(eta)ds')
 
         grid1d = occgrid.ravel
-        for i in range(0, self.graph.n, 5):
+        for i in range(0, len(self._x), 5):
             
             xy = self.scanxy(i)
             r, theta = self.scan(i)
             if maxrange is not None:
                 toofar = np.where(r > maxrange)[0]
                 xy = np.delete(xy, toofar, axis=1)
-            xyt = self.vindex[i].coord
+            xyt = self._x[i]
             
             xy = SE2(xyt) * xy
             
-            # start of each ray
-            p1 = occgrid.w2g(xyt[:2])
-            
-            for p2 in occgrid.w2g(xy.T):
+            # start and end of each ray
+            p2 = occgrid.w2g(xy.T).astype(float)
+            p1 = np.tile(occgrid.w2g(xyt[:2]), (len(p2), 1)).astype(float)
 
-                # all cells along the ray
-                try:
-                    k = occgrid._line(p1, p2)
-                except ValueError:
-                    # silently ignore rays to points outside the grid map
-                    continue
-                
-                # increment cells along the ray, these are free space
-                grid1d[k[:-1]] += 1
-                # decrement target cell
-                grid1d[k[-1]] -= 1
+            # all cells along all the rays, in order along each ray
+            seg, r, c = occgrid._supercover(p1, p2)
+
+            # silently ignore rays to points outside the grid map
+            outside = (c < 0) | (c >= occgrid.shape[1]) | (r < 0) | (r >= occgrid.shape[0])
+            keep = ~np.isin(seg, seg[outside])
+            seg, k = seg[keep], np.ravel_multi_index((r[keep], c[keep]), occgrid.shape)
+
+            # increment cells along the ray, these are free space, and
+            # decrement the target cell
+            last = np.r_[seg[1:] != seg[:-1], True]
+            np.add.at(grid1d, k[~last], 1)
+            np.add.at(grid1d, k[last], -1)
 
             bar.next()
 
@@ -412,17 +582,72 @@ class PoseGraph:
 # n:	 number of iterations
 # newmeans: matrix containing the column vectors of the updated vertices positions
     
-    def optimize(self, iterations = 10, animate = False, retain = False, **kwargs):
-        
-        eprev  =  math.inf
+    def optimize(self, iterations=10, animate=False, retain=False,
+            method="gauss-newton", kernel=None, delta=1, lmbda=1e-4, **kwargs):
+        r"""
+        Optimize the pose graph
+
+        :param iterations: maximum number of iterations, defaults to 10
+        :type iterations: int, optional
+        :param animate: plot the graph at each iteration, defaults to False
+        :type animate: bool, optional
+        :param retain: retain the plot of previous iterations, defaults to False
+        :type retain: bool, optional
+        :param method: optimization method, "gauss-newton" [default] or "levenberg-marquardt"
+        :type method: str, optional
+        :param kernel: robust kernel, None [default], "huber" or "cauchy"
+        :type kernel: str, optional
+        :param delta: width of the robust kernel, defaults to 1
+        :type delta: float, optional
+        :param lmbda: initial Levenberg-Marquardt damping, defaults to 1e-4
+        :type lmbda: float, optional
+        :param kwargs: options passed to :meth:`~pgraph.UGraph.plot` if animating
+        :return: final cost
+        :rtype: float
+
+        The vertex poses are adjusted to minimize the sum of squared errors
+        :math:`e_k^T \Omega_k e_k` over all edges.  The normal equations are
+        assembled as a sparse matrix, directly from the per-edge blocks, and
+        the fill-reducing ordering is computed once and reused at every
+        iteration.  If scikit-sparse is installed the CHOLMOD symbolic
+        factorization is reused instead.
+
+        Gauss-Newton stops when the cost no longer decreases.
+        Levenberg-Marquardt rejects a step that increases the cost and
+        increases the damping, otherwise it accepts the step and decreases the
+        damping.
+
+        A robust kernel reduces the influence of edges with large error, for
+        example wrong loop closures.  The kernels are functions of
+        :math:`s = e^T \Omega e`:
+
+        ==========   ==========================================
+        kernel       cost for :math:`s > \delta^2`
+        ==========   ==========================================
+        "huber"      :math:`2 \delta \sqrt{s} - \delta^2`
+        "cauchy"     :math:`\delta^2 \log(1 + s / \delta^2)` for all :math:`s`
+        ==========   ==========================================
+
+        and are minimized by iteratively reweighted least squares.
+
+        :seealso: :meth:`linearize_and_solve`
+        """
+        if method not in ("gauss-newton", "levenberg-marquardt"):
+            raise ValueError(f"unknown method {method}")
+        if kernel not in (None, "huber", "cauchy"):
+            raise ValueError(f"unknown kernel {kernel}")
+        self._setup()
+
+        eprev = math.inf
+        xprev = self._x.copy()
 
         if animate and retain:
             colors = plt.cm.Greys(np.linspace(0.3, 1, iterations))
-            if 'eopt' in kwargs:
-                eo = kwargs['eopt']
-                kwargs = {k: v for (k, v) in kwargs.items() if k != 'eopt'}
-            else:
-                eo = {}
+        if 'eopt' in kwargs:
+            eo = kwargs['eopt']
+            kwargs = {k: v for (k, v) in kwargs.items() if k != 'eopt'}
+        else:
+            eo = {}
 
         for i in range(iterations):
             if animate:
@@ -433,12 +658,171 @@ class PoseGraph:
                     eopt = {**eo, **dict(color=tuple(colors[i, :]), label=i)}
                 self.graph.plot(eopt=eopt, force2d=True, colorcomponents=False, **kwargs)
                 plt.pause(0.5)
-            
-            energy = self.linearize_and_solve()
-            
-            if energy >= eprev:
-                break
-            eprev = energy
+
+            if method == "gauss-newton":
+                x = self._x.copy()
+                energy = self.linearize_and_solve(kernel=kernel, delta=delta)
+
+                if energy >= eprev:
+                    # the previous step increased the cost, undo it
+                    self._x[:] = xprev
+                    break
+                eprev = energy
+                xprev = x
+            else:
+                # Levenberg-Marquardt
+                x = self._x.copy()
+                energy = self.linearize_and_solve(kernel=kernel, delta=delta, lmbda=lmbda)
+                enew = self._cost(kernel, delta)
+                if enew < energy:
+                    # accept the step
+                    lmbda /= 10
+                    if energy - enew < 1e-9 * energy:
+                        break
+                else:
+                    # reject the step
+                    self._x[:] = x
+                    lmbda *= 10
+                    if lmbda > 1e10:
+                        break
+
+        return self._cost(kernel, delta)
+
+    def _setup(self):
+        # the optimizer works on the arrays of vertex poses and edges from
+        # the file.  If the graph has been changed since, gather it into
+        # arrays again, the vertex coordinates become views into a single
+        # array so updating that array updates the vertices
+        g = self._graph
+        if g is not None and (g.n, g.ne) != (len(self._x), len(self._ei)):
+            vertices = list(g)
+            index = {id(v): k for k, v in enumerate(vertices)}
+            self._x = np.array([v.coord for v in vertices], dtype=float)
+            for k, v in enumerate(vertices):
+                v.coord = self._x[k]
+
+            edges = list(g.edges())
+            self._ei = np.array([index[id(e.endpoints[0])] for e in edges], dtype=int)
+            self._ej = np.array([index[id(e.endpoints[1])] for e in edges], dtype=int)
+            self._emean = np.array([e.mean for e in edges], dtype=float).reshape((-1, 3))
+            self._einfo = np.array([e.info for e in edges], dtype=float).reshape((-1, 3, 3))
+            self._problem = None
+
+        if self._problem == (len(self._x), len(self._ei)):
+            return
+
+        # the sparsity pattern of H is fixed, it has 3x3 blocks (i,i), (i,j),
+        # (j,i) and (j,j) for each edge, plus the anchor on the first vertex.
+        # The fill-reducing ordering depends only on this pattern and is
+        # computed once, H is assembled with its rows and columns already
+        # permuted.  Each element of the blocks, in the order they are
+        # computed, is mapped to its position in the compressed sparse column
+        # data of H.
+        n = 3 * len(self._x)
+        r, c = np.indices((3, 3))
+        r = r.ravel()
+        c = c.ravel()
+        bi = 3 * self._ei[:, np.newaxis]
+        bj = 3 * self._ej[:, np.newaxis]
+        rows = np.r_[(bi + r).ravel(), (bi + r).ravel(), (bj + r).ravel(), (bj + r).ravel(), r]
+        cols = np.r_[(bi + c).ravel(), (bj + c).ravel(), (bi + c).ravel(), (bj + c).ravel(), c]
+
+        pattern = sp.sparse.csr_matrix((np.ones(rows.shape), (rows, cols)), shape=(n, n))
+        self._perm = reverse_cuthill_mckee(pattern, symmetric_mode=True)
+        iperm = np.argsort(self._perm)
+        rows = iperm[rows]
+        cols = iperm[cols]
+
+        key, self._hmap = np.unique(cols * n + rows, return_inverse=True)
+        indptr = np.r_[0, np.cumsum(np.bincount(key // n, minlength=n))]
+        self._H = sp.sparse.csc_matrix(
+            (np.zeros((len(key),)), key % n, indptr), shape=(n, n)
+        )
+        self._hdiag = np.flatnonzero(key // n == key % n)
+
+        self._factor = None
+        self._problem = (len(self._x), len(self._ei))
+
+    def _linearize(self):
+        # vectorized form of PGEdge.linear_factors for all edges, the error
+        # and its Jacobians with respect to the poses of the two vertices
+        xi = self._x[self._ei, :]
+        xj = self._x[self._ej, :]
+        z = self._emean
+
+        si = np.sin(xi[:, 2])
+        ci = np.cos(xi[:, 2])
+        sz = np.sin(z[:, 2])
+        cz = np.cos(z[:, 2])
+
+        # displacement between x_i and x_j in the frame of x_i
+        dt = xj[:, :2] - xi[:, :2]
+        fx = ci * dt[:, 0] + si * dt[:, 1]
+        fy = -si * dt[:, 0] + ci * dt[:, 1]
+
+        # error is the displacement relative to the edge mean
+        e = np.c_[
+            cz * (fx - z[:, 0]) + sz * (fy - z[:, 1]),
+            -sz * (fx - z[:, 0]) + cz * (fy - z[:, 1]),
+            base.angdiff(xj[:, 2] - xi[:, 2] - z[:, 2]),
+        ]
+
+        # Jacobians, A = Rz' @ [-Ri' dRi'/dtheta dt; 0 0 -1], B = Rz' @ [Ri' 0; 0 1]
+        # where Rz is the rotation of the edge mean
+        m = len(z)
+        A = np.zeros((m, 3, 3))
+        B = np.zeros((m, 3, 3))
+        ai0 = np.c_[-ci, -si, -si * dt[:, 0] + ci * dt[:, 1]]
+        ai1 = np.c_[si, -ci, -ci * dt[:, 0] - si * dt[:, 1]]
+        A[:, 0, :] = cz[:, np.newaxis] * ai0 + sz[:, np.newaxis] * ai1
+        A[:, 1, :] = -sz[:, np.newaxis] * ai0 + cz[:, np.newaxis] * ai1
+        A[:, 2, 2] = -1
+        bi0 = np.c_[ci, si]
+        bi1 = np.c_[-si, ci]
+        B[:, 0, :2] = cz[:, np.newaxis] * bi0 + sz[:, np.newaxis] * bi1
+        B[:, 1, :2] = -sz[:, np.newaxis] * bi0 + cz[:, np.newaxis] * bi1
+        B[:, 2, 2] = 1
+
+        return e, A, B
+
+    def _weights(self, s, kernel, delta):
+        # robust kernel, the cost of each edge and the IRLS weight
+        if kernel is None:
+            return s, np.ones_like(s)
+        elif kernel == "huber":
+            d2 = delta ** 2
+            inlier = s <= d2
+            r = np.sqrt(s)
+            cost = np.where(inlier, s, 2 * delta * r - d2)
+            w = np.where(inlier, 1.0, delta / np.where(inlier, 1.0, r))
+            return cost, w
+        elif kernel == "cauchy":
+            d2 = delta ** 2
+            return d2 * np.log1p(s / d2), 1 / (1 + s / d2)
+
+    def _cost(self, kernel=None, delta=1):
+        self._setup()
+        e, _, _ = self._linearize()
+        s = np.einsum("ki,kij,kj->k", e, self._einfo, e)
+        cost, _ = self._weights(s, kernel, delta)
+        return cost.sum()
+
+    def _solve(self, H, b):
+        # solve H x = b where H has been assembled with the fill-reducing
+        # ordering applied, the symbolic analysis is reused if possible
+        p = self._perm
+        if _cholmod:
+            if self._factor is None:
+                self._factor = cholmod.analyze(H)
+            self._factor.cholesky_inplace(H)
+            xp = self._factor(b[p])
+        else:
+            lu = sp.sparse.linalg.splu(H, permc_spec="NATURAL",
+                diag_pivot_thresh=0, options=dict(SymmetricMode=True))
+            xp = lu.solve(b[p])
+        x = np.empty_like(b)
+        x[p] = xp
+        return x
 
     # linearizes and solves one time the ls-slam problem specified by the input
     # vmeans:   vertices positions at the linearization point
@@ -446,69 +830,81 @@ class PoseGraph:
     # emeans:   edge means
     # einfs:    edge information matrices
     # newmeans: new solution computed from the initial guess in vmeans
-    def linearize_and_solve(self):
+    def linearize_and_solve(self, kernel=None, delta=1, lmbda=0):
+        """
+        One iteration of pose graph optimization
+
+        :param kernel: robust kernel, None [default], "huber" or "cauchy"
+        :type kernel: str, optional
+        :param delta: width of the robust kernel, defaults to 1
+        :type delta: float, optional
+        :param lmbda: Levenberg-Marquardt damping, defaults to 0
+        :type lmbda: float, optional
+        :return: cost at the linearization point
+        :rtype: float
+
+        Linearizes the error of every edge about the current vertex poses,
+        solves the normal equations and updates the vertex poses.
+
+        :seealso: :meth:`optimize`
+        """
         t0  =  time.time()
-
-        g = self.graph
-        
-        # H and b are respectively the system matrix and the system vector
-        H = np.zeros((g.n * 3, g.n * 3))
-        b = np.zeros((g.n * 3, 1))
-        # this loop constructs the global system by accumulating in H and b the contributions
-        # of all edges (see lecture)
-        
-        etotal = 0
-        for edge  in g.edges():
-            e, A, B = edge.linear_factors()
-            omega  =  edge.info
-
-            # compute the blocks of H^k
-            bi  = -A.T @ omega @ e
-            bj  = -B.T @ omega @ e
-            Hii =  A.T @ omega @ A
-            Hij =  A.T @ omega @ B
-            Hjj =  B.T @ omega @ B
-            
-            v = edge.endpoints
-            i = v[0].index
-            j = v[1].index
-
-            islice = slice(i*3, (i+1)*3)
-            jslice = slice(j*3, (j+1)*3)
-
-            # accumulate the blocks in H and b
-            H[islice, islice] += Hii
-            H[jslice, jslice] += Hjj
-            H[islice, jslice] += Hij
-            H[jslice, islice] += Hij.T
-
-            b[islice,0] += bi
-            b[jslice,0] += bj
-
-            etotal += np.inner(e, e)
-
-        # note that the system (H b) is obtained only from
-        # relative constraints. H is not full rank.
-        # we solve the problem by anchoring the position of
-        # the the first vertex.
-        # this can be expressed by adding the equation
-        #  deltax(1:3,1) = 0
-        # which is equivalent to the following
-
-        H[0:3, 0:3] += np.eye(3)
-        
-        SH = sp.sparse.csr_matrix(H)
-        deltax = sp.sparse.linalg.spsolve(SH, b)  # SH \ b
-        
-        # split the increments in nice 3x1 vectors and sum them up to the original matrix
-        for vertex in g:
-            i = vertex.index * 3
-            vertex.coord += deltax[i: i+3]
-            # normalize the angles between -PI and PI
-            vertex.coord[2] = base.angdiff(vertex.coord[2])
-
-        dt  =  time.time() - t0
-        print(f"done in {dt*1e3:0.2f} msec.  Total cost {etotal:g}")
+        self._setup()
+
+        e, A, B = self._linearize()
+        omega = self._einfo
+
+        # robust kernel, by reweighting the information matrix of each edge
+        s = np.einsum("ki,kij,kj->k", e, omega, e)
+        cost, w = self._weights(s, kernel, delta)
+        omega = w[:, np.newaxis, np.newaxis] * omega
+
+        # compute the blocks of H^k and b^k for all edges
+        At = A.transpose((0, 2, 1)) @ omega
+        Bt = B.transpose((0, 2, 1)) @ omega
+        bi = -np.einsum("kij,kj->ki", At, e)
+        bj = -np.einsum("kij,kj->ki", Bt, e)
+        Hii = At @ A
+        Hij = At @ B
+        Hjj = Bt @ B
+
+        # accumulate the blocks in H and b, the elements of the blocks are
+        # in the order of the index map built by _setup()
+        #
+        # note that the system (H b) is obtained only from relative
+        # constraints. H is not full rank.  We solve the problem by anchoring
+        # the position of the the first vertex, adding the equation 
+        # deltax(1:3,1) = 0
+        vals = np.r_[
+            Hii.ravel(),
+            Hij.ravel(),
+            Hij.transpose((0, 2, 1)).ravel(),
+            Hjj.ravel(),
+            np.eye(3).ravel(),
+        ]
+        H = self._H
+        H.data = np.bincount(self._hmap, weights=vals, minlength=H.nnz)
+        if lmbda > 0:
+            H.data[self._hdiag] *= 1 + lmbda
+
+        n = H.shape[0]
+        b = np.bincount(
+            np.r_[(3 * self._ei[:, np.newaxis] + np.arange(3)).ravel(),
+                  (3 * self._ej[:, np.newaxis] + np.arange(3)).ravel()],
+            weights=np.r_[bi.ravel(), bj.ravel()], minlength=n)
+
+        deltax = self._solve(H, b)
+
+        # add the increments to the poses, the vertex coordinates are views
+        # of these
+        self._x += deltax.reshape((-1, 3))
+        # normalize the angles between -PI and PI
+        self._x[:, 2] = base.angdiff(self._x[:, 2])
+
+        etotal = cost.sum()
+        if self._verbose:
+            dt  =  time.time() - t0
+            print(f"done in {dt*1e3:0.2f} msec.  Total cost {etotal:g}")
 
         return etotal
 
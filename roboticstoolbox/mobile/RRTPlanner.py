@@ -15,6 +15,7 @@ from roboticstoolbox.mobile.OccGrid import PolygonMap
 from roboticstoolbox import *
 import numpy as np
 import matplotlib.pyplot as plt
+from scipy.spatial import cKDTree
 
 from spatialmath import Polygon2, SE2, base
 from roboticstoolbox.mobile.PlannerBase import PlannerBase
@@ -24,6 +25,87 @@ from roboticstoolbox.mobile.DubinsPlanner import DubinsPlanner
 from pgraph import DGraph
 
 
+class _SE2Index:
+    r"""
+    Nearest neighbour index over SE(2) graph vertices
+
+    :param workspace: bounds of the map [xmin, xmax, ymin, ymax]
+    :type workspace: array_like(4)
+
+    Uses the same distance as the pgraph ``SE2`` metric, the Euclidean norm
+    with the heading difference wrapped to :math:`[-\pi, \pi)`.  Vertices
+    are held in a KD-tree with periodic heading and an unsorted buffer of
+    recently added vertices. The tree is rebuilt when the buffer grows to a
+    quarter of its size, so growing a tree of N vertices costs
+    O(N log N) in total rather than O(N^2) for linear scans.
+    """
+
+    def __init__(self, workspace):
+        workspace = np.r_[workspace]
+        span = workspace[1::2] - workspace[0::2]
+
+        # periodic in heading, in x and y the box is large enough that
+        # wrapping never shortens a distance
+        self._origin = np.r_[workspace[0], workspace[2], -np.pi]
+        self._boxsize = np.r_[4 * span + 1, 2 * np.pi]
+        # buffer of wrapped vertex coordinates, its capacity doubles when full
+        self._points = np.zeros((16, 3))
+        self._vertices = []
+        self._tree = None
+        self._ntree = 0
+
+    def __len__(self):
+        return len(self._vertices)
+
+    def add(self, vertex):
+        r"""
+        Add a vertex to the index
+
+        :param vertex: vertex with ``coord`` attribute :math:`(x, y, \theta)`
+        :type vertex: Vertex subclass
+        """
+        n = len(self._vertices)
+        if n == len(self._points):
+            points = np.zeros((2 * n, 3))
+            points[:n] = self._points
+            self._points = points
+        self._points[n] = np.mod(np.r_[vertex.coord] - self._origin, self._boxsize)
+        self._vertices.append(vertex)
+        n += 1
+
+        if n - self._ntree > max(16, self._ntree // 4):
+            self._tree = cKDTree(self._points[:n], boxsize=self._boxsize)
+            self._ntree = n
+
+    def closest(self, coord):
+        r"""
+        Vertex closest to point
+
+        :param coord: configuration :math:`(x, y, \theta)`
+        :type coord: array_like(3)
+        :return: closest vertex and distance to it
+        :rtype: Vertex subclass, float
+        """
+        p = np.mod(np.r_[coord] - self._origin, self._boxsize)
+
+        dmin, imin = np.inf, None
+        if self._tree is not None:
+            dmin, imin = self._tree.query(p)
+
+        # linear scan over the vertices added since the tree was built
+        if self._ntree < len(self._vertices):
+            d = np.abs(self._points[self._ntree : len(self._vertices)] - p)
+            d = np.minimum(d, self._boxsize - d)
+            d = np.linalg.norm(d, axis=1)
+            i = np.argmin(d)
+            if d[i] < dmin:
+                dmin, imin = d[i], self._ntree + i
+
+        if imin is None:
+            return None, np.inf
+        return self._vertices[imin], dmin
+
+
 class RRTPlanner(PlannerBase):
     """
     Rapidly exploring tree planner
@@ -139,7 +221,7 @@ class RRTPlanner(PlannerBase):
         the workspace which is an attribute of the ``map``.
 
         For every new point added, a Dubins path is computed to the nearest
-        vertex already in the graph.  Each configuration on that path, with
+        vertex already in the graph, found using a KD-tree.  Each configuration on that path, with
         spacing of ``stepsize``, is tested for obstacle intersection.
 
         :seealso: :meth:`query`
@@ -151,6 +233,8 @@ class RRTPlanner(PlannerBase):
 
         v = self.g.add_vertex(coord=goal)
         v.path = None
+        self._index = _SE2Index(self.map.workspace)
+        self._index.add(v)
 
         self.progress_start(self.npoints)
         count = 0
@@ -161,7 +245,7 @@ class RRTPlanner(PlannerBase):
             if self.showsamples:
                 plt.plot(random_point[0], random_point[1], "ok", markersize=2)
 
-            vnearest, d = self.g.closest(random_point)
+            vnearest, d = self._index.closest(random_point)
 
             if d > 6:
                 continue
@@ -190,6 +274,7 @@ class RRTPlanner(PlannerBase):
             vnew = self.g.add_vertex(random_point)
             self.g.add_edge(vnew, vnearest, cost=pstatus.length)
             vnew.path = path
+            self._index.add(vnew)
 
             self.vehicle.polygon(random_point).plot(color="b", alpha=0.1)
             plt.show()
@@ -221,7 +306,7 @@ class RRTPlanner(PlannerBase):
 
         """
         self._start = start
-        vstart, d = self.g.closest(start)
+        vstart, d = self._index.closest(start)
 
         vpath, cost, _ = self.g.path_UCS(vstart, self.g[0])
 
@@ -25,6 +25,7 @@ from roboticstoolbox.mobile.drivers import *
 from roboticstoolbox.mobile.Animations import VehicleAnimationBase, VehicleMarker, VehiclePolygon, VehicleIcon
 
 from roboticstoolbox.mobile.PoseGraph import *
+from roboticstoolbox.mobile.history import History
 from roboticstoolbox.mobile.EKF import EKF
 from roboticstoolbox.mobile.ParticleFilter import ParticleFilter
 
@@ -59,6 +60,7 @@ __all__ = [
     "RRTPlanner",
     "EKF",
     "ParticleFilter",
+    "History",
 ]
 
 
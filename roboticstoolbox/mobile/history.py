@@ -0,0 +1,403 @@
+"""
+Compact step-by-step history for the state estimators
+@Author: Peter Corke
+"""
+
+import os
+from collections import namedtuple
+
+import numpy as np
+
+
+def _fill(dtype):
+    # padding value for a dtype
+    return np.nan if np.issubdtype(dtype, np.inexact) else -1
+
+
+class _Column:
+    # storage for one field of the history.  A field whose values all have
+    # the same shape is held in a preallocated array with one row per record.
+    # When a value of a different shape arrives, like the SLAM covariance
+    # which grows with the map, the field is converted to ragged storage: the
+    # values are stored one after another in a flat buffer, and the offset
+    # and shape of each record are kept so that it can be returned unchanged.
+
+    def __init__(self, capacity, file=None):
+        self.capacity = capacity
+        self.file = file
+        self.data = None  # fixed size values, one row per record
+        self.flat = None  # ragged values
+        self.offset = None
+        self.shape = None
+        self.end = 0  # end of the ragged values written so far
+        self.present = np.zeros((capacity,), dtype=bool)
+
+    def _alloc(self, shape, dtype):
+        if self.file is None:
+            data = np.empty(shape, dtype=dtype)
+        else:
+            # write to a temporary file, the old one may still be read from
+            data = np.lib.format.open_memmap(
+                self.file + ".tmp", mode="w+", dtype=dtype, shape=shape
+            )
+        data.fill(_fill(dtype))
+        return data
+
+    def _commit(self, data):
+        # return the storage to use for a newly allocated array
+        if self.file is not None:
+            data.flush()
+            self.data = self.flat = None  # release the old mapping
+            os.replace(self.file + ".tmp", self.file)
+            data = np.lib.format.open_memmap(self.file, mode="r+")
+        return data
+
+    def resize(self, capacity, rows):
+        # change the number of rows, the rows given are kept, in order
+        present = self.present[rows]
+        self.capacity = capacity
+        self.present = np.zeros((capacity,), dtype=bool)
+        self.present[: len(rows)] = present
+        if self.data is not None:
+            data = self._alloc((capacity, *self.data.shape[1:]), self.data.dtype)
+            data[: len(rows)] = self.data[rows]
+            self.data = self._commit(data)
+        elif self.flat is not None:
+            # the ragged values stay where they are
+            offset = np.zeros((capacity,), dtype=int)
+            offset[: len(rows)] = self.offset[rows]
+            shape = np.zeros((capacity, self.shape.shape[1]), dtype=int)
+            shape[: len(rows)] = self.shape[rows]
+            self.offset, self.shape = offset, shape
+
+    def _ragged(self):
+        # convert the fixed size values to ragged storage
+        rows = np.flatnonzero(self.present)
+        shape = self.data.shape[1:]
+        size = int(np.prod(shape))
+
+        flat = self._alloc((max(2 * len(rows) * size, 64),), self.data.dtype)
+        flat[: len(rows) * size] = self.data[rows].ravel()
+        self.offset = np.zeros((self.capacity,), dtype=int)
+        self.offset[rows] = np.arange(len(rows)) * size
+        self.shape = np.zeros((self.capacity, len(shape)), dtype=int)
+        self.shape[:] = shape
+        self.end = len(rows) * size
+        self.flat = self._commit(flat)
+        self.data = None
+
+    def _put_ragged(self, i, value):
+        size = value.size
+        if self.end + size > len(self.flat):
+            # compact the values into a larger buffer, this also reclaims the
+            # space of values that have been overwritten or discarded
+            self.present[i] = False
+            rows = np.flatnonzero(self.present)
+            sizes = np.prod(self.shape[rows], axis=1).astype(int)
+            live = int(sizes.sum())
+            n = live + size
+            flat = self._alloc((max(n + n // 2, 64),), self.flat.dtype)
+            offset = np.cumsum(sizes) - sizes
+            for row, start, m in zip(rows, offset, sizes):
+                old = self.offset[row]
+                flat[start : start + m] = self.flat[old : old + m]
+            self.offset[rows] = offset
+            self.end = live
+            self.flat = self._commit(flat)
+
+        self.flat[self.end : self.end + size] = value.ravel()
+        self.offset[i] = self.end
+        self.shape[i] = value.shape
+        self.end += size
+
+    def put(self, i, value):
+        if value is None:
+            self.present[i] = False
+            return
+        value = np.asarray(value)
+
+        if self.data is None and self.flat is None:
+            self.data = self._commit(
+                self._alloc((self.capacity, *value.shape), value.dtype)
+            )
+        elif self.flat is None:
+            if value.ndim != self.data.ndim - 1:
+                raise ValueError("history field changed number of dimensions")
+            if value.shape != self.data.shape[1:]:
+                self._ragged()
+        elif value.ndim != self.shape.shape[1]:
+            raise ValueError("history field changed number of dimensions")
+
+        if self.flat is None:
+            self.data[i] = value
+        else:
+            self._put_ragged(i, value)
+        self.present[i] = True
+
+    def get(self, i):
+        if not self.present[i]:
+            return None
+        if self.flat is None:
+            value = self.data[i]
+        else:
+            start = self.offset[i]
+            n = int(np.prod(self.shape[i]))
+            value = self.flat[start : start + n].reshape(self.shape[i])
+        return value.copy() if isinstance(value, np.ndarray) else value
+
+    def values(self, rows):
+        # the values of the given rows, padded to the largest shape
+        present = self.present[rows]
+        if self.flat is None:
+            out = np.array(self.data[rows])
+        else:
+            if np.any(present):
+                shape = self.shape[rows[present]].max(axis=0)
+            else:
+                shape = np.zeros((self.shape.shape[1],), dtype=int)
+            out = np.full((len(rows), *shape), _fill(self.flat.dtype), self.flat.dtype)
+            for k in np.flatnonzero(present):
+                value = self.get(rows[k])
+                out[(k, *(slice(0, n) for n in value.shape))] = value
+        out[~present] = _fill(out.dtype)
+        return out
+
+    def close(self):
+        if self.file is not None and (self.data is not None or self.flat is not None):
+            self.data = self.flat = None
+            os.remove(self.file)
+
+
+class History:
+    def __init__(self, fields=None, maxlen=None, every=1, file=None):
+        """
+        Compact history of an estimator
+
+        :param fields: names of the fields to record, defaults to those chosen
+            by the estimator, usually all
+        :type fields: iterable of str, optional
+        :param maxlen: maximum number of records, defaults to None
+        :type maxlen: int, optional
+        :param every: record only every ``every`` steps, defaults to 1
+        :type every: int, optional
+        :param file: prefix for files that hold the recorded data, defaults to None
+        :type file: str, optional
+
+        Records the step-by-step history of a state estimator such as
+        :class:`EKF` or :class:`ParticleFilter`.  Each record is a namedtuple
+        whose fields are defined by the estimator, and the history can be
+        indexed and iterated over like a list of those namedtuples.
+
+        The data is held in columns, one NumPy array per field with one row
+        per record, so a whole field can be retrieved efficiently by
+        :meth:`column`.  Fields whose values change size, for example the
+        covariance matrix when doing SLAM, are stored without padding, one
+        value after another, and are padded only by :meth:`column`.
+
+        The memory used can be limited by:
+
+        - ``fields``, only those fields are recorded and the others are
+          ``None`` in each record.
+        - ``maxlen``, the history becomes a ring buffer and keeps only the most
+          recent ``maxlen`` records.
+        - ``every``, only every ``every`` steps is recorded, the step number of
+          each record is given by :meth:`index`.
+        - ``file``, each field is stored in a memory-mapped ``.npy`` file
+          called ``file-FIELD.npy`` rather than in memory.
+
+        Example::
+
+            ekf = EKF(..., history=History(fields=("t", "xest", "P"), every=10))
+
+        :seealso: :meth:`EKF.history` :meth:`ParticleFilter.history`
+        """
+        if maxlen is not None and maxlen < 1:
+            raise ValueError("maxlen must be positive")
+        if every < 1:
+            raise ValueError("every must be positive")
+        self._fields = None if fields is None else tuple(fields)
+        self._maxlen = maxlen
+        self._every = every
+        self._file = file
+        self._tuple = None
+        self._default = None
+        self._columns = {}
+        self._capacity = 0
+        self._n = 0
+
+    def _bind(self, name, fields, default=None):
+        # called by the estimator to define the record, and the fields that
+        # are recorded if none were given
+        if self._fields is not None:
+            for field in self._fields:
+                if field not in fields:
+                    raise ValueError(f"unknown history field {field}")
+        self._tuple = namedtuple(name, fields)
+        self._default = fields if default is None else tuple(default)
+        self.clear()
+
+    def __str__(self):
+        s = f"History: {len(self)} records"
+        if self._tuple is not None:
+            s += " of " + ", ".join(self.fields)
+        if self._maxlen is not None:
+            s += f", maxlen={self._maxlen}"
+        if self._every > 1:
+            s += f", every={self._every}"
+        return s
+
+    def __repr__(self):
+        return str(self)
+
+    @property
+    def fields(self):
+        """
+        Recorded fields
+
+        :return: names of the recorded fields
+        :rtype: tuple of str
+        """
+        return tuple(self._columns)
+
+    @property
+    def maxlen(self):
+        """
+        Maximum number of records
+
+        :return: maximum number of records or None if unlimited
+        :rtype: int or None
+        """
+        return self._maxlen
+
+    @property
+    def every(self):
+        """
+        Recording interval
+
+        :return: number of steps between records
+        :rtype: int
+        """
+        return self._every
+
+    def clear(self):
+        """
+        Remove all records
+
+        Removes all records and resets the step count.
+        """
+        for column in self._columns.values():
+            column.close()
+
+        if self._maxlen is not None:
+            capacity = self._maxlen
+        else:
+            capacity = 64
+        fields = self._default if self._fields is None else self._fields
+        self._columns = {}
+        for field in fields:
+            if self._file is not None:
+                file = f"{self._file}-{field}.npy"
+            else:
+                file = None
+            self._columns[field] = _Column(capacity, file)
+
+        self._capacity = capacity
+        self._step = np.zeros((capacity,), dtype=int)
+        self._count = 0  # number of steps
+        self._n = 0  # number of records written
+
+    def append(self, *args):
+        """
+        Add a record to the history
+
+        :param args: value of each field of the record, in order
+
+        The values are copied into the history.  Values for fields that are not
+        recorded are ignored.  If ``every`` is greater than one then only some
+        calls add a record.
+        """
+        step = self._count
+        self._count += 1
+        if step % self._every != 0:
+            return
+
+        if self._maxlen is None and self._n == self._capacity:
+            # grow the columns
+            rows = np.arange(self._n)
+            self._capacity *= 2
+            for column in self._columns.values():
+                column.resize(self._capacity, rows)
+            self._step = np.r_[self._step, np.zeros_like(self._step)]
+
+        i = self._n % self._capacity
+        for field, value in zip(self._tuple._fields, args):
+            column = self._columns.get(field)
+            if column is not None:
+                column.put(i, value)
+        self._step[i] = step
+        self._n += 1
+
+    def _rows(self):
+        # row of each record in the columns, oldest first
+        n = len(self)
+        if self._n <= self._capacity:
+            return np.arange(n)
+        else:
+            return (self._n + np.arange(n)) % self._capacity
+
+    def __len__(self):
+        return min(self._n, self._capacity)
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return [self[i] for i in range(*k.indices(len(self)))]
+        n = len(self)
+        if k < 0:
+            k += n
+        if not 0 <= k < n:
+            raise IndexError("history index out of range")
+        row = self._rows()[k]
+        return self._tuple(
+            *[
+                self._columns[field].get(row) if field in self._columns else None
+                for field in self._tuple._fields
+            ]
+        )
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self[k]
+
+    def index(self):
+        """
+        Step number of each record
+
+        :return: step number of each record, oldest first
+        :rtype: ndarray(n)
+
+        The step number counts calls to :meth:`append`, starting at zero.  It
+        differs from the record number if records have been discarded, by
+        ``maxlen`` or ``every``.
+        """
+        return self._step[self._rows()]
+
+    def column(self, field):
+        """
+        All values of one field
+
+        :param field: name of field
+        :type field: str
+        :return: value of field in each record, oldest first
+        :rtype: ndarray(n,...)
+
+        Values that are smaller than the largest value of that field are
+        padded, with NaN for floating point values or -1 for integers.  Records
+        where the value was ``None`` are entirely padding.
+        """
+        try:
+            column = self._columns[field]
+        except KeyError:
+            raise ValueError(f"history field {field} is not recorded") from None
+        if column.data is None and column.flat is None:
+            return None
+        return column.values(self._rows())
@@ -450,6 +450,71 @@ class RangeBearingSensor(SensorBase):
     
         return z, lm_id
 
+    def readings(self):
+        r"""
+        Return observations of all visible landmarks
+
+        :return: range and bearing angle to each visible landmark, one per row, and landmark ids
+        :rtype: ndarray(N,2), ndarray(N) of int
+
+        Returns an observation (range, bearing) of every visible landmark, those
+        within the angular field of view and range limit, and the ``id`` of
+        each landmark.  The constructor arguments ``every`` and ``fail`` are
+        handled as for :meth:`reading`.
+
+        If no valid reading is available then return (None, None)
+
+        .. runblock:: pycon
+
+            >>> from roboticstoolbox import Bicycle, LandmarkMap, RangeBearingSensor
+            >>> from math import pi
+            >>> robot = Bicycle()
+            >>> map = LandmarkMap(20)
+            >>> sensor = RangeBearingSensor(robot, map, range=(0.5, 20), angle=pi/4)
+            >>> print(sensor.readings())
+
+        .. note:: Independent noise with covariance ``W`` (set by constructor)
+            is added to each reading.
+
+        :seealso: :meth:`reading` :meth:`visible` :meth:`h`
+        """
+        self._count += 1
+
+        # sample interval and simulated failure
+        if self._count % self._every != 0 or (
+            self._fail is not None
+            and any([start <= self._count < end for start, end in self._fail])
+        ):
+            self._landmarklog.append(-1)
+            return (None, None)
+
+        # range and bearing to all landmarks, find those that are visible
+        z = self.h(self.robot.x).reshape((-1, 2))
+        visible = np.ones((z.shape[0],), dtype=bool)
+        if self._r_range is not None:
+            visible &= (self._r_range[0] <= z[:, 0]) & (z[:, 0] <= self._r_range[1])
+        if self._theta_range is not None:
+            visible &= (self._theta_range[0] <= z[:, 1]) & (
+                z[:, 1] <= self._theta_range[1]
+            )
+        lm_id = np.flatnonzero(visible)
+
+        if len(lm_id) == 0:
+            if self.verbose:
+                print('Sensor:: no features\n')
+            self._landmarklog.append(-1)
+            return (None, None)
+
+        if self._animate:
+            for id in lm_id:
+                self.plot(id)
+        self._landmarklog.append(lm_id)
+
+        # add noise with covariance W
+        z = z[lm_id, :] + self._random.multivariate_normal((0, 0), self._W, size=len(lm_id))
+
+        return z, lm_id
+
     def visible(self):
         """
         List of all visible landmarks
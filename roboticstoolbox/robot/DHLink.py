@@ -588,6 +588,7 @@ class DHLink(Link):
         return self._offset
 
     @offset.setter
+    @_listen_dyn
     def offset(self, offset_new):
         self._offset = offset_new
 
@@ -637,7 +638,7 @@ class DHLink(Link):
         sa = _sin(self.alpha)
         ca = _cos(self.alpha)
 
-        if self.ets[-1].isflip:
+        if self.isflip:
             q = -q + self.offset
         else:
             q = q + self.offset
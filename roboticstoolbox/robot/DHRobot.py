@@ -22,6 +22,9 @@ from spatialmath.base import (
     t2r,
     trlog,
     rotvelxform,
+    transl,
+    trotx,
+    trotz,
 )
 from spatialmath import SE3, Twist3
 import spatialmath.base.symbolic as sym
@@ -32,6 +35,7 @@ from scipy.linalg import block_diag
 from roboticstoolbox.robot.DHLink import _check_rne, DHLink
 from roboticstoolbox import rtb_get_param
 from frne import init, frne, delete
+from fdh import DH_init, DH_fkine, DH_fkine_all, DH_jacobe, DH_jacob0
 from numpy import any
 from typing import Union, Tuple
 
@@ -133,6 +137,9 @@ class DHRobot(Robot):
         # rne parameters
         self._rne_ob = None
 
+        # compiled kinematics, see _dh()
+        self._dh_ob = None
+
     def __str__(self):
         """
         Pretty prints the DH Model of the robot. Will output angles in degrees
@@ -928,8 +935,14 @@ class DHRobot(Robot):
               into the result.
             - Joint offsets, if defined, are added to ``q`` before the forward
               kinematics are computed.
+            - Numeric robots are evaluated by compiled code, robots with
+              symbolic parameters or joint coordinates in Python.
         """
 
+        args = self._dh_args(q)
+        if args is not None:
+            return SE3(list(DH_fkine(*args)), check=False)
+
         if np.array_equal(self.base.A, np.eye(4)):
             base = None
         else:
@@ -1007,7 +1020,7 @@ class DHRobot(Robot):
         :param old: "old" behaviour, defaults to True
         :type old: bool, optional
         :return: Forward kinematics as an SE(3) matrix
-        :rtype: SE3 instance with ``n`` values
+        :rtype: SE3 instance with ``n+1`` values
 
         - ``fkine_all(q)`` evaluates fkine for each joint within a robot and
           returns a sequence of link frame poses.
@@ -1032,9 +1045,17 @@ class DHRobot(Robot):
               into the result.
             - Joint offsets, if defined, are added to q before the forward
               kinematics are computed.
+            - If ``q`` is a 2D array the ``n+1`` frames for each row are
+              returned in turn.
         """
         q = self._getq(q)
 
+        args = self._dh_args(q)
+        if args is not None:
+            dh, q, base, _ = args
+            T = DH_fkine_all(dh, q, base).reshape((-1, 4, 4))
+            return SE3(list(T), check=False)
+
         Tj = self.base.copy()
         Tall = Tj
 
@@ -1048,11 +1069,11 @@ class DHRobot(Robot):
         Manipulator Jacobian in end-effector frame
 
         :param q: Joint coordinate vector
-        :type q: ndarray(n)
+        :type q: ndarray(n) or ndarray(m,n)
         :param half: return half Jacobian: 'trans' or 'rot'
         :type half: str
         :return J: The manipulator Jacobian in the end-effector frame
-        :rtype: ndarray(6,n)
+        :rtype: ndarray(6,n) or ndarray(m,6,n)
 
         - ``robot.jacobe(q)`` is the manipulator Jacobian matrix which maps
           joint  velocity to end-effector spatial velocity.
@@ -1060,6 +1081,10 @@ class DHRobot(Robot):
         End-effector spatial velocity :math:`\nu = (v_x, v_y, v_z, \omega_x, \omega_y, \omega_z)^T`
         is related to joint velocity by :math:`{}^{E}\!\nu = \mathbf{J}_m(q) \dot{q}`.
 
+        If ``q`` is a 2D array the rows are interpreted as a trajectory and
+        the result is a 3D array, ``J[k,:,:]`` is the Jacobian for the k'th
+        configuration.
+
         Example:
 
         .. runblock:: pycon
@@ -1074,6 +1099,17 @@ class DHRobot(Robot):
             velocity twist as per the text by Lynch & Park.
         """  # noqa
 
+        if half not in (None, "trans", "rot"):
+            raise ValueError("bad half specified")
+
+        args = self._dh_args(q)
+        if args is not None:
+            dh, qm, _, tool = args
+            J = DH_jacobe(dh, qm, tool)
+            if np.ndim(q) == 1:
+                J = J[0]
+            return self._jacob_half(J, half)
+
         q = getvector(q, self.n)
 
         n = self.n
@@ -1102,35 +1138,30 @@ class DHRobot(Robot):
                 d = U[2, :3]  # nz oz az
                 delta = np.zeros((3,))
 
+            if L[j].isflip:
+                d = -d
+                delta = -delta
+
             J[:, j] = np.r_[d, delta]
 
             if self.mdh != 0:
                 # modified DH convention
                 U = L[j].A(q[j]).A @ U  # type: ignore
 
-        # return top or bottom half if asked
-        if half is not None:
-            if half == "trans":
-                return J[:3, :]
-            elif half == "rot":
-                return J[3:, :]
-            else:
-                raise ValueError("bad half specified")
-
-        return J
+        return self._jacob_half(J, half)
 
     def jacob0(self, q=None, T=None, half=None, start=None, end=None):
         r"""
         Manipulator Jacobian in world frame
 
         :param q: Joint coordinate vector
-        :type q: ndarray(n)
+        :type q: ndarray(n) or ndarray(m,n)
         :param T: Forward kinematics if known, SE(3 matrix)
         :type T: SE3 instance
         :param half: return half Jacobian: 'trans' or 'rot'
         :type half: str
         :return J: The manipulator Jacobian in the world frame
-        :rtype: ndarray(6,n)
+        :rtype: ndarray(6,n) or ndarray(m,6,n)
 
         - ``robot.jacob0(q)`` is the manipulator geometric Jacobian matrix which maps
           joint velocity to end-effector spatial velocity.
@@ -1138,6 +1169,10 @@ class DHRobot(Robot):
         End-effector spatial velocity :math:`\nu = (v_x, v_y, v_z, \omega_x, \omega_y, \omega_z)^T`
         is related to joint velocity by :math:`{}^{0}\!\nu = \mathbf{J}_0(q) \dot{q}`.
 
+        If ``q`` is a 2D array the rows are interpreted as a trajectory and
+        the result is a 3D array, ``J[k,:,:]`` is the Jacobian for the k'th
+        configuration.
+
         Example:
 
         .. runblock:: pycon
@@ -1153,9 +1188,22 @@ class DHRobot(Robot):
 
         .. note:: ``T`` can be passed in to save the cost of computing forward
             kinematics which is needed to transform velocity from end-effector
-            frame to world frame.
+            frame to world frame.  The compiled code computes it anyway, so
+            ``T`` is only used for robots with symbolic parameters.
 
         """  # noqa
+        if half not in (None, "trans", "rot"):
+            raise ValueError("bad half specified")
+
+        q = self._getq(q)
+
+        args = self._dh_args(q)
+        if args is not None:
+            J0 = DH_jacob0(*args)
+            if q.ndim == 1:
+                J0 = J0[0]
+            return self._jacob_half(J0, half)
+
         q = getvector(q, self.n)
 
         if T is None:
@@ -1165,17 +1213,7 @@ class DHRobot(Robot):
         # compute Jacobian in EE frame and transform to world frame
         J0 = tr2jac(T) @ self.jacobe(q)
 
-        # TODO optimize computation above if half matrix is returned
-
-        # return top or bottom half if asked
-        if half is not None:
-            if half == "trans":
-                J0 = J0[:3, :]
-            elif half == "rot":
-                J0 = J0[3:, :]
-            else:
-                raise ValueError("bad half specified")
-        return J0
+        return self._jacob_half(J0, half)
 
     def jacob0_analytical(self, q, representation=None, T=None):
         r"""
@@ -1317,6 +1355,113 @@ class DHRobot(Robot):
 
     # -------------------------------------------------------------------------- #
 
+    def dynchanged(self, what=None):
+        # the compiled kinematics use the same link parameters
+        super().dynchanged(what)
+        if what != "gravity":
+            self._dh_ob = None
+
+    def _dh(self):
+        """
+        Compiled Denavit-Hartenberg chain (DHRobot)
+
+        :return: the chain object used by the ``fdh`` extension, or None if
+            the robot has symbolic parameters
+        :rtype: PyCapsule or None
+
+        The link parameters are packed into arrays on first use and discarded
+        whenever a link parameter changes, see :func:`dynchanged`.
+        """
+        if self._dh_ob is None:
+            param = np.array(
+                [[L.theta, L.d, L.a, L.alpha, L.offset] for L in self.links]
+            )
+            if param.dtype.kind not in "biuf":
+                # symbolic parameters
+                return None
+
+            sigma = [L.sigma for L in self.links]
+            flip = [-1.0 if L.isflip else 1.0 for L in self.links]
+            self._dh_ob = DH_init(sigma, *param.T, flip, self.mdh)
+
+        return self._dh_ob
+
+    def _dh_args(self, q):
+        # Arguments for the fdh extension, the compiled chain, joint
+        # coordinates as an ndarray(m,n) and the base and tool transforms.
+        # None if any of them is symbolic.
+        dh = self._dh()
+        if dh is None:
+            return None
+
+        q = getmatrix(q, (None, self.n))
+        base = self.base.A
+        tool = self.tool.A
+        if not all(x.dtype.kind in "biuf" for x in (q, base, tool)):
+            return None
+
+        return dh, q, base, tool
+
+    @staticmethod
+    def _jacob_half(J, half):
+        # return top or bottom half of Jacobian(s) if asked
+        if half == "trans":
+            return J[..., :3, :]
+        elif half == "rot":
+            return J[..., 3:, :]
+        return J
+
+    def _rbd_tree(self):
+        # Each link is a body whose parent is the previous link, the link
+        # transform is split either side of the joint transform
+        n = self.n
+        axis = np.zeros(n, dtype=int)
+        flip = np.ones(n)
+        offset = np.zeros(n)
+        Tpre = np.zeros((n, 4, 4))
+        Tpost = np.zeros((n, 4, 4))
+        L = np.zeros((n, 18))
+
+        for i, link in enumerate(self.links):
+            if link.isflip:
+                flip[i] = -1.0
+            offset[i] = link.offset
+
+            if link.isrevolute:
+                axis[i] = 2
+                Ttheta = np.eye(4)
+                Td = transl(0, 0, link.d)
+            else:
+                axis[i] = 5
+                Ttheta = trotz(link.theta)
+                Td = np.eye(4)
+
+            Taa = transl(link.a, 0, 0) @ trotx(link.alpha)
+
+            if self.mdh:
+                Tpre[i] = Taa @ Ttheta
+                Tpost[i] = Td
+            else:
+                Tpre[i] = Ttheta
+                Tpost[i] = Td @ Taa
+
+            L[i, 0] = link.m
+            L[i, 1:4] = link.r
+            L[i, 4:13] = link.I.flatten()
+            L[i, 13] = link.Jm
+            L[i, 14] = link.G
+            L[i, 15] = link.B
+            L[i, 16:18] = link.Tc
+
+        parent = np.arange(n) - 1
+        jindex = np.arange(n)
+
+        return parent, jindex, axis, flip, offset, Tpre, Tpost, L
+
+    def _rbd_gravity(self, gravity=None):
+        # The tree is expressed in the base frame
+        return self.base.R.T @ super()._rbd_gravity(gravity)
+
     def _init_rne(self):
         # Compress link data into a 1D array
         L = np.zeros(24 * self.n)
@@ -1909,6 +2054,8 @@ class DHRobot(Robot):
         reject_jl: bool = True,
         we: Union[np.ndarray, None] = None,
         λ: float = 1.0,
+        seed: Union[int, np.random.Generator, None] = None,
+        restart: str = "random",
     ) -> Tuple[np.ndarray, int, int, int, float]:
         """
         Numerical inverse kinematics by Levenberg-Marquadt optimization (Chan's Method)
@@ -1926,6 +2073,10 @@ class DHRobot(Robot):
             Corresponds to translation in X, Y and Z and rotation about X, Y and Z
             respectively
         :param λ: value of lambda for the damping matrix Wn
+        :param seed: seed or generator for the random restarts, defaults to
+            a seed drawn from NumPy's global generator
+        :param restart: how restart configurations are chosen, ``"random"``
+            or ``"halton"`` for a quasi-random sequence over the joint limits
 
         :return: inverse kinematic solution
         :rtype: tuple (q, success, iterations, searches, residual)
@@ -2002,7 +2153,7 @@ class DHRobot(Robot):
             TODO
         """
 
-        return self.ets().ik_lm_chan(Tep, q0, ilimit, slimit, tol, reject_jl, we, λ)
+        return self.ets().ik_lm_chan(Tep, q0, ilimit, slimit, tol, reject_jl, we, λ, seed, restart)
 
     def ik_lm_wampler(
         self,
@@ -2014,6 +2165,8 @@ class DHRobot(Robot):
         reject_jl: bool = True,
         we: Union[np.ndarray, None] = None,
         λ: float = 1.0,
+        seed: Union[int, np.random.Generator, None] = None,
+        restart: str = "random",
     ) -> Tuple[np.ndarray, int, int, int, float]:
         """
         Numerical inverse kinematics by Levenberg-Marquadt optimization (Wamplers's Method)
@@ -2031,6 +2184,10 @@ class DHRobot(Robot):
             Corresponds to translation in X, Y and Z and rotation about X, Y and Z
             respectively
         :param λ: value of lambda for the damping matrix Wn
+        :param seed: seed or generator for the random restarts, defaults to
+            a seed drawn from NumPy's global generator
+        :param restart: how restart configurations are chosen, ``"random"``
+            or ``"halton"`` for a quasi-random sequence over the joint limits
 
         :return: inverse kinematic solution
         :rtype: tuple (q, success, iterations, searches, residual)
@@ -2107,7 +2264,7 @@ class DHRobot(Robot):
             TODO
         """
 
-        return self.ets().ik_lm_wampler(Tep, q0, ilimit, slimit, tol, reject_jl, we, λ)
+        return self.ets().ik_lm_wampler(Tep, q0, ilimit, slimit, tol, reject_jl, we, λ, seed, restart)
 
     def ik_lm_sugihara(
         self,
@@ -2119,6 +2276,8 @@ class DHRobot(Robot):
         reject_jl: bool = True,
         we: Union[np.ndarray, None] = None,
         λ: float = 1.0,
+        seed: Union[int, np.random.Generator, None] = None,
+        restart: str = "random",
     ) -> Tuple[np.ndarray, int, int, int, float]:
         """
         Numerical inverse kinematics by Levenberg-Marquadt optimization (Sugihara's Method)
@@ -2136,6 +2295,10 @@ class DHRobot(Robot):
             Corresponds to translation in X, Y and Z and rotation about X, Y and Z
             respectively
         :param λ: value of lambda for the damping matrix Wn
+        :param seed: seed or generator for the random restarts, defaults to
+            a seed drawn from NumPy's global generator
+        :param restart: how restart configurations are chosen, ``"random"``
+            or ``"halton"`` for a quasi-random sequence over the joint limits
 
         :return: inverse kinematic solution
         :rtype: tuple (q, success, iterations, searches, residual)
@@ -2212,7 +2375,7 @@ class DHRobot(Robot):
             TODO
         """
 
-        return self.ets().ik_lm_sugihara(Tep, q0, ilimit, slimit, tol, reject_jl, we, λ)
+        return self.ets().ik_lm_sugihara(Tep, q0, ilimit, slimit, tol, reject_jl, we, λ, seed, restart)
 
     def ik_nr(
         self,
@@ -2225,6 +2388,8 @@ class DHRobot(Robot):
         we: Union[np.ndarray, None] = None,
         use_pinv: int = True,
         pinv_damping: float = 0.0,
+        seed: Union[int, np.random.Generator, None] = None,
+        restart: str = "random",
     ) -> Tuple[np.ndarray, int, int, int, float]:
         """
         Numerical inverse kinematics by Levenberg-Marquadt optimization (Newton-Raphson Method)
@@ -2242,6 +2407,10 @@ class DHRobot(Robot):
             Corresponds to translation in X, Y and Z and rotation about X, Y and Z
             respectively
         :param λ: value of lambda for the damping matrix Wn
+        :param seed: seed or generator for the random restarts, defaults to
+            a seed drawn from NumPy's global generator
+        :param restart: how restart configurations are chosen, ``"random"``
+            or ``"halton"`` for a quasi-random sequence over the joint limits
 
         :return: inverse kinematic solution
         :rtype: tuple (q, success, iterations, searches, residual)
@@ -2318,7 +2487,7 @@ class DHRobot(Robot):
             TODO
         """
 
-        return self.ets().ik_nr(Tep, q0, ilimit, slimit, tol, reject_jl, we, use_pinv, pinv_damping)
+        return self.ets().ik_nr(Tep, q0, ilimit, slimit, tol, reject_jl, we, use_pinv, pinv_damping, seed, restart)
 
     def ik_gn(
         self,
@@ -2331,6 +2500,8 @@ class DHRobot(Robot):
         we: Union[np.ndarray, None] = None,
         use_pinv: int = True,
         pinv_damping: float = 0.0,
+        seed: Union[int, np.random.Generator, None] = None,
+        restart: str = "random",
     ) -> Tuple[np.ndarray, int, int, int, float]:
         """
         Numerical inverse kinematics by Levenberg-Marquadt optimization (Gauss-Newton Method)
@@ -2348,6 +2519,10 @@ class DHRobot(Robot):
             Corresponds to translation in X, Y and Z and rotation about X, Y and Z
             respectively
         :param λ: value of lambda for the damping matrix Wn
+        :param seed: seed or generator for the random restarts, defaults to
+            a seed drawn from NumPy's global generator
+        :param restart: how restart configurations are chosen, ``"random"``
+            or ``"halton"`` for a quasi-random sequence over the joint limits
 
         :return: inverse kinematic solution
         :rtype: tuple (q, success, iterations, searches, residual)
@@ -2424,7 +2599,148 @@ class DHRobot(Robot):
             TODO
         """
 
-        return self.ets().ik_gn(Tep, q0, ilimit, slimit, tol, reject_jl, we, use_pinv, pinv_damping)
+        return self.ets().ik_gn(Tep, q0, ilimit, slimit, tol, reject_jl, we, use_pinv, pinv_damping, seed, restart)
+
+    def ik_batch(
+        self,
+        Tep: Union[np.ndarray, SE3],
+        q0: Union[np.ndarray, None] = None,
+        method: str = "lm_chan",
+        ilimit: int = 30,
+        slimit: int = 100,
+        tol: float = 1e-6,
+        reject_jl: bool = True,
+        we: Union[np.ndarray, None] = None,
+        λ: float = 1.0,
+        use_pinv: int = True,
+        pinv_damping: float = 0.0,
+        nthreads: Union[int, None] = None,
+        seed: Union[int, np.random.Generator, None] = None,
+        restart: str = "random",
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Numerical inverse kinematics for many target poses
+
+        :param Tep: The desired end-effector poses
+        :type Tep: ndarray(M,4,4) or SE3 with M values
+        :param q0: initial joint configuration for each problem (default to
+            random valid joint configurations)
+        :type q0: ndarray(M,n)
+        :param method: the solver, one of ``"nr"``, ``"gn"``, ``"lm_chan"``,
+            ``"lm_wampler"`` or ``"lm_sugihara"``
+        :param ilimit: maximum number of iterations per search
+        :param slimit: maximum number of search attempts
+        :param tol: final error tolerance
+        :param reject_jl: constrain the solution to being within the joint
+            limits of the robot
+        :param we: a mask vector which weights the end-effector error priority
+        :param λ: value of lambda for the damping matrix Wn, LM solvers only
+        :param use_pinv: use the pseudo-inverse, NR and GN solvers only
+        :param pinv_damping: damping of the pseudo-inverse, NR and GN solvers
+            only
+        :param nthreads: number of native threads to use, defaults to the
+            number of CPUs
+        :param seed: seed or generator for the random restarts, defaults to
+            a seed drawn from NumPy's global generator
+        :param restart: how restart configurations are chosen, ``"random"``
+            or ``"halton"`` for a quasi-random sequence over the joint limits
+
+        :return: inverse kinematic solutions
+        :rtype: tuple (q, success, iterations, searches, residual)
+
+        ``sol = robot.ik_batch(Tep)`` solves the M independent problems given
+        by the poses ``Tep``, in compiled code spread over ``nthreads``
+        threads.  Each element of ``sol`` is an array with one row or element
+        per problem.
+
+        :seealso: :func:`ETS.ik_batch`
+        """
+
+        return self.ets().ik_batch(
+            Tep,
+            q0,
+            method,
+            ilimit,
+            slimit,
+            tol,
+            reject_jl,
+            we,
+            λ,
+            use_pinv,
+            pinv_damping,
+            nthreads,
+            seed,
+            restart,
+        )
+
+    def ik_traj(
+        self,
+        Tep: Union[np.ndarray, SE3],
+        q0: Union[np.ndarray, None] = None,
+        method: str = "lm_chan",
+        ilimit: int = 30,
+        slimit: int = 100,
+        tol: float = 1e-6,
+        reject_jl: bool = True,
+        we: Union[np.ndarray, None] = None,
+        λ: float = 1.0,
+        use_pinv: int = True,
+        pinv_damping: float = 0.0,
+        seed: Union[int, np.random.Generator, None] = None,
+        restart: str = "random",
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Numerical inverse kinematics along a pose trajectory
+
+        :param Tep: The desired end-effector pose trajectory
+        :type Tep: ndarray(M,4,4) or SE3 with M values
+        :param q0: initial joint configuration for the first pose (default
+            to a random valid joint configuration)
+        :type q0: ndarray(n)
+        :param method: the solver, one of ``"nr"``, ``"gn"``, ``"lm_chan"``,
+            ``"lm_wampler"`` or ``"lm_sugihara"``
+        :param ilimit: maximum number of iterations per search
+        :param slimit: maximum number of search attempts
+        :param tol: final error tolerance
+        :param reject_jl: constrain the solution to being within the joint
+            limits of the robot
+        :param we: a mask vector which weights the end-effector error priority
+        :param λ: value of lambda for the damping matrix Wn, LM solvers only
+        :param use_pinv: use the pseudo-inverse, NR and GN solvers only
+        :param pinv_damping: damping of the pseudo-inverse, NR and GN solvers
+            only
+        :param seed: seed or generator for the random restarts, defaults to
+            a seed drawn from NumPy's global generator
+        :param restart: how restart configurations are chosen, ``"random"``
+            or ``"halton"`` for a quasi-random sequence over the joint limits
+
+        :return: inverse kinematic solutions
+        :rtype: tuple (q, success, iterations, searches, residual, dq)
+
+        ``sol = robot.ik_traj(Tep)`` solves the poses ``Tep`` in order, each
+        seeded with the previous solution.  Random restarts are only used when
+        the seeded search fails.  ``sol`` has one row or element per pose and
+        its last element is the continuity error, the largest joint step from
+        the previous pose.
+
+        :seealso: :func:`ETS.ik_traj`
+        """
+
+        return self.ets().ik_traj(
+            Tep,
+            q0,
+            method,
+            ilimit,
+            slimit,
+            tol,
+            reject_jl,
+            we,
+            λ,
+            use_pinv,
+            pinv_damping,
+            seed,
+            restart,
+        )
 
 
 
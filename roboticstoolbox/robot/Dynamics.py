@@ -18,6 +18,7 @@ from spatialmath.base import symbolic as sym
 from roboticstoolbox import rtb_get_param
 
 from ansitable import ANSITable, Column
+from frbd import RBD_init, RBD_coriolis, RBD_inertia, RBD_accel
 import warnings
 
 
@@ -95,6 +96,62 @@ class DynamicsMixin:
 
     # --------------------------------------------------------------------- #
 
+    def _rbd_tree(self):
+        """
+        Rigid-body tree description for the compiled dynamics (Robot superclass)
+
+        :return: arguments for ``frbd.RBD_init``, or None if the robot class
+            has no compiled dynamics
+
+        Subclasses return a tuple ``(parent, jindex, axis, flip, offset,
+        Tpre, Tpost, L)`` which describes one body per joint, ordered so
+        that a parent always precedes its children.
+
+        :seealso: :func:`_rbd`
+        """
+        return None
+
+    def _rbd(self):
+        """
+        Compiled rigid-body tree (Robot superclass)
+
+        :return: the tree object used by the ``frbd`` extension, or None if
+            it is not available for this robot
+        :rtype: PyCapsule or None
+
+        The tree is built on first use and discarded whenever a dynamic
+        parameter changes, see :func:`dynchanged`.  Robots with symbolic
+        parameters have no compiled tree.
+        """
+        if self._rbd_ob is None:
+            try:
+                tree = self._rbd_tree()
+            except TypeError:
+                # symbolic parameters
+                return None
+
+            if tree is not None:
+                self._rbd_ob = RBD_init(*tree)
+
+        return self._rbd_ob
+
+    def _rbd_gravity(self, gravity=None):
+        """
+        Gravity for the compiled dynamics (Robot superclass)
+
+        :param gravity: gravitational acceleration, defaults to the robot's
+            ``gravity`` attribute
+        :type gravity: ndarray(3), optional
+        :return: gravitational acceleration in the frame of the rigid-body
+            tree
+        :rtype: ndarray(3)
+        """
+        if gravity is None:
+            gravity = self.gravity
+        return getvector(gravity, 3)
+
+    # --------------------------------------------------------------------- #
+
     def friction(self, qd):
         r"""
         Manipulator joint friction (Robot superclass)
@@ -200,15 +257,16 @@ class DynamicsMixin:
         :param T: integration time
         :type T: float
         :param q0: initial joint coordinates
-        :type q0: array_like
+        :type q0: array_like(n) or ndarray(K,n)
         :param qd0: initial joint velocities, assumed zero if not given
-        :type qd0: array_like
+        :type qd0: array_like(n) or ndarray(K,n)
         :param torque: a function that computes torque as a function of time
         and/or state
         :type torque: callable
         :param torque_args: positional arguments passed to ``torque``
         :type torque_args: dict
-        :type solver: name of scipy solver to use, RK45 is the default
+        :type solver: name of scipy solver to use, RK45 is the default, or
+            a fixed-step solver ``"euler"`` or ``"rk4"``
         :param solver: str
         :type solver_args: arguments passed to the solver
         :param solver_args: dict
@@ -276,6 +334,22 @@ class DynamicsMixin:
         want to animate the result.  If ``dt`` is specified then the solver
         results are interpolated in time steps of ``dt``.
 
+        **Fixed-step and batched operation**
+
+        If ``solver`` is ``"euler"`` (semi-implicit Euler) or ``"rk4"``
+        (classical 4th order Runge-Kutta) the dynamics are integrated with a
+        fixed step of ``dt``, which must be given, and the results are written
+        into preallocated arrays.  In this mode ``q0`` and ``qd0`` may be
+        matrices (K,n) where each row is an initial condition.  All K
+        rollouts are advanced together, with one vectorised call to
+        :func:`accel` per integrator stage, and the torque function is called
+        with (K,n) matrices for ``q`` and ``qd`` and must return a (K,n)
+        matrix.  The elements of the returned namedtuple are then ``t`` (M,),
+        ``q`` (K,M,n) and ``qd`` (K,M,n).  This is well suited to
+        Monte-Carlo evaluation of a controller over many rollouts::
+
+                tg = robot.fdyn(2, q0, myfunc, solver="rk4", dt=1e-3)
+
         .. note::
 
             - This function performs poorly with non-linear joint friction,
@@ -297,14 +371,18 @@ class DynamicsMixin:
 
         if not isscalar(T):
             raise ValueError("T must be a scalar")
+        if torque is not None:
+            if not callable(torque):
+                raise ValueError("torque function must be callable")
+
+        if solver in ("euler", "rk4"):
+            return self._fdyn_fixed(T, q0, qd0, torque, torque_args, solver, dt)
+
         q0 = getvector(q0, n)
         if qd0 is None:
             qd0 = np.zeros((n,))
         else:
             qd0 = getvector(qd0, n)
-        if torque is not None:
-            if not callable(torque):
-                raise ValueError("torque function must be callable")
 
         # concatenate q and qd into the initial state vector
         x0 = np.r_[q0, qd0]
@@ -362,6 +440,91 @@ class DynamicsMixin:
         else:
             return namedtuple("fdyn", "t q qd")(tarray, xarray[:, :n], xarray[:, n:])
 
+    def _fdyn_fixed(self, T, q0, qd0, torqfun, targs, solver, dt):
+        """
+        Private function called by fdyn for the fixed-step solvers
+
+        :param T: integration time
+        :type T: float
+        :param q0: initial joint coordinates
+        :type q0: array_like(n) or ndarray(K,n)
+        :param qd0: initial joint velocities, zero if None
+        :type qd0: array_like(n) or ndarray(K,n)
+        :param torqfun: a function that computes torque as a function of time
+        and/or state
+        :type torqfun: callable
+        :param targs: argumments passed to ``torqfun``
+        :type targs: dict
+        :param solver: ``"euler"`` or ``"rk4"``
+        :type solver: str
+        :param dt: integration step
+        :type dt: float
+
+        :return: robot trajectory
+        :rtype: namedtuple
+        """
+        n = self.n
+
+        if dt is None:
+            raise ValueError("dt must be given for a fixed-step solver")
+
+        # a single initial condition gives a single trajectory, and the
+        # torque function sees vectors as it does for the scipy solvers
+        single = np.ndim(q0) == 1
+        q = np.array(getmatrix(q0, (None, n)), dtype=float)
+        K = q.shape[0]
+        if qd0 is None:
+            qd = np.zeros((K, n))
+        else:
+            qd = np.array(
+                np.broadcast_to(getmatrix(qd0, (None, n)), (K, n)), dtype=float
+            )
+
+        nsteps = int(round(T / dt))
+        t = np.arange(nsteps + 1) * dt
+
+        qt = np.empty((K, nsteps + 1, n))
+        qdt = np.empty((K, nsteps + 1, n))
+        qt[:, 0, :] = q
+        qdt[:, 0, :] = qd
+
+        zero = np.zeros((K, n))
+
+        def qdd(t, q, qd):
+            if torqfun is None:
+                tau = zero
+            elif single:
+                tau = torqfun(self, t, q[0], qd[0], **targs)
+            else:
+                tau = torqfun(self, t, q, qd, **targs)
+            return self.accel(q, qd, tau).reshape((K, n))
+
+        for i in range(nsteps):
+            ti = t[i]
+            if solver == "euler":
+                # semi-implicit (symplectic) Euler
+                qd = qd + dt * qdd(ti, q, qd)
+                q = q + dt * qd
+            else:
+                k1v = qdd(ti, q, qd)
+                k2q = qd + 0.5 * dt * k1v
+                k2v = qdd(ti + 0.5 * dt, q + 0.5 * dt * qd, k2q)
+                k3q = qd + 0.5 * dt * k2v
+                k3v = qdd(ti + 0.5 * dt, q + 0.5 * dt * k2q, k3q)
+                k4q = qd + dt * k3v
+                k4v = qdd(ti + dt, q + dt * k3q, k4q)
+
+                q = q + dt / 6 * (qd + 2 * k2q + 2 * k3q + k4q)
+                qd = qd + dt / 6 * (k1v + 2 * k2v + 2 * k3v + k4v)
+
+            qt[:, i + 1, :] = q
+            qdt[:, i + 1, :] = qd
+
+        if single:
+            return namedtuple("fdyn", "t q qd")(t, qt[0], qdt[0])
+        else:
+            return namedtuple("fdyn", "t q qd")(t, qt, qdt)
+
     def _fdyn(self, t, x, torqfun, targs):
         """
         Private function called by fdyn
@@ -443,10 +606,11 @@ class DynamicsMixin:
         .. note::
             - Useful for simulation of manipulator dynamics, in
               conjunction with a numerical integration function.
-            - Uses the method 1 of Walker and Orin to compute the forward
-              dynamics.
-            - Featherstone's method is more efficient for robots with large
-              numbers of joints.
+            - For numeric models uses Featherstone's articulated-body
+              algorithm, :math:`O(n)` per joint state, in compiled code for
+              the whole trajectory.
+            - Symbolic models use the method 1 of Walker and Orin to compute
+              the forward dynamics.
             - Joint friction is considered.
 
         :references:
@@ -454,6 +618,7 @@ class DynamicsMixin:
               M. W. Walker and D. E. Orin,
               ASME Journa of Dynamic Systems, Measurement and Control, vol.
               104, no. 3, pp. 205-211, 1982.
+            - Rigid Body Dynamics Algorithms, R. Featherstone, Springer, 2008.
 
         """  # noqa
 
@@ -461,23 +626,33 @@ class DynamicsMixin:
         qd = getmatrix(qd, (None, self.n))
         torque = getmatrix(torque, (None, self.n))
 
-        qdd = np.zeros((q.shape[0], self.n))
+        tree = self._rbd()
+        if tree is not None and all(
+            [x.dtype != object for x in (q, qd, torque)]
+        ):
+            qdd = RBD_accel(tree, q, qd, torque, self._rbd_gravity(gravity))
+            if np.isnan(qdd).any():
+                # a joint with no inertia beyond it, as np.linalg.solve
+                raise np.linalg.LinAlgError("Singular matrix")
+            if q.shape[0] == 1:
+                return qdd[0, :]
+            else:
+                return qdd
 
-        for k, (qk, qdk, tauk) in enumerate(zip(q, qd, torque)):
-            # Compute current manipulator inertia torques resulting from unit
-            # acceleration of each joint with no gravity.
-            qI = (np.c_[qk] @ np.ones((1, self.n))).T
-            qdI = np.zeros((self.n, self.n))
-            qddI = np.eye(self.n)
+        qdd = np.zeros((q.shape[0], self.n))
 
-            M = self.rne(qI, qdI, qddI, gravity=[0, 0, 0])
+        # Compute current manipulator inertia for the whole trajectory, this
+        # is the torque resulting from unit acceleration of each joint with
+        # no gravity.
+        M = self.inertia(q).reshape((q.shape[0], self.n, self.n))
 
+        for k, (qk, qdk, tauk) in enumerate(zip(q, qd, torque)):
             # Compute gravity and coriolis torque torques resulting from zero
             # acceleration at given velocity & with gravity acting.
             tau = self.rne(qk, qdk, np.zeros((1, self.n)), gravity=gravity)
 
             # solve is faster than inv() which is faster than pinv()
-            qdd[k, :] = np.linalg.solve(M, tauk - tau)
+            qdd[k, :] = np.linalg.solve(M[k], tauk - tau)
 
         if q.shape[0] == 1:
             return qdd[0, :]
@@ -674,7 +849,7 @@ class DynamicsMixin:
         **Trajectory operation**
 
         If ``q`` is a matrix (m,n), each row is interpretted as a joint state
-        vector, and the result is a 3d-matrix (nxnxk) where each plane
+        vector, and the result is a 3d-matrix (m,n,n) where each plane
         corresponds to the inertia for the corresponding row of q.
 
         .. note::
@@ -685,11 +860,22 @@ class DynamicsMixin:
               joint ``k``.
             - The diagonal terms include the motor inertia reflected through
               the gear ratio.
+            - For numeric models the composite rigid-body algorithm is used,
+              in compiled code for the whole trajectory.  Symbolic models
+              fall back to :math:`n` invocations of RNE.
 
         :seealso: :func:`cinertia`
         """
         q = getmatrix(q, (None, self.n))
 
+        tree = self._rbd()
+        if tree is not None and q.dtype != object:
+            In = RBD_inertia(tree, q)
+            if q.shape[0] == 1:
+                return In[0, :, :]
+            else:
+                return In
+
         In = np.zeros((q.shape[0], self.n, self.n))
 
         for k, qk in enumerate(q):
@@ -738,13 +924,23 @@ class DynamicsMixin:
         **Trajectory operation**
 
         If ``q`` and `qd` are matrices (m,n), each row is interpretted as a
-        joint configuration, and the result (n,n,m) is a 3d-matrix where
+        joint configuration, and the result (m,n,n) is a 3d-matrix where
         each plane corresponds to a row of ``q`` and ``qd``.
 
         .. note::
             - Joint viscous friction is also a joint force proportional to
               velocity but it is eliminated in the computation of this value.
-            - Computationally slow, involves :math:`n^2/2` invocations of RNE.
+            - For numeric models the matrix is computed directly from the
+              rigid-body tree in compiled code, :math:`O(n^2)` per
+              configuration, with the trajectory loop also in compiled code.
+              Symbolic models fall back to :math:`n^2/2` invocations of RNE.
+            - The result satisfies :math:`\dot{\mathbf{M}} - 2 \mathbf{C}`
+              skew symmetric.
+
+        :references:
+            - Numerical Methods to Compute the Coriolis Matrix and
+              Christoffel Symbols for Rigid-Body Systems, S. Echeandia and
+              P. M. Wensing, J. Comput. Nonlinear Dynam. 16(9), 2021.
         """
 
         q = getmatrix(q, (None, self.n))
@@ -752,6 +948,14 @@ class DynamicsMixin:
         if q.shape[0] != qd.shape[0]:
             raise ValueError("q and qd must have the same number of rows")
 
+        tree = self._rbd()
+        if tree is not None and q.dtype != object and qd.dtype != object:
+            C = RBD_coriolis(tree, q, qd)
+            if q.shape[0] == 1:
+                return C[0, :, :]
+            else:
+                return C
+
         # ensure that friction doesn't enter the mix, it's also a velocity
         # dependent force/torque
         r1 = self.nofriction(True, True)
@@ -926,6 +1130,7 @@ class DynamicsMixin:
         else:
             # trajectory case
             Mt = np.zeros((q.shape[0], 6, 6))
+            M = self.inertia(q)
 
             for k, qk in enumerate(q):
                 Ja = self.jacob0_analytical(qk, representation)
@@ -933,8 +1138,7 @@ class DynamicsMixin:
                     Ji = np.linalg.pinv(Ja)
                 else:
                     Ji = np.linalg.inv(Ja)
-                M = self.inertia(qk)
-                Mt[k, :, :] = Ji.T @ M @ Ji
+                Mt[k, :, :] = Ji.T @ M[k] @ Ji
 
             return Mt
 
@@ -20,17 +20,20 @@ from numpy import (
     cross,
     arccos,
     dot,
+    outer,
 )
 from numpy.linalg import norm as npnorm, inv
+from numpy.random import Generator
 from spatialmath import SE3, SE2
 from spatialgeometry import Cylinder
-from spatialmath.base.argcheck import getvector, islistof
+from spatialmath.base.argcheck import getvector, getmatrix, islistof
 from roboticstoolbox.robot.Link import Link, Link2, BaseLink
 from roboticstoolbox.robot.ETS import ETS, ETS2
 from roboticstoolbox.robot.ET import ET
 from roboticstoolbox.robot.DHRobot import DHRobot
 from roboticstoolbox.tools import xacro
 from roboticstoolbox.tools import URDF
+from roboticstoolbox.tools.urdf import cache as urdf_cache
 from roboticstoolbox.robot.Robot import Robot
 from roboticstoolbox.robot.Gripper import Gripper
 from roboticstoolbox.tools.data import rtb_path_to_datafile
@@ -46,6 +49,7 @@ from spatialmath import (
 from functools import lru_cache
 from typing import Union, overload, Dict, List, Tuple, Optional
 from copy import deepcopy
+from frbd import RBD_rne
 
 ArrayLike = Union[list, ndarray, tuple, set]
 
@@ -291,8 +295,8 @@ class BaseERobot(Robot):
         for gripper in self.grippers:
             self._nlinks += len(gripper.links)
 
-        # SceneNode, set a reference to the first link
-        self.scene_children = [self.links[0]]  # type: ignore
+        # SceneNode, set a reference to the base link
+        self.scene_children = [self.base_link]  # type: ignore
 
     def __str__(self) -> str:
         """
@@ -830,16 +834,43 @@ class BaseERobot(Robot):
         - ``T[0]`` is the base transform
         - ``T[i]`` is the pose of link whose ``number`` is ``i``
 
+        For a 3D robot the poses of the robot links are copied from the link
+        frame array shared with the collision checker and graphical backends,
+        which is computed once per joint configuration.  Gripper links are
+        composed with the frame of their parent, using the joint coordinates
+        of their gripper.
+
         :references:
             - Kinematic Derivatives using the Elementary Transform
               Sequence, J. Haviland and P. Corke
+
+        :seealso: :func:`Robot._link_frames`
         """
         q = getvector(q)
 
         if isinstance(self, ERobot):
-            Tbase = SE3(self.base)  # add base, also sets the type
-        else:
-            Tbase = SE2(self.base)  # add base, also sets the type
+            # copy, the shared frames are read only
+            frames = array(self._link_frames(q))
+
+            linkframes = SE3.Alloc(self.nlinks + 1)
+            linkframes.data[0] = self.base.A
+            for link, T in zip(self.links, frames):
+                linkframes.data[link.number] = T
+
+            # gripper links are in depth-first order, after their parent
+            for gripper in self.grippers:
+                for link in gripper.links:
+                    if link.isjoint:
+                        A = link.A(gripper.q[link.jindex]).A
+                    else:
+                        A = link.A().A
+                    linkframes.data[link.number] = (
+                        linkframes.data[link.parent.number] @ A
+                    )
+
+            return linkframes
+
+        Tbase = SE2(self.base)  # add base, also sets the type
 
         linkframes = Tbase.__class__.Alloc(self.nlinks + 1)
         linkframes[0] = Tbase
@@ -848,10 +879,7 @@ class BaseERobot(Robot):
             # if joint??
             T = Tparent
             while True:
-                if isinstance(self, ERobot):
-                    T *= SE3(link.A(q[link.jindex]))
-                else:
-                    T *= SE2(link.A(q[link.jindex]))
+                T *= SE2(link.A(q[link.jindex]))
 
                 Tall[link.number] = T
 
@@ -1410,7 +1438,7 @@ class ERobot(BaseERobot):
     # --------------------------------------------------------------------- #
 
     @staticmethod
-    def URDF_read(file_path, tld=None, xacro_tld=None):
+    def URDF_read(file_path, tld=None, xacro_tld=None, cache=None):
         """
         Read a URDF file as Links
         :param file_path: File path relative to the xacro folder
@@ -1421,6 +1449,9 @@ class ERobot(BaseERobot):
         :param xacro_tld: A custom top-level within the xacro data,
             defaults to None
         :type xacro_tld: str, optional
+        :param cache: use the on-disk model cache, defaults to the toolbox
+            parameter ``"urdf_cache"`` which is False
+        :type cache: bool, optional
         :return: Links and robot name
         :rtype: tuple(Link list, str)
         File should be specified relative to ``RTBDATA/URDF/xacro``
@@ -1429,6 +1460,17 @@ class ERobot(BaseERobot):
             be directly under ``RTBDATA/URDF/xacro`` OR under ``./xacro`` relative
             to the model file calling this method. If ``tld`` is supplied, then
             ```file_path``` needs to be relative to ``tld``
+
+        .. note:: If the cache is enabled, by ``cache=True`` or
+            ``rtb_set_param("urdf_cache", True)``, parsed models are kept on
+            disk so later reads skip the xacro preprocessor and the XML parse.
+            The cache is in ``~/.cache/roboticstoolbox/urdf``, or under
+            ``$XDG_CACHE_HOME`` or ``%LOCALAPPDATA%`` if set, or the directory
+            given by ``rtb_set_param("cache_dir", ...)``.  An entry is rebuilt
+            when the model file, or any file it includes, is modified or the
+            toolbox version changes.
+
+        :seealso: :mod:`roboticstoolbox.tools.urdf.cache`
         """
 
         # get the path to the class that defines the robot
@@ -1442,21 +1484,47 @@ class ERobot(BaseERobot):
         file_path = base_path / PurePosixPath(file_path)
         name, ext = splitext(file_path)
 
+        if xacro_tld is not None:
+            xacro_tld = base_path / PurePosixPath(xacro_tld)
+
+        if cache is None:
+            cache = rtb_get_param("urdf_cache")
+
+        entry = None
+        if cache:
+            entry = urdf_cache.read(file_path, xacro_tld)
+            if entry is not None and urdf_cache.isfresh(entry):
+                return (
+                    urdf_cache.links(entry),
+                    entry["name"],
+                    entry["urdf_string"],
+                    file_path,
+                )
+
+        sources = [file_path]
         if ext == ".xacro":
             # it's a xacro file, preprocess it
-            if xacro_tld is not None:
-                xacro_tld = base_path / PurePosixPath(xacro_tld)
+            nincludes = len(xacro.all_includes)
             urdf_string = xacro.main(file_path, xacro_tld)
+            sources += xacro.all_includes[nincludes:]
+        else:  # pragma nocover
+            urdf_string = open(file_path).read()
+
+        if entry is not None and entry["hash"] == urdf_cache.urdf_hash(urdf_string):
+            # the sources were touched but expand to the same URDF
+            links, name = urdf_cache.links(entry), entry["name"]
+        else:
             try:
                 urdf = URDF.loadstr(urdf_string, file_path, base_path)
             except BaseException as e:
                 print("error parsing URDF file", file_path)
                 raise e
-        else:  # pragma nocover
-            urdf_string = open(file_path).read()
-            urdf = URDF.loadstr(urdf_string, file_path, base_path)
+            links, name = urdf.elinks, urdf.name
+
+        if cache:
+            urdf_cache.write(file_path, xacro_tld, sources, urdf_string, name, links)
 
-        return urdf.elinks, urdf.name, urdf_string, file_path
+        return links, name, urdf_string, file_path
 
     # --------------------------------------------------------------------- #
 
@@ -1571,6 +1639,7 @@ class ERobot(BaseERobot):
         end: Union[str, Link, Gripper, None] = None,
         start: Union[str, Link, Gripper, None] = None,
         tool: Union[ndarray, SE3, None] = None,
+        out: Union[ndarray, None] = None,
     ) -> ndarray:
         r"""
         Manipulator geometric Jacobian in the base frame
@@ -1582,6 +1651,8 @@ class ERobot(BaseERobot):
         :param start: the link considered as the base frame, defaults to the robots's base frame
         :param tool: a static tool transformation matrix to apply to the
             end of end, defaults to None
+        :param out: preallocated C contiguous float64 array of shape (m,6,n)
+            to write the result into, optional
 
         :return J: Manipulator Jacobian in the base frame
 
@@ -1592,6 +1663,11 @@ class ERobot(BaseERobot):
         End-effector spatial velocity :math:`\nu = (v_x, v_y, v_z, \omega_x, \omega_y, \omega_z)^T`
         is related to joint velocity by :math:`{}^{E}\!\nu = \mathbf{J}_m(q) \dot{q}`.
 
+        **Trajectory operation**:
+
+        If ``q`` has multiple rows (mxn), it is considered a trajectory and the
+        result is an ndarray(m,6,n).
+
         Example:
         .. runblock:: pycon
             >>> import roboticstoolbox as rtb
@@ -1606,7 +1682,7 @@ class ERobot(BaseERobot):
         .. warning:: ``start`` and ``end`` must be on the same branch,
             with ``start`` closest to the base.
         """  # noqa
-        return self.ets(start, end).jacob0(q, tool=tool)
+        return self.ets(start, end).jacob0(q, tool=tool, out=out)
 
     def jacobe(
         self,
@@ -1614,6 +1690,7 @@ class ERobot(BaseERobot):
         end: Union[str, Link, Gripper, None] = None,
         start: Union[str, Link, Gripper, None] = None,
         tool: Union[ndarray, SE3, None] = None,
+        out: Union[ndarray, None] = None,
     ) -> ndarray:
         r"""
         Manipulator geometric Jacobian in the end-effector frame
@@ -1625,6 +1702,8 @@ class ERobot(BaseERobot):
         :param start: the link considered as the base frame, defaults to the robots's base frame
         :param tool: a static tool transformation matrix to apply to the
             end of end, defaults to None
+        :param out: preallocated C contiguous float64 array of shape (m,6,n)
+            to write the result into, optional
 
         :return J: Manipulator Jacobian in the end-effector frame
 
@@ -1634,6 +1713,11 @@ class ERobot(BaseERobot):
         End-effector spatial velocity :math:`\nu = (v_x, v_y, v_z, \omega_x, \omega_y, \omega_z)^T`
         is related to joint velocity by :math:`{}^{E}\!\nu = \mathbf{J}_m(q) \dot{q}`.
 
+        **Trajectory operation**:
+
+        If ``q`` has multiple rows (mxn), it is considered a trajectory and the
+        result is an ndarray(m,6,n).
+
         Example:
         .. runblock:: pycon
             >>> import roboticstoolbox as rtb
@@ -1648,7 +1732,7 @@ class ERobot(BaseERobot):
         .. warning:: ``start`` and ``end`` must be on the same branch,
             with ``start`` closest to the base.
         """  # noqa
-        return self.ets(start, end).jacobe(q, tool=tool)
+        return self.ets(start, end).jacobe(q, tool=tool, out=out)
 
     def hessian0(
         self,
@@ -1657,6 +1741,7 @@ class ERobot(BaseERobot):
         start: Union[str, Link, Gripper, None] = None,
         J0: Union[ndarray, None] = None,
         tool: Union[ndarray, SE3, None] = None,
+        out: Union[ndarray, None] = None,
     ) -> ndarray:
         r"""
         Manipulator Hessian
@@ -1674,6 +1759,8 @@ class ERobot(BaseERobot):
         :param J0: The manipulator Jacobian in the 0 frame
         :param tool: a static tool transformation matrix to apply to the
             end of end, defaults to None
+        :param out: preallocated C contiguous float64 array of shape
+            (m,n,6,n) to write the result into, optional
         
         :return: The manipulator Hessian in 0 frame
         
@@ -1696,12 +1783,17 @@ class ERobot(BaseERobot):
         Similarly, we can write
         .. math::
             \mat{J}_{i,j} = \frac{d u_i}{d q_j}
+
+        **Trajectory operation**:
+
+        If ``q`` has multiple rows (mxn), it is considered a trajectory and the
+        result is an ndarray(m,n,6,n).
         
         :references:
             - Kinematic Derivatives using the Elementary Transform
               Sequence, J. Haviland and P. Corke
         """
-        return self.ets(start, end).hessian0(q, J0=J0, tool=tool)
+        return self.ets(start, end).hessian0(q, J0=J0, tool=tool, out=out)
 
     def hessiane(
         self,
@@ -1710,6 +1802,7 @@ class ERobot(BaseERobot):
         start: Union[str, Link, Gripper, None] = None,
         Je: Union[ndarray, None] = None,
         tool: Union[ndarray, SE3, None] = None,
+        out: Union[ndarray, None] = None,
     ) -> ndarray:
         r"""
         Manipulator Hessian
@@ -1727,6 +1820,8 @@ class ERobot(BaseERobot):
         :param Je: The manipulator Jacobian in the ee frame
         :param tool: a static tool transformation matrix to apply to the
             end of end, defaults to None
+        :param out: preallocated C contiguous float64 array of shape
+            (m,n,6,n) to write the result into, optional
         
         :return: The manipulator Hessian in ee frame
         
@@ -1749,12 +1844,17 @@ class ERobot(BaseERobot):
         Similarly, we can write
         .. math::
             \mat{J}_{i,j} = \frac{d u_i}{d q_j}
+
+        **Trajectory operation**:
+
+        If ``q`` has multiple rows (mxn), it is considered a trajectory and the
+        result is an ndarray(m,n,6,n).
         
         :references:
             - Kinematic Derivatives using the Elementary Transform
               Sequence, J. Haviland and P. Corke
         """
-        return self.ets(start, end).hessiane(q, Je=Je, tool=tool)
+        return self.ets(start, end).hessiane(q, Je=Je, tool=tool, out=out)
 
     def partial_fkine0(
         self,
@@ -2040,8 +2140,142 @@ class ERobot(BaseERobot):
 
         return Ain, bin
 
+    def _rbd_tree(self):
+        # One body per joint link, in depth-first order. A static link is
+        # rigidly attached to the nearest joint link above it, so its
+        # transform is folded into the Tpre of its descendants and its
+        # inertia lumped into that body. Links fixed to the base do not
+        # contribute to the joint space dynamics.
+        axes = ["Rx", "Ry", "Rz", "tx", "ty", "tz"]
+        links = set(id(link) for link in self.links)
+
+        parent = []
+        jindex = []
+        axis = []
+        flip = []
+        Tpre = []
+        L = []
+        parts = []  # inertial parts of each body, in the body frame
+
+        # link -> (body it is attached to, pose of link wrt the body frame)
+        attached = {}
+
+        def visit(link):
+            if id(link) not in links:
+                # gripper link
+                return
+
+            if link.parent is None:
+                body, T = -1, eye(4)
+            else:
+                body, T = attached[id(link.parent)]
+
+            if link.isjoint:
+                attached[id(link)] = (len(parent), eye(4))
+                parent.append(body)
+                jindex.append(link.jindex)
+                axis.append(axes.index(link.v.axis))
+                flip.append(-1.0 if link.v.isflip else 1.0)
+                Tpre.append(T @ link.Ts)
+                L.append([link.Jm, link.G, link.B, link.Tc[0], link.Tc[1]])
+                parts.append([(link.m, link.r, link.I)])
+            else:
+                T = T @ link.Ts
+                attached[id(link)] = (body, T)
+                if body >= 0:
+                    R = T[:3, :3]
+                    parts[body].append(
+                        (link.m, R @ link.r + T[:3, 3], R @ link.I @ R.T)
+                    )
+
+        self.dfs_links(self.base_link, visit)
+
+        n = len(parent)
+        Lb = zeros((n, 18))
+
+        for i in range(n):
+            # combine the parts with the parallel axis theorem
+            m = sum([part[0] for part in parts[i]])
+            if m > 0:
+                r = sum([part[0] * part[1] for part in parts[i]]) / m
+            else:
+                r = zeros(3)
+
+            I = zeros((3, 3))  # noqa
+            for mk, rk, Ik in parts[i]:
+                d = rk - r
+                I += Ik + mk * (dot(d, d) * eye(3) - outer(d, d))
+
+            Lb[i, 0] = m
+            Lb[i, 1:4] = r
+            Lb[i, 4:13] = I.flatten()
+            Lb[i, 13:] = L[i]
+
+        return (
+            array(parent),
+            array(jindex),
+            array(axis),
+            array(flip),
+            zeros(n),
+            array(Tpre).reshape((n, 4, 4)),
+            array([eye(4)] * n).reshape((n, 4, 4)),
+            Lb,
+        )
+
     # inverse dynamics (recursive Newton-Euler) using spatial vector notation
     def rne(self, q, qd, qdd, symbolic=False, gravity=None):
+        """
+        Inverse dynamics
+
+        :param q: Joint coordinates
+        :type q: ndarray(n) or ndarray(m,n)
+        :param qd: Joint velocity
+        :type qd: ndarray(n) or ndarray(m,n)
+        :param qdd: The joint accelerations of the robot
+        :type qdd: ndarray(n) or ndarray(m,n)
+        :param symbolic: compute the result symbolically
+        :type symbolic: bool
+        :param gravity: Gravitational acceleration to override robot's gravity
+            value
+        :type gravity: ndarray(3)
+        :return: Joint force/torque
+        :rtype: ndarray(n) or ndarray(m,n)
+
+        ``tau = rne(q, qd, qdd)`` is the joint torque required for the robot
+        to achieve the specified joint position ``q``, velocity ``qd`` and
+        acceleration ``qdd``.
+
+        **Trajectory operation**
+
+        If ``q``, ``qd`` and ``qdd`` are matrices (m,n) each row is a joint
+        state and the result ``tau`` is (m,n).
+
+        .. note::
+            - For numeric models the recursion runs in compiled code over a
+              rigid-body tree which is built once, and rebuilt only when a
+              dynamic parameter changes. Branched robots are supported and
+              the dynamic parameters of static links are lumped into the
+              joint link that carries them.  The torque computed contains a
+              contribution due to armature inertia and joint friction.
+            - Symbolic models use a Python implementation based on
+              spatial vector objects.
+        """
+
+        if not symbolic:
+            tree = self._rbd()
+            Q = getmatrix(q, (None, self.n))
+            Qd = getmatrix(qd, (None, self.n))
+            Qdd = getmatrix(qdd, (None, self.n))
+
+            if tree is not None and all(
+                [x.dtype != object for x in (Q, Qd, Qdd)]
+            ):
+                tau = RBD_rne(tree, Q, Qd, Qdd, self._rbd_gravity(gravity))
+
+                if tau.shape[0] == 1:
+                    return tau[0, :]
+                else:
+                    return tau
 
         n = self.n
 
@@ -2138,6 +2372,8 @@ class ERobot(BaseERobot):
         reject_jl: bool = True,
         we: Union[ndarray, None] = None,
         λ: float = 1.0,
+        seed: Union[int, Generator, None] = None,
+        restart: str = "random",
     ) -> Tuple[ndarray, int, int, int, float]:
         """
         Numerical inverse kinematics by Levenberg-Marquadt optimization (Chan's Method)
@@ -2157,6 +2393,10 @@ class ERobot(BaseERobot):
             Corresponds to translation in X, Y and Z and rotation about X, Y and Z
             respectively
         :param λ: value of lambda for the damping matrix Wn
+        :param seed: seed or generator for the random restarts, defaults to
+            a seed drawn from NumPy's global generator
+        :param restart: how restart configurations are chosen, ``"random"``
+            or ``"halton"`` for a quasi-random sequence over the joint limits
 
         :return: inverse kinematic solution
         :rtype: tuple (q, success, iterations, searches, residual)
@@ -2233,7 +2473,7 @@ class ERobot(BaseERobot):
             TODO
         """
 
-        return self.ets(start, end).ik_lm_chan(Tep, q0, ilimit, slimit, tol, reject_jl, we, λ)
+        return self.ets(start, end).ik_lm_chan(Tep, q0, ilimit, slimit, tol, reject_jl, we, λ, seed, restart)
 
     def ik_lm_wampler(
         self,
@@ -2247,6 +2487,8 @@ class ERobot(BaseERobot):
         reject_jl: bool = True,
         we: Union[ndarray, None] = None,
         λ: float = 1.0,
+        seed: Union[int, Generator, None] = None,
+        restart: str = "random",
     ) -> Tuple[ndarray, int, int, int, float]:
         """
         Numerical inverse kinematics by Levenberg-Marquadt optimization (Wamplers's Method)
@@ -2266,6 +2508,10 @@ class ERobot(BaseERobot):
             Corresponds to translation in X, Y and Z and rotation about X, Y and Z
             respectively
         :param λ: value of lambda for the damping matrix Wn
+        :param seed: seed or generator for the random restarts, defaults to
+            a seed drawn from NumPy's global generator
+        :param restart: how restart configurations are chosen, ``"random"``
+            or ``"halton"`` for a quasi-random sequence over the joint limits
 
         :return: inverse kinematic solution
         :rtype: tuple (q, success, iterations, searches, residual)
@@ -2342,7 +2588,7 @@ class ERobot(BaseERobot):
             TODO
         """
 
-        return self.ets(start, end).ik_lm_wampler(Tep, q0, ilimit, slimit, tol, reject_jl, we, λ)
+        return self.ets(start, end).ik_lm_wampler(Tep, q0, ilimit, slimit, tol, reject_jl, we, λ, seed, restart)
 
     def ik_lm_sugihara(
         self,
@@ -2356,6 +2602,8 @@ class ERobot(BaseERobot):
         reject_jl: bool = True,
         we: Union[ndarray, None] = None,
         λ: float = 1.0,
+        seed: Union[int, Generator, None] = None,
+        restart: str = "random",
     ) -> Tuple[ndarray, int, int, int, float]:
         """
         Numerical inverse kinematics by Levenberg-Marquadt optimization (Sugihara's Method)
@@ -2375,6 +2623,10 @@ class ERobot(BaseERobot):
             Corresponds to translation in X, Y and Z and rotation about X, Y and Z
             respectively
         :param λ: value of lambda for the damping matrix Wn
+        :param seed: seed or generator for the random restarts, defaults to
+            a seed drawn from NumPy's global generator
+        :param restart: how restart configurations are chosen, ``"random"``
+            or ``"halton"`` for a quasi-random sequence over the joint limits
 
         :return: inverse kinematic solution
         :rtype: tuple (q, success, iterations, searches, residual)
@@ -2451,7 +2703,7 @@ class ERobot(BaseERobot):
             TODO
         """
 
-        return self.ets(start, end).ik_lm_sugihara(Tep, q0, ilimit, slimit, tol, reject_jl, we, λ)
+        return self.ets(start, end).ik_lm_sugihara(Tep, q0, ilimit, slimit, tol, reject_jl, we, λ, seed, restart)
 
     def ik_nr(
         self,
@@ -2466,6 +2718,8 @@ class ERobot(BaseERobot):
         we: Union[ndarray, None] = None,
         use_pinv: int = True,
         pinv_damping: float = 0.0,
+        seed: Union[int, Generator, None] = None,
+        restart: str = "random",
     ) -> Tuple[ndarray, int, int, int, float]:
         """
         Numerical inverse kinematics by Levenberg-Marquadt optimization (Newton-Raphson Method)
@@ -2485,6 +2739,10 @@ class ERobot(BaseERobot):
             Corresponds to translation in X, Y and Z and rotation about X, Y and Z
             respectively
         :param λ: value of lambda for the damping matrix Wn
+        :param seed: seed or generator for the random restarts, defaults to
+            a seed drawn from NumPy's global generator
+        :param restart: how restart configurations are chosen, ``"random"``
+            or ``"halton"`` for a quasi-random sequence over the joint limits
 
         :return: inverse kinematic solution
         :rtype: tuple (q, success, iterations, searches, residual)
@@ -2561,7 +2819,7 @@ class ERobot(BaseERobot):
             TODO
         """
 
-        return self.ets(start, end).ik_nr(Tep, q0, ilimit, slimit, tol, reject_jl, we, use_pinv, pinv_damping)
+        return self.ets(start, end).ik_nr(Tep, q0, ilimit, slimit, tol, reject_jl, we, use_pinv, pinv_damping, seed, restart)
 
     def ik_gn(
         self,
@@ -2576,6 +2834,8 @@ class ERobot(BaseERobot):
         we: Union[ndarray, None] = None,
         use_pinv: int = True,
         pinv_damping: float = 0.0,
+        seed: Union[int, Generator, None] = None,
+        restart: str = "random",
     ) -> Tuple[ndarray, int, int, int, float]:
         """
         Numerical inverse kinematics by Levenberg-Marquadt optimization (Gauss-NewtonMethod)
@@ -2595,6 +2855,10 @@ class ERobot(BaseERobot):
             Corresponds to translation in X, Y and Z and rotation about X, Y and Z
             respectively
         :param λ: value of lambda for the damping matrix Wn
+        :param seed: seed or generator for the random restarts, defaults to
+            a seed drawn from NumPy's global generator
+        :param restart: how restart configurations are chosen, ``"random"``
+            or ``"halton"`` for a quasi-random sequence over the joint limits
 
         :return: inverse kinematic solution
         :rtype: tuple (q, success, iterations, searches, residual)
@@ -2671,7 +2935,156 @@ class ERobot(BaseERobot):
             TODO
         """
 
-        return self.ets(start, end).ik_gn(Tep, q0, ilimit, slimit, tol, reject_jl, we, use_pinv, pinv_damping)
+        return self.ets(start, end).ik_gn(Tep, q0, ilimit, slimit, tol, reject_jl, we, use_pinv, pinv_damping, seed, restart)
+
+    def ik_batch(
+        self,
+        Tep: Union[ndarray, SE3],
+        end: Union[str, Link, Gripper, None] = None,
+        start: Union[str, Link, Gripper, None] = None,
+        q0: Union[ndarray, None] = None,
+        method: str = "lm_chan",
+        ilimit: int = 30,
+        slimit: int = 100,
+        tol: float = 1e-6,
+        reject_jl: bool = True,
+        we: Union[ndarray, None] = None,
+        λ: float = 1.0,
+        use_pinv: int = True,
+        pinv_damping: float = 0.0,
+        nthreads: Union[int, None] = None,
+        seed: Union[int, Generator, None] = None,
+        restart: str = "random",
+    ) -> Tuple[ndarray, ndarray, ndarray, ndarray, ndarray]:
+        """
+        Numerical inverse kinematics for many target poses
+
+        :param Tep: The desired end-effector poses
+        :type Tep: ndarray(M,4,4) or SE3 with M values
+        :param end: the link considered as the end-effector
+        :param start: the link considered as the base frame, defaults to the robots's base frame
+        :param q0: initial joint configuration for each problem (default to
+            random valid joint configurations)
+        :type q0: ndarray(M,n)
+        :param method: the solver, one of ``"nr"``, ``"gn"``, ``"lm_chan"``,
+            ``"lm_wampler"`` or ``"lm_sugihara"``
+        :param ilimit: maximum number of iterations per search
+        :param slimit: maximum number of search attempts
+        :param tol: final error tolerance
+        :param reject_jl: constrain the solution to being within the joint
+            limits of the robot
+        :param we: a mask vector which weights the end-effector error priority
+        :param λ: value of lambda for the damping matrix Wn, LM solvers only
+        :param use_pinv: use the pseudo-inverse, NR and GN solvers only
+        :param pinv_damping: damping of the pseudo-inverse, NR and GN solvers
+            only
+        :param nthreads: number of native threads to use, defaults to the
+            number of CPUs
+        :param seed: seed or generator for the random restarts, defaults to
+            a seed drawn from NumPy's global generator
+        :param restart: how restart configurations are chosen, ``"random"``
+            or ``"halton"`` for a quasi-random sequence over the joint limits
+
+        :return: inverse kinematic solutions
+        :rtype: tuple (q, success, iterations, searches, residual)
+
+        ``sol = robot.ik_batch(Tep)`` solves the M independent problems given
+        by the poses ``Tep``, in compiled code spread over ``nthreads``
+        threads.  Each element of ``sol`` is an array with one row or element
+        per problem.
+
+        :seealso: :func:`ETS.ik_batch`
+        """
+
+        return self.ets(start, end).ik_batch(
+            Tep,
+            q0,
+            method,
+            ilimit,
+            slimit,
+            tol,
+            reject_jl,
+            we,
+            λ,
+            use_pinv,
+            pinv_damping,
+            nthreads,
+            seed,
+            restart,
+        )
+
+    def ik_traj(
+        self,
+        Tep: Union[ndarray, SE3],
+        end: Union[str, Link, Gripper, None] = None,
+        start: Union[str, Link, Gripper, None] = None,
+        q0: Union[ndarray, None] = None,
+        method: str = "lm_chan",
+        ilimit: int = 30,
+        slimit: int = 100,
+        tol: float = 1e-6,
+        reject_jl: bool = True,
+        we: Union[ndarray, None] = None,
+        λ: float = 1.0,
+        use_pinv: int = True,
+        pinv_damping: float = 0.0,
+        seed: Union[int, Generator, None] = None,
+        restart: str = "random",
+    ) -> Tuple[ndarray, ndarray, ndarray, ndarray, ndarray, ndarray]:
+        """
+        Numerical inverse kinematics along a pose trajectory
+
+        :param Tep: The desired end-effector pose trajectory
+        :type Tep: ndarray(M,4,4) or SE3 with M values
+        :param end: the link considered as the end-effector
+        :param start: the link considered as the base frame, defaults to the robots's base frame
+        :param q0: initial joint configuration for the first pose (default
+            to a random valid joint configuration)
+        :type q0: ndarray(n)
+        :param method: the solver, one of ``"nr"``, ``"gn"``, ``"lm_chan"``,
+            ``"lm_wampler"`` or ``"lm_sugihara"``
+        :param ilimit: maximum number of iterations per search
+        :param slimit: maximum number of search attempts
+        :param tol: final error tolerance
+        :param reject_jl: constrain the solution to being within the joint
+            limits of the robot
+        :param we: a mask vector which weights the end-effector error priority
+        :param λ: value of lambda for the damping matrix Wn, LM solvers only
+        :param use_pinv: use the pseudo-inverse, NR and GN solvers only
+        :param pinv_damping: damping of the pseudo-inverse, NR and GN solvers
+            only
+        :param seed: seed or generator for the random restarts, defaults to
+            a seed drawn from NumPy's global generator
+        :param restart: how restart configurations are chosen, ``"random"``
+            or ``"halton"`` for a quasi-random sequence over the joint limits
+
+        :return: inverse kinematic solutions
+        :rtype: tuple (q, success, iterations, searches, residual, dq)
+
+        ``sol = robot.ik_traj(Tep)`` solves the poses ``Tep`` in order, each
+        seeded with the previous solution.  Random restarts are only used when
+        the seeded search fails.  ``sol`` has one row or element per pose and
+        its last element is the continuity error, the largest joint step from
+        the previous pose.
+
+        :seealso: :func:`ETS.ik_traj`
+        """
+
+        return self.ets(start, end).ik_traj(
+            Tep,
+            q0,
+            method,
+            ilimit,
+            slimit,
+            tol,
+            reject_jl,
+            we,
+            λ,
+            use_pinv,
+            pinv_damping,
+            seed,
+            restart,
+        )
 
 
 
@@ -2742,6 +3155,7 @@ class ERobot2(BaseERobot):
                 self._tool = SE2(T, check=True)
         else:
             raise ValueError("base must be set to None (no tool) or SE2")
+        self._changes += 1
 
     def jacob0(self, q, start=None, end=None):
         return self.ets(start, end).jacob0(q)
@@ -23,7 +23,7 @@ from numpy import (
     flip,
     concatenate,
 )
-from numpy.random import uniform
+from numpy.random import uniform, randint, default_rng, Generator
 from numpy.linalg import inv, det, cond, pinv, matrix_rank, svd, eig
 from spatialmath import SE3, SE2
 from spatialmath.base import (
@@ -52,8 +52,11 @@ from fknm import (
     IK_LM_Chan,
     IK_LM_Wampler,
     IK_LM_Sugihara,
+    IK_batch,
+    IK_traj,
 )
 from copy import deepcopy
+from os import cpu_count
 from roboticstoolbox import rtb_get_param
 from roboticstoolbox.robot.ET import ET, ET2
 from spatialmath.base import getvector
@@ -73,6 +76,30 @@ else:
     c_property = property
 
 
+def _ik_restart(seed, restart):
+    """
+    Restart options for the compiled IK solvers
+
+    :param seed: seed or generator for the random restarts
+    :param restart: ``"random"`` or ``"halton"``
+    :return: integer seed and Halton flag
+
+    When ``seed`` is None the seed is drawn from NumPy's global generator,
+    so ``numpy.random.seed`` also makes the solvers repeatable.
+    """
+
+    restarts = ["random", "halton"]
+    if restart not in restarts:
+        raise ValueError(f"restart must be one of {restarts}")
+
+    if seed is None:
+        seed = randint(0, 2**63, dtype="uint64")
+    elif isinstance(seed, Generator):
+        seed = seed.integers(0, 2**63, dtype="uint64")
+
+    return int(seed), restarts.index(restart)
+
+
 class BaseETS(UserList):
     def __init__(self, *args):
         super().__init__(*args)
@@ -588,11 +615,15 @@ class BaseETS(UserList):
 
         robot.teach(*args, **kwargs)
 
-    def random_q(self, i: int = 1) -> ndarray:
+    def random_q(
+        self, i: int = 1, seed: Union[int, Generator, None] = None
+    ) -> ndarray:
         """
         Generate a random valid joint configuration
 
         :param i: number of configurations to generate
+        :param seed: seed or generator for the random values, defaults to
+            NumPy's global generator
 
         Generates a random q vector within the joint limits defined by
         `self.qlim`.
@@ -609,20 +640,15 @@ class BaseETS(UserList):
 
         """
 
-        if i == 1:
-            q = zeros(self.n)
-
-            for i in range(self.n):
-                q[i] = uniform(self.qlim[0, i], self.qlim[1, i])
-
+        if seed is None:
+            rand = uniform
         else:
-            q = zeros((i, self.n))
+            rand = default_rng(seed).uniform
 
-            for j in range(i):
-                for i in range(self.n):
-                    q[j, i] = uniform(self.qlim[0, i], self.qlim[1, i])
-
-        return q
+        if i == 1:
+            return rand(self.qlim[0, :], self.qlim[1, :], self.n)
+        else:
+            return rand(self.qlim[0, :], self.qlim[1, :], (i, self.n))
 
 
 class ETS(BaseETS):
@@ -882,6 +908,7 @@ class ETS(BaseETS):
         base: Union[ndarray, SE3, None] = None,
         tool: Union[ndarray, SE3, None] = None,
         include_base: bool = True,
+        out: Union[ndarray, None] = None,
     ) -> ndarray:
         """
         Forward kinematics
@@ -890,6 +917,8 @@ class ETS(BaseETS):
         :type q: ArrayLike
         :param base: base transform, optional
         :param tool: tool transform, optional
+        :param out: preallocated C contiguous float64 array of shape (m,4,4)
+            to write the result into, optional
 
         :return: The transformation matrix representing the pose of the
             end-effector
@@ -898,7 +927,10 @@ class ETS(BaseETS):
           joint configuration ``q``.
         **Trajectory operation**:
         If ``q`` has multiple rows (mxn), it is considered a trajectory and the
-        result is an ``SE3`` instance with ``m`` values.
+        result is an ndarray(m,4,4).  The whole trajectory is evaluated in a
+        single call to the C extension, which releases the GIL while it
+        runs.  If ``out`` is given the result is written into it and it is
+        returned.
         .. note::
             - The robot's base tool transform, if set, is incorporated
               into the result.
@@ -909,21 +941,22 @@ class ETS(BaseETS):
               Sequence, J. Haviland and P. Corke
         """
 
+        if isinstance(tool, SE3):
+            tool = array(tool.A)
+
+        if isinstance(base, SE3):
+            base = array(base.A)
+
         try:
-            return ETS_fkine(self._fknm, q, base, tool, include_base)
-        except BaseException:
+            return ETS_fkine(self._fknm, q, base, tool, include_base, out)
+        except TypeError:
+            # symbolic values, fall back to the Python implementation
             pass
 
         q = getmatrix(q, (None, None))
         l, _ = q.shape  # type: ignore
         end = self.data[-1]
 
-        if isinstance(tool, SE3):
-            tool = array(tool.A)
-
-        if isinstance(base, SE3):
-            base = array(base.A)
-
         if base is None:
             bases = None
         elif array_equal(base, eye(3)):  # pragma: nocover
@@ -981,6 +1014,7 @@ class ETS(BaseETS):
         self,
         q: ArrayLike,
         tool: Union[ndarray, SE3, None] = None,
+        out: Union[ndarray, None] = None,
     ) -> ndarray:
         r"""
         Jacobian in base frame
@@ -988,6 +1022,8 @@ class ETS(BaseETS):
         :type q: ArrayLike
         :param tool: a static tool transformation matrix to apply to the
             end of end, defaults to None
+        :param out: preallocated C contiguous float64 array of shape (m,6,n)
+            to write the result into, optional
         :return J: Manipulator Jacobian in the base frame
         ``jacob0(q)`` is the ETS Jacobian matrix which maps joint
         velocity to spatial velocity in the {0} frame.
@@ -1009,24 +1045,29 @@ class ETS(BaseETS):
            {}^0 \nu = {}^0 \mathbf{J}(q) \dot{q} \in \mathbb{R}^6
         This velocity can be expressed relative to the {0} frame or the {e}
         frame.
+        **Trajectory operation**:
+        If ``q`` has multiple rows (mxn), it is considered a trajectory and the
+        result is an ndarray(m,6,n) computed in a single call to the C
+        extension.
         :references:
             - `Kinematic Derivatives using the Elementary Transform Sequence, J. Haviland and P. Corke <https://arxiv.org/abs/2010.08696>`_
         :seealso: :func:`jacobe`, :func:`hessian0`
         """  # noqa
 
+        if isinstance(tool, SE3):
+            tool = array(tool.A)
+
         # Use c extension
         try:
-            return ETS_jacob0(self._fknm, q, tool)
+            return ETS_jacob0(self._fknm, q, tool, out)
         except TypeError:
             pass
 
         # Otherwise use Python
         if tool is None:
             tools = eye(4)
-        elif isinstance(tool, SE3):
-            tools = array(tool.A)
-        else:  # pragma: nocover
-            tools = eye(4)
+        else:
+            tools = array(tool)
 
         q = getvector(q, None)
 
@@ -1091,6 +1132,7 @@ class ETS(BaseETS):
         self,
         q: ArrayLike,
         tool: Union[ndarray, SE3, None] = None,
+        out: Union[ndarray, None] = None,
     ) -> ndarray:
         r"""
         Manipulator geometric Jacobian in the end-effector frame
@@ -1099,6 +1141,8 @@ class ETS(BaseETS):
         :type q: ArrayLike
         :param tool: a static tool transformation matrix to apply to the
             end of end, defaults to None
+        :param out: preallocated C contiguous float64 array of shape (m,6,n)
+            to write the result into, optional
 
         :return J: Manipulator Jacobian in the end-effector frame
 
@@ -1112,11 +1156,19 @@ class ETS(BaseETS):
             Corke, Spong etal., Siciliano etal.  The end-effector velocity is
             described in terms of translational and angular velocity, not a
             velocity twist as per the text by Lynch & Park.
+
+        **Trajectory operation**:
+        If ``q`` has multiple rows (mxn), it is considered a trajectory and the
+        result is an ndarray(m,6,n) computed in a single call to the C
+        extension.
         """  # noqa
 
+        if isinstance(tool, SE3):
+            tool = array(tool.A)
+
         # Use c extension
         try:
-            return ETS_jacobe(self._fknm, q, tool)
+            return ETS_jacobe(self._fknm, q, tool, out)
         except TypeError:
             pass
 
@@ -1128,6 +1180,7 @@ class ETS(BaseETS):
         q: Union[ArrayLike, None] = None,
         J0: Union[ndarray, None] = None,
         tool: Union[ndarray, SE3, None] = None,
+        out: Union[ndarray, None] = None,
     ) -> ndarray:
         r"""
         Manipulator Hessian
@@ -1144,6 +1197,8 @@ class ETS(BaseETS):
         :param J0: The manipulator Jacobian in the 0 frame
         :param tool: a static tool transformation matrix to apply to the
             end frame, defaults to None
+        :param out: preallocated C contiguous float64 array of shape
+            (m,n,6,n) to write the result into, optional
 
         :return: The manipulator Hessian in 0 frame
 
@@ -1165,14 +1220,21 @@ class ETS(BaseETS):
         Similarly, we can write
         .. math::
             \mat{J}_{i,j} = \frac{d u_i}{d q_j}
+        **Trajectory operation**:
+        If ``q`` has multiple rows (mxn), or ``J`` is a stack of Jacobians
+        (mx6xn), the result is an ndarray(m,n,6,n) computed in a single call
+        to the C extension.
         :references:
             - Kinematic Derivatives using the Elementary Transform
               Sequence, J. Haviland and P. Corke
         """
 
+        if isinstance(tool, SE3):
+            tool = array(tool.A)
+
         # Use c extension
         try:
-            return ETS_hessian0(self._fknm, q, J0, tool)
+            return ETS_hessian0(self._fknm, q, J0, tool, out)
         except TypeError:
             pass
 
@@ -1208,6 +1270,7 @@ class ETS(BaseETS):
         q: Union[ArrayLike, None] = None,
         Je: Union[ndarray, None] = None,
         tool: Union[ndarray, SE3, None] = None,
+        out: Union[ndarray, None] = None,
     ) -> ndarray:
         r"""
         Manipulator Hessian
@@ -1224,6 +1287,8 @@ class ETS(BaseETS):
         :param Je: The manipulator Jacobian in the ee frame
         :param tool: a static tool transformation matrix to apply to the
             end frame, defaults to None
+        :param out: preallocated C contiguous float64 array of shape
+            (m,n,6,n) to write the result into, optional
 
         :return: The manipulator Hessian in ee frame
 
@@ -1245,14 +1310,21 @@ class ETS(BaseETS):
         Similarly, we can write
         .. math::
             \mat{J}_{i,j} = \frac{d u_i}{d q_j}
+        **Trajectory operation**:
+        If ``q`` has multiple rows (mxn), or ``J`` is a stack of Jacobians
+        (mx6xn), the result is an ndarray(m,n,6,n) computed in a single call
+        to the C extension.
         :references:
             - Kinematic Derivatives using the Elementary Transform
               Sequence, J. Haviland and P. Corke
         """
 
+        if isinstance(tool, SE3):
+            tool = array(tool.A)
+
         # Use c extension
         try:
-            return ETS_hessiane(self._fknm, q, Je, tool)
+            return ETS_hessiane(self._fknm, q, Je, tool, out)
         except TypeError:
             pass
 
@@ -1681,6 +1753,8 @@ class ETS(BaseETS):
         reject_jl: bool = True,
         we: Union[ndarray, None] = None,
         λ: float = 1.0,
+        seed: Union[int, Generator, None] = None,
+        restart: str = "random",
     ) -> Tuple[ndarray, int, int, int, float]:
         """
         Numerical inverse kinematics by Levenberg-Marquadt optimization (Chan's Method)
@@ -1698,6 +1772,10 @@ class ETS(BaseETS):
             Corresponds to translation in X, Y and Z and rotation about X, Y and Z
             respectively
         :param λ: value of lambda for the damping matrix Wn
+        :param seed: seed or generator for the random restarts, defaults to
+            a seed drawn from NumPy's global generator
+        :param restart: how restart configurations are chosen, ``"random"``
+            or ``"halton"`` for a quasi-random sequence over the joint limits
 
         :return: inverse kinematic solution
         :rtype: tuple (q, success, iterations, searches, residual)
@@ -1774,7 +1852,18 @@ class ETS(BaseETS):
             TODO
         """
 
-        return IK_LM_Chan(self._fknm, Tep, q0, ilimit, slimit, tol, reject_jl, we, λ)
+        return IK_LM_Chan(
+            self._fknm,
+            Tep,
+            q0,
+            ilimit,
+            slimit,
+            tol,
+            reject_jl,
+            we,
+            λ,
+            *_ik_restart(seed, restart),
+        )
 
     def ik_lm_wampler(
         self,
@@ -1786,6 +1875,8 @@ class ETS(BaseETS):
         reject_jl: bool = True,
         we: Union[ndarray, None] = None,
         λ: float = 1.0,
+        seed: Union[int, Generator, None] = None,
+        restart: str = "random",
     ) -> Tuple[ndarray, int, int, int, float]:
         """
         Numerical inverse kinematics by Levenberg-Marquadt optimization (Chan's Method)
@@ -1803,6 +1894,10 @@ class ETS(BaseETS):
             Corresponds to translation in X, Y and Z and rotation about X, Y and Z
             respectively
         :param λ: value of lambda for the damping matrix Wn
+        :param seed: seed or generator for the random restarts, defaults to
+            a seed drawn from NumPy's global generator
+        :param restart: how restart configurations are chosen, ``"random"``
+            or ``"halton"`` for a quasi-random sequence over the joint limits
 
         :return: inverse kinematic solution
         :rtype: tuple (q, success, iterations, searches, residual)
@@ -1879,7 +1974,18 @@ class ETS(BaseETS):
             TODO
         """
 
-        return IK_LM_Wampler(self._fknm, Tep, q0, ilimit, slimit, tol, reject_jl, we, λ)
+        return IK_LM_Wampler(
+            self._fknm,
+            Tep,
+            q0,
+            ilimit,
+            slimit,
+            tol,
+            reject_jl,
+            we,
+            λ,
+            *_ik_restart(seed, restart),
+        )
 
     def ik_lm_sugihara(
         self,
@@ -1891,6 +1997,8 @@ class ETS(BaseETS):
         reject_jl: bool = True,
         we: Union[ndarray, None] = None,
         λ: float = 1.0,
+        seed: Union[int, Generator, None] = None,
+        restart: str = "random",
     ) -> Tuple[ndarray, int, int, int, float]:
         """
         Numerical inverse kinematics by Levenberg-Marquadt optimization (Chan's Method)
@@ -1908,6 +2016,10 @@ class ETS(BaseETS):
             Corresponds to translation in X, Y and Z and rotation about X, Y and Z
             respectively
         :param λ: value of lambda for the damping matrix Wn
+        :param seed: seed or generator for the random restarts, defaults to
+            a seed drawn from NumPy's global generator
+        :param restart: how restart configurations are chosen, ``"random"``
+            or ``"halton"`` for a quasi-random sequence over the joint limits
 
         :return: inverse kinematic solution
         :rtype: tuple (q, success, iterations, searches, residual)
@@ -1985,7 +2097,16 @@ class ETS(BaseETS):
         """
 
         return IK_LM_Sugihara(
-            self._fknm, Tep, q0, ilimit, slimit, tol, reject_jl, we, λ
+            self._fknm,
+            Tep,
+            q0,
+            ilimit,
+            slimit,
+            tol,
+            reject_jl,
+            we,
+            λ,
+            *_ik_restart(seed, restart),
         )
 
     def ik_nr(
@@ -1999,6 +2120,8 @@ class ETS(BaseETS):
         we: Union[ndarray, None] = None,
         use_pinv: int = True,
         pinv_damping: float = 0.0,
+        seed: Union[int, Generator, None] = None,
+        restart: str = "random",
     ) -> Tuple[ndarray, int, int, int, float]:
         """
         Numerical inverse kinematics by Levenberg-Marquadt optimization (Chan's Method)
@@ -2016,6 +2139,10 @@ class ETS(BaseETS):
             Corresponds to translation in X, Y and Z and rotation about X, Y and Z
             respectively
         :param λ: value of lambda for the damping matrix Wn
+        :param seed: seed or generator for the random restarts, defaults to
+            a seed drawn from NumPy's global generator
+        :param restart: how restart configurations are chosen, ``"random"``
+            or ``"halton"`` for a quasi-random sequence over the joint limits
 
         :return: inverse kinematic solution
         :rtype: tuple (q, success, iterations, searches, residual)
@@ -2103,6 +2230,7 @@ class ETS(BaseETS):
             we,
             use_pinv,
             pinv_damping,
+            *_ik_restart(seed, restart),
         )
 
     def ik_gn(
@@ -2116,6 +2244,8 @@ class ETS(BaseETS):
         we: Union[ndarray, None] = None,
         use_pinv: int = True,
         pinv_damping: float = 0.0,
+        seed: Union[int, Generator, None] = None,
+        restart: str = "random",
     ) -> Tuple[ndarray, int, int, int, float]:
         """
         Numerical inverse kinematics by Levenberg-Marquadt optimization (Chan's Method)
@@ -2133,6 +2263,10 @@ class ETS(BaseETS):
             Corresponds to translation in X, Y and Z and rotation about X, Y and Z
             respectively
         :param λ: value of lambda for the damping matrix Wn
+        :param seed: seed or generator for the random restarts, defaults to
+            a seed drawn from NumPy's global generator
+        :param restart: how restart configurations are chosen, ``"random"``
+            or ``"halton"`` for a quasi-random sequence over the joint limits
 
         :return: inverse kinematic solution
         :rtype: tuple (q, success, iterations, searches, residual)
@@ -2220,6 +2354,212 @@ class ETS(BaseETS):
             we,
             use_pinv,
             pinv_damping,
+            *_ik_restart(seed, restart),
+        )
+
+    def ik_batch(
+        self,
+        Tep: Union[ndarray, SE3],
+        q0: Union[ndarray, None] = None,
+        method: str = "lm_chan",
+        ilimit: int = 30,
+        slimit: int = 100,
+        tol: float = 1e-6,
+        reject_jl: bool = True,
+        we: Union[ndarray, None] = None,
+        λ: float = 1.0,
+        use_pinv: int = True,
+        pinv_damping: float = 0.0,
+        nthreads: Union[int, None] = None,
+        seed: Union[int, Generator, None] = None,
+        restart: str = "random",
+    ) -> Tuple[ndarray, ndarray, ndarray, ndarray, ndarray]:
+        """
+        Numerical inverse kinematics for many target poses
+
+        :param Tep: The desired end-effector poses
+        :type Tep: ndarray(M,4,4) or SE3 with M values
+        :param q0: initial joint configuration for each problem (default to
+            random valid joint configurations)
+        :type q0: ndarray(M,n)
+        :param method: the solver, one of ``"nr"``, ``"gn"``, ``"lm_chan"``,
+            ``"lm_wampler"`` or ``"lm_sugihara"``
+        :param ilimit: maximum number of iterations per search
+        :param slimit: maximum number of search attempts
+        :param tol: final error tolerance
+        :param reject_jl: constrain the solution to being within the joint
+            limits of the robot
+        :param we: a mask vector which weights the end-effector error priority
+        :param λ: value of lambda for the damping matrix Wn, LM solvers only
+        :param use_pinv: use the pseudo-inverse, NR and GN solvers only
+        :param pinv_damping: damping of the pseudo-inverse, NR and GN solvers
+            only
+        :param nthreads: number of native threads to use, defaults to the
+            number of CPUs
+        :param seed: seed or generator for the random restarts, defaults to
+            a seed drawn from NumPy's global generator
+        :param restart: how restart configurations are chosen, ``"random"``
+            or ``"halton"`` for a quasi-random sequence over the joint limits
+
+        :return: inverse kinematic solutions
+        :rtype: tuple (q, success, iterations, searches, residual)
+
+        ``sol = ets.ik_batch(Tep)`` solves the M independent problems given by
+        the poses ``Tep`` with the solver named by ``method``, and is
+        equivalent to calling ``ets.ik_lm_chan`` etc. for each pose.  The
+        problems are solved in compiled code, without the GIL, and spread
+        over ``nthreads`` threads.  The return value ``sol`` is a tuple with
+        elements:
+
+        ============    ============  ==========================================
+        Element         Type          Description
+        ============    ============  ==========================================
+        ``q``           ndarray(M,n)  joint coordinates, one row per problem
+        ``success``     ndarray(M)    whether a solution was found
+        ``iterations``  ndarray(M)    total number of iterations
+        ``searches``    ndarray(M)    total number of searches
+        ``residual``    ndarray(M)    final value of cost function
+        ============    ============  ==========================================
+
+        :seealso: :func:`ik_lm_chan`, :func:`ik_lm_wampler`,
+            :func:`ik_lm_sugihara`, :func:`ik_nr`, :func:`ik_gn`
+        """
+
+        methods = ["nr", "gn", "lm_chan", "lm_wampler", "lm_sugihara"]
+        if method not in methods:
+            raise ValueError(f"method must be one of {methods}")
+
+        if isinstance(Tep, SE3):
+            Tep = Tep.A
+        Tep = array(Tep, dtype=float).reshape((-1, 4, 4))
+
+        if q0 is not None:
+            q0 = getmatrix(q0, (Tep.shape[0], self.n))
+
+        if we is not None:
+            we = getvector(we, 6)
+
+        if nthreads is None:
+            nthreads = cpu_count() or 1
+
+        return IK_batch(
+            self._fknm,
+            methods.index(method),
+            Tep,
+            q0,
+            ilimit,
+            slimit,
+            tol,
+            reject_jl,
+            we,
+            λ,
+            use_pinv,
+            pinv_damping,
+            nthreads,
+            *_ik_restart(seed, restart),
+        )
+
+    def ik_traj(
+        self,
+        Tep: Union[ndarray, SE3],
+        q0: Union[ndarray, None] = None,
+        method: str = "lm_chan",
+        ilimit: int = 30,
+        slimit: int = 100,
+        tol: float = 1e-6,
+        reject_jl: bool = True,
+        we: Union[ndarray, None] = None,
+        λ: float = 1.0,
+        use_pinv: int = True,
+        pinv_damping: float = 0.0,
+        seed: Union[int, Generator, None] = None,
+        restart: str = "random",
+    ) -> Tuple[ndarray, ndarray, ndarray, ndarray, ndarray, ndarray]:
+        """
+        Numerical inverse kinematics along a pose trajectory
+
+        :param Tep: The desired end-effector pose trajectory
+        :type Tep: ndarray(M,4,4) or SE3 with M values
+        :param q0: initial joint configuration for the first pose (default
+            to a random valid joint configuration)
+        :type q0: ndarray(n)
+        :param method: the solver, one of ``"nr"``, ``"gn"``, ``"lm_chan"``,
+            ``"lm_wampler"`` or ``"lm_sugihara"``
+        :param ilimit: maximum number of iterations per search
+        :param slimit: maximum number of search attempts
+        :param tol: final error tolerance
+        :param reject_jl: constrain the solution to being within the joint
+            limits of the robot
+        :param we: a mask vector which weights the end-effector error priority
+        :param λ: value of lambda for the damping matrix Wn, LM solvers only
+        :param use_pinv: use the pseudo-inverse, NR and GN solvers only
+        :param pinv_damping: damping of the pseudo-inverse, NR and GN solvers
+            only
+        :param seed: seed or generator for the random restarts, defaults to
+            a seed drawn from NumPy's global generator
+        :param restart: how restart configurations are chosen, ``"random"``
+            or ``"halton"`` for a quasi-random sequence over the joint limits
+
+        :return: inverse kinematic solutions
+        :rtype: tuple (q, success, iterations, searches, residual, dq)
+
+        ``sol = ets.ik_traj(Tep)`` solves the poses ``Tep`` in order, as
+        produced by ``ctraj`` for example.  Each solve is seeded with the most
+        recent successful solution, so when consecutive poses are close only
+        a couple of iterations are needed, and random restarts are used only
+        when the seeded search fails.  Revolute joints are kept on the same
+        branch as the previous solution rather than wrapped to [-π, π],
+        joint limits permitting.  The return value ``sol`` is a tuple with
+        elements:
+
+        ============    ============  ==========================================
+        Element         Type          Description
+        ============    ============  ==========================================
+        ``q``           ndarray(M,n)  joint coordinates, one row per pose
+        ``success``     ndarray(M)    whether a solution was found
+        ``iterations``  ndarray(M)    total number of iterations
+        ``searches``    ndarray(M)    total number of searches
+        ``residual``    ndarray(M)    final value of cost function
+        ``dq``          ndarray(M)    continuity error
+        ============    ============  ==========================================
+
+        The continuity error ``dq[k]`` is the largest absolute joint step
+        between ``q[k-1]`` and ``q[k]``, for the first pose it is measured
+        from ``q0`` or is zero if ``q0`` is not given.  A large value
+        indicates the solver has jumped to a different solution branch, for
+        instance after a random restart.
+
+        :seealso: :func:`ik_batch`, :func:`ik_lm_chan`
+        """
+
+        methods = ["nr", "gn", "lm_chan", "lm_wampler", "lm_sugihara"]
+        if method not in methods:
+            raise ValueError(f"method must be one of {methods}")
+
+        if isinstance(Tep, SE3):
+            Tep = Tep.A
+        Tep = array(Tep, dtype=float).reshape((-1, 4, 4))
+
+        if q0 is not None:
+            q0 = getvector(q0, self.n)
+
+        if we is not None:
+            we = getvector(we, 6)
+
+        return IK_traj(
+            self._fknm,
+            methods.index(method),
+            Tep,
+            q0,
+            ilimit,
+            slimit,
+            tol,
+            reject_jl,
+            we,
+            λ,
+            use_pinv,
+            pinv_damping,
+            *_ik_restart(seed, restart),
         )
 
 
@@ -8,7 +8,6 @@ import spatialmath as sm
 from spatialmath.base.argcheck import getvector
 from roboticstoolbox.robot.Link import Link
 from typing import List
-from functools import lru_cache
 from typing import Union
 from fknm import Robot_link_T
 
@@ -180,12 +179,9 @@ class Gripper:
         this robot according to q (or self.q if q is none)
         """
 
-        @lru_cache(maxsize=2)
-        def get_link_ets():
-            return [link.ets._fknm for link in self.links]
-
-        @lru_cache(maxsize=2)
-        def get_link_scene_node():
-            return [link._T_reference for link in self.links]
-
-        Robot_link_T(get_link_ets(), get_link_scene_node(), self._q, q)
+        Robot_link_T(
+            [link.ets._fknm for link in self.links],
+            [link._T_reference for link in self.links],
+            self._q,
+            q,
+        )
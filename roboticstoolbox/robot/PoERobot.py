@@ -1,8 +1,10 @@
 # PoERobot
 import numpy as np
 from spatialmath import Twist3, SE3
-from spatialmath.base import skew
+from spatialmath.base import skew, getmatrix
 from roboticstoolbox.robot import Link, Robot
+from roboticstoolbox.robot.ET import ET
+from roboticstoolbox.robot.ETS import ETS
 
 
 class PoELink(Link):
@@ -19,6 +21,24 @@ class PoELink(Link):
         self.S = Twist3(twist)
         self.name = name
 
+    @property
+    def S(self):
+        """
+        Joint twist
+
+        :return: the joint axis as a twist in the world frame
+        :rtype: Twist3
+        """
+        return self._S
+
+    @S.setter
+    def S(self, twist):
+        self._S = Twist3(twist)
+
+        # the robot keeps a copy of all the twists
+        if self._robot is not None:
+            self._robot._screws = None
+
     def __repr__(self):
         s = f"PoELink({np.array2string(self.S.S, separator=',')}"
         if self.name is not None:
@@ -98,6 +118,7 @@ class PoERobot(Robot):
 
         super().__init__(links, **kwargs)
         self.T0 = T0
+        self._screws = None
 
 
     def __str__(self):
@@ -138,71 +159,214 @@ class PoERobot(Robot):
     def nbranches(self):
         return 0
 
+    @property
+    def S(self):
+        r"""
+        Joint twists as an array
+
+        :return: the twist of each joint, one per row
+        :rtype: ndarray(n,6)
+
+        Each row is the twist :math:`(v, \omega)` of a joint axis in the world
+        frame.  The array is built from the link twists on first use, and
+        again if a link twist is changed.
+        """
+        return self._twists()[0]
+
+    def _twists(self):
+        # the twist array, and the twists scaled to a unit rotational part:
+        # the scale, translational part and skew matrices of the rotational
+        # part and its square
+        if self._screws is None:
+            S = np.array([link.S.S for link in self], dtype=np.float64)
+            S = S.reshape((self.n, 6))
+            S.flags.writeable = False
+
+            wn = np.linalg.norm(S[:, 3:], axis=1)
+            wn[wn == 0] = 1.0
+            v = S[:, :3] / wn[:, np.newaxis]
+            K = np.array([skew(w) for w in S[:, 3:] / wn[:, np.newaxis]])
+            K = K.reshape((self.n, 3, 3))
+
+            self._screws = (S, wn, v, K, K @ K)
+        return self._screws
+
+    def _exp(self, q):
+        """
+        Exponentials of the joint twists
+
+        :param q: joint configurations, one per row
+        :type q: ndarray(m,n)
+        :return: the exponential of each joint twist
+        :rtype: ndarray(m,n,4,4)
+
+        The exponentials are evaluated by the closed-form Rodrigues formula
+        for all configurations and joints at once.  The rotational part of a
+        prismatic twist is zero and the same formula gives a translation.
+        """
+        _, wn, v, K, K2 = self._twists()
+
+        theta = (q * wn)[..., np.newaxis, np.newaxis]
+        s = np.sin(theta)
+        c = 1.0 - np.cos(theta)
+        I = np.eye(3)
+
+        E = np.zeros(q.shape + (4, 4))
+        E[..., :3, :3] = I + s * K + c * K2
+        E[..., :3, 3] = ((theta * I + c * K + (theta - s) * K2) @ v[..., np.newaxis])[
+            ..., 0
+        ]
+        E[..., 3, 3] = 1.0
+        return E
+
+    def _fkine(self, q):
+        """
+        Poses along the kinematic chain
+
+        :param q: joint configurations, one per row
+        :type q: ndarray(m,n)
+        :return: the pose before each joint, and the end effector pose
+        :rtype: ndarray(m,n,4,4), ndarray(m,4,4)
+        """
+        E = self._exp(q)
+
+        P = np.empty(E.shape)
+        T = np.broadcast_to(np.eye(4), (q.shape[0], 4, 4))
+        for j in range(self.n):
+            P[:, j] = T
+            T = T @ E[:, j]
+
+        return P, T @ SE3(self.T0).A
+
     def fkine(self, q):
         """
         Forward kinematics
 
         :param q: joint configuration
-        :type q: array_like(n)
+        :type q: array_like(n) or ndarray(m,n)
         :return: end effector pose
         :rtype: SE3
+
+        If ``q`` is a 2D array the rows are joint configurations along a
+        trajectory, and the returned ``SE3`` instance has one value per row.
         """
-        T = None
-        for link, qk in zip(self, q):
-            if T is None:
-                T = link.S.exp(qk)
-            else:
-                T *= link.S.exp(qk)
+        _, T = self._fkine(getmatrix(q, (None, self.n)))
+        return SE3(list(T), check=False)
 
-        return T * self.T0
+    def _jacob0(self, q):
+        # world-frame Jacobian, one (6,n) matrix per row of q, and the end
+        # effector poses
+        P, T = self._fkine(q)
+        S = self.S[..., np.newaxis]
 
-        # T = reduce(lambda x, y: x * y,
-        #           [link.A(qk) for link, qk in zip(self, q)])
+        # the joint twists moved to the current configuration by Ad(P)
+        Jw = (P[..., :3, :3] @ S[:, 3:])[..., 0]
+        Jv = (P[..., :3, :3] @ S[:, :3])[..., 0] + np.cross(P[..., :3, 3], Jw)
+
+        # convert Jacobian from velocity twist to spatial velocity
+        Jv -= np.cross(T[:, np.newaxis, :3, 3], Jw)
+
+        J = np.concatenate((Jv, Jw), axis=2).transpose((0, 2, 1))
+        return J, T
 
     def jacob0(self, q):
         """
         Jacobian in world frame
 
         :param q: joint configuration
-        :type q: array_like(n)
+        :type q: array_like(n) or ndarray(m,n)
         :return: Jacobian matrix
-        :rtype: ndarray(6,n)
-        """
-        columns = []
-        T = SE3()
-        for link, qk in zip(self, q):
-            columns.append(T.Ad() @ link.S.S)
-            T *= link.S.exp(qk)
-        T *= self.T0
-        J = np.column_stack(columns)
+        :rtype: ndarray(6,n) or ndarray(m,6,n)
 
-        # convert Jacobian from velocity twist to spatial velocity
-        Jsv = np.eye(6)
-        Jsv[:3, 3:] = -skew(T.t)
-        return Jsv @ J
+        If ``q`` is a 2D array the rows are joint configurations along a
+        trajectory, and the result has one Jacobian per row.
+        """
+        J, _ = self._jacob0(getmatrix(q, (None, self.n)))
+        if np.ndim(q) < 2:
+            J = J[0]
+        return J
 
     def jacobe(self, q):
         """
         Jacobian in end-effector frame
 
         :param q: joint configuration
-        :type q: array_like(n)
+        :type q: array_like(n) or ndarray(m,n)
         :return: Jacobian matrix
-        :rtype: ndarray(6,n)
+        :rtype: ndarray(6,n) or ndarray(m,6,n)
+
+        If ``q`` is a 2D array the rows are joint configurations along a
+        trajectory, and the result has one Jacobian per row.
+        """
+        J, T = self._jacob0(getmatrix(q, (None, self.n)))
+
+        # rotate the world-frame Jacobian into the end-effector frame
+        R = T[:, :3, :3].transpose((0, 2, 1))
+        J = np.concatenate((R @ J[:, :3], R @ J[:, 3:]), axis=1)
+        if np.ndim(q) < 2:
+            J = J[0]
+        return J
+
+    def ets(self, *args, **kwargs):
+        r"""
+        Robot kinematics as an elementary transform sequence
+
+        :raises ValueError: a joint twist is not a unit revolute or prismatic
+            twist
+        :return: elementary transform sequence
+        :rtype: ETS
+
+        The exponential of the unit twist of joint :math:`j` is written as
+        :math:`F_j \mathbf{R}_z(q_j) F_j^{-1}`, or with :math:`\mathbf{t}_z`
+        for a prismatic joint, where :math:`F_j` is a frame whose z-axis is
+        the joint axis.  Adjacent constant transforms are merged, so the ETS
+        has one joint and at most one constant transform per link.
+
+        ``robot.ets().eval(q)`` equals ``robot.fkine(q)``, and the ETS can be
+        given to the compiled inverse kinematic solvers, for example
+        ``robot.ets().ik_lm_chan(T)``.
+
+        :seealso: :func:`ETS.ik_lm_chan`, :func:`ETS.ik_batch`
         """
-        columns = []
-        T = SE3()
-        for link, qk in zip(self, q):
-            columns.append(T.Ad() @ link.S.S)
-            T *= link.S.exp(qk)
-        T *= self.T0
-        J = np.column_stack(columns)
+        ets = ETS()
+        F0 = np.eye(4)
+
+        for j, S in enumerate(self.S):
+            v, w = S[:3], S[3:]
+            F = np.eye(4)
+
+            if not np.allclose(w, 0):
+                if not np.isclose(np.linalg.norm(w), 1) or not np.isclose(w @ v, 0):
+                    raise ValueError(f"joint {j} is not a unit revolute twist")
+                a = w
+                F[:3, 3] = np.cross(w, v)  # point on the axis
+                joint = ET.Rz(jindex=j)
+            else:
+                if not np.isclose(np.linalg.norm(v), 1):
+                    raise ValueError(f"joint {j} is not a unit prismatic twist")
+                a = v
+                joint = ET.tz(jindex=j)
+
+            # a frame with the joint axis as its z-axis
+            if abs(a[2]) < 0.9:
+                x = np.cross([0, 0, 1], a)
+            else:
+                x = np.cross([0, 1, 0], a)
+            x /= np.linalg.norm(x)
+            F[:3, :3] = np.column_stack((x, np.cross(a, x), a))
+
+            C = np.linalg.inv(F0) @ F
+            if not np.allclose(C, np.eye(4)):
+                ets *= ET.SE3(C)
+            ets *= joint
+            F0 = F
+
+        C = np.linalg.inv(F0) @ SE3(self.T0).A
+        if not np.allclose(C, np.eye(4)):
+            ets *= ET.SE3(C)
 
-        # convert velocity twist from world frame to EE frame
-        return T.inv().Ad() @ J
+        return ets
 
-    def ets(self):
-        return NotImplemented
 
 if __name__ == "__main__":  # pragma nocover
 
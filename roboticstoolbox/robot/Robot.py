@@ -18,10 +18,10 @@ from roboticstoolbox.backends.PyPlot.EllipsePlot import EllipsePlot
 from roboticstoolbox.robot.Dynamics import DynamicsMixin
 from roboticstoolbox.robot.ETS import ETS
 from roboticstoolbox.robot.IK import IKMixin
+from roboticstoolbox.robot.KinematicCache import KinematicCache
 from typing import Union, Dict, Tuple
 from spatialgeometry import Shape
-from fknm import Robot_link_T
-from functools import lru_cache
+from fknm import Robot_link_frames
 from spatialgeometry import SceneNode
 from roboticstoolbox.robot.Link import BaseLink, Link
 
@@ -75,6 +75,9 @@ class Robot(SceneNode, ABC, DynamicsMixin, IKMixin):
         # Initialise the scene node
         SceneNode.__init__(self)
 
+        # count of parameter changes, lets a KinematicCache detect stale values
+        self._changes = 0
+
         self._T = base.A
         self.tool = tool
 
@@ -127,6 +130,15 @@ class Robot(SceneNode, ABC, DynamicsMixin, IKMixin):
 
         self._dynchanged = False
 
+        # compiled rigid-body tree, built on demand by the dynamics methods
+        self._rbd_ob = None
+
+        # world frame of every link for the last joint configuration
+        self._link_frames_cache = None
+        self._link_frames_key = None
+        self._link_frames_ets = None
+        self._link_frames_scene = False
+
         # Set up named configuration property
         if configs is None:
             configs = dict()
@@ -237,13 +249,39 @@ class Robot(SceneNode, ABC, DynamicsMixin, IKMixin):
         Dynamic parameters have changed (Robot superclass)
 
         Called from a property setter to inform the robot that the cache of
-        dynamic parameters is invalid.
+        dynamic parameters is invalid.  Any :class:`KinematicCache` for the
+        robot is emptied on its next use.
 
         :seealso: :func:`roboticstoolbox.Link._listen_dyn`
         """
         self._dynchanged = True
+        self._changes += 1
         if what != "gravity":
             self._hasdynamics = True
+            self._rbd_ob = None
+
+    def cached(self, cachesize=16):
+        """
+        Kinematic cache for the robot (Robot superclass)
+
+        :param cachesize: maximum number of cache entries, defaults to 16
+        :type cachesize: int, optional
+        :return: a proxy for the robot that caches kinematic values
+        :rtype: KinematicCache instance
+
+        ``robot.cached()`` is a proxy for the robot that remembers the results
+        of kinematic and dynamic methods, so that the forward kinematics,
+        Jacobian, Hessian, manipulability and inertia at the same joint
+        configuration are each computed just once.  It can be used as a
+        context manager, and the cache is emptied on exit::
+
+            with robot.cached() as kc:
+                J = kc.jacob0(q)
+                m = kc.manipulability(q)  # reuses J
+
+        :seealso: :class:`KinematicCache`
+        """
+        return KinematicCache(self, cachesize)
 
     def _getq(self, q=None):
         """
@@ -827,7 +865,8 @@ class Robot(SceneNode, ABC, DynamicsMixin, IKMixin):
 
         If ``q`` is a matrix (m,n) then the result (m,) is a vector of
         manipulability indices for each joint configuration specified by a row
-        of ``q``.
+        of ``q``.  For an ``ERobot`` the Jacobians of all rows are computed in
+        a single call to ``jacob0``.
 
         .. note::
 
@@ -925,9 +964,14 @@ class Robot(SceneNode, ABC, DynamicsMixin, IKMixin):
             q = getmatrix(q, (None, self.n))
             w = np.zeros(q.shape[0])
 
+            if q.shape[0] > 1 and isinstance(self, rtb.ERobot):
+                # evaluate the Jacobians of the whole trajectory at once
+                Jt = self.jacob0(q, **kwargs)
+            else:
+                Jt = [self.jacob0(qk, **kwargs) for qk in q]
+
             for k, qk in enumerate(q):
-                Jk = self.jacob0(qk, **kwargs)
-                w[k] = mfunc(self, Jk, qk, axes)
+                w[k] = mfunc(self, Jt[k], qk, axes)
 
         if len(w) == 1:
             return w[0]
@@ -1030,7 +1074,7 @@ class Robot(SceneNode, ABC, DynamicsMixin, IKMixin):
         :param J: The manipulator Jacobian in any frame
         :type J: float ndarray(6,n)
         :param H: The manipulator Hessian in any frame
-        :type H: float ndarray(6,n,n)
+        :type H: float ndarray(n,6,n)
         :param end: the final link or Gripper which the Hessian represents
         :type end: str or ELink or Gripper
         :param start: the first link which the Hessian represents
@@ -1083,7 +1127,7 @@ class Robot(SceneNode, ABC, DynamicsMixin, IKMixin):
         if H is None:
             H = self.hessian0(J0=J, start=start, end=end)
         else:
-            verifymatrix(H, (6, self.n, self.n))
+            verifymatrix(H, (self.n, 6, self.n))
 
         manipulability = self.manipulability(q, J=J, start=start, end=end, axes=axes)
 
@@ -1245,6 +1289,7 @@ class Robot(SceneNode, ABC, DynamicsMixin, IKMixin):
                 self._T = T.A
             else:
                 self._T = T
+            self._changes += 1
 
         else:
             raise ValueError("base must be set to None (no tool), SE2, or SE3")
@@ -1271,6 +1316,7 @@ class Robot(SceneNode, ABC, DynamicsMixin, IKMixin):
             self._tool = T.A
         else:
             self._tool = T
+        self._changes += 1
 
     @property
     def qlim(self):
@@ -2178,23 +2224,88 @@ class Robot(SceneNode, ABC, DynamicsMixin, IKMixin):
     # Scene Graph section
     # --------------------------------------------------------------------- #
 
+    def _link_frames(
+        self, q: Union[ArrayLike, None] = None, scene: bool = False
+    ) -> ndarray:
+        """
+        World frame of every link
+
+        :param q: The joint configuration, defaults to ``self.q``
+        :param scene: also write the local transform of each link into its
+            scene node
+        :return: the world frame of each link in ``self.links``
+        :rtype: ndarray(nlinks,4,4)
+
+        The frames are computed in a single compiled pass which composes
+        each link ETS with the frame of its parent, starting from the base.
+        The result for the most recent joint configuration is kept and
+        returned again, without recomputation, until the configuration, the
+        base or a link ETS changes.
+
+        The returned array is read only and is never overwritten, later
+        configurations are written to a new array, so its rows can be shared
+        as they are by :func:`ERobot.fkine_all`, collision checking and the
+        graphical backends.
+        """
+
+        if q is None:
+            q = self._q
+
+        q = np.array(getvector(q, self.n), dtype=np.float64)
+        links = self.links
+        ets = [link.ets._fknm for link in links]
+        key = (q.tobytes(), self._changes)
+
+        if (
+            self._link_frames_cache is None
+            or key != self._link_frames_key
+            or ets != self._link_frames_ets
+            or (scene and not self._link_frames_scene)
+        ):
+            if isinstance(self, rtb.DHRobot):
+                # DH links form a serial chain
+                parents = list(range(-1, len(links) - 1))
+            else:
+                index = {id(link): i for i, link in enumerate(links)}
+                parents = [index.get(id(link.parent), -1) for link in links]
+
+            if scene:
+                T = [link._T_reference for link in links]
+            else:
+                T = None
+
+            frames = np.empty((len(links), 4, 4))
+            Robot_link_frames(ets, T, parents, q, self._T_reference, frames)
+            frames.flags.writeable = False
+
+            self._link_frames_cache = frames
+            self._link_frames_key = key
+            self._link_frames_ets = ets
+            self._link_frames_scene = scene
+
+        return self._link_frames_cache
+
     def _update_link_tf(self, q: Union[ArrayLike, None] = None):
         """
         This private method updates the local transform of each link within
         this robot according to q (or self.q if q is none)
-        """
 
-        @lru_cache(maxsize=2)
-        def get_link_ets():
-            return [link.ets._fknm for link in self.links]
+        :return: the world frame of each link in ``self.links``
+        :rtype: ndarray(nlinks,4,4)
+
+        The transforms are only recomputed if q has changed since the last
+        call.
 
-        @lru_cache(maxsize=2)
-        def get_link_scene_node():
-            return [link._T_reference for link in self.links]
+        :seealso: :func:`_link_frames`
+        """
+
+        frames = self._link_frames(q, scene=True)
 
-        Robot_link_T(get_link_ets(), get_link_scene_node(), self._q, q)
+        if isinstance(self, rtb.ERobot):
+            for gripper in self.grippers:
+                gripper._update_link_tf()
 
-        [gripper._update_link_tf() for gripper in self.grippers]
+        return frames
 
     # --------------------------------------------------------------------- #
 
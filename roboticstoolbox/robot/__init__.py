@@ -20,7 +20,7 @@ from roboticstoolbox.robot.ERobot import ERobot, ERobot2
 from roboticstoolbox.robot.ELink import ELink, ELink2
 from roboticstoolbox.robot.ETS import ETS, ETS2
 from roboticstoolbox.robot.Gripper import Gripper
-# from roboticstoolbox.robot.KinematicCache import KinematicCache
+from roboticstoolbox.robot.KinematicCache import KinematicCache
 from roboticstoolbox.robot.ET import ET, ET2
 
 __all__ = [
@@ -44,7 +44,7 @@ __all__ = [
     "ETS",
     "ETS2",
     "Gripper",
-    # "KinematicCache",
+    "KinematicCache",
     "PoERobot",
     "PoELink",
     "PoEPrismatic",
@@ -1,5 +1,9 @@
 _params = {
     "unicode": True,
+    # cache parsed URDF/xacro models on disk, off unless enabled
+    "urdf_cache": False,
+    # directory for cached data, None for the user's cache directory
+    "cache_dir": None,
 }
 
 
@@ -0,0 +1,323 @@
+"""
+Persistent cache of parsed URDF and xacro robot models.
+
+A model is stored as the expanded URDF string together with a plain
+description of its links, their elementary transforms, dynamic parameters
+and geometry.  Rebuilding the links from this description avoids running
+the xacro preprocessor and parsing the XML.
+
+The cache is used only if enabled, by the toolbox parameter
+``"urdf_cache"`` or the ``cache`` argument of :meth:`ERobot.URDF_read`.
+
+Each model has one file in the cache directory, named by a hash of the
+model file path and the toolbox version.  An entry is used only if the
+modification time and size of every source file, the model file and all the
+files it includes, are unchanged.  If a source file has been touched but the
+expanded URDF string has the same hash, the stored links are used and only
+the XML parse is skipped.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import roboticstoolbox as rtb
+import spatialgeometry as gm
+from roboticstoolbox.tools.params import rtb_get_param
+
+# bump when the layout of a cache entry changes
+_FORMAT = 1
+
+# entries already read by this process
+_entries = {}
+
+
+def cache_dir():
+    """
+    Directory holding the cached models
+
+    :return: path of the cache directory
+    :rtype: Path
+
+    The directory is given by the toolbox parameter ``"cache_dir"`` if it is
+    set, otherwise ``roboticstoolbox/urdf`` within the user's cache directory,
+    ``$XDG_CACHE_HOME`` or ``~/.cache``, or ``%LOCALAPPDATA%`` on Windows.
+
+    :seealso: :func:`rtb_set_param`
+    """
+    root = rtb_get_param("cache_dir")
+    if root is not None:
+        return Path(root).expanduser()
+
+    if os.name == "nt":  # pragma nocover
+        root = os.environ.get("LOCALAPPDATA", Path.home() / "AppData" / "Local")
+    else:
+        root = os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")
+
+    return Path(root) / "roboticstoolbox" / "urdf"
+
+
+def clear():
+    """
+    Remove all the cached models
+    """
+    _entries.clear()
+
+    for file in cache_dir().glob("*.pickle"):
+        try:
+            file.unlink()
+        except OSError:  # pragma nocover
+            pass
+
+
+def _version():
+    # the toolbox version, and the modification time of the URDF parser so
+    # that a change to the parser in a source tree also invalidates entries
+    try:
+        from importlib.metadata import version
+
+        v = version("roboticstoolbox-python")
+    except Exception:
+        v = "unknown"
+
+    parser = Path(__file__).with_name("urdf.py")
+    return f"{_FORMAT}:{v}:{parser.stat().st_mtime_ns}"
+
+
+def _stat(file):
+    try:
+        st = os.stat(file)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _cachefile(file_path, xacro_tld):
+    key = f"{_version()}\n{Path(file_path).resolve()}\n{xacro_tld}"
+    name = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+    return cache_dir() / (name + ".pickle")
+
+
+def urdf_hash(urdf_string):
+    """
+    Content hash of a URDF string
+
+    :param urdf_string: the expanded URDF
+    :type urdf_string: str
+    :return: SHA-256 digest
+    :rtype: str
+    """
+    return hashlib.sha256(urdf_string.encode("utf-8")).hexdigest()
+
+
+def read(file_path, xacro_tld=None):
+    """
+    Read a cached model
+
+    :param file_path: path of the URDF or xacro file
+    :type file_path: Path
+    :param xacro_tld: top-level directory given to the xacro preprocessor
+    :type xacro_tld: str or Path, optional
+    :return: the cache entry, or None if there is none
+    :rtype: dict
+
+    An entry written by a different toolbox version, or that cannot be read,
+    is ignored.  The caller should check :func:`isfresh` before using the
+    entry without running xacro.
+    """
+    file = _cachefile(file_path, xacro_tld)
+
+    entry = _entries.get(file)
+    if entry is not None:
+        return entry
+
+    try:
+        with open(file, "rb") as f:
+            entry = pickle.load(f)
+    except Exception:
+        return None
+
+    if not isinstance(entry, dict) or entry.get("version") != _version():
+        return None
+
+    _entries[file] = entry
+    return entry
+
+
+def isfresh(entry):
+    """
+    Test if the source files of a cache entry are unchanged
+
+    :param entry: cache entry
+    :type entry: dict
+    :return: True if no source file has been modified
+    :rtype: bool
+    """
+    return all(_stat(file) == stat for file, stat in entry["sources"].items())
+
+
+def write(file_path, xacro_tld, sources, urdf_string, name, links):
+    """
+    Write a model to the cache
+
+    :param file_path: path of the URDF or xacro file
+    :type file_path: Path
+    :param xacro_tld: top-level directory given to the xacro preprocessor
+    :type xacro_tld: str or Path, optional
+    :param sources: the model file and all files that it includes
+    :type sources: list of str
+    :param urdf_string: the expanded URDF
+    :type urdf_string: str
+    :param name: robot name
+    :type name: str
+    :param links: the links as built from the URDF, before they are given to
+        a robot
+    :type links: list of Link
+    :return: the cache entry
+    :rtype: dict
+
+    A cache directory that cannot be written is silently skipped.
+    """
+    entry = {
+        "version": _version(),
+        "sources": {str(Path(s).resolve()): _stat(s) for s in sources},
+        "hash": urdf_hash(urdf_string),
+        "urdf_string": urdf_string,
+        "name": name,
+        "links": _encode(links),
+    }
+
+    file = _cachefile(file_path, xacro_tld)
+    _entries[file] = entry
+
+    try:
+        file.parent.mkdir(parents=True, exist_ok=True)
+
+        # write to a temporary file first so a concurrent reader never
+        # sees a partial entry
+        fd, tmp = tempfile.mkstemp(dir=file.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, file)
+    except OSError:
+        pass
+
+    return entry
+
+
+def links(entry):
+    """
+    Links of a cached model
+
+    :param entry: cache entry
+    :type entry: dict
+    :return: new links
+    :rtype: list of Link
+
+    Each call returns a new set of links, equal to those built by
+    :class:`URDF` from the original file.
+    """
+    return _decode(entry["links"])
+
+
+# ------------------------------------------------------------------------- #
+
+
+def _encode(links):
+    index = {id(link): i for i, link in enumerate(links)}
+    out = []
+
+    for link in links:
+        ets = []
+        for et in link.ets:
+            if et.axis == "SE3":
+                ets.append(("SE3", et.A(), False, None))
+            elif et.isjoint:
+                ets.append((et.axis, None, et.isflip, et.qlim))
+            else:
+                ets.append((et.axis, et.eta, False, None))
+
+        out.append(
+            {
+                "name": link.name,
+                "parent": index.get(id(link.parent)),
+                "joint_name": link._joint_name,
+                "ets": ets,
+                "m": link.m,
+                "r": link.r,
+                "I": link.I,
+                "B": link.B,
+                "G": link.G,
+                "hasdynamics": link.hasdynamics,
+                "geometry": [_encode_shape(ob) for ob in link.geometry],
+                "collision": [_encode_shape(ob) for ob in link.collision],
+            }
+        )
+
+    return out
+
+
+def _decode(data):
+    links = []
+
+    for d in data:
+        ets = rtb.ETS()
+        for axis, eta, flip, qlim in d["ets"]:
+            if axis == "SE3":
+                et = rtb.ET.SE3(eta)
+            elif eta is None:
+                et = getattr(rtb.ET, axis)(flip=flip, qlim=qlim)
+            else:
+                et = getattr(rtb.ET, axis)(eta)
+            ets *= et
+
+        link = rtb.Link(ets, name=d["name"], m=d["m"], r=d["r"], I=d["I"])
+        link.B = d["B"]
+        link.G = d["G"]
+        link._hasdynamics = d["hasdynamics"]
+        link._joint_name = d["joint_name"]
+
+        link.geometry = [_decode_shape(s) for s in d["geometry"]]
+        link.collision = [_decode_shape(s) for s in d["collision"]]
+        links.append(link)
+
+    for link, d in zip(links, data):
+        if d["parent"] is not None:
+            link._parent = links[d["parent"]]
+
+    return links
+
+
+def _encode_shape(ob):
+    if ob.stype == "cuboid":
+        args = (ob.scale,)
+    elif ob.stype == "cylinder":
+        args = (ob.radius, ob.length)
+    elif ob.stype == "sphere":
+        args = (ob.radius,)
+    elif ob.stype == "mesh":
+        args = (ob.filename, ob.scale)
+    else:  # pragma nocover
+        raise ValueError(f"cannot cache a shape of type {ob.stype}")
+
+    return (ob.stype, args, np.array(ob.T), ob.color)
+
+
+def _decode_shape(data):
+    stype, args, T, color = data
+
+    if stype == "cuboid":
+        ob = gm.Cuboid(args[0])
+    elif stype == "cylinder":
+        ob = gm.Cylinder(*args)
+    elif stype == "sphere":
+        ob = gm.Sphere(*args)
+    else:
+        ob = gm.Mesh(args[0], scale=args[1])
+
+    ob.T = T
+    ob.color = color
+    return ob
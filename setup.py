@@ -91,6 +91,24 @@ fknm = Extension(
     # ],
 )
 
+frbd = Extension(
+    "frbd",
+    sources=[
+        "./roboticstoolbox/core/rbd.cpp",
+        "./roboticstoolbox/core/frbd.cpp",
+    ],
+    include_dirs=["./roboticstoolbox/core/", numpy.get_include()],
+)
+
+fdh = Extension(
+    "fdh",
+    sources=[
+        "./roboticstoolbox/core/dh.cpp",
+        "./roboticstoolbox/core/fdh.cpp",
+    ],
+    include_dirs=["./roboticstoolbox/core/", numpy.get_include()],
+)
+
 setup(
     name="roboticstoolbox-python",
     version="1.0.2",
@@ -125,7 +143,7 @@ setup(
         "Coverage": "https://codecov.io/gh/petercorke/roboticstoolbox-python",
     },
     # cmdclass={"build_ext": build_ext_subclass},
-    ext_modules=[frne, fknm],
+    ext_modules=[frne, fknm, frbd, fdh],
     keywords="python robotics robotics-toolbox kinematics dynamics"
     " motion-planning trajectory-generation jacobian hessian"
     " control simulation robot-manipulator mobile-robot",
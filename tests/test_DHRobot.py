@@ -1106,6 +1106,48 @@ class TestDHRobot(unittest.TestCase):
         nt.assert_array_almost_equal(qdd1[0, :], res, decimal=4)
         nt.assert_array_almost_equal(qdd1[1, :], res, decimal=4)
 
+    def test_accel_traj(self):
+        puma = rp.models.DH.Puma560()
+        puma.base = sm.SE3.Rx(0.3)
+        q = np.random.rand(10, 6)
+        qd = np.random.rand(10, 6)
+        torque = np.random.rand(10, 6)
+
+        qdd = puma.accel(q, qd, torque)
+        self.assertEqual(qdd.shape, (10, 6))
+
+        nt.assert_array_almost_equal(puma.rne(q, qd, qdd), torque)
+        nt.assert_array_almost_equal(qdd[4], puma.accel(q[4], qd[4], torque[4]))
+
+    def test_fdyn_fixed(self):
+        puma = rp.models.DH.Puma560().nofriction()
+
+        tg = puma.fdyn(0.2, puma.qn, solver="rk4", dt=0.01)
+        ref = puma.fdyn(0.2, puma.qn, solver_args={"rtol": 1e-9, "atol": 1e-9})
+        self.assertEqual(tg.q.shape, (21, 6))
+        nt.assert_array_almost_equal(tg.t[-1], 0.2)
+        nt.assert_array_almost_equal(tg.q[-1], ref.q[-1], decimal=6)
+        nt.assert_array_almost_equal(tg.qd[-1], ref.qd[-1], decimal=6)
+
+        tg = puma.fdyn(0.2, puma.qn, solver="euler", dt=0.001)
+        nt.assert_array_almost_equal(tg.q[-1], ref.q[-1], decimal=2)
+
+        # batch of initial conditions with a damping controller
+        def damp(robot, t, q, qd):
+            return -10 * qd
+
+        q0 = np.random.rand(4, 6)
+        tg = puma.fdyn(0.1, q0, damp, solver="rk4", dt=0.01)
+        self.assertEqual(tg.q.shape, (4, 11, 6))
+        self.assertEqual(tg.qd.shape, (4, 11, 6))
+
+        tg2 = puma.fdyn(0.1, q0[2], damp, solver="rk4", dt=0.01)
+        nt.assert_array_almost_equal(tg.q[2], tg2.q)
+        nt.assert_array_almost_equal(tg.qd[2], tg2.qd)
+
+        with self.assertRaises(ValueError):
+            puma.fdyn(0.1, puma.qn, solver="rk4")
+
     def test_inertia(self):
         puma = rp.models.DH.Puma560()
         puma.q = puma.qn
@@ -1121,11 +1163,11 @@ class TestDHRobot(unittest.TestCase):
         ]
 
         I0 = puma.inertia(q)
-        # I1 = puma.inertia(np.c_[q, q].T)
+        I1 = puma.inertia(np.c_[q, q].T)
 
         nt.assert_array_almost_equal(I0, Ir, decimal=4)
-        # nt.assert_array_almost_equal(I1[0, :, :], Ir, decimal=4)
-        # nt.assert_array_almost_equal(I1[1, :, :], Ir, decimal=4)
+        nt.assert_array_almost_equal(I1[0, :, :], Ir, decimal=4)
+        nt.assert_array_almost_equal(I1[1, :, :], Ir, decimal=4)
 
     def test_inertia_x(self):
         puma = rp.models.DH.Puma560()
@@ -1169,6 +1211,43 @@ class TestDHRobot(unittest.TestCase):
         nt.assert_array_almost_equal(C1[0, :, :], Cr, decimal=4)
         nt.assert_array_almost_equal(C1[1, :, :], Cr, decimal=4)
 
+    def test_rbd_tree(self):
+        from frbd import RBD_init
+
+        puma = rp.models.DH.Puma560()
+        tree = puma._rbd_tree()
+        self.assertIsNotNone(RBD_init(*tree))
+
+        # out of range indices are rejected, a parent must precede its child
+        for arg, k, value in [
+            (0, 2, 3),
+            (0, 2, 2),
+            (0, 1, -2),
+            (1, 0, 6),
+            (1, 0, -1),
+            (2, 0, 6),
+        ]:
+            bad = [np.array(a) for a in tree]
+            bad[arg][k] = value
+            with self.assertRaises(ValueError):
+                RBD_init(*bad)
+
+    def test_coriolis_traj(self):
+        for robot in [rp.models.DH.Puma560(), rp.models.DH.Panda()]:
+            r1 = robot.nofriction(True, True)
+            q = np.random.rand(10, robot.n)
+            qd = np.random.rand(10, robot.n)
+            z = np.zeros(robot.n)
+
+            C = robot.coriolis(q, qd)
+            self.assertEqual(C.shape, (10, robot.n, robot.n))
+
+            for k in range(10):
+                nt.assert_array_almost_equal(
+                    C[k] @ qd[k], r1.rne(q[k], qd[k], z, gravity=[0, 0, 0])
+                )
+                nt.assert_array_almost_equal(C[k], robot.coriolis(q[k], qd[k]))
+
     def test_gravload(self):
         puma = rp.models.DH.Puma560()
         q = puma.qn
@@ -1520,6 +1599,77 @@ class TestDHRobot(unittest.TestCase):
     def test_SerialLink(self):
         rp.SerialLink([rp.RevoluteDH()])
 
+    def test_compiled_traj(self):
+        # standard DH with a prismatic joint, modified DH, flipped joint
+        for robot in [
+            rp.models.DH.Stanford(),
+            rp.models.DH.Panda(),
+            rp.models.DH.Jaco(),
+        ]:
+            robot.base = sm.SE3(0.1, 0.2, 0.3) * sm.SE3.Rx(0.3)
+            robot.tool = sm.SE3.Tz(0.1) * sm.SE3.Ry(0.2)
+            ets = robot.ets()  # includes base and tool
+            q = np.random.default_rng(0).uniform(-1, 1, (5, robot.n))
+
+            T = robot.fkine(q)
+            Tall = robot.fkine_all(q)
+            J0 = robot.jacob0(q)
+            Je = robot.jacobe(q)
+            self.assertEqual(len(T), 5)
+            self.assertEqual(len(Tall), 5 * (robot.n + 1))
+            self.assertEqual(J0.shape, (5, 6, robot.n))
+            self.assertEqual(Je.shape, (5, 6, robot.n))
+
+            for k in range(5):
+                nt.assert_array_almost_equal(T[k].A, ets.eval(q[k]))
+                nt.assert_array_almost_equal(
+                    Tall[(k + 1) * (robot.n + 1) - 1].A,
+                    (T[k] * robot.tool.inv()).A,
+                )
+
+                # numerical derivative of the end-effector pose
+                Jn = np.zeros((6, robot.n))
+                for j in range(robot.n):
+                    dq = np.zeros(robot.n)
+                    dq[j] = 1e-7
+                    dT = (ets.eval(q[k] + dq) - T[k].A) / 1e-7
+                    S = dT[:3, :3] @ T[k].R.T
+                    Jn[:, j] = np.r_[dT[:3, 3], S[2, 1], S[0, 2], S[1, 0]]
+                nt.assert_array_almost_equal(J0[k], Jn, decimal=5)
+
+                Re = np.kron(np.eye(2), T[k].R)
+                nt.assert_array_almost_equal(Re @ Je[k], J0[k])
+                nt.assert_array_almost_equal(robot.jacob0(q[k]), J0[k])
+                nt.assert_array_almost_equal(
+                    robot.jacobe(q[k], half="rot"), Je[k, 3:, :]
+                )
+
+    def test_compiled_changed(self):
+        puma = rp.models.DH.Puma560()
+        q = puma.qn
+        T = puma.fkine(q)
+
+        puma.links[1].a += 0.1
+        self.assertFalse(np.allclose(puma.fkine(q).A, T.A))
+        puma.links[1].a -= 0.1
+        nt.assert_array_almost_equal(puma.fkine(q).A, T.A)
+
+        puma.links[2].offset = 0.1
+        nt.assert_array_almost_equal(
+            puma.fkine(q).A,
+            rp.models.DH.Puma560().fkine(q + np.r_[0, 0, 0.1, 0, 0, 0]).A,
+        )
+
+    def test_compiled_symbolic(self):
+        puma = rp.models.DH.Puma560(symbolic=True)
+        self.assertIsNone(puma._dh())
+
+        q = rp.models.DH.Puma560().qn
+        nt.assert_array_almost_equal(
+            np.array(puma.fkine(q).A, dtype=float),
+            rp.models.DH.Puma560().fkine(q).A,
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -743,6 +743,23 @@ class TestERobot(unittest.TestCase):
         self.assertRaises(TypeError, panda.manipulability, "Wfgsrth")
         self.assertRaises(ValueError, panda.manipulability, [1, 3])
 
+    def test_manipulability_traj(self):
+        panda = rtb.models.ETS.Panda()
+        qt = np.random.rand(10, 7)
+
+        m = panda.manipulability(qt)
+        self.assertEqual(m.shape, (10,))
+
+        for k in range(10):
+            nt.assert_almost_equal(m[k], panda.manipulability(qt[k]))
+
+        J0 = panda.jacob0(qt)
+        H0 = panda.hessian0(qt)
+        self.assertEqual(J0.shape, (10, 6, 7))
+        self.assertEqual(H0.shape, (10, 7, 6, 7))
+        nt.assert_almost_equal(J0[3], panda.jacob0(qt[3]))
+        nt.assert_almost_equal(H0[3], panda.hessian0(qt[3]))
+
     def test_jacobm(self):
         panda = rtb.models.ETS.Panda()
         q1 = np.array([1.4, 0.2, 1.8, 0.7, 0.1, 3.1, 2.9])
@@ -899,6 +916,81 @@ class TestERobot(unittest.TestCase):
         self.assertAlmostEqual(d1, 2.362147178773918)  # type: ignore
         self.assertAlmostEqual(d2, None)  # type: ignore
 
+    def test_fkine_all(self):
+        robot = rtb.models.ETS.Frankie()
+        robot.base = SE3.Rx(0.2) * SE3.Tx(0.1)
+        q = robot.qr + 0.1
+
+        T = robot.fkine_all(q)
+        self.assertEqual(len(T), robot.nlinks + 1)
+        nt.assert_array_almost_equal(T[0].A, robot.base.A)
+
+        for link in robot.links:
+            nt.assert_array_almost_equal(
+                T[link.number].A, robot.fkine(q, end=link, include_base=True).A
+            )
+
+    def test_fkine_all_gripper(self):
+        # a wrist with a tool flange and a gripper with one finger joint
+        l0 = Link(ET.Rz(), name="l0")
+        l1 = Link(ET.tz(0.5) * ET.Ry(), name="l1", parent=l0)
+        l2 = Link(ET.tz(0.4) * ET.Rz(), name="l2", parent=l1)
+        flange = Link(ET.tz(0.05), name="flange", parent=l2)
+        hand = Link(ET.tz(0.1) * ET.Rz(0.3), name="hand", parent=l2)
+        finger = Link(ET.ty(), name="finger", parent=hand)
+        robot = ERobot([l0, l1, l2, flange, hand, finger], gripper_links=hand)
+        robot.grippers[0].q = [0.02]
+        q = [0.1, 0.2, 0.3]
+
+        T = robot.fkine_all(q)
+        self.assertEqual(len(T), 7)
+        Tl2 = robot.fkine(q, end=l2, include_base=True)
+        nt.assert_array_almost_equal(T[flange.number].A, (Tl2 * SE3.Tz(0.05)).A)
+        Thand = Tl2 * SE3.Tz(0.1) * SE3.Rz(0.3)
+        nt.assert_array_almost_equal(T[hand.number].A, Thand.A)
+        nt.assert_array_almost_equal(T[finger.number].A, (Thand * SE3.Ty(0.02)).A)
+
+        # the poses can be modified, they are not shared with the robot
+        T[1].A[0, 3] = 10
+        self.assertEqual(T[1].A[0, 3], 10)
+        nt.assert_array_almost_equal(robot.fkine_all(q)[1].A, robot.fkine(q, end=l0).A)
+
+    def test_link_frames(self):
+        # a branched robot whose links are not given in parent-first order
+        l0 = Link(ET.Rz(jindex=0), name="l0")
+        l1 = Link(ET.tx(1) * ET.Rz(jindex=1), name="l1", parent=l0)
+        l2 = Link(ET.tx(1) * ET.ty(0.5) * ET.Rz(jindex=2), name="l2", parent=l1)
+        l3 = Link(ET.tx(1) * ET.Rz(jindex=3), name="l3", parent=l0)
+        robot = ERobot([l2, l3, l0, l1])
+        robot.base = SE3.Tz(0.5)
+        q = [0.1, 0.2, 0.3, 0.4]
+
+        frames = robot._link_frames(q)
+        self.assertEqual(frames.shape, (4, 4, 4))
+        for link, T in zip(robot.links, frames):
+            nt.assert_array_almost_equal(
+                T, robot.fkine(q, end=link, include_base=True).A
+            )
+
+        # shared and read only, recomputed only for a new configuration
+        self.assertIs(robot._link_frames(np.array(q)), frames)
+        with self.assertRaises(ValueError):
+            frames[0, 0, 0] = 1
+
+        frames2 = robot._update_link_tf([0, 0, 0, 0])
+        self.assertIsNot(frames2, frames)
+        nt.assert_array_almost_equal(frames[1], robot.fkine(q, end=l3).A)
+
+        # the scene graph agrees with the frames
+        robot._propogate_scene_tree()
+        for link, T in zip(robot.links, frames2):
+            nt.assert_array_almost_equal(link._wT, T)
+
+        robot.base = SE3()
+        nt.assert_array_almost_equal(
+            robot._link_frames([0, 0, 0, 0])[0], SE3(2, 0.5, 0).A
+        )
+
     def test_collided(self):
         s0 = gm.Cuboid([1, 1, 1], pose=sm.SE3(0, 0, 0))
         s1 = gm.Cuboid([1, 1, 1], pose=sm.SE3(3, 0, 0))
@@ -967,6 +1059,103 @@ class TestERobot(unittest.TestCase):
         tau = robot.rne(q, z, [1, 1])
         nt.assert_array_almost_equal(tau, np.r_[d11 + d12, d21 + d22])
 
+    def test_coriolis(self):
+        # the robot from test_invdyn, but the mass of the second link is
+        # carried by a static link
+        l1 = Link(ets=ETS(ET.Ry()), m=1, r=[0.5, 0, 0], name="l1")
+        l2 = Link(ets=ETS(ET.tx(1)) * ET.Ry(), parent=l1, name="l2")
+        l3 = Link(ets=ETS(ET.tx(0.25)), m=1, r=[0.25, 0, 0], parent=l2, name="l3")
+        robot = ERobot([l1, l2, l3], name="simple 2 link")
+
+        q = [0, -pi / 2]
+        h = -0.5 * sin(q[1])
+
+        qd = np.array([[0, 0], [1, 0], [0, 1], [1, 1]])
+        tau = np.array([[0, 0], [0, -1], [1, 0], [3, -1]]) * h
+
+        C = robot.coriolis(np.tile(q, (4, 1)), qd)
+        self.assertEqual(C.shape, (4, 2, 2))
+
+        for k in range(4):
+            nt.assert_array_almost_equal(C[k] @ qd[k], tau[k])
+            nt.assert_array_almost_equal(robot.coriolis(q, qd[k]), C[k])
+
+    def test_inertia(self):
+        l1 = Link(ets=ETS(ET.Ry()), m=1, r=[0.5, 0, 0], name="l1")
+        l2 = Link(ets=ETS(ET.tx(1)) * ET.Ry(), parent=l1, name="l2")
+        l3 = Link(ets=ETS(ET.tx(0.25)), m=1, r=[0.25, 0, 0], parent=l2, name="l3")
+        robot = ERobot([l1, l2, l3], name="simple 2 link")
+
+        q = np.array([[0, -pi / 2], [0, 0], [0.3, pi / 3]])
+        M = robot.inertia(q)
+        self.assertEqual(M.shape, (3, 2, 2))
+
+        for k in range(3):
+            d11 = 1.5 + cos(q[k, 1])
+            d12 = 0.25 + 0.5 * cos(q[k, 1])
+            Mr = np.array([[d11, d12], [d12, 0.25]])
+            nt.assert_array_almost_equal(M[k], Mr)
+            nt.assert_array_almost_equal(robot.inertia(q[k]), Mr)
+
+    def test_rne_branched(self):
+        def chain(root, name):
+            l1 = Link(ets=ETS(ET.Ry()), m=1, r=[0.5, 0, 0], name=name + "1")
+            l2 = Link(ETS(ET.tx(1)) * ET.Ry(), m=1, r=[0.5, 0, 0], name=name + "2")
+            l1._parent = root
+            l2._parent = l1
+            return [l1, l2]
+
+        single = ERobot(chain(None, "a"))
+
+        # two copies of the chain attached to a static base link
+        base = Link(ets=ETS(ET.tz(0.5)), m=2, name="base")
+        robot = ERobot([base] + chain(base, "a") + chain(base, "b"))
+        self.assertEqual(robot.n, 4)
+
+        q = np.random.rand(5, 4)
+        qd = np.random.rand(5, 4)
+        qdd = np.random.rand(5, 4)
+
+        tau = robot.rne(q, qd, qdd)
+        self.assertEqual(tau.shape, (5, 4))
+
+        for k in range(5):
+            for j in (0, 2):
+                s = slice(j, j + 2)
+                nt.assert_array_almost_equal(
+                    tau[k, s], single.rne(q[k, s], qd[k, s], qdd[k, s])
+                )
+
+            nt.assert_array_almost_equal(
+                tau[k],
+                robot.inertia(q[k]) @ qdd[k]
+                + robot.coriolis(q[k], qd[k]) @ qd[k]
+                + robot.gravload(q[k]),
+            )
+
+    def test_accel(self):
+        base = Link(ets=ETS(ET.tz(0.5)), m=2, name="base")
+        l1 = Link(ETS(ET.Rz()), m=1, r=[0.2, 0, 0], parent=base, name="l1")
+        l2 = Link(ETS(ET.tx(0.4)) * ET.Ry(), m=1, r=[0.3, 0, 0.1], parent=l1)
+        l3 = Link(ETS(ET.tx(0.5)) * ET.tz(), m=0.5, I=[0.1, 0.2, 0.3], parent=l2)
+        l4 = Link(ETS(ET.ty(0.2)) * ET.Rx(), m=1, r=[0, 0.3, 0], parent=l1)
+        robot = ERobot([base, l1, l2, l3, l4])
+
+        q = np.random.rand(10, 4)
+        qd = np.random.rand(10, 4)
+        torque = np.random.rand(10, 4)
+
+        qdd = robot.accel(q, qd, torque)
+        self.assertEqual(qdd.shape, (10, 4))
+
+        nt.assert_array_almost_equal(robot.rne(q, qd, qdd), torque)
+        nt.assert_array_almost_equal(
+            qdd[2],
+            np.linalg.solve(
+                robot.inertia(q[2]), torque[2] - robot.rne(q[2], qd[2], np.zeros(4))
+            ),
+        )
+
 
 class TestERobot2(unittest.TestCase):
     def test_plot(self):
@@ -186,6 +186,35 @@ class TestETS(unittest.TestCase):
 
         nt.assert_almost_equal(r.fkine(q), ans.A)
 
+    def test_fkine_traj(self):
+        panda = rtb.models.Panda()
+        ets = panda.ets()
+        base = SE3.Rx(0.5)
+        tool = SE3.Tz(0.2)
+        qt = np.random.rand(20, 7)
+
+        T = ets.eval(qt, base=base, tool=tool)
+        self.assertEqual(T.shape, (20, 4, 4))
+        self.assertEqual(T.dtype, np.float64)
+
+        for k in range(20):
+            nt.assert_almost_equal(T[k], ets.eval(qt[k], base=base, tool=tool))
+
+        out = np.zeros((20, 4, 4))
+        ret = ets.eval(qt, base=base, tool=tool, out=out)
+        self.assertIs(ret, out)
+        nt.assert_almost_equal(out, T)
+
+        fk = ets.fkine(qt)
+        self.assertEqual(len(fk), 20)
+        nt.assert_almost_equal(fk[7].A, ets.eval(qt[7]))
+
+        with self.assertRaises(ValueError):
+            ets.eval(qt, out=np.zeros((19, 4, 4)))
+
+        with self.assertRaises(ValueError):
+            ets.eval(np.zeros((20, 6)))
+
     def test_fkine_sym(self):
         x = sympy.Symbol("x")
         y = sympy.Symbol("y")
@@ -577,6 +606,137 @@ class TestETS(unittest.TestCase):
         nt.assert_almost_equal(rz.jacob0(q), np.array([[0, 0, 0, 0, 0, 1]]).T)
         nt.assert_almost_equal(r.jacob0(q), np.eye(6))
 
+    def test_jacob_traj(self):
+        panda = rtb.models.Panda()
+        ets = panda.ets()
+        tool = SE3.Tz(0.2)
+        qt = np.random.rand(10, 7)
+
+        J0 = ets.jacob0(qt, tool=tool)
+        Je = ets.jacobe(qt, tool=tool)
+        self.assertEqual(J0.shape, (10, 6, 7))
+        self.assertEqual(Je.shape, (10, 6, 7))
+
+        for k in range(10):
+            nt.assert_almost_equal(J0[k], ets.jacob0(qt[k], tool=tool))
+            nt.assert_almost_equal(Je[k], ets.jacobe(qt[k], tool=tool))
+
+        out = np.zeros((10, 6, 7))
+        self.assertIs(ets.jacob0(qt, tool=tool, out=out), out)
+        nt.assert_almost_equal(out, J0)
+
+        with self.assertRaises(ValueError):
+            ets.jacobe(qt, out=np.zeros((10, 7, 6)))
+
+    def test_hessian_traj(self):
+        panda = rtb.models.Panda()
+        ets = panda.ets()
+        qt = np.random.rand(10, 7)
+
+        H0 = ets.hessian0(qt)
+        He = ets.hessiane(qt)
+        self.assertEqual(H0.shape, (10, 7, 6, 7))
+        self.assertEqual(He.shape, (10, 7, 6, 7))
+
+        for k in range(10):
+            nt.assert_almost_equal(H0[k], ets.hessian0(qt[k]))
+            nt.assert_almost_equal(He[k], ets.hessiane(qt[k]))
+
+        nt.assert_almost_equal(ets.hessian0(J0=ets.jacob0(qt)), H0)
+
+        out = np.zeros((10, 7, 6, 7))
+        self.assertIs(ets.hessiane(qt, out=out), out)
+        nt.assert_almost_equal(out, He)
+
+    def test_ik_batch(self):
+        ets = rtb.models.Panda().ets()
+        qr = ets.random_q(6)
+        q0 = qr + 0.02
+        Tep = ets.eval(qr)
+
+        single = {
+            "nr": ets.ik_nr,
+            "gn": ets.ik_gn,
+            "lm_chan": ets.ik_lm_chan,
+            "lm_wampler": ets.ik_lm_wampler,
+            "lm_sugihara": ets.ik_lm_sugihara,
+        }
+
+        for method, solver in single.items():
+            q, success, it, search, E = ets.ik_batch(
+                Tep, q0, method=method, ilimit=100, reject_jl=False, nthreads=2
+            )
+            self.assertEqual(q.shape, (6, 7))
+            self.assertEqual(success.shape, (6,))
+
+            for i in range(6):
+                sol = solver(Tep[i], q0[i], ilimit=100, reject_jl=False)
+                if sol[3] > 1:
+                    # restarted from a random q
+                    continue
+                nt.assert_almost_equal(q[i], sol[0])
+                self.assertEqual(success[i], sol[1])
+                self.assertEqual(it[i], sol[2])
+                self.assertEqual(search[i], sol[3])
+                nt.assert_almost_equal(E[i], sol[4])
+
+        with self.assertRaises(ValueError):
+            ets.ik_batch(Tep, method="foo")
+
+    def test_ik_seed(self):
+        ets = rtb.models.Panda().ets()
+        Tep = ets.eval(ets.random_q(seed=1))
+
+        for restart in ["random", "halton"]:
+            sol1 = ets.ik_lm_chan(Tep, seed=5, restart=restart)
+            sol2 = ets.ik_lm_chan(Tep, seed=np.random.default_rng(5), restart=restart)
+            sol3 = ets.ik_lm_chan(Tep, seed=5, restart=restart)
+            nt.assert_equal(sol1[0], sol3[0])
+            self.assertEqual(sol1[3], sol3[3])
+            self.assertTrue(sol2[1])
+
+        Tep = np.array([ets.eval(q) for q in ets.random_q(8, seed=2)])
+        q1 = ets.ik_batch(Tep, seed=7, restart="halton", nthreads=1)[0]
+        q2 = ets.ik_batch(Tep, seed=7, restart="halton", nthreads=3)[0]
+        nt.assert_equal(q1, q2)
+
+        with self.assertRaises(ValueError):
+            ets.ik_gn(Tep[0], restart="sobol")
+
+    def test_random_q(self):
+        ets = rtb.models.Panda().ets()
+
+        q = ets.random_q(seed=3)
+        self.assertEqual(q.shape, (7,))
+        nt.assert_equal(q, ets.random_q(seed=3))
+
+        q = ets.random_q(10, seed=np.random.default_rng(3))
+        self.assertEqual(q.shape, (10, 7))
+        self.assertTrue(np.all(q >= ets.qlim[0]) and np.all(q <= ets.qlim[1]))
+
+    def test_ik_traj(self):
+        panda = rtb.models.Panda()
+        ets = panda.ets()
+        T0 = ets.fkine(panda.qr)
+        T1 = SE3.Trans(0.1, 0.2, -0.1) * T0
+        Ts = rtb.ctraj(T0, T1, 100)
+
+        q, success, it, search, E, dq = ets.ik_traj(Ts, panda.qr)
+        self.assertEqual(q.shape, (100, 7))
+        self.assertTrue(success.all())
+        self.assertTrue((search == 1).all())
+        self.assertLess(it.mean(), 3)
+        self.assertLess(dq.max(), 0.05)
+        nt.assert_almost_equal(ets.fkine(q[-1]).A, T1.A, decimal=3)
+
+        # the joint trajectory is continuous through +- pi
+        rz = rtb.ETS(rtb.ET.Rz())
+        Ts = np.array([rz.eval([t]) for t in np.linspace(3.0, 3.3, 7)])
+        q, success, it, search, E, dq = rz.ik_traj(Ts, [3.0], reject_jl=False)
+        self.assertTrue(success.all())
+        nt.assert_almost_equal(q[:, 0], np.linspace(3.0, 3.3, 7), decimal=3)
+        nt.assert_almost_equal(dq[1:], 0.05, decimal=3)
+
     def test_jacobe(self):
         q = [0]
         rx = rtb.ETS(rtb.ET.Rx())
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+import numpy.testing as nt
+import numpy as np
+import roboticstoolbox as rp
+import spatialmath as sm
+import unittest
+
+
+class TestKinematicCache(unittest.TestCase):
+    def test_values(self):
+        puma = rp.models.DH.Puma560()
+        kc = rp.KinematicCache(puma)
+        q = puma.qn
+
+        nt.assert_array_almost_equal(kc.fkine(q).A, puma.fkine(q).A)
+        nt.assert_array_almost_equal(kc.jacob0(q), puma.jacob0(q))
+        nt.assert_array_almost_equal(kc.jacobe(q), puma.jacobe(q))
+        nt.assert_array_almost_equal(kc.hessian0(q), puma.hessian0(q))
+        nt.assert_array_almost_equal(kc.jacobm(q), puma.jacobm(q))
+        nt.assert_almost_equal(kc.manipulability(q), puma.manipulability(q))
+        nt.assert_array_almost_equal(
+            kc.jacob0_analytical(q, "eul"), puma.jacob0_analytical(q, "eul")
+        )
+        nt.assert_array_almost_equal(kc.inertia(q), puma.inertia(q))
+        nt.assert_array_almost_equal(kc.gravload(q), puma.gravload(q))
+        nt.assert_array_almost_equal(
+            kc.coriolis(q, puma.qr + 0.1), puma.coriolis(q, puma.qr + 0.1)
+        )
+        nt.assert_array_almost_equal(kc.inertia_x(q), puma.inertia_x(q))
+        nt.assert_array_almost_equal(kc.jacob0(q, half="rot"), puma.jacob0(q)[3:])
+
+        # attributes are passed through
+        self.assertEqual(kc.n, 6)
+        self.assertIs(kc.robot, puma)
+
+    def test_jacob0_analytical(self):
+        # the default representation is that of the robot
+        puma = rp.models.DH.Puma560()
+        kc = puma.cached()
+        q = puma.qn
+        nt.assert_array_almost_equal(kc.jacob0_analytical(q), puma.jacob0_analytical(q))
+        nt.assert_array_almost_equal(
+            kc.jacob0_analytical(q, None), puma.jacob0_analytical(q, None)
+        )
+        nt.assert_array_almost_equal(kc.jacob0_analytical(q, None), puma.jacob0(q))
+
+        panda = rp.models.ETS.Panda()
+        kc = panda.cached()
+        q = panda.qr
+        nt.assert_array_almost_equal(
+            kc.jacob0_analytical(q), panda.jacob0_analytical(q)
+        )
+
+    def test_erobot(self):
+        panda = rp.models.ETS.Panda()
+        kc = panda.cached()
+        q = panda.qr
+
+        end = panda.links[-2]
+        nt.assert_array_almost_equal(kc.jacob0(q, end=end), panda.jacob0(q, end=end))
+        nt.assert_array_almost_equal(kc.jacobm(q), panda.jacobm(q))
+        nt.assert_almost_equal(kc.manipulability(q), panda.manipulability(q))
+
+    def test_dependency(self):
+        puma = rp.models.DH.Puma560()
+        kc = puma.cached()
+        q = puma.qn
+
+        kc.jacob0(q)
+        self.assertEqual((kc.hits, kc.misses), (0, 1))
+
+        # uses the cached Jacobian
+        kc.hessian0(q)
+        self.assertEqual((kc.hits, kc.misses), (1, 2))
+
+        # uses the cached Jacobian and Hessian
+        kc.jacobm(q)
+        self.assertEqual((kc.hits, kc.misses), (3, 3))
+
+        kc.jacob0(q, half="trans")
+        self.assertEqual((kc.hits, kc.misses), (4, 3))
+        self.assertEqual(len(kc), 3)
+
+        kc.jacob0(puma.qr)
+        self.assertEqual((kc.hits, kc.misses), (4, 4))
+
+        # trajectories are not cached
+        J = kc.jacob0(np.r_[[q, q]])
+        self.assertEqual(J.shape, (2, 6, 6))
+        self.assertEqual((kc.hits, kc.misses), (4, 4))
+
+        self.assertIsInstance(kc.cache(), str)
+        self.assertIsInstance(str(kc), str)
+
+    def test_cachesize(self):
+        puma = rp.models.DH.Puma560()
+        kc = puma.cached(cachesize=2)
+        self.assertEqual(kc.cachesize, 2)
+
+        kc.fkine(puma.qz)
+        kc.fkine(puma.qr)
+        kc.fkine(puma.qz)  # now most recently used
+        kc.fkine(puma.qn)
+        self.assertEqual(len(kc), 2)
+
+        kc.fkine(puma.qz)
+        self.assertEqual(kc.hits, 2)
+        kc.fkine(puma.qr)
+        self.assertEqual(kc.misses, 4)
+
+        with self.assertRaises(ValueError):
+            puma.cached(cachesize=0)
+
+    def test_invalidate(self):
+        puma = rp.models.DH.Puma560()
+        kc = puma.cached()
+        q = puma.qn
+
+        T = kc.fkine(q)
+        puma.tool = sm.SE3.Tz(0.1)
+        nt.assert_array_almost_equal(kc.fkine(q).A, T.A @ sm.SE3.Tz(0.1).A)
+
+        puma.base = sm.SE3.Tx(0.1)
+        nt.assert_array_almost_equal(kc.fkine(q).A, puma.fkine(q).A)
+
+        M = kc.inertia(q)
+        puma.links[2].m += 1
+        self.assertFalse(np.allclose(kc.inertia(q), M))
+        nt.assert_array_almost_equal(kc.inertia(q), puma.inertia(q))
+
+        puma.links[1].a += 0.1
+        nt.assert_array_almost_equal(kc.jacob0(q), puma.jacob0(q))
+
+    def test_context(self):
+        puma = rp.models.DH.Puma560()
+        q = puma.qn
+
+        with puma.cached() as kc:
+            J = kc.jacob0(q)
+            self.assertEqual(len(kc), 1)
+
+            # cached arrays are shared, so they are read only
+            with self.assertRaises(ValueError):
+                J[0, 0] = 1
+
+        self.assertEqual(len(kc), 0)
+
+    def test_nocache(self):
+        panda = rp.models.ETS.Panda()
+        kc = panda.cached()
+        q = panda.qr
+
+        # an array argument cannot be part of the key
+        tool = sm.SE3.Tz(0.1).A
+        nt.assert_array_almost_equal(
+            kc.jacob0(q, tool=tool), panda.jacob0(q, tool=tool)
+        )
+        self.assertEqual(len(kc), 0)
+
+
+if __name__ == "__main__":  # pragma nocover
+    unittest.main()
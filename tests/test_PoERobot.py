@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import numpy.testing as nt
+import numpy as np
+import roboticstoolbox as rtb
+from roboticstoolbox import PoERobot, PoELink
+from roboticstoolbox.robot.PoERobot import PoERevolute, PoEPrismatic
+from spatialmath import SE3, Twist3
+import unittest
+
+
+class TestPoERobot(unittest.TestCase):
+    def setUp(self):
+        self.puma = rtb.models.DH.Puma560()
+        tw, T0 = self.puma.twists()
+        self.robot = PoERobot([PoELink(t) for t in tw], T0)
+
+    def test_fkine_jacob(self):
+        q = self.puma.qn + 0.1
+
+        nt.assert_array_almost_equal(self.robot.fkine(q).A, self.puma.fkine(q).A)
+        nt.assert_array_almost_equal(self.robot.jacob0(q), self.puma.jacob0(q))
+        nt.assert_array_almost_equal(self.robot.jacobe(q), self.puma.jacobe(q))
+
+    def test_traj(self):
+        Q = np.random.default_rng(0).uniform(-np.pi, np.pi, (5, 6))
+
+        T = self.robot.fkine(Q)
+        J0 = self.robot.jacob0(Q)
+        Je = self.robot.jacobe(Q)
+        self.assertEqual(len(T), 5)
+        self.assertEqual(J0.shape, (5, 6, 6))
+
+        for k, q in enumerate(Q):
+            nt.assert_array_almost_equal(T[k].A, self.puma.fkine(q).A)
+            nt.assert_array_almost_equal(J0[k], self.puma.jacob0(q))
+            nt.assert_array_almost_equal(Je[k], self.puma.jacobe(q))
+
+    def test_prismatic(self):
+        # general twists, compared with the twist exponentials
+        links = [
+            PoERevolute([0, 0, 1], [0, 0, 0]),
+            PoEPrismatic([0, 1, 0]),
+            PoELink([0.1, 0.2, 0.3, 0, 0.6, 0.8]),
+        ]
+        T0 = SE3.Trans(2, 0, 1) * SE3.Rx(0.3)
+        robot = PoERobot(links, T0)
+        q = [0.3, 0.5, -0.7]
+
+        T = SE3()
+        for link, qk in zip(links, q):
+            T *= link.S.exp(qk)
+        nt.assert_array_almost_equal(robot.fkine(q).A, (T * T0).A)
+
+        # the Jacobian by finite differences
+        J = robot.jacob0(q)
+        for j in range(3):
+            dq = np.zeros(3)
+            dq[j] = 1e-7
+            dT = (robot.fkine(q + dq).A - robot.fkine(q).A) / 1e-7
+            nt.assert_array_almost_equal(J[:3, j], dT[:3, 3])
+
+    def test_S(self):
+        S = self.robot.S
+        self.assertEqual(S.shape, (6, 6))
+        nt.assert_array_almost_equal(S[1], self.robot.links[1].S.S)
+
+        # changing a link twist is seen by the robot
+        self.robot.links[1].S = Twist3.UnitPrismatic([0, 0, 1])
+        nt.assert_array_almost_equal(self.robot.S[1], [0, 0, 1, 0, 0, 0])
+
+    def test_ets(self):
+        q = self.puma.qn + 0.1
+        ets = self.robot.ets()
+
+        self.assertEqual(ets.n, 6)
+        nt.assert_array_almost_equal(ets.eval(q), self.robot.fkine(q).A)
+        nt.assert_array_almost_equal(ets.jacob0(q), self.robot.jacob0(q))
+
+        Tep = self.robot.fkine(q).A
+        sol = ets.ik_lm_chan(Tep, seed=0, reject_jl=False)
+        self.assertEqual(sol[1], 1)
+        nt.assert_array_almost_equal(self.robot.fkine(sol[0]).A, Tep, decimal=4)
+
+        robot = PoERobot([PoELink([0.1, 0.2, 0.3, 0, 0.6, 0.8])], SE3())
+        with self.assertRaises(ValueError):
+            robot.ets()
+
+
+if __name__ == "__main__":  # pragma nocover
+    unittest.main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+import numpy.testing as nt
+import os
+import tempfile as tf
+import unittest
+from pathlib import Path
+from roboticstoolbox import ERobot
+from roboticstoolbox.tools import rtb_get_param, rtb_set_param
+from roboticstoolbox.tools.urdf import cache
+
+ROBOT = """<?xml version="1.0"?>
+<robot xmlns:xacro="http://www.ros.org/wiki/xacro" name="arm">
+  <xacro:include filename="parts.xacro"/>
+  <xacro:property name="len" value="0.3"/>
+  <link name="base">
+    <visual><geometry><box size="0.2 0.2 0.1"/></geometry>
+      <material name="grey"><color rgba="0.5 0.5 0.5 1"/></material></visual>
+  </link>
+  <xacro:arm_link name="l1"/>
+  <xacro:arm_link name="l2"/>
+  <link name="tip">
+    <visual><origin xyz="0 0 0.05" rpy="0.1 0 0"/>
+      <geometry><sphere radius="0.03"/></geometry></visual>
+    <visual><geometry><mesh filename="package://arm/tip.stl"/></geometry></visual>
+  </link>
+  <joint name="j1" type="revolute"><parent link="base"/><child link="l1"/>
+    <origin xyz="0 0 0.1"/><axis xyz="0 0 1"/>
+    <limit lower="-2" upper="2" effort="1" velocity="1"/>
+    <dynamics friction="0.1"/></joint>
+  <joint name="j2" type="revolute"><parent link="l1"/><child link="l2"/>
+    <origin xyz="0 0 ${len}" rpy="0 0.2 0"/><axis xyz="0 -1 0"/>
+    <limit lower="-1" upper="1.5" effort="1" velocity="1"/></joint>
+  <joint name="j3" type="prismatic"><parent link="l2"/><child link="tip"/>
+    <origin xyz="0 0 ${len}"/><axis xyz="1 0 0"/>
+    <limit lower="0" upper="0.1" effort="1" velocity="1"/></joint>
+</robot>
+"""
+
+PARTS = """<?xml version="1.0"?>
+<robot xmlns:xacro="http://www.ros.org/wiki/xacro">
+  <xacro:macro name="arm_link" params="name">
+    <link name="${name}">
+      <inertial><origin xyz="0 0 0.15"/><mass value="%s"/>
+        <inertia ixx="0.01" ixy="0" ixz="0" iyy="0.01" iyz="0" izz="0.002"/>
+      </inertial>
+      <collision><origin xyz="0 0 0.15"/>
+        <geometry><cylinder radius="0.05" length="0.3"/></geometry></collision>
+    </link>
+  </xacro:macro>
+</robot>
+"""
+
+
+class TestURDFCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tf.TemporaryDirectory()
+        self.tld = Path(self.tmp.name)
+        (self.tld / "arm").mkdir()
+        (self.tld / "arm" / "arm.urdf.xacro").write_text(ROBOT)
+        self.parts = self.tld / "arm" / "parts.xacro"
+        self.parts.write_text(PARTS % 1.5)
+
+        self.params = {p: rtb_get_param(p) for p in ("cache_dir", "urdf_cache")}
+        rtb_set_param("cache_dir", self.tld / "cache")
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+        for param, value in self.params.items():
+            rtb_set_param(param, value)
+        self.tmp.cleanup()
+
+    def read(self, **kwargs):
+        links, name, _, _ = ERobot.URDF_read(
+            "arm/arm.urdf.xacro", tld=self.tld, **kwargs
+        )
+        return ERobot(links, name=name)
+
+    def assertRobotEqual(self, r0, r1):
+        q = [0.3, 0.4, 0.05]
+        self.assertEqual(r0.name, r1.name)
+        nt.assert_array_almost_equal(r0.fkine(q).A, r1.fkine(q).A)
+        nt.assert_array_almost_equal(r0.qlim, r1.qlim)
+        nt.assert_array_almost_equal(r0.inertia(q), r1.inertia(q))
+
+        for l0, l1 in zip(r0.links, r1.links):
+            self.assertEqual(l0.name, l1.name)
+            self.assertEqual(str(l0.ets), str(l1.ets))
+            self.assertEqual(l0.hasdynamics, l1.hasdynamics)
+            self.assertEqual(l0.B, l1.B)
+            self.assertEqual(l0._joint_name, l1._joint_name)
+
+            s0 = list(l0.geometry) + list(l0.collision)
+            s1 = list(l1.geometry) + list(l1.collision)
+            self.assertEqual([s.stype for s in s0], [s.stype for s in s1])
+            for a, b in zip(s0, s1):
+                nt.assert_array_almost_equal(a.T, b.T)
+                self.assertEqual(a.color, b.color)
+
+    def test_cache(self):
+        # the cache is off by default
+        r0 = self.read()
+        self.assertFalse((self.tld / "cache").exists())
+
+        r1 = self.read(cache=True)
+        self.assertEqual(len(list((self.tld / "cache").glob("*.pickle"))), 1)
+        self.assertRobotEqual(r0, r1)
+
+        # read back from disk, the includes are recorded as sources
+        cache._entries.clear()
+        entry = cache.read(self.tld / "arm" / "arm.urdf.xacro")
+        self.assertIn(str(self.parts.resolve()), entry["sources"])
+        self.assertTrue(cache.isfresh(entry))
+        self.assertRobotEqual(r0, self.read(cache=True))
+
+        # enabled by the toolbox parameter
+        rtb_set_param("urdf_cache", True)
+        self.assertRobotEqual(r0, self.read())
+
+    def test_invalidate(self):
+        rtb_set_param("urdf_cache", True)
+        self.read()
+        entry = cache.read(self.tld / "arm" / "arm.urdf.xacro")
+        self.assertTrue(cache.isfresh(entry))
+
+        # touching an include is a cache miss, the file is read again but the
+        # model is unchanged
+        st = os.stat(self.parts)
+        os.utime(self.parts, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        self.assertFalse(cache.isfresh(entry))
+        r = self.read()
+        self.assertEqual(r.links[1].m, 1.5)
+        entry = cache.read(self.tld / "arm" / "arm.urdf.xacro")
+        mtime, _ = entry["sources"][str(self.parts.resolve())]
+        self.assertEqual(mtime, st.st_mtime_ns + 10**9)
+        self.assertTrue(cache.isfresh(entry))
+
+        # so is touching the model file
+        robot = self.tld / "arm" / "arm.urdf.xacro"
+        st = os.stat(robot)
+        os.utime(robot, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        self.assertFalse(cache.isfresh(entry))
+        self.read()
+        self.assertTrue(cache.isfresh(cache.read(robot)))
+
+        # changing an include rebuilds the model
+        self.parts.write_text(PARTS % 2.5)
+        st = os.stat(self.parts)
+        os.utime(self.parts, ns=(st.st_atime_ns, st.st_mtime_ns + 2 * 10**9))
+        r = self.read()
+        self.assertEqual(r.links[1].m, 2.5)
+        self.assertRobotEqual(r, self.read(cache=False))
+
+
+if __name__ == "__main__":  # pragma nocover
+    unittest.main()
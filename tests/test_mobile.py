@@ -10,8 +10,18 @@ import spatialmath.base as sm
 import unittest
 
 # from roboticstoolbox import Bug2, DistanceTransformPlanner, rtb_loadmat
-from roboticstoolbox import Bug2
+from roboticstoolbox import (
+    Bug2,
+    PRMPlanner,
+    BinaryOccupancyGrid,
+    OccupancyGrid,
+    DstarPlanner,
+    DistanceTransformPlanner,
+)
 from roboticstoolbox.mobile.Bug2 import edgelist
+from roboticstoolbox.mobile.RRTPlanner import _SE2Index
+from roboticstoolbox.mobile.LatticePlanner import LatticePlanner
+from pgraph import DGraph
 from roboticstoolbox.mobile.landmarkmap import *
 from roboticstoolbox.mobile.drivers import *
 from roboticstoolbox.mobile.sensors import *
@@ -51,6 +61,146 @@ class TestNavigation(unittest.TestCase):
             for e in edge:
                 self.assertEqual(im[e[1], e[0]], im[seed[1], seed[0]])
 
+    def test_occgrid_many(self):
+        grid = np.zeros((10, 10))
+        grid[5, 5] = 1
+        og = BinaryOccupancyGrid(grid, origin=(-1, -1))
+
+        p = np.array([[4, 4], [0, 0], [-2, 0], [9, 0], [8, 0]])
+        nt.assert_equal(og.isoccupied_many(p), [True, False, True, True, False])
+        for pi, occ in zip(p, og.isoccupied_many(p)):
+            self.assertEqual(og.isoccupied(pi), occ)
+
+        p1 = [[-1, -1], [-1, -1], [-1, 4], [3.4, 3.6], [3.4, 3.6], [0, 0]]
+        p2 = [[8, 8], [8, -1], [8, 4], [4.6, 4.8], [3.4, 4.8], [0, 9]]
+        nt.assert_equal(og.segment_free(p1, p2), [False, True, False, False, True, False])
+
+        # one start point for many segments
+        nt.assert_equal(og.segment_free([-1, -1], [[8, 8], [8, -1]]), [False, True])
+
+        # an end point on a cell boundary is rounded as for w2g
+        grid = np.zeros((10, 10))
+        grid[0, 4] = 1
+        og = BinaryOccupancyGrid(grid)
+        self.assertTrue(og.isoccupied_many([[3.5, 0]])[0])
+        nt.assert_equal(og.segment_free([0, 0], [[3.5, 0], [2.5, 0]]), [False, True])
+
+    def test_prm(self):
+        grid = np.zeros((50, 50))
+        grid[10:40, 20:30] = 1
+
+        prm = PRMPlanner(grid, npoints=300, dist_thresh=10, seed=0)
+        prm.plan()
+        self.assertEqual(prm.graph.n, 300)
+
+        # vertices are in free space and edges respect the threshold
+        for vertex in prm.graph:
+            self.assertFalse(prm.occgrid.isoccupied(vertex.coord))
+        for edge in prm.graph.edges():
+            self.assertLessEqual(edge.cost, 10)
+            self.assertTrue(prm._test_path(*edge.endpoints))
+
+        path = prm.query(start=(5, 25), goal=(45, 25))
+        nt.assert_equal(path[0], (5, 25))
+        nt.assert_equal(path[-1], (45, 25))
+
+        # each vertex contributes at most k edges
+        ne = prm.graph.ne
+        prm.plan(k=4)
+        self.assertLessEqual(prm.graph.ne, 4 * 300)
+        self.assertLess(prm.graph.ne, ne)
+
+    def test_se2_index(self):
+        rng = np.random.default_rng(0)
+        g = DGraph(metric="SE2")
+        index = _SE2Index([0, 10, -5, 5])
+
+        for coord in rng.uniform((0, -5, -np.pi), (10, 5, np.pi), (300, 3)):
+            index.add(g.add_vertex(coord))
+
+        for coord in rng.uniform((-1, -6, -4), (11, 6, 4), (50, 3)):
+            v1, d1 = index.closest(coord)
+            v2, d2 = g.closest(coord)
+            self.assertIs(v1, v2)
+            self.assertAlmostEqual(d1, d2)
+
+    def test_lattice(self):
+        lattice = LatticePlanner()
+        lattice.plan(iterations=6)
+
+        # vertices are unique
+        keys = {lattice._ikey(v.coord) for v in lattice.graph}
+        self.assertEqual(len(keys), lattice.graph.n)
+
+        path, status = lattice.query(start=(0, 0, 0), goal=(1, 2, np.pi / 2))
+        nt.assert_almost_equal(path[-1], (1, 2, np.pi / 2))
+        self.assertEqual(status.segments, ["L", "S"])
+
+        with self.assertRaises(ValueError):
+            lattice.query(start=(0, 0, 0), goal=(0.5, 2, 0))
+
+    def test_dstar(self):
+        costmap = np.ones((6, 6))
+        costmap[2:5, 3:5] = 10
+        ds = DstarPlanner(costmap, goal=(1, 1))
+        ds.plan()
+        self.assertEqual(ds.nexpand, 36)
+
+        path, status = ds.query(start=(5, 4))
+        nt.assert_array_equal(
+            path, [(5, 4), (5, 3), (5, 2), (4, 1), (3, 1), (2, 1), (1, 1)]
+        )
+        self.assertAlmostEqual(status.cost, 5 + np.sqrt(2))
+
+        # a wall appears across the planned path, replan incrementally
+        def sensor(pos):
+            if pos == (5, 3):
+                return [(x, 2, np.inf) for x in range(1, 6)]
+
+        path, status = ds.query(start=(5, 4), sensor=sensor)
+        self.assertGreater(ds.nexpand, 36)
+        self.assertEqual(tuple(path[-1]), (1, 1))
+        self.assertTrue(np.all(np.isfinite(costmap[path[:, 1], path[:, 0]])))
+
+        # the rest of the path is optimal for the new costmap
+        fresh = DstarPlanner(costmap.copy(), goal=(1, 1))
+        fresh.plan()
+        cost = 0
+        for (x1, y1), (x2, y2) in zip(path[1:-1], path[2:]):
+            c = (costmap[y1, x1] + costmap[y2, x2]) / 2
+            cost += c * np.hypot(x2 - x1, y2 - y1)
+        self.assertAlmostEqual(cost, fresh.query(start=(5, 3))[1].cost)
+
+    def test_distancexform(self):
+        grid = np.zeros((6, 8))
+        grid[2:5, 3:5] = 1
+        dx = DistanceTransformPlanner(grid, goal=(1, 1))
+        dx.plan()
+        self.assertTrue(np.isnan(dx.distancemap[2, 3]))
+        self.assertAlmostEqual(dx.distancemap[4, 7], 3 + 3 * np.sqrt(2))
+
+        path = dx.query(start=(7, 4))
+        nt.assert_array_equal(
+            path, [(7, 4), (6, 3), (5, 2), (4, 1), (3, 1), (2, 1), (1, 1)]
+        )
+        self.assertEqual(dx.next((2, 1)), None)
+        nt.assert_array_equal(dx.next((3, 1)), (2, 1))
+
+        # incremental update is the same as planning again
+        rng = np.random.default_rng(0)
+        for occupied in (True, True, False, True, False):
+            cells = np.column_stack((rng.integers(2, 8, 6), rng.integers(0, 6, 6)))
+            dx.update(cells, occupied=occupied)
+
+            replan = DistanceTransformPlanner(dx.occgrid.grid.copy(), goal=(1, 1))
+            replan.plan()
+            nt.assert_array_almost_equal(dx.distancemap, replan.distancemap)
+
+        dx.update([(x, 2) for x in range(8)])
+        self.assertTrue(np.isinf(dx.distancemap[5, 7]))
+        with self.assertRaises(RuntimeError):
+            dx.query(start=(7, 5))
+
     # def test_map(self):
     #     map = np.zeros((10, 10))
     #     map[2, 3] = 1
@@ -108,6 +258,22 @@ class RangeBearingSensorTest(unittest.TestCase):
         z, lm_id = rs.reading()
         self.assertEqual(z, None)
 
+    def test_readings(self):
+        veh = rtb.Bicycle(x0=[0, 0, 0])
+        map = rtb.LandmarkMap(20, workspace=10, seed=0)
+        rs = RangeBearingSensor(veh, map, range=8, angle=[-pi / 2, pi / 2])
+
+        z, lm_id = rs.readings()
+        self.assertEqual(z.shape, (len(lm_id), 2))
+        nt.assert_array_almost_equal(z, [rs.h(veh.x, id) for id in lm_id])
+
+        # every visible landmark is returned
+        zall = rs.h(veh.x)
+        visible = np.flatnonzero(
+            (zall[:, 0] <= 8) & (zall[:, 1] >= -pi / 2) & (zall[:, 1] <= pi / 2)
+        )
+        nt.assert_array_equal(lm_id, visible)
+
     def test_h(self):
         xv = np.r_[2, 3, 0.5]
         p = np.r_[3, 4]
@@ -293,6 +459,348 @@ class TestBicycle(unittest.TestCase):
         )
 
 
+class EKFTest(unittest.TestCase):
+    def make(self, **kwargs):
+        V = np.diag([0.02, np.radians(0.5)]) ** 2
+        W = np.diag([0.1, np.radians(1)]) ** 2
+        P0 = np.diag([0.05, 0.05, np.radians(0.5)]) ** 2
+
+        robot = Bicycle(covar=V, animation=None)
+        robot.control = RandomPath(workspace=10, seed=0)
+        map = LandmarkMap(20, workspace=10, seed=0)
+        sensor = RangeBearingSensor(
+            robot=robot, map=map, covar=W, angle=[-pi / 2, pi / 2], range=4
+        )
+        return rtb.EKF(robot=(robot, V), P0=P0, sensor=(sensor, W), **kwargs)
+
+    def error(self, ekf):
+        e = ekf.robot.x_hist - ekf.get_xyt()
+        return np.linalg.norm(e[:, :2], axis=1).mean()
+
+    def test_slam_batch(self):
+        ekf = self.make()
+        ekf.run(T=20)
+        ekf_batch = self.make(batch=True)
+        ekf_batch.run(T=20)
+
+        self.assertEqual(len(ekf_batch.landmarks), len(ekf.landmarks))
+        self.assertLess(self.error(ekf_batch), 2 * self.error(ekf))
+
+    def test_slam_information(self):
+        ekf = self.make(batch=True)
+        ekf.run(T=20)
+
+        # without sparsification the information filter is exact
+        seif = self.make(batch=True, form="information", nactive=100)
+        seif.run(T=20)
+        nt.assert_array_almost_equal(
+            seif.get_xyt()[:, :2], ekf.get_xyt()[:, :2], decimal=1
+        )
+        nt.assert_array_almost_equal(seif.P_est, ekf.P_est, decimal=2)
+
+        # the covariance is recorded only if asked for, and is the vehicle
+        # marginal
+        self.assertNotIn("P", seif.history.fields)
+        self.assertIsNone(seif.get_P(-1))
+        history = rtb.History(fields=("t", "xest", "P"))
+        seif = self.make(batch=True, form="information", nactive=100, history=history)
+        seif.run(T=20)
+        nt.assert_array_almost_equal(seif.history[-1].P, ekf.P_est[:3, :3], decimal=3)
+
+        seif = self.make(batch=True, form="information", nactive=4)
+        seif.run(T=20)
+        self.assertLess(self.error(seif), 2 * self.error(ekf))
+
+        with self.assertRaises(ValueError):
+            V = np.diag([0.02, np.radians(0.5)]) ** 2
+            rtb.EKF(robot=(Bicycle(), V), P0=np.eye(3), form="information")
+
+    def test_history(self):
+        ekf = self.make()
+        ekf.run(T=20)
+        ekf_small = self.make(history=rtb.History(fields=("t", "xest", "P"), maxlen=50, every=4))
+        ekf_small.run(T=20)
+
+        h = ekf_small.history
+        self.assertEqual(len(h), 50)
+        self.assertEqual(h.fields, ("t", "xest", "P"))
+        index = h.index()
+        nt.assert_array_equal(index, np.arange(200 - 50 * 4, 200, 4))
+        nt.assert_array_almost_equal(ekf_small.get_t(), ekf.get_t()[index])
+        nt.assert_array_almost_equal(ekf_small.get_xyt(), ekf.get_xyt()[index])
+        for k, i in enumerate(index):
+            nt.assert_array_almost_equal(ekf_small.get_P(k), ekf.get_P(i))
+            nt.assert_array_almost_equal(h[k].xest, ekf.history[i].xest)
+        self.assertIsNone(h[-1].K)
+
+        with self.assertRaises(ValueError):
+            self.make(history=rtb.History(fields=("t", "foo")))
+
+    def test_history_file(self):
+        import os
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as dir:
+            file = os.path.join(dir, "ekf")
+            ekf = self.make(batch=True, history=rtb.History(file=file))
+            ekf.run(T=10)
+
+            self.assertTrue(os.path.exists(file + "-P.npy"))
+            # the covariance grows with the map, so it is stored ragged in a
+            # flat buffer
+            P = np.load(file + "-P.npy", mmap_mode="r")
+            self.assertEqual(P.ndim, 1)
+            size = sum(h.P.size for h in ekf.history)
+            self.assertLessEqual(P.size, 2 * size)
+            nt.assert_array_equal(ekf.get_P(-1), ekf.P_est)
+            nt.assert_array_equal(ekf.history[-1].lm, ekf.sensor._landmarklog[-1])
+            del P
+
+
+class ParticleFilterTest(unittest.TestCase):
+    def make(self, **kwargs):
+        V = np.diag([0.02, np.radians(0.5)]) ** 2
+        W = np.diag([0.1, np.radians(1)]) ** 2
+
+        robot = Bicycle(covar=V, animation=None, workspace=10)
+        robot.control = RandomPath(workspace=10, seed=0)
+        map = LandmarkMap(20, workspace=10, seed=0)
+        sensor = RangeBearingSensor(robot=robot, map=map, covar=W)
+
+        R = np.diag([0.1, 0.1, np.radians(1)]) ** 2
+        L = np.diag([0.1, 0.1])
+        return rtb.ParticleFilter(robot, sensor, R, L, nparticles=1000, **kwargs)
+
+    def error(self, pf):
+        e = pf.robot.x_hist[:, :2] - pf.get_xyt()
+        return np.linalg.norm(e[-50:, :], axis=1).mean()
+
+    def test_run(self):
+        for resample in ("systematic", "stratified", "residual", "multinomial"):
+            pf = self.make(resample=resample)
+            pf.run(T=10)
+            self.assertLess(self.error(pf), 1, resample)
+
+        pf = self.make(batch=True, neff=0.5)
+        pf.run(T=10)
+        self.assertLess(self.error(pf), 0.5)
+
+        with self.assertRaises(ValueError):
+            self.make(resample="foo")
+
+    def test_select(self):
+        pf = self.make()
+        pf._init()
+        N = pf.nparticles
+        pf.x = np.c_[np.arange(N), np.zeros((N, 2))]
+
+        for resample in ("systematic", "stratified", "residual", "multinomial"):
+            # all the weight on one particle
+            pf._resample = resample
+            pf.x = np.c_[np.arange(N), np.zeros((N, 2))]
+            pf.weight = np.full((N,), 1e-20)
+            pf.weight[7] = 1
+            self.assertAlmostEqual(pf.neff(), 1)
+            pf._select()
+            nt.assert_array_equal(pf.x[:, 0], 7)
+            nt.assert_array_equal(pf.weight, 1)
+            self.assertAlmostEqual(pf.neff(), N)
+
+        # residual resampling keeps floor(N w) copies of each particle
+        pf._resample = "residual"
+        pf.x = np.c_[np.arange(N), np.zeros((N, 2))]
+        pf.weight = np.zeros((N,))
+        pf.weight[:3] = [0.5, 0.3, 0.2]
+        pf._select()
+        nt.assert_array_equal(np.bincount(pf.x[:, 0].astype(int)), [500, 300, 200])
+
+
+class PoseGraphTest(unittest.TestCase):
+    def test_linearize(self):
+        pg = rtb.PoseGraph("data/killian-small.toro")
+        pg._setup()
+        e, A, B = pg._linearize()
+        index = {(pg._vid[i], pg._vid[j]): k for k, (i, j) in enumerate(zip(pg._ei, pg._ej))}
+        for edge in list(pg.graph.edges())[::100]:
+            k = index[edge.endpoints[0].name, edge.endpoints[1].name]
+            ek, Ak, Bk = edge.linear_factors()
+            nt.assert_array_almost_equal(e[k], ek)
+            nt.assert_array_almost_equal(A[k], Ak)
+            nt.assert_array_almost_equal(B[k], Bk)
+
+    def test_optimize(self):
+        pg = rtb.PoseGraph("data/pg1.g2o")
+        self.assertEqual(pg.graph.n, 4)
+        pg.optimize()
+
+        pg = rtb.PoseGraph("data/killian-small.toro")
+        cost0 = pg._cost()
+        cost = pg.optimize()
+        self.assertLess(cost, 1e-2 * cost0)
+
+        # vertex coordinates are updated
+        nt.assert_array_equal(pg.graph[0].coord, pg._x[0])
+
+        pg_lm = rtb.PoseGraph("data/killian-small.toro")
+        cost_lm = pg_lm.optimize(method="levenberg-marquardt", iterations=20)
+        self.assertAlmostEqual(cost_lm / cost, 1, places=3)
+
+        for kernel in ("huber", "cauchy"):
+            pg = rtb.PoseGraph("data/killian-small.toro")
+            cost0 = pg._cost(kernel=kernel)
+            self.assertLess(pg.optimize(kernel=kernel), 0.2 * cost0)
+
+        with self.assertRaises(ValueError):
+            pg.optimize(method="foo")
+        with self.assertRaises(ValueError):
+            pg.optimize(kernel="foo")
+
+    def test_graph_view(self):
+        # the graph is created before optimizing, its vertices follow the poses
+        pg = rtb.PoseGraph("data/killian-small.toro")
+        g = pg.graph
+        pg.optimize()
+        for k in (0, 100, 1000):
+            self.assertTrue(np.shares_memory(g[k].coord, pg._x))
+            nt.assert_array_equal(g[k].coord, pg.pose(k))
+
+    def test_scanmap(self):
+        # one scan with a single beam from the origin to (5, 3)
+        pg = rtb.PoseGraph("data/pg1.g2o")
+        pg._x = np.zeros((1, 3))
+        pg._scanvertex = {0: 0}
+        pg._nbeams, pg._angmin, pg._anginc = 1, np.arctan2(3, 5), 0.1
+        pg._maxrange = 100
+        pg._ranges, pg._times = np.array([[np.hypot(5, 3)]]), np.zeros(1)
+
+        og = OccupancyGrid(np.zeros((6, 8)))
+        pg.scanmap(og)
+
+        # every cell the ray touches is free, a supercover line, which
+        # includes (0, 1) and (3, 4) that Bresenham's algorithm does not
+        free = [(0, 0), (0, 1), (1, 1), (1, 2), (2, 3), (2, 4), (3, 4)]
+        r, c = np.nonzero(og.grid > 0)
+        self.assertEqual(list(zip(r, c)), free)
+        r, c = np.nonzero(og.grid < 0)
+        self.assertEqual(list(zip(r, c)), [(3, 5)])
+
+    def test_load(self):
+        pg = rtb.PoseGraph("data/killian-small.toro")
+        self.assertEqual(pg.graph.n, 1941)
+        self.assertEqual(pg.graph.ne, 3995)
+
+        # edges join the named vertices, with the TORO information matrix
+        # IXX IXY IYY ITT IXT IYT
+        for e in pg.graph.edges():
+            v1, v2 = e.endpoints
+            if (v1.name, v2.name) == ("1", "0"):
+                break
+        nt.assert_array_equal(v1.coord, pg.pose(1))
+        nt.assert_array_almost_equal(e.mean, [-1.082078, -0.007851, -0.009693])
+        nt.assert_array_equal(e.info, np.diag([20, 20, 100000]))
+
+        pg = rtb.PoseGraph("data/killian.g2o.zip", lidar=True)
+        self.assertEqual(len(pg._x), 3873)
+        r, theta = pg.scan(1)
+        self.assertEqual(r.shape, (180,))
+        self.assertEqual(theta.shape, (180,))
+        self.assertAlmostEqual(theta[0], -pi / 2, places=5)
+        self.assertEqual(pg.scanxy(1).shape, (2, 180))
+        self.assertGreater(pg.time(2), pg.time(1))
+
+    def test_cache(self):
+        import os
+        import shutil
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as dir:
+            file = os.path.join(dir, "pg1.g2o")
+            shutil.copy(rtb.rtb_path_to_datafile("data/pg1.g2o"), file)
+
+            pg = rtb.PoseGraph(file, cache=True)
+            self.assertTrue(os.path.exists(file + ".npz"))
+            pg_cached = rtb.PoseGraph(file, cache=True)
+            nt.assert_array_equal(pg_cached._x, pg._x)
+            nt.assert_array_equal(pg_cached._einfo, pg._einfo)
+            nt.assert_array_equal(pg_cached._ei, pg._ei)
+            self.assertEqual(pg_cached.graph.n, 4)
+
+            # the cache is not used if the file changes
+            with open(file, "a") as f:
+                f.write("VERTEX_SE2 5 1 2 0\n")
+            pg = rtb.PoseGraph(file, cache=True)
+            self.assertEqual(pg.graph.n, 5)
+
+            # a truncated or incomplete cache file is a cache miss, and is
+            # rewritten
+            size = os.path.getsize(file + ".npz")
+            with open(file + ".npz", "r+b") as f:
+                f.truncate(size // 2)
+            pg = rtb.PoseGraph(file, cache=True)
+            self.assertEqual(pg.graph.n, 5)
+            self.assertEqual(os.path.getsize(file + ".npz"), size)
+
+            with np.load(file + ".npz") as npz:
+                data = {k: npz[k] for k in npz.files if k != "vcoord"}
+            np.savez(file + ".npz", **data)
+            pg = rtb.PoseGraph(file, cache=True)
+            self.assertEqual(pg.graph.n, 5)
+            self.assertEqual(sorted(os.listdir(dir)), ["pg1.g2o", "pg1.g2o.npz"])
+
+
+class HistoryTest(unittest.TestCase):
+    def test_append(self):
+        h = rtb.History()
+        h._bind("log", ("t", "x", "lm"))
+        self.assertEqual(len(h), 0)
+
+        for k in range(100):
+            h.append(k * 0.1, np.arange(k % 5 + 1), -1 if k % 2 else None)
+        self.assertEqual(len(h), 100)
+        self.assertAlmostEqual(h[3].t, 0.3)
+        nt.assert_array_equal(h[3].x, np.arange(4))
+        self.assertEqual(h[3].lm, -1)
+        self.assertIsNone(h[4].lm)
+
+        x = h.column("x")
+        self.assertEqual(x.shape, (100, 5))
+        self.assertEqual(x[0, 1], -1)
+        nt.assert_array_equal(h.column("lm")[:4], [-1, -1, -1, -1])
+
+        # ring buffer
+        h = rtb.History(maxlen=10, every=3)
+        h._bind("log", ("t", "x"))
+        for k in range(100):
+            h.append(k, np.r_[k, k])
+        self.assertEqual(len(h), 10)
+        nt.assert_array_equal(h.index(), np.arange(72, 100, 3))
+        nt.assert_array_equal(h.column("t"), np.arange(72, 100, 3))
+        self.assertEqual(h[-1].t, 99)
+        self.assertEqual(len(h[2:5]), 3)
+        self.assertEqual([r.t for r in h], list(range(72, 100, 3)))
+
+        # values that change size are stored without padding, the discarded
+        # records of a ring buffer are reclaimed
+        h = rtb.History(maxlen=10)
+        h._bind("log", ("t", "P"))
+        for k in range(1000):
+            h.append(k, np.full((k % 7 + 1, k % 7 + 1), k))
+        self.assertLessEqual(len(h._columns["P"].flat), 2 * 10 * 49)
+        for r in h:
+            n = r.t % 7 + 1
+            nt.assert_array_equal(r.P, np.full((n, n), r.t))
+        P = h.column("P")
+        self.assertEqual(P.shape, (10, 7, 7))
+        self.assertEqual(P[0, 0, 0], 990)
+        self.assertEqual(P[0, 0, 6], -1)
+
+        h.clear()
+        self.assertEqual(len(h), 0)
+
+        with self.assertRaises(IndexError):
+            h[0]
+
+
 # function setupOnce(testCase)
 #     testCase.TestData.Duration = 50;
 # end